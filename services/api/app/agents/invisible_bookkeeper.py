@@ -8,7 +8,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 # Import your existing functionality - don't modify, just wrap  
 from ..ai import suggest_account_and_vat, build_entries_with_code
-from ..ocr import get_ocr_adapter, _extract_fields_from_text
+from ..ocr import _extract_fields_from_text
+from ..ocr_cache import cached_extract
 from ..compliance import run_verification_rules, compute_score
 from ..routers.verifications import VerificationIn, EntryIn, create_verification
 from ..ai_fallback import extract_fields_with_llm
@@ -30,12 +31,10 @@ class InvisibleBookkeeper:
             if not file_path.exists():
                 return {"error": "File not found", "fallback": True}
                 
-            # Use your existing OCR adapter
-            ocr_adapter = get_ocr_adapter()
-            
             try:
                 image_bytes = file_path.read_bytes()
-                ocr_result = await ocr_adapter.extract(image_bytes)
+                # Same bytes already OCR'd via upload, Fortnox or e-mail are served from the cache
+                ocr_result, _source = await cached_extract(self.session, image_bytes, original=file_path)
                 
                 # Calculate confidence based on field extraction success
                 extracted_data = {}
@@ -133,7 +132,7 @@ class InvisibleBookkeeper:
         # Your existing suggest_account_and_vat function
         from ..metrics_llm import record_request
         record_request("rules", "heuristics", "suggest_account")
-        decision = await suggest_account_and_vat(vendor, total, self.session)
+        decision = await suggest_account_and_vat(vendor, total, self.session, self.org_id)
         
         # Enhanced VAT code detection
         vat_code = body.get('vat_code') or self._smart_vat_detection(body)
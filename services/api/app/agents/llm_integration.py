@@ -4,12 +4,14 @@ LLM Integration Module - Connect to OpenAI/Anthropic/OpenRouter/Local Models
 
 import os
 import json
+import hashlib
 from typing import Dict, Any, Optional
 from enum import Enum
 from dataclasses import dataclass
-from datetime import timedelta
 import time
 
+from ..llm_cache import cache_key, get_llm_cache, get_single_flight
+
 class LLMProvider(Enum):
     OPENAI = "openai"
     ANTHROPIC = "anthropic" 
@@ -32,21 +34,10 @@ class LLMService:
     def __init__(self, config: LLMConfig):
         self.config = config
         self._init_client()
-        self._cache = None
-        self._init_cache()
         self._daily_budget_cents = None
         self._daily_spent_cents = 0
         self._budget_reset_epoch = int(time.time())
 
-    def _init_cache(self) -> None:
-        try:
-            from ..config import settings  # local import to avoid cycles
-            if settings.llm_cache_url:
-                import redis
-                self._cache = redis.Redis.from_url(settings.llm_cache_url, decode_responses=True)
-        except Exception:
-            self._cache = None
-        
     def _init_client(self):
         """Initialize the appropriate LLM client."""
         # A/B routing setup (select model dynamically if enabled)
@@ -118,72 +109,58 @@ class LLMService:
         Be precise with Swedish formats (SEK, dates, org numbers).
         """
         
-        # Cache key
-        cache_key = None
-        try:
-            if self._cache:
-                cache_key = f"llm:extract:{hash(ocr_text)}"
-                cached = self._cache.get(cache_key)
-                if cached:
-                    return json.loads(cached)
-        except Exception:
-            pass
-
-        from ..metrics_llm import record_request, record_error, observe_latency
+        from ..metrics_llm import record_request, record_error, observe_latency, llm_request, record_upstream_call
         provider_label = self.config.provider.value
         model_label = getattr(self.client, "models", {}).get("swedish") if self.config.provider == LLMProvider.OPENROUTER else self.config.model
-        record_request(provider_label, model_label or "unknown", "extract")
-        start = time.perf_counter()
-        # Budget guard
-        self._check_and_enforce_budget()
-        if self.config.provider == LLMProvider.OPENAI:
-            response = await self._openai_complete(prompt)
-            data = self._parse_json_response(response)
-            try:
-                from .llm_schemas import ReceiptExtractionResult, validate_data
-                validate_data(ReceiptExtractionResult, data)
-            except Exception:
-                pass
-            return data
-        elif self.config.provider == LLMProvider.ANTHROPIC:
-            response = await self._anthropic_complete(prompt)
-            data = self._parse_json_response(response)
-            try:
-                from .llm_schemas import ReceiptExtractionResult, validate_data
-                validate_data(ReceiptExtractionResult, data)
-            except Exception:
-                pass
-            return data
-        elif self.config.provider == LLMProvider.OPENROUTER:
-            # Use Swedish model, force JSON
-            resp = await self.client._call_openrouter(  # type: ignore[attr-defined]
-                model=self.client.models.get("swedish", "meta-llama/llama-3.1-70b-instruct:free"),
-                prompt=prompt,
-                task_type="extraction",
-                temperature=self.config.temperature,
-            )
-            data = resp if isinstance(resp, dict) else {"raw_response": str(resp)}
-            # Cache
+        # Content-addressed cache shared by all workers (same receipt text -> same answer)
+        cache = get_llm_cache()
+        key = cache_key(prompt, model_label or self.config.model, self.config.temperature)
+
+        async def _fetch() -> Dict[str, Any]:
+            record_request(provider_label, model_label or "unknown", "extract")
+            start = time.perf_counter()
+            # Budget guard
+            self._check_and_enforce_budget()
             try:
-                if self._cache:
-                    from ..config import settings
-                    self._cache.setex(cache_key, timedelta(hours=settings.llm_cache_ttl_hours), json.dumps(data, ensure_ascii=False))
+                if self.config.provider == LLMProvider.OPENROUTER:
+                    # Use Swedish model, force JSON; cached here rather than in the client
+                    resp = await self.client._call_openrouter(  # type: ignore[attr-defined]
+                        model=self.client.models.get("swedish", "meta-llama/llama-3.1-70b-instruct:free"),
+                        prompt=prompt,
+                        task_type="extract",
+                        temperature=self.config.temperature,
+                        use_cache=False,
+                    )
+                    data = resp if isinstance(resp, dict) else {"raw_response": str(resp)}
+                else:
+                    record_upstream_call("extract")
+                    if self.config.provider == LLMProvider.OPENAI:
+                        response = await self._openai_complete(prompt)
+                    elif self.config.provider == LLMProvider.ANTHROPIC:
+                        response = await self._anthropic_complete(prompt)
+                    else:
+                        response = await self._local_complete(prompt)
+                    data = self._parse_json_response(response)
+                    try:
+                        from .llm_schemas import ReceiptExtractionResult, validate_data
+                        validate_data(ReceiptExtractionResult, data)
+                    except Exception:
+                        pass
             except Exception:
-                pass
-            observe_latency(provider_label, model_label or "unknown", "extract", time.perf_counter() - start)
+                record_error(provider_label, model_label or "unknown", "extract")
+                raise
+            finally:
+                observe_latency(provider_label, model_label or "unknown", "extract", time.perf_counter() - start)
             self._add_estimated_cost()
+            await cache.set(key, data)
             return data
-        else:
-            response = await self._local_complete(prompt)
-            out = self._parse_json_response(response)
-            try:
-                from .llm_schemas import ReceiptExtractionResult, validate_data
-                validate_data(ReceiptExtractionResult, out)
-            except Exception:
-                pass
-            observe_latency(provider_label, model_label or "unknown", "extract", time.perf_counter() - start)
-            self._add_estimated_cost()
-            return out
+
+        with llm_request("extract"):
+            cached = await cache.get(key, "extract")
+            if cached is not None:
+                return cached
+            # Identical receipts arriving together share one upstream call
+            return await get_single_flight().do(key, _fetch, "extract")
     
     async def optimize_tax(self, verification_data: Dict[str, Any]) -> Dict[str, Any]:
         """Swedish tax optimization using LLM with Skatteverket rules."""
@@ -227,10 +204,8 @@ class LLMService:
         
         Format response as JSON with specific actions and savings, and include a 'citations' array listing any URLs used.
         """
-        # Budget guard
-        self._check_and_enforce_budget()
         try:
-            response = await self._get_completion(prompt)
+            response = await self._get_completion(prompt, "tax")
             out = self._parse_json_response(response)
             try:
                 from .llm_schemas import TaxOptimizationResult, validate_data
@@ -245,7 +220,6 @@ class LLMService:
             raise
         finally:
             observe_latency(provider_label, model_label or "unknown", "tax", time.perf_counter() - start)
-            self._add_estimated_cost()
     
     async def check_compliance(self, transaction: Dict[str, Any]) -> Dict[str, Any]:
         """Swedish compliance checking using LLM."""
@@ -293,10 +267,8 @@ class LLMService:
         
         Be strict - it's better to flag potential issues than miss real problems.
         """
-        # Budget guard
-        self._check_and_enforce_budget()
         try:
-            response = await self._get_completion(prompt)
+            response = await self._get_completion(prompt, "compliance")
             out = self._parse_json_response(response)
             try:
                 from .llm_schemas import ComplianceCheckResult, validate_data
@@ -311,7 +283,6 @@ class LLMService:
             raise
         finally:
             observe_latency(provider_label, model_label or "unknown", "compliance", time.perf_counter() - start)
-            self._add_estimated_cost()
     
     async def generate_insights(self, business_data: Dict[str, Any]) -> Dict[str, Any]:
         """Generate contextual business insights using LLM."""
@@ -358,10 +329,8 @@ class LLMService:
         
         Focus on Swedish business context and regulations.
         """
-        # Budget guard
-        self._check_and_enforce_budget()
         try:
-            response = await self._get_completion(prompt)
+            response = await self._get_completion(prompt, "insights")
             out = self._parse_json_response(response)
             try:
                 from .llm_schemas import InsightsResult, validate_data
@@ -376,10 +345,14 @@ class LLMService:
             raise
         finally:
             observe_latency(provider_label, model_label or "unknown", "insights", time.perf_counter() - start)
-            self._add_estimated_cost()
     
-    async def _get_completion(self, prompt: str) -> str:
-        """Route to appropriate provider."""
+    async def _get_completion(self, prompt: str, operation: str = "general") -> str:
+        """Route to appropriate provider, answering repeated prompts from the LLM cache."""
+        from ..metrics_llm import llm_request
+        with llm_request(operation):
+            return await self._complete(prompt, operation)
+
+    async def _complete(self, prompt: str, operation: str) -> str:
         # Simple A/B split based on hash of prompt
         try:
             from ..config import settings as _settings
@@ -388,26 +361,45 @@ class LLMService:
                 s = getattr(_settings, "llm_ab_secondary_model", None)
                 split = int(getattr(_settings, "llm_ab_split_percent", 0))
                 if p and s and 0 < split < 100:
-                    h = abs(hash(prompt)) % 100
+                    # Stable bucket: hash() is randomised per process
+                    h = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8], 16) % 100
                     self.config.model = p if h >= split else s
         except Exception:
             pass
+        openrouter_model = None
+        if self.config.provider == LLMProvider.OPENROUTER:
+            openrouter_model = self.client.models.get("swedish", "meta-llama/llama-3.1-70b-instruct:free")
+        cache = get_llm_cache()
+        key = cache_key(prompt, openrouter_model or self.config.model, self.config.temperature)
+        cached = await cache.get(key, operation)
+        if cached is not None:
+            return cached
+        # Budget guard (cache hits are free)
+        self._check_and_enforce_budget()
+        if self.config.provider != LLMProvider.OPENROUTER:
+            # OpenRouter counts its own requests, retries included
+            from ..metrics_llm import record_upstream_call
+            record_upstream_call(operation)
         if self.config.provider == LLMProvider.OPENAI:
-            return await self._openai_complete(prompt)
+            response = await self._openai_complete(prompt)
         elif self.config.provider == LLMProvider.ANTHROPIC:
-            return await self._anthropic_complete(prompt)
+            response = await self._anthropic_complete(prompt)
         elif self.config.provider == LLMProvider.OPENROUTER:
             # For generic completions via OpenRouter when not strict JSON
             resp = await self.client._call_openrouter(  # type: ignore[attr-defined]
-                model=self.client.models.get("swedish", "meta-llama/llama-3.1-70b-instruct:free"),
+                model=openrouter_model,
                 prompt=prompt,
-                task_type="general",
+                task_type=operation,
                 temperature=self.config.temperature,
+                use_cache=False,
             )
             # Return a string for downstream parsing compatibility
-            return json.dumps(resp, ensure_ascii=False)
+            response = json.dumps(resp, ensure_ascii=False)
         else:
-            return await self._local_complete(prompt)
+            response = await self._local_complete(prompt)
+        self._add_estimated_cost()
+        await cache.set(key, response)
+        return response
     
     async def _openai_complete(self, prompt: str) -> str:
         """OpenAI completion."""
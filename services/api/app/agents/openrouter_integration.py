@@ -5,14 +5,19 @@ Production-ready implementation with 1000 free requests/day
 
 import os
 import json
-import hashlib
+import random
+import time
 from typing import Dict, Any, Optional, List
-from datetime import datetime, timedelta
+from datetime import datetime
 import aiohttp
 from dataclasses import dataclass
 import asyncio
+import contextlib
 from enum import Enum
 
+from ..llm_cache import cache_key, get_llm_cache, get_single_flight
+from ..metrics_llm import llm_request, observe_consensus_model, record_consensus, record_failover, record_retry, record_upstream_call
+
 # OpenRouter Configuration
 OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
@@ -32,6 +37,115 @@ class OpenRouterConfig:
     site_name: str = "Bertil-AI"
     daily_free_limit: int = 1000
     cache_ttl_hours: int = 24
+    base_url: str = OPENROUTER_BASE_URL
+
+
+class OpenRouterError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None, retryable: bool = False):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff; a server-sent Retry-After wins when present (both capped)."""
+    from ..config import settings
+    cap = float(settings.openrouter_backoff_max_seconds)
+    if retry_after is not None:
+        return min(cap, max(0.0, retry_after))
+    return random.uniform(0.0, min(cap, float(settings.openrouter_backoff_base_seconds) * (2 ** attempt)))
+
+
+def _retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None  # HTTP-date form: fall back to our own backoff
+
+
+def _vote_value(value: Any) -> str:
+    # Compare answers, not spelling: "245", "245.0" and 245 are the same amount
+    try:
+        return f"{float(str(value).replace(',', '.').replace(' ', '')):.2f}"
+    except ValueError:
+        return " ".join(str(value).split()).casefold()
+
+
+def _consensus_merge(
+    results: List[Dict[str, Any]], extracted: Dict[str, Any], quorum: int
+) -> "tuple[Dict[str, Any], Dict[str, float], bool]":
+    """Field-level vote over the models' corrections.
+
+    A model that doesn't correct a field votes for the extracted value. A correction is applied
+    when at least ``min(quorum, answers)`` models propose it (taking the most confident model's
+    spelling of the value); ``agreement`` is the share of
+    answers behind each field's leading value. The quorum is reached once ``quorum`` answers
+    agree on every field any model wanted to correct.
+    """
+    corrections = [r.get("corrections") if isinstance(r.get("corrections"), dict) else {} for r in results]
+    fields = sorted({f for c in corrections for f in c})
+    needed = min(quorum, len(results))
+    merged: Dict[str, Any] = {}
+    agreement: Dict[str, float] = {}
+    reached = len(results) >= quorum
+    for field in fields:
+        votes: Dict[str, List[Any]] = {}
+        for r, c in zip(results, corrections):
+            value = c[field] if field in c else extracted.get(field)
+            confidence = r.get("confidence") if isinstance(r.get("confidence"), (int, float)) else 0.0
+            votes.setdefault(_vote_value(value), []).append((field in c, confidence, value))
+        top = max(votes.values(), key=len)
+        agreement[field] = round(len(top) / len(results), 4)
+        reached = reached and len(top) >= quorum
+        corrected = sorted(((conf, value) for is_correction, conf, value in top if is_correction), key=lambda cv: -cv[0])
+        if corrected and len(top) >= needed:
+            merged[field] = corrected[0][1]
+    return merged, agreement, reached
+
+
+class CircuitBreaker:
+    """Per-model breaker: opens after N consecutive failed calls, lets one trial call through
+    after the cool-down (half-open), and closes again on success."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        from ..config import settings
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= float(settings.openrouter_breaker_reset_seconds):
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def release(self) -> None:
+        # Call abandoned (cancelled): let the next caller make the trial
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        from ..config import settings
+        self.failures += 1
+        if self._trial_in_flight or self.failures >= int(settings.openrouter_breaker_failures):
+            self.opened_at = time.monotonic()
+        self._trial_in_flight = False
 
 
 class OpenRouterClient:
@@ -42,7 +156,8 @@ class OpenRouterClient:
     - Smart model selection based on task
     - Request counting and limits
     - Caching to maximize free tier
-    - Fallback strategies
+    - Fallback strategies: retries with jittered backoff on 429/5xx, per-model circuit
+      breakers with failover to models["fallback"], one pooled HTTP session per process
     """
     
     def __init__(self, config: Optional[OpenRouterConfig] = None):
@@ -51,7 +166,10 @@ class OpenRouterClient:
         )
         self.requests_today = 0
         self.last_reset = datetime.now()
-        self.cache = {}  # Simple in-memory cache
+        self.cache = get_llm_cache()  # shared, content-addressed (L1 in-process, L2 Redis)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._breakers: Dict[str, CircuitBreaker] = {}
         
         # Best free models for our use case
         self.models = {
@@ -92,45 +210,80 @@ class OpenRouterClient:
             self.models["accounting"], # Secondary: Math/logic model
             self.models["simple"]      # Tertiary: Fast validation model
         ]
-        
-        results = []
-        
-        for model in models_to_try:
-            if not self._check_daily_limit():
-                break
-                
-            try:
-                result = await self._call_openrouter(
-                    model=model,
-                    prompt=validation_prompt,
-                    task_type="consensus_validation",
-                    temperature=0.0  # Deterministic for validation
-                )
-                results.append(result)
-            except Exception:
-                continue
-        
+
+        # Fan out concurrently, each model under its own deadline; stop as soon as a quorum agrees
+        from ..config import settings
+        quorum = max(1, int(settings.openrouter_consensus_quorum))
+        tasks = {
+            asyncio.create_task(self._consensus_vote(model, validation_prompt)): model
+            for model in dict.fromkeys(models_to_try)
+        }
+        quorum = min(quorum, len(tasks))
+        results: List[Dict[str, Any]] = []
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if result is not None:
+                        results.append(result)
+                if _consensus_merge(results, extracted_data, quorum)[2]:
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
         if not results:
             return {"confidence": 0.5, "corrections": {}}
-        
+
+        merged, agreement, reached = _consensus_merge(results, extracted_data, quorum)
         # Calculate consensus confidence
         confidences = [r.get("confidence", 0.5) for r in results if isinstance(r.get("confidence"), (int, float))]
         consensus_confidence = sum(confidences) / len(confidences) if confidences else 0.5
-        
-        # Merge corrections where models agree
-        all_corrections = {}
-        for result in results:
-            if "corrections" in result and isinstance(result["corrections"], dict):
-                for field, value in result["corrections"].items():
-                    all_corrections[field] = value
-        
+        overall_agreement = min(agreement.values()) if agreement else 1.0
+        record_consensus(overall_agreement, "quorum" if reached else "no_quorum")
+
         return {
             "confidence": consensus_confidence,
-            "corrections": all_corrections,
+            "corrections": merged,
+            "agreement": agreement,
+            "quorum_reached": reached,
             "model_count": len(results),
             "reasoning": f"Consensus from {len(results)} models"
         }
-    
+
+    async def _consensus_vote(self, model: str, prompt: str) -> Optional[Dict[str, Any]]:
+        """One model's answer within the per-model deadline; None when it fails or runs out of time."""
+        from ..config import settings
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await asyncio.wait_for(
+                self._call_openrouter(
+                    model=model,
+                    prompt=prompt,
+                    task_type="consensus_validation",
+                    temperature=0.0,  # Deterministic for validation
+                    failover=False,  # the fallback model would vote twice
+                ),
+                timeout=float(settings.openrouter_consensus_deadline_seconds),
+            )
+            outcome = "ok"
+            return result if isinstance(result, dict) else None
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            return None
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except Exception:
+            return None
+        finally:
+            observe_consensus_model(model, outcome, time.perf_counter() - start)
+
     async def process_receipt(self, image_data: bytes) -> Dict[str, Any]:
         """
         Process Swedish receipt with optimal model selection.
@@ -146,11 +299,6 @@ class OpenRouterClient:
         if not self._check_daily_limit():
             return {"error": "Daily free limit reached", "limit": 1000}
         
-        # Check cache
-        cache_key = hashlib.md5(image_data).hexdigest()
-        if cache_key in self.cache:
-            return self.cache[cache_key]
-        
         try:
             # Step 1: Extract text with visual model
             ocr_text = await self._call_openrouter(
@@ -173,9 +321,6 @@ class OpenRouterClient:
                 task_type="accounting"
             )
             
-            # Cache result
-            self.cache[cache_key] = result
-            
             return result
             
         except Exception as e:
@@ -245,18 +390,87 @@ class OpenRouterClient:
         model: str, 
         prompt: str, 
         task_type: str,
-        temperature: float = 0.1
+        temperature: float = 0.1,
+        use_cache: bool = True,
+        failover: bool = True,
+    ) -> Dict[str, Any]:
+        """Make API call to OpenRouter (answered from the LLM cache when the same prompt was seen)."""
+        with llm_request(task_type):
+            return await self._cached_completion(model, prompt, task_type, temperature, use_cache, failover)
+
+    async def _cached_completion(
+        self, model: str, prompt: str, task_type: str, temperature: float, use_cache: bool, failover: bool
+    ) -> Dict[str, Any]:
+        key = cache_key(prompt, model, temperature) if use_cache else None
+        if key is not None:
+            cached = await self.cache.get(key, task_type)
+            if cached is not None:
+                return cached
+        if key is None:
+            return await self._post_completion(model, prompt, task_type, temperature, failover)
+
+        async def _fetch() -> Dict[str, Any]:
+            out = await self._post_completion(model, prompt, task_type, temperature, failover)
+            await self.cache.set(key, out)
+            return out
+
+        # Concurrent misses for the same prompt share one request
+        return await get_single_flight().do(f"{key}:{int(failover)}", _fetch, task_type)
+
+    async def _post_completion(
+        self, model: str, prompt: str, task_type: str, temperature: float, failover: bool = True
+    ) -> Dict[str, Any]:
+        """Call ``model``; when it keeps failing, times out (or its breaker is open) fail over to ``models["fallback"]``.
+
+        The whole call, failover included, is bounded by ``openrouter_call_deadline_seconds``.
+        """
+        from ..config import settings
+        deadline = time.monotonic() + float(settings.openrouter_call_deadline_seconds)
+        fallback = self.models.get("fallback") if failover else None
+        candidates = [model] + ([fallback] if fallback and fallback != model else [])
+        last_error: Optional[Exception] = None
+        for candidate in candidates:
+            if time.monotonic() >= deadline:
+                last_error = last_error or OpenRouterError("OpenRouter call deadline exceeded", retryable=True)
+                break
+            breaker = self._breaker(candidate)
+            if not breaker.allow():
+                last_error = OpenRouterError(f"circuit open for {candidate}", retryable=True)
+                continue
+            try:
+                out = await self._request_with_retries(candidate, prompt, task_type, temperature, deadline)
+            except OpenRouterError as exc:
+                if not exc.retryable:
+                    breaker.record_success()  # the model answered; the request itself was rejected
+                    raise
+                breaker.record_failure()
+                last_error = exc
+                if candidate != candidates[-1]:
+                    record_failover(candidate, candidates[-1], task_type)
+                continue
+            except BaseException:
+                breaker.release()
+                raise
+            breaker.record_success()
+            return out
+        raise last_error or OpenRouterError("no model available", retryable=True)
+
+    async def _request_with_retries(
+        self, model: str, prompt: Any, task_type: str, temperature: float, deadline: Optional[float] = None
     ) -> Dict[str, Any]:
-        """Make API call to OpenRouter."""
+        """POST to ``model``, retrying 429/5xx/connection errors until ``deadline`` (time.monotonic()).
+
+        A timeout is not retried: a model that is this slow is better replaced by the fallback.
+        """
+        from ..config import settings
+        if deadline is None:
+            deadline = time.monotonic() + float(settings.openrouter_call_deadline_seconds)
         from ..metrics_llm import record_request, record_error, observe_latency
         provider_label = "openrouter"
         model_label = model
         record_request(provider_label, model_label, task_type)
-        import time as _time
-        _start = _time.perf_counter()
-        # Increment counter
-        self.requests_today += 1
-        
+        _start = time.perf_counter()
+
         headers = {
             "Authorization": f"Bearer {self.config.api_key}",
             "HTTP-Referer": self.config.site_url,
@@ -284,31 +498,90 @@ class OpenRouterClient:
                 "max_tokens": 1000,
                 "response_format": {"type": "json_object"}
             }
-        
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{OPENROUTER_BASE_URL}/chat/completions",
-                headers=headers,
-                json=payload
-            ) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    content = data["choices"][0]["message"]["content"]
-                    
-                    # Parse JSON response
-                    try:
-                        out = json.loads(content)
-                        observe_latency(provider_label, model_label, task_type, _time.perf_counter() - _start)
-                        return out
-                    except json.JSONDecodeError:
-                        observe_latency(provider_label, model_label, task_type, _time.perf_counter() - _start)
-                        return {"raw_response": content, "task_type": task_type}
-                else:
-                    error = await response.text()
+
+        max_retries = max(0, int(settings.openrouter_max_retries))
+        try:
+            for attempt in range(max_retries + 1):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise OpenRouterError("OpenRouter call deadline exceeded", retryable=True)
+                # Increment counter (every attempt counts against the free tier)
+                self.requests_today += 1
+                record_upstream_call(task_type)
+                retry_after: Optional[float] = None
+                timeout = aiohttp.ClientTimeout(
+                    total=min(float(settings.openrouter_timeout_seconds), remaining),
+                    sock_connect=float(settings.openrouter_connect_timeout_seconds),
+                )
+                try:
+                    session = await self._get_session()
+                    async with session.post(f"{self.config.base_url}/chat/completions", headers=headers, json=payload, timeout=timeout) as response:
+                        if response.status == 200:
+                            data = await response.json()
+                            content = data["choices"][0]["message"]["content"]
+                            # Parse JSON response
+                            try:
+                                return json.loads(content)
+                            except json.JSONDecodeError:
+                                return {"raw_response": content, "task_type": task_type}
+                        error = await response.text()
+                        if response.status != 429 and response.status < 500:
+                            record_error(provider_label, model_label, task_type)
+                            raise OpenRouterError(f"OpenRouter error: {error}", status=response.status, retryable=False)
+                        retry_after = _retry_after_seconds(response.headers.get("Retry-After"))
+                        failure = OpenRouterError(f"OpenRouter error: {error}", status=response.status, retryable=True)
+                except asyncio.TimeoutError as exc:
+                    # Checked first: aiohttp's timeout errors are ClientErrors too
                     record_error(provider_label, model_label, task_type)
-                    observe_latency(provider_label, model_label, task_type, _time.perf_counter() - _start)
-                    raise Exception(f"OpenRouter error: {error}")
-    
+                    raise OpenRouterError(f"OpenRouter request timed out: {exc!r}", retryable=True) from exc
+                except aiohttp.ClientError as exc:
+                    failure = OpenRouterError(f"OpenRouter request failed: {exc!r}", retryable=True)
+                record_error(provider_label, model_label, task_type)
+                delay = backoff_delay(attempt, retry_after)
+                if attempt == max_retries or time.monotonic() + delay >= deadline:
+                    raise failure
+                record_retry(model_label, str(failure.status or "network"))
+                await asyncio.sleep(delay)
+            raise AssertionError("unreachable")
+        finally:
+            observe_latency(provider_label, model_label, task_type, time.perf_counter() - _start)
+
+    def _breaker(self, model: str) -> "CircuitBreaker":
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = self._breakers[model] = CircuitBreaker(model)
+        return breaker
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Long-lived pooled session (keep-alive, TLS reuse); rebuilt if closed or used from another loop."""
+        from ..config import settings
+        loop = asyncio.get_running_loop()
+        # A session is bound to the loop it was created on (one per process in production)
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            stale = self._session
+            if stale is not None and not stale.closed:
+                # Left behind by another loop: release its pooled connections
+                with contextlib.suppress(Exception):
+                    await stale.close()
+            connector = aiohttp.TCPConnector(
+                limit=int(settings.openrouter_max_connections),
+                limit_per_host=int(settings.openrouter_max_connections),
+                ttl_dns_cache=300,
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=float(settings.openrouter_timeout_seconds),
+                sock_connect=float(settings.openrouter_connect_timeout_seconds),
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            self._session_loop = loop
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+
     def _check_daily_limit(self) -> bool:
         """Check if within daily free limit."""
         
@@ -316,7 +589,6 @@ class OpenRouterClient:
         if datetime.now().date() > self.last_reset.date():
             self.requests_today = 0
             self.last_reset = datetime.now()
-            self.cache.clear()  # Clear cache daily
         
         return self.requests_today < self.config.daily_free_limit
     
@@ -362,15 +634,6 @@ class OpenRouterClient:
         - Transport/taxi: 6%
         - Standard: 25%
         """
-    
-def get_openrouter_client() -> OpenRouterClient:
-    """Get singleton OpenRouter client instance."""
-    global _openrouter_client
-    if _openrouter_client is None:
-        _openrouter_client = OpenRouterClient()
-    return _openrouter_client
-
-_openrouter_client: Optional[OpenRouterClient] = None
 
     def _build_accounting_prompt(self, parsed_data: Dict[str, Any]) -> str:
         """Build accounting validation prompt."""
@@ -396,6 +659,7 @@ _openrouter_client: Optional[OpenRouterClient] = None
             "requests_today": self.requests_today,
             "remaining": self.config.daily_free_limit - self.requests_today,
             "cache_size": len(self.cache),
+            "cache": dict(self.cache.stats),
             "last_reset": self.last_reset.isoformat(),
             "models_available": list(self.models.keys()),
             "cost_today": "$0.00"  # Free tier!
@@ -449,6 +713,11 @@ def get_openrouter_client() -> OpenRouterClient:
     return _client
 
 
+async def close_openrouter_client() -> None:
+    if _client is not None:
+        await _client.close()
+
+
 # Example usage
 async def example_usage():
     """Example of using OpenRouter for Swedish accounting."""
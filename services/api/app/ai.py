@@ -1,82 +1,60 @@
 from __future__ import annotations
 
+import asyncio
 from dataclasses import dataclass
-from typing import Tuple
-from sqlalchemy import select
+from typing import Dict, List, Sequence, Tuple
 
-from .vendor_embeddings import embed_vendor_name
+from . import vendor_index
+from .feedback_cache import get_feedback_cache
+from .vendor_embeddings import aembed_vendor_name, model_id, normalize_name
 from sqlalchemy.ext.asyncio import AsyncSession
-from .models import VendorEmbedding
 
 # Feedback-aware mapping: prefer explicit user feedback over embeddings/heuristics
-async def _lookup_feedback(session: AsyncSession, vendor: str | None) -> MappingDecision | None:
+async def _lookup_feedback(session: AsyncSession, vendor: str | None, org_id: int | None = None) -> MappingDecision | None:
     if not session or not vendor:
         return None
-    try:
-        from .models_feedback import AiFeedback  # lazy import to avoid circular in tests without migration
-    except Exception:
+    cache = get_feedback_cache()
+    if cache.needs_load(session):
+        await cache.load(session)
+    hit = cache.resolve(org_id, vendor)
+    if hit is None:
         return None
-    try:
-        stmt = select(AiFeedback).where(AiFeedback.vendor_ilike == vendor.lower()).order_by(AiFeedback.id.desc())
-        row = (await session.execute(stmt)).scalars().first()
-        if row and (row.correct_account or row.correct_vat_code or row.correct_vat_rate is not None):
-            account = row.correct_account or None
-            # VAT precedence: explicit code -> rate
-            if row.correct_vat_code:
-                # Map common codes to rate when building entries is not code-based
-                code = row.correct_vat_code.upper()
-                if code == "SE12":
-                    rate = 0.12
-                elif code == "SE06":
-                    rate = 0.06
-                else:
-                    rate = 0.25
-            else:
-                rate = float(row.correct_vat_rate) if row.correct_vat_rate is not None else 0.25
-            if account is None:
-                # keep default heuristic account if not set; indicate reason
-                return None
-            return MappingDecision(account, rate, "Användarfeedback prioriterad")
-    except Exception:
-        return None
-    return None
+    return MappingDecision(hit[0], hit[1], "Användarfeedback prioriterad", "feedback", 1.0)
 
 @dataclass
 class MappingDecision:
     expense_account: str
     vat_rate: float  # 0.0..1.0
     reason: str
+    source: str = "rules"  # feedback | embeddings model id | rules
+    confidence: float | None = None
 
 
 async def _lookup_vendor_embedding(session: AsyncSession, vendor: str) -> MappingDecision | None:
-    vec = embed_vendor_name(vendor)
-    # Simple nearest neighbor (cosine via dot product assuming normalized embeddings)
-    # If pgvector is available we could use <-> operator; here we fetch small set
-    rows = (await session.execute(select(VendorEmbedding))).scalars().all()
-    best = None
-    best_score = -1.0
-    for r in rows:
-        if isinstance(r.embedding, (list, tuple)):
-            emb = list(map(float, r.embedding))
-        else:
-            try:
-                emb = [float(x) for x in str(r.embedding).split(',')]
-            except Exception:
-                continue
-        score = sum(a*b for a, b in zip(vec, emb))
-        if score > best_score:
-            best_score = score
-            best = r
-    if best and best.suggested_account and best.vat_rate is not None:
-        return MappingDecision(best.suggested_account, float(best.vat_rate), f"Embeddings träff ({best.name})")
-    return None
-
-
-async def suggest_account_and_vat(vendor: str | None, total_amount: float, session: AsyncSession | None = None) -> MappingDecision:
+    # Nearest vendor above the similarity threshold (pgvector <=> on Postgres, in-memory matrix otherwise)
+    matches = await vendor_index.search(session, await aembed_vendor_name(vendor), k=1)
+    if not matches:
+        return None
+    best = matches[0]
+    return _embedding_decision(best)
+
+
+def _embedding_decision(match: vendor_index.VendorMatch) -> MappingDecision:
+    return MappingDecision(
+        match.suggested_account, match.vat_rate, f"Embeddings träff ({match.name})", model_id(), round(float(match.score), 4)
+    )
+
+
+async def suggest_account_and_vat(
+    vendor: str | None,
+    total_amount: float,
+    session: AsyncSession | None = None,
+    org_id: int | None = None,
+) -> MappingDecision:
     v = (vendor or "").lower()
     # 0) Use prior feedback first if available
     if session is not None and vendor:
-        fb = await _lookup_feedback(session, vendor)
+        fb = await _lookup_feedback(session, vendor, org_id)
         if fb:
             return fb
     # Embedding-based suggestion when session provided and we have a dictionary
@@ -84,6 +62,10 @@ async def suggest_account_and_vat(vendor: str | None, total_amount: float, sessi
         hit = await _lookup_vendor_embedding(session, vendor)
         if hit:
             return hit
+    return _heuristic_decision(v)
+
+
+def _heuristic_decision(v: str) -> MappingDecision:
     if any(k in v for k in ["kaffe", "café", "cafe", "fika", "lunch"]):
         return MappingDecision("5811", 0.12, "Leverantör antyder representation (12% moms)")
     if "taxi" in v:
@@ -93,6 +75,36 @@ async def suggest_account_and_vat(vendor: str | None, total_amount: float, sessi
     return MappingDecision("4000", 0.25, "Standard inköp (25% moms)")
 
 
+async def suggest_many(items: Sequence[Tuple[int | None, str | None]], session: AsyncSession) -> List[MappingDecision]:
+    """suggest_account_and_vat for many (org_id, vendor) pairs at once.
+
+    Each distinct (org, vendor) is resolved once: feedback from the in-memory cache, then the
+    remaining names are embedded together (one micro-batch) and matched against the vendor index.
+    """
+    cache = get_feedback_cache()
+    if cache.needs_load(session):
+        await cache.load(session)
+    keys = [(org_id, normalize_name(vendor or "")) for org_id, vendor in items]
+    decided: Dict[Tuple[int | None, str], MappingDecision] = {}
+    for (org_id, vendor), key in zip(items, keys):
+        if key in decided or not key[1]:
+            continue
+        hit = cache.resolve(org_id, vendor)
+        if hit is not None:
+            decided[key] = MappingDecision(hit[0], hit[1], "Användarfeedback prioriterad", "feedback", 1.0)
+    names = sorted({key[1] for key in keys if key[1] and key not in decided})
+    vectors = await asyncio.gather(*(aembed_vendor_name(n) for n in names))
+    nearest: Dict[str, MappingDecision | None] = {}
+    for name, vec in zip(names, vectors):
+        matches = await vendor_index.search(session, vec, k=1)
+        nearest[name] = _embedding_decision(matches[0]) if matches else None
+    out: List[MappingDecision] = []
+    for (_org_id, vendor), key in zip(items, keys):
+        decision = decided.get(key) or nearest.get(key[1])
+        out.append(decision or _heuristic_decision((vendor or "").lower()))
+    return out
+
+
 def build_entries(total_amount: float, expense_account: str, vat_rate: float) -> list[dict]:
     if vat_rate <= 0:
         return [
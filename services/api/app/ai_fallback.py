@@ -1,11 +1,15 @@
 from __future__ import annotations
 
+import asyncio
 import os
 import json
+import re
 from dataclasses import dataclass
-from typing import List, Tuple, Any, Dict
+from typing import List, Optional, Tuple, Any, Dict
 
 from .config import settings
+from .llm_cache import cache_key, get_llm_cache, get_single_flight
+from .metrics_llm import llm_request, observe_batch_size, record_coalesced
 
 
 @dataclass
@@ -55,67 +59,238 @@ def _map_response_to_fields(resp: Dict[str, Any]) -> List[Tuple[str, str, float]
     return out
 
 
-async def extract_fields_with_llm(text: str) -> List[Tuple[str, str, float]]:
-    """Attempt LLM-based field extraction for low-confidence OCR cases.
+_DEFAULT_OPENROUTER_MODEL = "meta-llama/llama-3.1-70b-instruct:free"
 
-    Returns empty list unless explicitly enabled via settings.llm_fallback_enabled.
-    """
-    if not settings.llm_fallback_enabled:
-        return []
+_FIELDS_SPEC = """{
+      "vendor": "företagsnamn",
+      "total_amount": nummer,
+      "vat_amount": nummer eller 0,
+      "vat_rate": 0.25/0.12/0.06 eller 0,
+      "date": "YYYY-MM-DD",
+      "invoice_number": "om finns",
+      "confidence": 0.0-1.0
+    }"""
 
-    provider = (settings.llm_provider or os.getenv("LLM_PROVIDER", "")).lower().strip()
 
+def _extraction_prompt(text: str) -> str:
     # Strict, short prompt to reduce cost and enforce JSON
-    extraction_prompt = f"""
+    return f"""
     Extrahera strukturerad data från följande svensk kvittotext.
 
     Text:
     {text[:2000]}
 
     Returnera ENDAST JSON-objekt med fälten:
-    {{
-      "vendor": "företagsnamn",
-      "total_amount": nummer,
-      "vat_amount": nummer eller 0,
-      "vat_rate": 0.25/0.12/0.06 eller 0,
-      "date": "YYYY-MM-DD",
-      "invoice_number": "om finns",
-      "confidence": 0.0-1.0
-    }}
+    {_FIELDS_SPEC}
     """
 
-    try:
-        if provider == "openrouter":
-            # Use OpenRouter optimized path (Swedish model, forced JSON)
-            from .agents.openrouter_integration import get_openrouter_client
-
-            client = get_openrouter_client()
-            resp = await client._call_openrouter(  # type: ignore[attr-defined]
-                model=client.models.get("swedish", "meta-llama/llama-3.1-70b-instruct:free"),
-                prompt=extraction_prompt,
-                task_type="extraction",
-                temperature=0.1,
-            )
-            return _map_response_to_fields(resp)
 
-        else:
-            # Fallback to generic LLM service (OpenAI/Anthropic/Local)
-            from .agents.llm_integration import get_llm_service
+def _batch_prompt(texts: List[str]) -> str:
+    receipts = "\n\n".join(f"Kvitto {i}:\n{t[:2000]}" for i, t in enumerate(texts))
+    return f"""
+    Extrahera strukturerad data från följande {len(texts)} svenska kvittotexter.
 
-            llm = get_llm_service()
-            resp = await llm.extract_receipt_data(text)
-            return _map_response_to_fields(resp)
+    {receipts}
 
-    except Exception:
-        # On any error, return empty to force manual review
-        return []
+    Returnera ENDAST JSON: {{"results": [...]}} med exakt ett objekt per kvitto, i samma ordning,
+    där varje objekt har fältet "index" (kvittots nummer) och fälten:
+    {_FIELDS_SPEC}
+    """
+
+
+def _provider() -> str:
+    return (settings.llm_provider or os.getenv("LLM_PROVIDER", "")).lower().strip()
+
+
+def _model_label(provider: str) -> str:
+    if provider == "openrouter":
+        from .agents.openrouter_integration import get_openrouter_client
 
+        return get_openrouter_client().models.get("swedish", _DEFAULT_OPENROUTER_MODEL)
+    from .agents.llm_integration import get_llm_service
 
+    return get_llm_service().config.model
 
 
+async def _complete_json(provider: str, prompt: str, operation: str) -> Any:
+    if provider == "openrouter":
+        # Use OpenRouter optimized path (Swedish model, forced JSON)
+        from .agents.openrouter_integration import get_openrouter_client
 
+        client = get_openrouter_client()
+        return await client._call_openrouter(  # type: ignore[attr-defined]
+            model=client.models.get("swedish", _DEFAULT_OPENROUTER_MODEL),
+            prompt=prompt,
+            task_type=operation,
+            temperature=0.1,
+        )
+    from .agents.llm_integration import get_llm_service
 
+    llm = get_llm_service()
+    return llm._parse_json_response(await llm._get_completion(prompt, operation))
 
 
+async def _extract_one(provider: str, text: str) -> Any:
+    if provider == "openrouter":
+        return await _complete_json(provider, _extraction_prompt(text), "extraction")
+    # Fallback to generic LLM service (OpenAI/Anthropic/Local)
+    from .agents.llm_integration import get_llm_service
 
+    return await get_llm_service().extract_receipt_data(text)
 
+
+_AMOUNT_RE = re.compile(r"\d{1,3}(?:[ \u00a0]\d{3})+(?:[.,]\d{1,2})?|\d+(?:[.,]\d+)*")
+
+
+def _amounts_in(text: str) -> set[float]:
+    """Every amount a receipt text could mean, reading ',' and '.' both ways."""
+    out: set[float] = set()
+    for m in _AMOUNT_RE.finditer(text):
+        raw = m.group().replace(" ", "").replace("\u00a0", "")
+        for thousands, decimal in ((".", ","), (",", ".")):
+            try:
+                out.add(round(float(raw.replace(thousands, "").replace(decimal, ".")), 2))
+            except ValueError:
+                continue
+    return out
+
+
+def _answers_receipt(item: Dict[str, Any], text: str) -> bool:
+    """Whether a batched answer is plausibly about ``text``: its vendor or total must appear there."""
+    vendor = str(item.get("vendor") or "").strip().casefold()
+    if vendor and vendor in text.casefold():
+        return True
+    total = item.get("total_amount", item.get("total"))
+    try:
+        return total is not None and round(float(str(total).replace(" ", "").replace(",", ".")), 2) in _amounts_in(text)
+    except ValueError:
+        return False
+
+
+def _batch_items(resp: Any, texts: List[str]) -> List[Optional[Dict[str, Any]]]:
+    """Per-receipt answers from a batched reply; None where the model skipped or misplaced one.
+
+    Answers are placed only by their ``index`` (never by list position) and kept only if they
+    mention something from that receipt, so a reordered or merged reply can't be cached under
+    another receipt's key.
+    """
+    items = resp.get("results") if isinstance(resp, dict) else None
+    out: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+    if not isinstance(items, list):
+        return out
+    claimed: set[int] = set()
+    for item in items:
+        slot = item.get("index") if isinstance(item, dict) else None
+        if not isinstance(slot, int) or isinstance(slot, bool) or not 0 <= slot < len(texts):
+            continue
+        if slot in claimed:
+            out[slot] = None  # two answers for one receipt: trust neither
+            continue
+        claimed.add(slot)
+        answer = {k: v for k, v in item.items() if k != "index"}
+        if _answers_receipt(answer, texts[slot]):
+            out[slot] = answer
+    return out
+
+
+class ExtractionBatcher:
+    """Packs concurrent short extractions into one structured request (same shape as aembed)."""
+
+    def __init__(self) -> None:
+        self._pending: Dict[str, List[Tuple[str, "asyncio.Future[Any]"]]] = {}
+        self._flush_handles: Dict[str, asyncio.TimerHandle] = {}
+        self.stats: Dict[str, int] = {"batches": 0, "batched_items": 0, "fallbacks": 0}
+
+    async def submit(self, provider: str, text: str) -> Any:
+        loop = asyncio.get_running_loop()
+        fut: "asyncio.Future[Any]" = loop.create_future()
+        pending = self._pending.setdefault(provider, [])
+        pending.append((text, fut))
+        if len(pending) >= int(settings.llm_extract_batch_max):
+            self._flush(loop, provider)
+        elif provider not in self._flush_handles:
+            self._flush_handles[provider] = loop.call_later(
+                float(settings.llm_extract_batch_wait_ms) / 1000.0, self._flush, loop, provider
+            )
+        return await fut
+
+    def _flush(self, loop: asyncio.AbstractEventLoop, provider: str) -> None:
+        handle = self._flush_handles.pop(provider, None)
+        if handle is not None:
+            handle.cancel()
+        batch = self._pending.pop(provider, [])
+        if batch:
+            loop.create_task(self._run_batch(provider, batch))
+
+    async def _run_batch(self, provider: str, batch: List[Tuple[str, "asyncio.Future[Any]"]]) -> None:
+        texts = [t for t, _ in batch]
+        items: List[Optional[Dict[str, Any]]] = [None] * len(batch)
+        if len(batch) > 1:
+            try:
+                items = _batch_items(await _complete_json(provider, _batch_prompt(texts), "extraction_batch"), texts)
+            except Exception:
+                pass
+            answered = sum(1 for i in items if i is not None)
+            if answered:
+                self.stats["batches"] += 1
+                self.stats["batched_items"] += answered
+                observe_batch_size("extraction", answered)
+                record_coalesced("extraction", "batched", answered - 1)
+                cache = get_llm_cache()
+                model = _model_label(provider)
+                for text, item in zip(texts, items):
+                    if item is not None:
+                        # Later single lookups of the same receipt hit the cache
+                        await cache.set(cache_key(_extraction_prompt(text), model, 0.1), item)
+
+        async def _settle(text: str, fut: "asyncio.Future[Any]", item: Optional[Dict[str, Any]]) -> None:
+            try:
+                if item is None:
+                    # Whatever the batch didn't answer is asked for on its own
+                    self.stats["fallbacks"] += 1
+                    item = await _extract_one(provider, text)
+            except Exception as exc:
+                if not fut.done():
+                    fut.set_exception(exc)
+                return
+            if not fut.done():
+                fut.set_result(item)
+
+        await asyncio.gather(*(_settle(t, f, i) for (t, f), i in zip(batch, items)))
+
+
+_batcher = ExtractionBatcher()
+
+
+def get_extraction_batcher() -> ExtractionBatcher:
+    return _batcher
+
+
+async def _extract(provider: str, text: str) -> Any:
+    if int(settings.llm_extract_batch_max) > 1 and len(text) <= int(settings.llm_extract_batch_max_chars):
+        cached = await get_llm_cache().get(cache_key(_extraction_prompt(text), _model_label(provider), 0.1), "extraction")
+        if cached is not None:
+            return cached
+        return await _batcher.submit(provider, text)
+    return await _extract_one(provider, text)
+
+
+async def extract_fields_with_llm(text: str) -> List[Tuple[str, str, float]]:
+    """Attempt LLM-based field extraction for low-confidence OCR cases.
+
+    Returns empty list unless explicitly enabled via settings.llm_fallback_enabled.
+    Identical texts in flight at the same time share one request; with
+    settings.llm_extract_batch_max > 1, short texts are micro-batched.
+    """
+    if not settings.llm_fallback_enabled:
+        return []
+
+    provider = _provider()
+    try:
+        with llm_request("extraction"):
+            key = "fallback:" + cache_key(text[:2000], provider, 0.1)
+            resp = await get_single_flight().do(key, lambda: _extract(provider, text), "extraction")
+        return _map_response_to_fields(resp)
+    except Exception:
+        # On any error, return empty to force manual review
+        return []
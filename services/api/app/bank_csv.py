@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import codecs
+import csv
+import io
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+
+@dataclass(frozen=True)
+class BankCsvProfile:
+    """Header mapping for one bank's CSV export. Header candidates are matched case-insensitively."""
+
+    name: str
+    date: Tuple[str, ...]
+    amount: Tuple[str, ...]
+    description: Tuple[str, ...]
+    counterparty: Tuple[str, ...] = ()
+    currency: Tuple[str, ...] = ()
+
+
+# Ordered by specificity: the first profile resolving all required columns with the most matched
+# headers wins. "generic" keeps the original English layout working.
+PROFILES: Tuple[BankCsvProfile, ...] = (
+    BankCsvProfile(
+        name="swedbank",
+        date=("bokföringsdag", "transaktionsdag"),
+        amount=("belopp",),
+        description=("beskrivning", "referens", "text"),
+        currency=("valuta",),
+    ),
+    BankCsvProfile(
+        name="seb",
+        date=("bokföringsdatum", "valutadatum"),
+        amount=("belopp",),
+        description=("text/mottagare", "text"),
+    ),
+    BankCsvProfile(
+        name="handelsbanken",
+        date=("reskontradatum", "transaktionsdatum"),
+        amount=("belopp",),
+        description=("text", "transaktionstext"),
+    ),
+    BankCsvProfile(
+        name="nordea",
+        date=("bokföringsdag",),
+        amount=("belopp",),
+        description=("rubrik", "meddelande", "text"),
+        counterparty=("namn", "avsändare", "mottagare"),
+        currency=("valuta",),
+    ),
+    BankCsvProfile(
+        name="lansforsakringar",
+        date=("bokföringsdag", "transaktionsdag"),
+        amount=("belopp",),
+        description=("transaktionstyp", "referens", "text"),
+    ),
+    BankCsvProfile(
+        name="icabanken",
+        date=("datum",),
+        amount=("belopp",),
+        description=("text",),
+        counterparty=("typ",),
+    ),
+    BankCsvProfile(
+        name="generic",
+        date=("date",),
+        amount=("amount",),
+        description=("description", "text"),
+        counterparty=("counterparty",),
+        currency=("currency",),
+    ),
+)
+
+_PROFILES_BY_NAME = {p.name: p for p in PROFILES}
+_SAMPLE_BYTES = 64 * 1024
+_HEADER_SCAN_LINES = 10  # some exports (e.g. Swedbank) put a title line above the header
+
+
+@dataclass
+class CsvDialect:
+    encoding: str
+    delimiter: str
+    decimal: str  # "," or "."
+
+
+@dataclass
+class RowError:
+    line: int
+    error: str
+    raw: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ParsedCsv:
+    dialect: CsvDialect
+    profile: str
+    header_line: int
+    rows: Iterator[Union[Dict[str, Any], RowError]]
+
+
+def sniff_encoding(sample: bytes) -> str:
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        # Final=False tolerates a multi-byte sequence cut at the end of the sample
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    try:
+        sample.decode("cp1252")
+        return "cp1252"
+    except UnicodeDecodeError:
+        return "iso-8859-1"
+
+
+def sniff_delimiter(text_sample: str) -> str:
+    lines = [ln for ln in text_sample.splitlines()[:50] if ln.strip()]
+    try:
+        return csv.Sniffer().sniff("\n".join(lines), delimiters=";,\t|").delimiter
+    except csv.Error:
+        pass
+    counts = {d: sum(ln.count(d) for ln in lines) for d in (";", "\t", ",", "|")}
+    return max(counts, key=lambda d: counts[d]) if any(counts.values()) else ","
+
+
+_AMOUNT_CLEAN = re.compile(r"\s|'|kr|sek", re.IGNORECASE)
+
+
+def parse_amount(raw: str, decimal: Optional[str] = None) -> float:
+    """Parse Swedish and English amount notations: "-1 234,56", "1.234,56", "45,00 kr", "1234.56".
+
+    With ``decimal`` ("," or ".", as sniffed for the file) the other separator is read as a
+    thousands separator, so "1,234" is 1234 in a "."-decimal file; values that don't fit that
+    notation fall back to guessing per value.
+    """
+    s = _AMOUNT_CLEAN.sub("", (raw or "").strip()).replace("\u2212", "-")
+    if not s:
+        raise ValueError("empty amount")
+    if decimal in (",", "."):
+        thousands = "." if decimal == "," else ","
+        d, t = re.escape(decimal), re.escape(thousands)
+        if re.fullmatch(rf"[+-]?(?:\d{{1,3}}(?:{t}\d{{3}})+|\d+)(?:{d}\d+)?", s):
+            return float(s.replace(thousands, "").replace(decimal, "."))
+    if "," in s and "." in s:
+        if s.rfind(",") > s.rfind("."):
+            s = s.replace(".", "").replace(",", ".")
+        else:
+            s = s.replace(",", "")
+    elif "," in s:
+        s = s.replace(",", ".")
+    return float(s)
+
+
+_DATE_FORMATS = ("%Y-%m-%d", "%Y%m%d", "%Y/%m/%d", "%d.%m.%Y", "%d/%m/%Y", "%y-%m-%d")
+
+
+def parse_date(raw: str) -> date:
+    s = (raw or "").strip().split(" ")[0].split("T")[0]
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(s, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognized date: {raw!r}")
+
+
+def _resolve(headers: List[str], candidates: Tuple[str, ...]) -> Optional[int]:
+    for cand in candidates:
+        if cand in headers:
+            return headers.index(cand)
+    return None
+
+
+def _match_profile(headers: List[str], forced: Optional[str]) -> Optional[Tuple[BankCsvProfile, Dict[str, Optional[int]]]]:
+    norm = [h.strip().strip("\ufeff").lower() for h in headers]
+    best: Optional[Tuple[int, BankCsvProfile, Dict[str, Optional[int]]]] = None
+    for prof in ([_PROFILES_BY_NAME[forced]] if forced else list(PROFILES)):
+        cols = {
+            "date": _resolve(norm, prof.date),
+            "amount": _resolve(norm, prof.amount),
+            "description": _resolve(norm, prof.description),
+            "counterparty": _resolve(norm, prof.counterparty),
+            "currency": _resolve(norm, prof.currency),
+        }
+        if cols["date"] is None or cols["amount"] is None or cols["description"] is None:
+            continue
+        known = set(prof.date + prof.amount + prof.description + prof.counterparty + prof.currency)
+        score = sum(1 for h in norm if h in known)
+        if best is None or score > best[0]:
+            best = (score, prof, cols)
+    return (best[1], best[2]) if best else None
+
+
+def _rows(reader: Any, cols: Dict[str, Optional[int]], decimal: Optional[str] = None) -> Iterator[Union[Dict[str, Any], RowError]]:
+    for raw in reader:
+        line = int(reader.line_num)
+        if not any(c.strip() for c in raw):
+            continue
+        try:
+            def col(name: str) -> Optional[str]:
+                idx = cols[name]
+                return raw[idx] if idx is not None and idx < len(raw) else None
+
+            dt = parse_date(col("date") or "")
+            amount = parse_amount(col("amount") or "", decimal)
+            description = (col("description") or "").strip()[:500]
+            counterparty = (col("counterparty") or "").strip()[:200] or None
+            currency = ((col("currency") or "SEK").strip() or "SEK").upper()[:3]
+        except Exception as exc:  # noqa: BLE001
+            yield RowError(line=line, error=str(exc), raw=raw)
+            continue
+        yield {
+            "date": dt,
+            "amount": amount,
+            "currency": currency,
+            "description": description,
+            "counterparty_ref": counterparty,
+        }
+
+
+def open_bank_csv(stream: BinaryIO, *, profile: Optional[str] = None) -> ParsedCsv:
+    """Sniff encoding, delimiter and bank profile, then return a lazy row iterator over ``stream``.
+
+    Rows are decoded incrementally from the binary stream; malformed rows are yielded as
+    :class:`RowError` instead of aborting the import. Raises ``ValueError`` if no header matches.
+    """
+    if profile and profile not in _PROFILES_BY_NAME:
+        raise ValueError(f"unknown profile {profile!r}; expected one of {', '.join(_PROFILES_BY_NAME)}")
+    start = stream.tell()
+    sample = stream.read(_SAMPLE_BYTES)
+    stream.seek(start)
+    encoding = sniff_encoding(sample)
+    sample_text = codecs.getincrementaldecoder(encoding)(errors="replace").decode(sample, final=False)
+    delimiter = sniff_delimiter(sample_text)
+    text = io.TextIOWrapper(stream, encoding=encoding, errors="replace", newline="")
+    reader = csv.reader(text, delimiter=delimiter)
+    for headers in reader:
+        header_line = int(reader.line_num)
+        matched = _match_profile(headers, profile)
+        if matched:
+            prof, cols = matched
+            decimal = "," if delimiter != "," and re.search(r"\d,\d{2}\b", sample_text) else "."
+            return ParsedCsv(
+                dialect=CsvDialect(encoding=encoding, delimiter=delimiter, decimal=decimal),
+                profile=prof.name,
+                header_line=header_line,
+                rows=_rows(reader, cols, decimal),
+            )
+        if header_line >= _HEADER_SCAN_LINES:
+            break
+    raise ValueError("unrecognized CSV header")
@@ -8,7 +8,8 @@ from typing import Iterable
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from .models import Verification, ComplianceFlag, Entry, FiscalYear
+from .models import Verification, ComplianceFlag, Document, Entry, FiscalYear
+from .storage_backend import LocalBackend, backend_for, is_local, run as run_storage
 
 
 @dataclass
@@ -88,14 +89,15 @@ async def rule_R021(_session: AsyncSession, v: Verification) -> list[RuleFlag]:
     link = v.document_link
     if link.startswith("/documents/"):
         digest = link.split("/documents/")[-1]
-        # locate file in .worm_store similar to ingest layout
-        store_dir = Path(".worm_store") / digest[:2] / digest[2:4]
-        found = False
-        if store_dir.exists():
-            for p in store_dir.iterdir():
-                if p.is_file() and p.name.startswith(f"{digest}_"):
-                    found = True
-                    break
+        # locate the original in the local WORM store, else wherever its Document says it lives
+        found = LocalBackend().find(digest) is not None
+        if not found:
+            uri = (await _session.execute(select(Document.storage_uri).where(Document.hash_sha256 == digest))).scalar()
+            if uri and not is_local(uri):
+                try:
+                    found = bool(await run_storage(backend_for(uri).exists, uri))
+                except Exception:
+                    found = False
         if not found:
             return [
                 RuleFlag(
@@ -287,7 +289,9 @@ async def rule_RVC(session: AsyncSession, v: Verification) -> list[RuleFlag]:
     return [RuleFlag(rule_code="R-VATCODE", severity="warning", message="Moms-kod saknas eller är inkonsekvent för inhemsk moms (2641).")]
 
 
-async def persist_flags(session: AsyncSession, entity_type: str, entity_id: int, flags: Iterable[RuleFlag]) -> None:
+async def persist_flags(
+    session: AsyncSession, entity_type: str, entity_id: int, flags: Iterable[RuleFlag], *, commit: bool = True
+) -> None:
     for f in flags:
         session.add(
             ComplianceFlag(
@@ -299,5 +303,6 @@ async def persist_flags(session: AsyncSession, entity_type: str, entity_id: int,
                 resolved_by=None,
             )
         )
-    await session.commit()
+    if commit:
+        await session.commit()
 
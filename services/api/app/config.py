@@ -14,13 +14,38 @@ class Settings(BaseSettings):
     ocr_provider: str = "stub"  # options: stub | google_vision | aws_textract | tesseract
     ocr_queue_url: str | None = None  # e.g., redis://localhost:6379/0 to enable async OCR
     ocr_queue_warn_threshold: int = 50
+    ocr_pdf_dpi: int = 300  # rasterization DPI for PDF pages without a text layer
+    ocr_pdf_max_pages: int = 50
+    ocr_pdf_min_text_chars: int = 20  # fewer alphanumerics than this => treat the page as scanned
+    ocr_pdf_page_cache_ttl_seconds: int = 30 * 24 * 3600  # worker-side (Redis) page cache
+    receipt_patterns_path: str = "kb/swedish_receipt_patterns.json"  # label/regex tables for field extraction
+    ocr_result_ttl_seconds: int = 3600  # per-job result keys expire after this
+    ocr_wait_timeout: float = 5.0  # seconds process-ocr waits for a queued job before 504
+    ocr_visibility_timeout_seconds: int = 120  # unACKed jobs idle this long are reclaimed by another worker
+    ocr_max_attempts: int = 3  # then the job goes to the ocr:dead stream
+    ocr_retry_backoff_seconds: float = 2.0  # doubled per failed attempt
+    ocr_worker_metrics_port: int | None = None  # expose worker Prometheus metrics on this port
     google_credentials_json_path: str | None = None
     aws_region: str | None = None
     aws_access_key_id: str | None = None
     aws_secret_access_key: str | None = None
     s3_bucket: str | None = None
     s3_object_lock_retention_days: int | None = None
+    # Local WORM store: "files" (one file per original) or "segments" (small originals packed into
+    # append-only, checksummed segment files; see segment_store.py)
+    worm_store_layout: str = "files"
+    worm_segment_max_bytes: int = 256 * 1024 * 1024  # segment is sealed (read-only) past this size
+    worm_segment_max_object_bytes: int = 4 * 1024 * 1024  # larger originals stay as separate files
+    worm_segment_compression: str = "none"  # none | zstd (only kept when it saves >10%)
+    worm_segment_zstd_level: int = 3
+    worm_segment_fsync: bool = True
+    s3_endpoint_url: str | None = None  # S3-compatible endpoint (MinIO etc.); None = AWS
+    storage_multipart_threshold_bytes: int = 8 * 1024 * 1024  # larger originals use multipart upload
     tesseract_cmd: str | None = None
+    ocr_pool_workers: int = 2  # Tesseract/OpenCV worker processes; 0 = run in a thread instead
+    ocr_pool_max_pending: int = 8  # jobs allowed to wait for a free worker before callers get backpressure
+    ocr_pool_admission_timeout: float = 2.0  # seconds to wait for admission before OcrBusyError
+    ocr_worker_concurrency: int = 4  # jobs processed concurrently per ocr_worker container
     allowed_regions: str = "SE,EU"
     # Supabase (optional)
     supabase_url: str | None = None
@@ -37,6 +62,12 @@ class Settings(BaseSettings):
     llm_extraction_threshold: float = 0.6
     llm_cache_url: str | None = None  # e.g., redis://localhost:6379/1
     llm_cache_ttl_hours: int = 24
+    llm_cache_l1_size: int = 1024  # in-process LRU entries in front of the Redis cache
+    # OCR-fallback micro-batching (off by default): concurrent short extractions within the window
+    # are packed into one structured request of up to llm_extract_batch_max receipts
+    llm_extract_batch_max: int = 0
+    llm_extract_batch_wait_ms: float = 25.0
+    llm_extract_batch_max_chars: int = 1500
     llm_budget_daily_usd: float = 1.0
     llm_budget_enforce: bool = False
     llm_cost_per_request_estimate_usd: float = 0.002
@@ -49,6 +80,18 @@ class Settings(BaseSettings):
     # OpenRouter specific models
     llm_model: str | None = None
     llm_temperature: float = 0.1
+    # OpenRouter HTTP client: one pooled session per process
+    openrouter_max_connections: int = 20
+    openrouter_timeout_seconds: float = 30.0  # whole request, per attempt
+    openrouter_call_deadline_seconds: float = 45.0  # whole call: retries, backoff and failover included
+    openrouter_connect_timeout_seconds: float = 5.0
+    openrouter_max_retries: int = 3  # on 429/5xx/network errors, with jittered exponential backoff
+    openrouter_backoff_base_seconds: float = 0.5
+    openrouter_backoff_max_seconds: float = 8.0
+    openrouter_breaker_failures: int = 5  # consecutive failed calls before a model's breaker opens
+    openrouter_breaker_reset_seconds: float = 30.0  # then one trial call is let through
+    openrouter_consensus_quorum: int = 2  # models that must agree before the rest are cancelled
+    openrouter_consensus_deadline_seconds: float = 8.0  # per model, retries included
     
     # Knowledge base
     kb_http_fetch_enabled: bool = False
@@ -58,6 +101,21 @@ class Settings(BaseSettings):
 
     # Embeddings
     embeddings_provider: str = "stub"  # options: stub | minilm
+    embeddings_model: str = "all-MiniLM-L6-v2"
+    embedding_dim: int = 16  # vendor_embeddings.embedding column size; changing it needs `alembic -x embedding_dim=N` + re-embed
+    embeddings_warmup: bool = False  # load the model at startup instead of on the first lookup
+    embeddings_batch_max: int = 64
+    embeddings_batch_wait_ms: float = 5.0  # concurrent lookups within this window share one encode
+    embeddings_cache_size: int = 10_000  # LRU entries (normalised vendor names)
+    vendor_index_top_k: int = 5
+    ai_feedback_half_life_days: float = 90.0  # a correction's vote halves in weight every N days
+    ai_feedback_max_votes: int = 50  # newest corrections kept per (org, vendor)
+    ai_feedback_pubsub_url: str | None = None  # Redis; shares feedback writes across API workers
+    vendor_embedding_min_score: float = 0.8  # cosine similarity below this is not a vendor match
+    vendor_index_ttl_seconds: float = 300.0  # reload the in-memory index at least this often (other writers)
+    ai_auto_post_chunk_size: int = 50  # documents per load/suggest/post round in /ai/auto-post/batch
+    ai_auto_post_pipeline_depth: int = 2  # prepared chunks allowed to wait for the posting stage
+    ai_auto_post_max_documents: int = 1000
 
     # Banking & VAT
     default_settlement_account: str = "1930"  # default bank account used for settlements
@@ -68,6 +126,15 @@ class Settings(BaseSettings):
     upload_allowed_mime: str = "image/jpeg,image/png"
     upload_allow_pdf: bool = False
     pdf_sanitize_enabled: bool = False
+    pdf_sanitize_timeout_seconds: float = 30.0
+    # Uploaded photos are downscaled so the long edge is at most this many pixels (~300 DPI for a
+    # receipt; more only slows OCR). 0 keeps the original resolution.
+    upload_image_max_edge: int = 2400
+    upload_batch_max_files: int = 500  # per POST /documents/batch, ZIP members included
+    upload_batch_max_bytes: int = 100_000_000  # bytes held per POST /documents/batch (ZIP members uncompressed)
+    thumbnail_sizes: str = "160,320,1024"  # long-edge px of the stored renditions (WebP + JPEG each)
+    thumbnail_at_ingest: bool = True  # render at upload; otherwise on first thumbnail request
+    ingest_workers: int = 4  # threads running the upload sanitization pipeline and storage writes
 
     # Rate limiting (naive, in-process)
     rate_limit_enabled: bool = True
@@ -88,6 +155,8 @@ class Settings(BaseSettings):
     fortnox_client_id: str | None = None
     fortnox_client_secret: str | None = None
     fortnox_redirect_uri: str | None = None
+    fortnox_sync_page_size: int = 100  # Fortnox caps list endpoints at 500 per page
+    fortnox_sync_concurrency: int = 4  # parallel page fetches (Fortnox allows ~25 req / 5 s)
     
     # BankID / broker placeholders (keys will be set via env/secrets in non-local)
     bankid_broker: str | None = None
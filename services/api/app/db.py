@@ -1,9 +1,11 @@
 from __future__ import annotations
 
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator, Sequence
 
+from sqlalchemy import column, literal, select, union_all, values
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.sql.expression import FromClause
 
 from .config import settings
 
@@ -27,3 +29,23 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
+
+
+# SQLite caps compound SELECTs at 500 terms; keep VALUES batches below that
+VALUES_CHUNK_SIZE = 400
+
+
+def values_source(
+    dialect_name: str, name: str, columns: Sequence[tuple[str, Any]], rows: Sequence[Sequence[Any]]
+) -> FromClause:
+    """Build an inline row source for set-based ``UPDATE ... FROM`` statements.
+
+    Postgres gets a real ``(VALUES ...) AS name (cols)`` clause. SQLite does not accept column
+    aliases on a VALUES subquery, so rows are emitted as a ``UNION ALL`` of literal SELECTs.
+    """
+    if dialect_name == "postgresql":
+        return values(*[column(n, t) for n, t in columns], name=name).data([tuple(r) for r in rows])
+    selects = [select(*[literal(v, t).label(n) for (n, t), v in zip(columns, row)]) for row in rows]
+    if len(selects) == 1:
+        return selects[0].subquery(name)
+    return union_all(*selects).subquery(name)
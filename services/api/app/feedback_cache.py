@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+
+
+# User corrections for AI account/VAT suggestions, held in memory per process and keyed by
+# (org_id, normalised vendor); org 0 holds feedback stored without an org. Loaded once (startup or
+# first lookup), then kept current write-through: /review/ai/feedback adds the vote locally and
+# publishes it on Redis so the other workers apply it too. Suggestions never query ai_feedback.
+# Conflicting corrections are settled by a recency-weighted vote (half-life ai_feedback_half_life_days).
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "ai:feedback"
+
+
+def normalize_vendor(vendor: str) -> str:
+    return " ".join((vendor or "").casefold().split())
+
+
+def vat_rate_for(code: Optional[str], rate: Any) -> Optional[float]:
+    # VAT precedence: explicit code -> rate
+    if code:
+        return {"SE12": 0.12, "SE06": 0.06}.get(code.upper(), 0.25)
+    return float(rate) if rate is not None else None
+
+
+@dataclass(frozen=True)
+class Vote:
+    id: int
+    org_id: int
+    vendor: str  # normalised
+    account: Optional[str]
+    vat_rate: Optional[float]
+    created_at: float  # epoch seconds
+
+    @classmethod
+    def from_row(cls, row: Any) -> "Vote":
+        created = row.created_at or datetime.now(timezone.utc)
+        if created.tzinfo is None:
+            created = created.replace(tzinfo=timezone.utc)
+        return cls(
+            id=int(row.id),
+            org_id=int(row.org_id or 0),
+            vendor=normalize_vendor(row.vendor_ilike or row.vendor),
+            account=row.correct_account or None,
+            vat_rate=vat_rate_for(row.correct_vat_code, row.correct_vat_rate),
+            created_at=created.timestamp(),
+        )
+
+
+def _winner(weights: Dict[Any, Tuple[float, float]]) -> Any:
+    # Highest total weight; ties go to the most recent vote
+    return max(weights.items(), key=lambda kv: kv[1])[0] if weights else None
+
+
+def decide(votes: List[Vote], now: Optional[float] = None) -> Optional[Tuple[str, float]]:
+    """(account, vat_rate) by recency-weighted majority; None when no vote names an account."""
+    now = time.time() if now is None else now
+    half_life = max(1.0, float(settings.ai_feedback_half_life_days)) * 86400.0
+    weights = [(v, 0.5 ** (max(0.0, now - v.created_at) / half_life)) for v in votes]
+    accounts: Dict[str, Tuple[float, float]] = {}
+    for v, w in weights:
+        if v.account:
+            total, latest = accounts.get(v.account, (0.0, 0.0))
+            accounts[v.account] = (total + w, max(latest, v.created_at))
+    account = _winner(accounts)
+    if account is None:
+        return None
+    # VAT from the votes behind the winning account; other votes only when none of those carry a rate
+    rates: Dict[float, Tuple[float, float]] = {}
+    for backing in (True, False):
+        for v, w in weights:
+            if v.vat_rate is not None and (v.account == account) == backing:
+                total, latest = rates.get(v.vat_rate, (0.0, 0.0))
+                rates[v.vat_rate] = (total + w, max(latest, v.created_at))
+        if rates:
+            break
+    rate = _winner(rates)
+    return account, (0.25 if rate is None else float(rate))
+
+
+class FeedbackCache:
+    def __init__(self) -> None:
+        self._votes: Dict[Tuple[int, str], List[Vote]] = {}
+        self._seen: set[int] = set()
+        self._bind: Any = None
+        self._arrived: Optional[List[Vote]] = None  # votes recorded while a load is in flight
+        self.loaded = False
+
+    def add(self, vote: Vote) -> bool:
+        if self._arrived is not None:
+            self._arrived.append(vote)
+        if vote.id in self._seen:
+            return False
+        self._seen.add(vote.id)
+        bucket = self._votes.setdefault((vote.org_id, vote.vendor), [])
+        bucket.append(vote)
+        if len(bucket) > int(settings.ai_feedback_max_votes):
+            bucket.sort(key=lambda v: v.created_at)
+            del bucket[: len(bucket) - int(settings.ai_feedback_max_votes)]
+        return True
+
+    def needs_load(self, session: AsyncSession) -> bool:
+        # Tests swap the engine under a running process; a new database means a fresh load
+        return not self.loaded or self._bind is not session.get_bind()
+
+    async def load(self, session: AsyncSession) -> int:
+        from .models_feedback import AiFeedback  # lazy import to avoid circular in tests without migration
+
+        # Readers keep the current maps until the new ones are complete; votes that arrive while
+        # the query runs may be missing from its rows, so they are replayed into the new maps
+        arrived: List[Vote] = []
+        self._arrived = arrived
+        try:
+            try:
+                rows = (await session.execute(select(AiFeedback).order_by(AiFeedback.id))).scalars().all()
+            except Exception:
+                # Table missing (no migration yet): behave as "no feedback" rather than retrying per request
+                rows = []
+        finally:
+            self._arrived = None
+        fresh = FeedbackCache()
+        for row in rows:
+            fresh.add(Vote.from_row(row))
+        for vote in arrived:
+            fresh.add(vote)
+        self._votes, self._seen = fresh._votes, fresh._seen
+        self._bind = session.get_bind()
+        self.loaded = True
+        return len(rows)
+
+    def resolve(self, org_id: Optional[int], vendor: Optional[str]) -> Optional[Tuple[str, float]]:
+        name = normalize_vendor(vendor or "")
+        if not name:
+            return None
+        # The org's own corrections first, then feedback recorded without an org
+        for key in ((int(org_id), name), (0, name)) if org_id else ((0, name),):
+            votes = self._votes.get(key)
+            if votes:
+                decision = decide(votes)
+                if decision:
+                    return decision
+        return None
+
+
+_cache = FeedbackCache()
+_instance = f"{os.getpid()}-{id(_cache)}"
+
+
+def get_feedback_cache() -> FeedbackCache:
+    return _cache
+
+
+@lru_cache(maxsize=1)
+def _redis() -> Any:
+    import redis.asyncio as redis  # type: ignore
+
+    return redis.from_url(settings.ai_feedback_pubsub_url, decode_responses=True)
+
+
+async def record(row: Any, r: Any = None) -> Vote:
+    """Write-through after a correction is committed: apply locally, then tell the other workers."""
+    vote = Vote.from_row(row)
+    _cache.add(vote)
+    if r is None and settings.ai_feedback_pubsub_url:
+        r = _redis()
+    if r is not None:
+        try:
+            await r.publish(CHANNEL, json.dumps({"source": _instance, "vote": asdict(vote)}))
+        except Exception:
+            logger.warning("ai feedback publish failed; other workers pick it up on their next reload")
+    return vote
+
+
+def apply_message(data: str | bytes) -> bool:
+    msg = json.loads(data)
+    if msg.get("source") == _instance:
+        return False
+    return _cache.add(Vote(**msg["vote"]))
+
+
+async def listen(r: Any, session_factory: Any) -> None:
+    """Apply votes published by other workers. (Re)subscribing reloads from the DB so nothing
+    published while disconnected is missed."""
+    while True:
+        try:
+            pubsub = r.pubsub()
+            await pubsub.subscribe(CHANNEL)
+            async with session_factory() as session:
+                await _cache.load(session)
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    apply_message(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning("ai feedback subscription lost; resubscribing", exc_info=True)
+            await asyncio.sleep(1.0)
@@ -1,27 +1,64 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
+
+
+_DEFAULT_RECEIPTS: List[Dict[str, Any]] = [
+    {"id": "R1", "date": "2025-01-12", "total": 123.45, "currency": "SEK", "vendor": "Kaffe AB", "last_modified": "2025-01-12T08:00:00"},
+]
+_DEFAULT_BANK: List[Dict[str, Any]] = [
+    {"id": "B1", "date": "2025-01-13", "amount": 123.45, "currency": "SEK", "description": "Card Kaffe AB", "counterparty": "Kaffe AB", "last_modified": "2025-01-13T08:00:00"},
+]
 
 
 class FortnoxStubClient:
-    """Stubbed Fortnox client for local/dev. Does not call external APIs."""
+    """Stubbed Fortnox client for local/dev. Does not call external APIs.
+
+    Paged methods mimic Fortnox list endpoints: ``page``/``limit`` select a slice, ``last_modified``
+    only returns rows changed after that timestamp, and ``meta`` carries the page counts.
+    """
 
-    def __init__(self, *_: Any, **__: Any) -> None:  # ignore credentials
-        pass
+    def __init__(
+        self,
+        *_: Any,
+        receipts: Optional[List[Dict[str, Any]]] = None,
+        bank_transactions: Optional[List[Dict[str, Any]]] = None,
+        **__: Any,
+    ) -> None:  # ignore credentials
+        self.receipts = list(_DEFAULT_RECEIPTS if receipts is None else receipts)
+        self.bank_transactions = list(_DEFAULT_BANK if bank_transactions is None else bank_transactions)
+        self.page_requests = 0
 
     async def exchange_code(self, code: str) -> Dict[str, Any]:
         return {"access_token": f"stub-token-{code}", "scope": "invoices receipts bank", "expires_in": 3600}
 
     async def list_receipts(self, access_token: str) -> List[Dict[str, Any]]:
-        # Minimal payload to emulate typical receipt objects
-        return [
-            {"id": "R1", "date": "2025-01-12", "total": 123.45, "currency": "SEK", "vendor": "Kaffe AB"},
-        ]
+        return list(self.receipts)
 
     async def list_bank_transactions(self, access_token: str) -> List[Dict[str, Any]]:
-        return [
-            {"date": "2025-01-13", "amount": 123.45, "currency": "SEK", "description": "Card Kaffe AB", "counterparty": "Kaffe AB"},
-        ]
+        return list(self.bank_transactions)
+
+    async def list_receipts_page(
+        self, access_token: str, *, page: int = 1, limit: int = 100, last_modified: Optional[str] = None
+    ) -> Dict[str, Any]:
+        return self._page(self.receipts, page, limit, last_modified)
+
+    async def list_bank_transactions_page(
+        self, access_token: str, *, page: int = 1, limit: int = 100, last_modified: Optional[str] = None
+    ) -> Dict[str, Any]:
+        return self._page(self.bank_transactions, page, limit, last_modified)
+
+    def _page(self, rows: List[Dict[str, Any]], page: int, limit: int, last_modified: Optional[str]) -> Dict[str, Any]:
+        self.page_requests += 1
+        if last_modified:
+            rows = [r for r in rows if str(r.get("last_modified") or "") > last_modified]
+        limit = max(1, int(limit))
+        total_pages = max(1, -(-len(rows) // limit))
+        start = (max(1, int(page)) - 1) * limit
+        return {
+            "items": rows[start:start + limit],
+            "meta": {"total_resources": len(rows), "total_pages": total_pages, "current_page": page},
+        }
 
 
 def get_fortnox_client(stub: bool = True):
@@ -29,8 +66,3 @@ def get_fortnox_client(stub: bool = True):
         return FortnoxStubClient()
     # A real client would be returned here when credentials/keys are configured
     return FortnoxStubClient()
-
-
-
-
-
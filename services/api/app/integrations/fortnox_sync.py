@@ -3,12 +3,19 @@ from __future__ import annotations
 import asyncio
 import hashlib
 from datetime import datetime, date
-from typing import Any, Dict, List, Tuple
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
-from sqlalchemy import select
+from sqlalchemy import insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..models import Document, ExtractedField, BankTransaction
+from ..config import settings
+from ..models import Document, ExtractedField, BankTransaction, SyncCursor
+
+
+PROVIDER = "fortnox"
+
+PageFetcher = Callable[..., Awaitable[Dict[str, Any]]]
+PageHandler = Callable[[AsyncSession, int, List[Dict[str, Any]]], Awaitable[int]]
 
 
 def _make_doc_digest(vendor: str | None, dt_iso: str | None, total: float | None) -> str:
@@ -16,76 +23,209 @@ def _make_doc_digest(vendor: str | None, dt_iso: str | None, total: float | None
     return hashlib.sha256(base.encode("utf-8")).hexdigest()
 
 
-async def _sync_receipts(session: AsyncSession, org_id: int, client, access_token: str) -> int:
-    count = 0
-    items: List[Dict[str, Any]] = await client.list_receipts(access_token)
+def _bank_external_ref(it: Dict[str, Any], dt: date, amt: float, desc: str) -> str:
+    if it.get("id"):
+        return f"{PROVIDER}:{it['id']}"[:100]
+    base = f"{dt.isoformat()}|{amt:.2f}|{desc.lower()}"
+    return f"{PROVIDER}:{hashlib.sha256(base.encode('utf-8')).hexdigest()}"
+
+
+async def get_cursor(session: AsyncSession, org_id: int, resource: str) -> Optional[str]:
+    stmt = select(SyncCursor.cursor).where(
+        SyncCursor.org_id == org_id, SyncCursor.provider == PROVIDER, SyncCursor.resource == resource
+    )
+    return (await session.execute(stmt)).scalars().first()
+
+
+async def _set_cursor(session: AsyncSession, org_id: int, resource: str, cursor: str) -> None:
+    row = (
+        await session.execute(
+            select(SyncCursor).where(
+                SyncCursor.org_id == org_id, SyncCursor.provider == PROVIDER, SyncCursor.resource == resource
+            )
+        )
+    ).scalars().first()
+    if row is None:
+        session.add(SyncCursor(org_id=org_id, provider=PROVIDER, resource=resource, cursor=cursor, updated_at=datetime.utcnow()))
+    else:
+        row.cursor = cursor
+        row.updated_at = datetime.utcnow()
+
+
+async def _upsert_receipts(session: AsyncSession, org_id: int, items: List[Dict[str, Any]]) -> int:
+    rows: Dict[str, Dict[str, Any]] = {}
     for it in items:
         try:
             vendor = (it.get("vendor") or "").strip()
             total = float(it.get("total") or 0.0)
             dt_iso = (it.get("date") or date.today().isoformat())
-            digest = _make_doc_digest(vendor, dt_iso, total)
-            # Check existing by digest
-            existing = (await session.execute(select(Document).where(Document.hash_sha256 == digest))).scalars().first()
-            if existing:
-                continue
-            storage_uri = f"fortnox:receipt:{it.get('id') or digest}"
-            doc = Document(
-                org_id=org_id,
-                fiscal_year_id=None,
-                type="receipt",
-                storage_uri=storage_uri,
-                hash_sha256=digest,
-                ocr_text=None,
-                status="new",
-                created_at=datetime.fromisoformat(f"{dt_iso} 00:00:00"),
-            )
-            session.add(doc)
-            await session.flush()
-            # Seed minimal extracted fields
-            session.add_all([
-                ExtractedField(document_id=doc.id, key="date", value=dt_iso, confidence=0.80),
-                ExtractedField(document_id=doc.id, key="total", value=f"{total:.2f}", confidence=0.80),
-                ExtractedField(document_id=doc.id, key="vendor", value=vendor, confidence=0.80),
-            ])
-            count += 1
+            created_at = datetime.fromisoformat(f"{dt_iso} 00:00:00")
         except Exception:
             # Skip faulty item, continue
             continue
-    await session.commit()
-    return count
+        digest = _make_doc_digest(vendor, dt_iso, total)
+        rows.setdefault(digest, {"id": it.get("id"), "vendor": vendor, "total": total, "date": dt_iso, "created_at": created_at})
+    if not rows:
+        return 0
+    # One existence check per page instead of one SELECT per item
+    existing = set(
+        (
+            await session.execute(
+                select(Document.hash_sha256).where(Document.org_id == org_id, Document.hash_sha256.in_(list(rows)))
+            )
+        ).scalars().all()
+    )
+    new = {d: r for d, r in rows.items() if d not in existing}
+    if not new:
+        return 0
+    res = await session.execute(
+        insert(Document).returning(Document.id, Document.hash_sha256),
+        [
+            {
+                "org_id": org_id,
+                "fiscal_year_id": None,
+                "type": "receipt",
+                "storage_uri": f"fortnox:receipt:{r['id'] or d}",
+                "hash_sha256": d,
+                "ocr_text": None,
+                "status": "new",
+                "created_at": r["created_at"],
+            }
+            for d, r in new.items()
+        ],
+    )
+    doc_ids = {h: i for i, h in res.all()}
+    # Seed minimal extracted fields
+    fields: List[Dict[str, Any]] = []
+    for d, r in new.items():
+        fields.extend(
+            [
+                {"document_id": doc_ids[d], "key": "date", "value": r["date"], "confidence": 0.80},
+                {"document_id": doc_ids[d], "key": "total", "value": f"{r['total']:.2f}", "confidence": 0.80},
+                {"document_id": doc_ids[d], "key": "vendor", "value": r["vendor"], "confidence": 0.80},
+            ]
+        )
+    await session.execute(insert(ExtractedField), fields)
+    return len(new)
 
 
-async def _sync_bank(session: AsyncSession, client, access_token: str) -> int:
-    count = 0
-    items: List[Dict[str, Any]] = await client.list_bank_transactions(access_token)
+async def _upsert_bank(session: AsyncSession, org_id: int, items: List[Dict[str, Any]], batch_id: int) -> int:
+    rows: Dict[str, Dict[str, Any]] = {}
     for it in items:
         try:
-            dt = datetime.fromisoformat((it.get("date") or str(date.today())))
+            dt = datetime.fromisoformat((it.get("date") or str(date.today()))).date()
             amt = float(it.get("amount") or 0.0)
-            currency = (it.get("currency") or "SEK").upper()[:3]
-            desc = (it.get("description") or "").strip()[:500]
-            cp = (it.get("counterparty") or None)
-            bt = BankTransaction(
-                import_batch_id=int(datetime.utcnow().timestamp()),
-                date=dt.date(),
-                amount=amt,
-                currency=currency,
-                description=desc,
-                counterparty_ref=cp,
-            )
-            session.add(bt)
-            count += 1
         except Exception:
             continue
+        desc = (it.get("description") or "").strip()[:500]
+        ref = _bank_external_ref(it, dt, amt, desc)
+        rows[ref] = {
+            "date": dt,
+            "amount": amt,
+            "currency": (it.get("currency") or "SEK").upper()[:3],
+            "description": desc,
+            "counterparty_ref": (it.get("counterparty") or None),
+        }
+    if not rows:
+        return 0
+    existing: Dict[str, int] = {}
+    matched: set[str] = set()
+    stmt = select(BankTransaction.external_ref, BankTransaction.id, BankTransaction.matched_verification_id).where(
+        BankTransaction.org_id == org_id, BankTransaction.external_ref.in_(list(rows))
+    )
+    for ref, tx_id, ver_id in (await session.execute(stmt)).all():
+        if ver_id is None:
+            existing[ref] = int(tx_id)
+        else:
+            matched.add(ref)
+    # Modified upstream rows refresh their unmatched local copy; matched rows are left alone
+    updates = [{"id": existing[ref], **vals} for ref, vals in rows.items() if ref in existing]
+    if updates:
+        await session.execute(update(BankTransaction), updates)
+    inserts = [
+        {"org_id": org_id, "import_batch_id": batch_id, "external_ref": ref, **vals}
+        for ref, vals in rows.items()
+        if ref not in existing and ref not in matched
+    ]
+    if inserts:
+        await session.execute(insert(BankTransaction), inserts)
+    return len(inserts)
+
+
+def _single_page(list_all: Callable[[str], Awaitable[List[Dict[str, Any]]]]) -> PageFetcher:
+    """Adapt an unpaged client method to the paged fetcher signature."""
+
+    async def fetch(access_token: str, *, page: int = 1, limit: int = 100, last_modified: Optional[str] = None) -> Dict[str, Any]:
+        return {"items": await list_all(access_token), "meta": {"total_pages": 1, "current_page": 1}}
+
+    return fetch
+
+
+async def _sync_resource(
+    session: AsyncSession,
+    org_id: int,
+    resource: str,
+    fetch: PageFetcher,
+    handle_page: PageHandler,
+    access_token: str,
+) -> int:
+    """Fetch every page changed since the stored cursor and upsert it, then advance the cursor.
+
+    Page 1 reports the page count; the remaining pages are fetched concurrently (bounded by
+    ``fortnox_sync_concurrency``) while earlier pages are written. Everything, including the new
+    cursor, is committed once so a failed run is retried from the old cursor.
+    """
+    since = await get_cursor(session, org_id, resource)
+    limit = max(1, int(settings.fortnox_sync_page_size))
+    sem = asyncio.Semaphore(max(1, int(settings.fortnox_sync_concurrency)))
+
+    async def _get(page: int) -> Dict[str, Any]:
+        async with sem:
+            return await fetch(access_token, page=page, limit=limit, last_modified=since)
+
+    first = await _get(1)
+    total_pages = int((first.get("meta") or {}).get("total_pages") or 1)
+    tasks = [asyncio.create_task(_get(p)) for p in range(2, total_pages + 1)]
+    count = 0
+    newest = since
+    try:
+        for pending in [None, *tasks]:
+            page = first if pending is None else await pending
+            items = page.get("items") or []
+            count += await handle_page(session, org_id, items)
+            for it in items:
+                lm = it.get("last_modified")
+                if lm and (newest is None or str(lm) > newest):
+                    newest = str(lm)
+    finally:
+        for t in tasks:
+            t.cancel()
+    if newest and newest != since:
+        await _set_cursor(session, org_id, resource, newest)
     await session.commit()
     return count
 
 
+async def _sync_receipts(session: AsyncSession, org_id: int, client, access_token: str) -> int:
+    fetch = getattr(client, "list_receipts_page", None) or _single_page(client.list_receipts)
+    return await _sync_resource(session, org_id, "receipts", fetch, _upsert_receipts, access_token)
+
+
+async def _sync_bank(session: AsyncSession, org_id: int, client, access_token: str) -> int:
+    fetch = getattr(client, "list_bank_transactions_page", None) or _single_page(client.list_bank_transactions)
+    batch_id = int(datetime.utcnow().timestamp())
+
+    async def handle(s: AsyncSession, oid: int, items: List[Dict[str, Any]]) -> int:
+        return await _upsert_bank(s, oid, items, batch_id)
+
+    return await _sync_resource(session, org_id, "bank", fetch, handle, access_token)
+
+
 async def sync_fortnox(session: AsyncSession, org_id: int, access_token: str, client) -> Dict[str, int]:
-    """Fetch receipts and bank transactions from Fortnox with simple retry/backoff.
+    """Incrementally fetch receipts and bank transactions from Fortnox with simple retry/backoff.
 
-    Returns {"receipts": N, "bank": M} counts of newly inserted items.
+    Each resource resumes from its per-org cursor. Returns {"receipts": N, "bank": M} counts of
+    newly inserted items.
     """
     receipts_count = 0
     bank_count = 0
@@ -95,13 +235,13 @@ async def sync_fortnox(session: AsyncSession, org_id: int, access_token: str, cl
             receipts_count = await _sync_receipts(session, org_id, client, access_token)
             break
         except Exception:
+            await session.rollback()
             await asyncio.sleep(0.25 * (2 ** attempt))
     for attempt in range(3):
         try:
-            bank_count = await _sync_bank(session, client, access_token)
+            bank_count = await _sync_bank(session, org_id, client, access_token)
             break
         except Exception:
+            await session.rollback()
             await asyncio.sleep(0.25 * (2 ** attempt))
     return {"receipts": receipts_count, "bank": bank_count}
-
-
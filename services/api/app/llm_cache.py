@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .config import settings
+from .metrics_llm import record_cache_hit, record_cache_miss, record_coalesced
+
+
+# Content-addressed cache for LLM responses, shared by every provider and operation.
+#   key: sha256 over (normalised prompt, model, temperature) -- stable across processes and
+#        restarts, unlike hash(), which is randomised per interpreter
+#   L1:  in-process LRU (llm_cache_l1_size entries)
+#   L2:  Redis (llm_cache_url), shared by all workers; a Redis outage degrades to L1 only
+# Both tiers expire entries after llm_cache_ttl_hours. Values are stored as JSON, so callers
+# always get their own copy.
+#
+# The cache only helps once a reply has landed; SingleFlight covers the window before that,
+# so a burst of identical prompts (same receipt uploaded twice, retries from the app) shares
+# one upstream call instead of each missing the cache and paying for its own.
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "llm:v1:"
+
+
+def normalize_prompt(prompt: Any) -> str:
+    if isinstance(prompt, str):
+        # Prompts are indented triple-quoted strings; layout whitespace doesn't change the answer
+        return " ".join(prompt.split())
+    return json.dumps(prompt, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+
+def cache_key(prompt: Any, model: str, temperature: float) -> str:
+    material = json.dumps(
+        {"prompt": normalize_prompt(prompt), "model": model or "", "temperature": round(float(temperature), 4)},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return KEY_PREFIX + hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def cacheable(value: Any) -> bool:
+    """Errors and unparsed replies are not worth replaying.
+
+    Raw completions are kept only if they carry a JSON object (what the callers parse out of
+    them); prose or truncated text would otherwise be served for the whole TTL.
+    """
+    if isinstance(value, dict):
+        return not (value.get("error") or value.get("parse_error") or "raw_response" in value)
+    if isinstance(value, str):
+        match = _JSON_OBJECT_RE.search(value)
+        if match is None:
+            return False
+        try:
+            json.loads(match.group())
+        except ValueError:
+            return False
+        return True
+    return value is not None
+
+
+class LLMCache:
+    def __init__(self, redis: Any = None) -> None:
+        self._l1: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = redis
+        self.stats: Dict[str, int] = {"l1_hits": 0, "l2_hits": 0, "misses": 0}
+
+    def _l2(self) -> Any:
+        if self._redis is None and settings.llm_cache_url:
+            import redis.asyncio as redis  # type: ignore
+
+            self._redis = redis.from_url(settings.llm_cache_url, decode_responses=True)
+        return self._redis
+
+    @staticmethod
+    def _ttl_seconds() -> int:
+        return max(1, int(float(settings.llm_cache_ttl_hours) * 3600))
+
+    def _l1_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._l1.get(key)
+            if item is None:
+                return None
+            expires_at, raw = item
+            if expires_at < time.monotonic():
+                del self._l1[key]
+                return None
+            self._l1.move_to_end(key)
+            return raw
+
+    def _l1_put(self, key: str, raw: str) -> None:
+        with self._lock:
+            self._l1[key] = (time.monotonic() + self._ttl_seconds(), raw)
+            self._l1.move_to_end(key)
+            while len(self._l1) > max(0, int(settings.llm_cache_l1_size)):
+                self._l1.popitem(last=False)
+
+    async def get(self, key: str, operation: str = "general") -> Any:
+        """Cached value for ``key`` or None."""
+        raw = self._l1_get(key)
+        if raw is not None:
+            self.stats["l1_hits"] += 1
+            record_cache_hit(operation, "l1")
+            return json.loads(raw)
+        r = self._l2()
+        if r is not None:
+            try:
+                raw = await r.get(key)
+            except Exception:
+                logger.warning("llm cache: redis get failed", exc_info=True)
+                raw = None
+            if raw is not None:
+                self._l1_put(key, raw)
+                self.stats["l2_hits"] += 1
+                record_cache_hit(operation, "l2")
+                return json.loads(raw)
+        self.stats["misses"] += 1
+        record_cache_miss(operation)
+        return None
+
+    async def set(self, key: str, value: Any) -> None:
+        if not cacheable(value):
+            return
+        raw = json.dumps(value, ensure_ascii=False)
+        self._l1_put(key, raw)
+        r = self._l2()
+        if r is not None:
+            try:
+                await r.set(key, raw, ex=self._ttl_seconds())
+            except Exception:
+                logger.warning("llm cache: redis set failed", exc_info=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._l1.clear()
+
+    def __len__(self) -> int:
+        return len(self._l1)
+
+
+_cache: Optional[LLMCache] = None
+
+
+def get_llm_cache() -> LLMCache:
+    global _cache
+    if _cache is None:
+        _cache = LLMCache()
+    return _cache
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key onto one in-flight task."""
+
+    def __init__(self) -> None:
+        self._inflight: Dict[str, "asyncio.Future[Any]"] = {}
+        self.stats: Dict[str, int] = {"leaders": 0, "followers": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]], operation: str = "general") -> Any:
+        loop = asyncio.get_running_loop()
+        task = self._inflight.get(key)
+        if task is not None and not task.done() and task.get_loop() is loop:
+            self.stats["followers"] += 1
+            record_coalesced(operation)
+            # shield: a follower giving up must not cancel the call for everyone else
+            return copy.deepcopy(await asyncio.shield(task))
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = task
+        task.add_done_callback(lambda t, k=key: self._inflight.pop(k, None) if self._inflight.get(k) is t else None)
+        self.stats["leaders"] += 1
+        return copy.deepcopy(await asyncio.shield(task))
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+
+_flights: Optional[SingleFlight] = None
+
+
+def get_single_flight() -> SingleFlight:
+    global _flights
+    if _flights is None:
+        _flights = SingleFlight()
+    return _flights
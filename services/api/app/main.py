@@ -5,7 +5,7 @@ import uuid
 from fastapi.middleware.cors import CORSMiddleware
 from .config import settings
 from .db import engine, Base
-from .routers import auth, ingest, verifications, compliance, exports, reports, ai_auto, ai_enhanced, bolagsverket, metrics, admin, storage, bank, vat, imports, einvoice, period, fortnox, review, accruals, email_ingest, personal_tax, invoices
+from .routers import auth, ingest, verifications, compliance, exports, reports, ai_auto, ai_enhanced, bolagsverket, metrics, admin, storage, bank, vat, imports, einvoice, period, fortnox, review, accruals, email_ingest, personal_tax, invoices, search
 from opentelemetry import trace
 from opentelemetry.sdk.resources import Resource
 from opentelemetry.sdk.trace import TracerProvider
@@ -56,22 +56,8 @@ def create_app() -> FastAPI:
             db_ok = False
         # Storage check
         try:
-            if settings.s3_bucket and settings.aws_region and settings.aws_access_key_id and settings.aws_secret_access_key:
-                import boto3  # type: ignore
-                s3 = boto3.client(
-                    "s3",
-                    region_name=settings.aws_region,
-                    aws_access_key_id=settings.aws_access_key_id,
-                    aws_secret_access_key=settings.aws_secret_access_key,
-                )
-                s3.head_bucket(Bucket=settings.s3_bucket)
-                storage_ok = True
-            elif settings.supabase_url and settings.supabase_service_role_key and settings.supabase_bucket:
-                storage_ok = True  # assume reachable; deeper probe would require HTTP
-            else:
-                # local WORM store existence check
-                from pathlib import Path as _Path
-                storage_ok = _Path(".worm_store").exists()
+            from .storage_backend import get_backend, run as _run_storage
+            storage_ok = bool(await _run_storage(get_backend().ping))
         except Exception:
             storage_ok = False
         # Queue check (optional OCR queue)
@@ -110,6 +96,7 @@ def create_app() -> FastAPI:
     app.include_router(email_ingest.router)
     app.include_router(personal_tax.router)
     app.include_router(invoices.router)
+    app.include_router(search.router)
 
     # Minimal DLP middleware: mask personal numbers in paths/queries
     @app.middleware("http")
@@ -177,6 +164,12 @@ def create_app() -> FastAPI:
                             await conn.execute(_text("ALTER TABLE bank_transactions ADD COLUMN org_id INTEGER"))
                             # Backfill to 1 for existing rows
                             await conn.execute(_text("UPDATE bank_transactions SET org_id = 1 WHERE org_id IS NULL"))
+                        res3 = await conn.execute(_text("PRAGMA table_info('vendor_embeddings')"))
+                        if "embedding_model" not in {row[1] for row in res3.fetchall()}:  # type: ignore[index]
+                            await conn.execute(_text("ALTER TABLE vendor_embeddings ADD COLUMN embedding_model VARCHAR(80)"))
+                        # FTS5 search shadow table + sync triggers for databases created before search
+                        from .search import install_sqlite_search
+                        await conn.run_sync(install_sqlite_search)
                     except Exception:
                         pass
             except Exception:
@@ -185,7 +178,7 @@ def create_app() -> FastAPI:
             from sqlalchemy import text as _text
             async with engine.begin() as conn:
                 try:
-                    for tbl in ("entries", "verifications", "compliance_flags", "audit_log", "period_locks", "bank_transactions"):
+                    for tbl in ("open_items", "entries", "verifications", "compliance_flags", "audit_log", "period_locks", "bank_transactions"):
                         await conn.execute(_text(f"DELETE FROM {tbl}"))
                 except Exception:
                     pass
@@ -196,6 +189,34 @@ def create_app() -> FastAPI:
             except Exception:
                 pass
 
+        # Inline Tesseract OCR: start the process pool now rather than on the first upload
+        if (settings.ocr_provider or "").lower() == "tesseract" and not settings.ocr_queue_url:
+            try:
+                from .ocr_pool import warm_pool
+                await warm_pool()
+            except Exception:
+                pass
+
+        # AI feedback map: load once here; later corrections arrive write-through / via Redis pub/sub
+        try:
+            from .db import SessionLocal
+            from . import feedback_cache
+            if settings.ai_feedback_pubsub_url:
+                app.state.feedback_listener = asyncio.create_task(feedback_cache.listen(feedback_cache._redis(), SessionLocal))
+            else:
+                async with SessionLocal() as session:
+                    await feedback_cache.get_feedback_cache().load(session)
+        except Exception:
+            pass
+
+        # Vendor embeddings: load the model before the first auto-post instead of during it
+        if settings.embeddings_warmup:
+            try:
+                from .vendor_embeddings import get_embedding_service
+                await asyncio.to_thread(get_embedding_service().warm_up)
+            except Exception:
+                pass
+
         # OpenTelemetry setup (optional)
         if settings.otlp_endpoint:
             resource = Resource.create({"service.name": "bertil-api"})
@@ -205,6 +226,16 @@ def create_app() -> FastAPI:
             trace.set_tracer_provider(provider)
             FastAPIInstrumentor.instrument_app(app)
 
+    @app.on_event("shutdown")
+    async def on_shutdown() -> None:
+        from .ocr_pool import shutdown_pool
+        shutdown_pool()
+        listener = getattr(app.state, "feedback_listener", None)
+        if listener is not None:
+            listener.cancel()
+        from .agents.openrouter_integration import close_openrouter_client
+        await close_openrouter_client()
+
     return app
 
 
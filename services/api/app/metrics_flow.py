@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from collections import deque
-from typing import Deque, List
+from typing import Deque, List, Optional
 try:
     from prometheus_client import Histogram  # type: ignore
 except Exception:  # pragma: no cover
@@ -21,6 +21,14 @@ _flow_latency = Histogram(
 
 _durations: Deque[float] = deque(maxlen=200)
 
+_upload_stage = Histogram(
+    "upload_stage_seconds",
+    "Upload sanitization pipeline time per stage",
+    ["stage"],  # sniff | image | pdf | scan | hash | store
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5),
+)
+_stage_durations: dict[str, Deque[float]] = {}
+
 
 def record_duration(seconds: float) -> None:
     try:
@@ -40,14 +48,24 @@ def get_stats() -> dict:
     return {"count": len(data_sorted), "p95": round(data_sorted[p95_index], 3), "durations": data_sorted[-20:]}
 
 
+def record_stage(stage: str, seconds: float) -> None:
+    try:
+        if seconds >= 0:
+            _stage_durations.setdefault(stage, deque(maxlen=200)).append(float(seconds))
+            _upload_stage.labels(stage=stage).observe(float(seconds))
+    except Exception:
+        pass
 
 
+def _pct(data_sorted: List[float], q: float) -> Optional[float]:
+    if not data_sorted:
+        return None
+    return round(data_sorted[max(0, int(q * (len(data_sorted) - 1)))], 4)
 
 
-
-
-
-
-
-
-
+def get_stage_stats() -> dict:
+    out: dict = {}
+    for stage, values in _stage_durations.items():
+        data_sorted = sorted(values)
+        out[stage] = {"count": len(data_sorted), "p50": _pct(data_sorted, 0.5), "p95": _pct(data_sorted, 0.95)}
+    return out
@@ -42,17 +42,21 @@ _success: dict[tuple[int, str], int] = {}
 _blocks: dict[tuple[int, str], int] = {}
 
 
-def record_attempt(org_id: int, level: str) -> None:
-    automation_attempts.labels(org_id=str(org_id), level=level).inc()
+def record_attempt(org_id: int, level: str, count: int = 1) -> None:
+    if count <= 0:
+        return
+    automation_attempts.labels(org_id=str(org_id), level=level).inc(count)
     key = (int(org_id), str(level))
-    _attempts[key] = _attempts.get(key, 0) + 1
+    _attempts[key] = _attempts.get(key, 0) + int(count)
     _update_rate(org_id, level)
 
 
-def record_success(org_id: int, level: str) -> None:
-    automation_success.labels(org_id=str(org_id), level=level).inc()
+def record_success(org_id: int, level: str, count: int = 1) -> None:
+    if count <= 0:
+        return
+    automation_success.labels(org_id=str(org_id), level=level).inc(count)
     key = (int(org_id), str(level))
-    _success[key] = _success.get(key, 0) + 1
+    _success[key] = _success.get(key, 0) + int(count)
     _update_rate(org_id, level)
 
 
@@ -1,6 +1,11 @@
 from __future__ import annotations
 
-from typing import Optional
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date
+from typing import Deque, Dict, Iterator, List, Optional
 
 try:
     from prometheus_client import Counter, Histogram, Gauge  # type: ignore
@@ -40,6 +45,44 @@ llm_latency = Histogram(
     ["provider", "model", "operation"],
     buckets=(0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10),
 )
+llm_cache_lookups = Counter(
+    "llm_cache_lookups_total",
+    "LLM response cache lookups",
+    ["operation", "result"],  # result: l1_hit|l2_hit|miss
+)
+llm_retries = Counter(
+    "llm_retries_total",
+    "LLM API calls retried after a 429/5xx or network error",
+    ["model", "reason"],
+)
+llm_failovers = Counter(
+    "llm_failovers_total",
+    "LLM calls moved to the fallback model",
+    ["model", "fallback", "operation"],
+)
+llm_coalesced = Counter(
+    "llm_coalesced_total",
+    "LLM requests served without their own upstream call",
+    ["operation", "mode"],  # mode: single_flight|batched
+)
+llm_batch_size = Histogram(
+    "llm_batch_size",
+    "Prompts packed into one micro-batched LLM request",
+    ["operation"],
+    buckets=(1, 2, 4, 8, 16, 32),
+)
+llm_consensus_model_latency = Histogram(
+    "llm_consensus_model_latency_seconds",
+    "Per-model latency within multi-model consensus",
+    ["model", "outcome"],  # ok|timeout|error|cancelled
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+llm_consensus_agreement = Histogram(
+    "llm_consensus_agreement",
+    "Lowest field-level agreement among answering models",
+    ["outcome"],  # quorum|no_quorum
+    buckets=(0.34, 0.5, 0.67, 0.75, 1.0),
+)
 llm_cost = Gauge(
     "llm_cost_usd",
     "Cumulative LLM cost in USD",
@@ -59,6 +102,30 @@ def observe_latency(provider: str, model: str, operation: str, seconds: float) -
     llm_latency.labels(provider=provider, model=model, operation=operation).observe(seconds)
 
 
+def record_cache_hit(operation: str, tier: str) -> None:
+    llm_cache_lookups.labels(operation=operation, result=f"{tier}_hit").inc()
+
+
+def record_cache_miss(operation: str) -> None:
+    llm_cache_lookups.labels(operation=operation, result="miss").inc()
+
+
+def record_retry(model: str, reason: str) -> None:
+    llm_retries.labels(model=model, reason=reason).inc()
+
+
+def record_failover(model: str, fallback: str, operation: str) -> None:
+    llm_failovers.labels(model=model, fallback=fallback, operation=operation).inc()
+
+
+def observe_consensus_model(model: str, outcome: str, seconds: float) -> None:
+    llm_consensus_model_latency.labels(model=model, outcome=outcome).observe(seconds)
+
+
+def record_consensus(agreement: float, outcome: str) -> None:
+    llm_consensus_agreement.labels(outcome=outcome).observe(agreement)
+
+
 def add_cost(provider: str, model: str, amount_usd: float) -> None:
     # This is cumulative by convention
     try:
@@ -68,3 +135,85 @@ def add_cost(provider: str, model: str, amount_usd: float) -> None:
         pass
 
 
+# In-process daily usage, for comparing what callers asked for with what reached a provider
+# (cache, single-flight and micro-batching sit in between), plus caller-side latency percentiles.
+# A request is counted once, by the outermost llm_request(); everything underneath it (caches,
+# shared flights, batches, provider clients, retries) is booked under that same operation label.
+_usage_day: date = date.today()
+_requested: Dict[str, int] = {}
+_upstream: Dict[str, int] = {}
+_coalesced: Dict[str, int] = {}
+_latencies: Dict[str, Deque[float]] = {}
+_request_operation: ContextVar[Optional[str]] = ContextVar("llm_request_operation", default=None)
+
+
+def _roll_day() -> None:
+    global _usage_day
+    today = date.today()
+    if today != _usage_day:
+        _usage_day = today
+        _requested.clear()
+        _upstream.clear()
+        _coalesced.clear()
+
+
+def _operation(operation: str) -> str:
+    return _request_operation.get() or operation
+
+
+@contextmanager
+def llm_request(operation: str) -> Iterator[None]:
+    """Count one caller-side request and how long the caller waited, unless an outer layer already does."""
+    if _request_operation.get() is not None:
+        yield
+        return
+    token = _request_operation.set(operation)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _request_operation.reset(token)
+        _roll_day()
+        _requested[operation] = _requested.get(operation, 0) + 1
+        _latencies.setdefault(operation, deque(maxlen=500)).append(time.perf_counter() - start)
+
+
+def record_upstream_call(operation: str) -> None:
+    """One request that actually reached a provider (counts against the daily quota)."""
+    operation = _operation(operation)
+    _roll_day()
+    _upstream[operation] = _upstream.get(operation, 0) + 1
+
+
+def record_coalesced(operation: str, mode: str = "single_flight", count: int = 1) -> None:
+    operation = _operation(operation)
+    llm_coalesced.labels(operation=operation, mode=mode).inc(count)
+    _roll_day()
+    _coalesced[operation] = _coalesced.get(operation, 0) + count
+
+
+def observe_batch_size(operation: str, size: int) -> None:
+    llm_batch_size.labels(operation=operation).observe(size)
+
+
+def _pct(data_sorted: List[float], q: float) -> Optional[float]:
+    if not data_sorted:
+        return None
+    return round(data_sorted[max(0, int(q * (len(data_sorted) - 1)))], 4)
+
+
+def get_usage_stats() -> dict:
+    _roll_day()
+    latency = {}
+    for operation, values in _latencies.items():
+        data_sorted = sorted(values)
+        latency[operation] = {"count": len(data_sorted), "p50": _pct(data_sorted, 0.5), "p95": _pct(data_sorted, 0.95)}
+    return {
+        "day": _usage_day.isoformat(),
+        "requested": dict(_requested),
+        "requested_total": sum(_requested.values()),
+        "upstream": dict(_upstream),
+        "upstream_total": sum(_upstream.values()),
+        "coalesced": dict(_coalesced),
+        "latency": latency,
+    }
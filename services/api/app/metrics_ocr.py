@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+try:
+    from prometheus_client import Counter, Histogram  # type: ignore
+except Exception:  # pragma: no cover
+    # No-op fallbacks if prometheus_client is not installed
+    class _Noop:
+        def labels(self, *args, **kwargs):
+            return self
+        def inc(self, *args, **kwargs):
+            return None
+        def observe(self, *args, **kwargs):
+            return None
+
+    def Counter(*args, **kwargs):
+        return _Noop()
+    def Histogram(*args, **kwargs):
+        return _Noop()
+
+
+ocr_jobs = Counter(
+    "ocr_jobs_total",
+    "OCR queue jobs by outcome",
+    ["outcome"],  # ok | retry | dead
+)
+ocr_job_wait = Histogram(
+    "ocr_job_wait_seconds",
+    "Time an OCR job spent queued before a worker picked it up",
+    buckets=(0.05, 0.1, 0.5, 1, 2, 5, 10, 30, 60),
+)
+ocr_job_latency = Histogram(
+    "ocr_job_latency_seconds",
+    "OCR processing time per job attempt",
+    ["outcome"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+)
+
+_outcomes: dict[str, int] = {}
+
+
+def record_job(outcome: str, wait_seconds: float | None, latency_seconds: float) -> None:
+    ocr_jobs.labels(outcome=outcome).inc()
+    if wait_seconds is not None and wait_seconds >= 0:
+        ocr_job_wait.observe(wait_seconds)
+    ocr_job_latency.labels(outcome=outcome).observe(max(0.0, latency_seconds))
+    _outcomes[outcome] = _outcomes.get(outcome, 0) + 1
+
+
+def get_outcome_counts() -> dict[str, int]:
+    return dict(_outcomes)
+
+
+ocr_cache_lookups = Counter(
+    "ocr_cache_lookups_total",
+    "OCR result cache lookups",
+    ["result"],  # hit_db | hit_sidecar | miss | bypass
+)
+
+_cache: dict[str, int] = {"hit_db": 0, "hit_sidecar": 0, "miss": 0, "bypass": 0}
+
+
+def record_cache_lookup(result: str) -> None:
+    ocr_cache_lookups.labels(result=result).inc()
+    _cache[result] = _cache.get(result, 0) + 1
+
+
+def get_cache_stats() -> dict:
+    hits = _cache.get("hit_db", 0) + _cache.get("hit_sidecar", 0)
+    lookups = hits + _cache.get("miss", 0)
+    return {**_cache, "hit_ratio": round(hits / lookups, 4) if lookups else None}
@@ -3,9 +3,10 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import BigInteger, Date, DateTime, ForeignKey, Integer, Numeric, String, Text
+from sqlalchemy import BigInteger, Date, DateTime, ForeignKey, Index, Integer, Numeric, String, Text, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
+from .config import settings
 from .db import Base
 try:
     from pgvector.sqlalchemy import Vector  # type: ignore
@@ -68,6 +69,20 @@ class ExtractedField(Base):
     confidence: Mapped[float] = mapped_column(Numeric(5, 2))
 
 
+class OcrCacheEntry(Base):
+    """OCR output for identical bytes, reused across uploads, Fortnox and e-mail ingest."""
+
+    __tablename__ = "ocr_cache"
+    __table_args__ = (UniqueConstraint("digest", "provider", "preprocess_version", name="uq_ocr_cache_identity"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    digest: Mapped[str] = mapped_column(String(64))
+    provider: Mapped[str] = mapped_column(String(40))
+    preprocess_version: Mapped[str] = mapped_column(String(40))
+    result_json: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
 class Verification(Base):
     __tablename__ = "verifications"
 
@@ -96,6 +111,38 @@ class Entry(Base):
     dimension: Mapped[Optional[str]] = mapped_column(String(50))
 
 
+class VerificationExplanation(Base):
+    """Why a posting was suggested (AI auto-post): shown reason plus the decision behind it."""
+
+    __tablename__ = "verification_explanations"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    verification_id: Mapped[int] = mapped_column(ForeignKey("verifications.id"), unique=True, index=True)
+    reason: Mapped[str] = mapped_column(Text)
+    model: Mapped[Optional[str]] = mapped_column(String(80))  # feedback | embeddings model id | rules
+    confidence: Mapped[Optional[float]] = mapped_column(Numeric(5, 4))
+    features_json: Mapped[Optional[str]] = mapped_column(Text)  # JSON object of the inputs the decision used
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class OpenItem(Base):
+    """AR (1510) / AP (2440) open item, created by a posting and reduced by settlements."""
+
+    __tablename__ = "open_items"
+    __table_args__ = (Index("ix_open_items_org_counterparty_status", "org_id", "counterparty", "status"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    org_id: Mapped[int] = mapped_column(Integer)
+    verification_id: Mapped[int] = mapped_column(ForeignKey("verifications.id"), index=True)
+    type: Mapped[str] = mapped_column(String(2))  # ar|ap
+    counterparty: Mapped[Optional[str]] = mapped_column(String(200))
+    date: Mapped[datetime] = mapped_column(Date)
+    original_amount: Mapped[float] = mapped_column(Numeric(14, 2))
+    open_amount: Mapped[float] = mapped_column(Numeric(14, 2))
+    status: Mapped[str] = mapped_column(String(10), default="open")  # open|settled
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
 class ComplianceFlag(Base):
     __tablename__ = "compliance_flags"
 
@@ -128,11 +175,13 @@ class VendorEmbedding(Base):
     name: Mapped[str] = mapped_column(String(200), unique=True, index=True)
     # Use pgvector's Vector type if available; fall back to String to avoid import-time errors
     if Vector:
-        embedding = mapped_column(Vector(16))  # type: ignore[assignment]
+        embedding = mapped_column(Vector(settings.embedding_dim))  # type: ignore[assignment]
     else:  # pragma: no cover
         embedding: Mapped[str] = mapped_column(String(400))
     suggested_account: Mapped[str | None] = mapped_column(String(10))
     vat_rate: Mapped[float | None] = mapped_column(Numeric(5, 2))
+    # vendor_embeddings.model_id() that produced ``embedding``; NULL = rows from before it was tracked
+    embedding_model: Mapped[str | None] = mapped_column(String(80))
 
 
 class VatCode(Base):
@@ -146,6 +195,7 @@ class VatCode(Base):
 
 class BankTransaction(Base):
     __tablename__ = "bank_transactions"
+    __table_args__ = (Index("ix_bank_transactions_org_external_ref", "org_id", "external_ref"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     org_id: Mapped[int] = mapped_column(Integer, index=True, default=1)
@@ -155,6 +205,7 @@ class BankTransaction(Base):
     currency: Mapped[str] = mapped_column(String(3), default="SEK")
     description: Mapped[str] = mapped_column(String(500))
     counterparty_ref: Mapped[str | None] = mapped_column(String(200))
+    external_ref: Mapped[str | None] = mapped_column(String(100), nullable=True)  # provider id for synced rows
     matched_verification_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
@@ -193,6 +244,18 @@ class IntegrationToken(Base):
     expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
 
 
+class SyncCursor(Base):
+    __tablename__ = "sync_cursors"
+    __table_args__ = (UniqueConstraint("org_id", "provider", "resource", name="uq_sync_cursors_org_provider_resource"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    org_id: Mapped[int] = mapped_column(Integer)
+    provider: Mapped[str] = mapped_column(String(40))  # e.g., fortnox
+    resource: Mapped[str] = mapped_column(String(40))  # e.g., receipts, bank
+    cursor: Mapped[Optional[str]] = mapped_column(String(100))  # last modified timestamp seen
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
 class Customer(Base):
     __tablename__ = "customers"
 
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .metrics_ocr import record_cache_lookup
+from .models import OcrCacheEntry
+from .ocr import OcrResult, get_ocr_adapter, ocr_identity
+from .ocr_pdf import extract_document, page_identity
+
+
+def sidecar_path(original: Path) -> Path:
+    return original.parent / f"{original.stem}.ocr.json"
+
+
+def _read_sidecar(original: Optional[Path], provider: str, version: str) -> Optional[OcrResult]:
+    if original is None:
+        return None
+    side = sidecar_path(original)
+    try:
+        data = json.loads(side.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+    # Sidecars written before the cache carry no identity and can't be trusted for reuse
+    if data.get("provider") != provider or data.get("preprocess_version") != version:
+        return None
+    return OcrResult.from_dict(data)
+
+
+async def lookup(
+    session: AsyncSession, digest: str, original: Optional[Path] = None, identity: Optional[Tuple[str, str]] = None
+) -> Tuple[Optional[OcrResult], str]:
+    """Cached OCR for (digest, provider, preprocessing version): DB first, then the ``.ocr.json`` sidecar.
+
+    Returns (result, source) with source ``db``, ``sidecar`` or ``miss``; records hit/miss metrics.
+    """
+    provider, version = identity or ocr_identity()
+    stmt = select(OcrCacheEntry.result_json).where(
+        OcrCacheEntry.digest == digest, OcrCacheEntry.provider == provider, OcrCacheEntry.preprocess_version == version
+    )
+    raw = (await session.execute(stmt)).scalars().first()
+    if raw:
+        record_cache_lookup("hit_db")
+        return OcrResult.from_dict(json.loads(raw)), "db"
+    side = _read_sidecar(original, provider, version)
+    if side is not None:
+        record_cache_lookup("hit_sidecar")
+        return side, "sidecar"
+    record_cache_lookup("miss")
+    return None, "miss"
+
+
+async def store(session: AsyncSession, digest: str, result: OcrResult, identity: Optional[Tuple[str, str]] = None) -> None:
+    """Upsert the cache row in the caller's transaction (no commit)."""
+    provider, version = identity or ocr_identity()
+    row = (
+        await session.execute(
+            select(OcrCacheEntry).where(
+                OcrCacheEntry.digest == digest,
+                OcrCacheEntry.provider == provider,
+                OcrCacheEntry.preprocess_version == version,
+            )
+        )
+    ).scalars().first()
+    payload = result.to_json()
+    if row is None:
+        session.add(OcrCacheEntry(digest=digest, provider=provider, preprocess_version=version, result_json=payload))
+    elif row.result_json != payload:
+        row.result_json = payload
+
+
+class DbPageCache:
+    """Per-page OCR text for rasterized PDF pages, keyed by the page image digest (no commit)."""
+
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+        self.identity = page_identity()
+
+    async def get(self, digest: str) -> Optional[str]:
+        hit, _source = await lookup(self.session, digest, identity=self.identity)
+        return hit.text if hit is not None else None
+
+    async def put(self, digest: str, text: str) -> None:
+        await store(self.session, digest, OcrResult(text=text, boxes=[], extracted_fields=[]), identity=self.identity)
+
+
+async def cached_extract(
+    session: AsyncSession, image_bytes: bytes, *, original: Optional[Path] = None, force: bool = False
+) -> Tuple[OcrResult, str]:
+    """OCR ``image_bytes`` through the cache; ``force`` re-runs the adapter and refreshes the entry."""
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    if force:
+        record_cache_lookup("bypass")
+    else:
+        hit, source = await lookup(session, digest, original)
+        if hit is not None:
+            return hit, source
+    result = await extract_document(image_bytes, get_ocr_adapter(), DbPageCache(session))
+    await store(session, digest, result)
+    await session.commit()
+    return result, "ocr"
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import threading
+from io import BytesIO
+from typing import Any, List, Optional, Protocol, Tuple
+
+from .config import settings
+from .ocr import OcrAdapter, OcrBox, OcrResult, _extract_fields_from_text, text_identity
+from .ocr_pool import run_cpu
+
+
+# PDFs: take the embedded text layer where a page has one (exact and ~free); rasterize only the
+# pages without text and OCR those in parallel through the adapter (Tesseract -> process pool).
+# Pages are joined with form feeds and OcrResult.page_offsets records where each page starts.
+
+PAGE_SEPARATOR = "\f"
+# pdfium is not thread-safe; serialize calls when the OCR pool runs in threads (ocr_pool_workers=0)
+_pdfium_lock = threading.Lock()
+
+
+def is_pdf(data: bytes) -> bool:
+    return data[:1024].lstrip().startswith(b"%PDF")
+
+
+def _text_layer(pdf_bytes: bytes, max_pages: int) -> List[str]:
+    """Text layer of each page (empty string for scanned pages). Runs in the OCR pool."""
+    import pypdfium2 as pdfium  # type: ignore
+
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(pdf_bytes)
+        try:
+            texts: List[str] = []
+            for i in range(min(len(pdf), max_pages)):
+                page = pdf[i]
+                textpage = page.get_textpage()
+                texts.append(textpage.get_text_range().replace("\r\n", "\n").replace("\r", "\n"))
+                textpage.close()
+                page.close()
+            return texts
+        finally:
+            pdf.close()
+
+
+def _render_page(pdf_bytes: bytes, index: int, dpi: int) -> bytes:
+    """Rasterize one page to grayscale PNG at ``dpi``. Runs in the OCR pool."""
+    import pypdfium2 as pdfium  # type: ignore
+
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(pdf_bytes)
+        try:
+            page = pdf[index]
+            image = page.render(scale=dpi / 72.0, grayscale=True).to_pil()
+            page.close()
+        finally:
+            pdf.close()
+    buf = BytesIO()
+    image.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def has_text(text: str) -> bool:
+    return sum(1 for ch in text if ch.isalnum()) >= int(settings.ocr_pdf_min_text_chars)
+
+
+def page_identity() -> Tuple[str, str]:
+    """Cache identity for rasterized pages: the text identity plus the render DPI (pages cache text only)."""
+    provider, version = text_identity()
+    return provider, f"{version}+pdf{int(settings.ocr_pdf_dpi)}dpi"
+
+
+class PageCache(Protocol):
+    async def get(self, digest: str) -> Optional[str]: ...
+
+    async def put(self, digest: str, text: str) -> None: ...
+
+
+class RedisPageCache:
+    """Page OCR text in Redis, for the queue worker (which has no DB session)."""
+
+    def __init__(self, r: Any) -> None:
+        self.r = r
+        self.provider, self.version = page_identity()
+
+    def _key(self, digest: str) -> str:
+        return f"ocr:page:{self.provider}:{self.version}:{digest}"
+
+    async def get(self, digest: str) -> Optional[str]:
+        raw = await self.r.get(self._key(digest))
+        if not raw:
+            return None
+        return json.loads(raw.decode("utf-8") if isinstance(raw, bytes) else raw)["text"]
+
+    async def put(self, digest: str, text: str) -> None:
+        payload = json.dumps({"text": text}, ensure_ascii=False).encode("utf-8")
+        await self.r.set(self._key(digest), payload, ex=int(settings.ocr_pdf_page_cache_ttl_seconds))
+
+
+def merge_pages(texts: List[str]) -> Tuple[str, List[int]]:
+    offsets: List[int] = []
+    pos = 0
+    for t in texts:
+        offsets.append(pos)
+        pos += len(t) + len(PAGE_SEPARATOR)
+    return PAGE_SEPARATOR.join(texts), offsets
+
+
+async def extract_pdf(pdf_bytes: bytes, adapter: OcrAdapter, cache: Optional[PageCache] = None) -> OcrResult:
+    max_pages = int(settings.ocr_pdf_max_pages)
+    dpi = int(settings.ocr_pdf_dpi)
+    texts = await run_cpu(_text_layer, pdf_bytes, max_pages)
+
+    async def ocr_page(index: int) -> None:
+        png = await run_cpu(_render_page, pdf_bytes, index, dpi)
+        digest = hashlib.sha256(png).hexdigest()
+        cached = await cache.get(digest) if cache is not None else None
+        if cached is not None:
+            texts[index] = cached
+            return
+        result = await adapter.extract(png)
+        texts[index] = result.text
+        if cache is not None:
+            await cache.put(digest, result.text)
+
+    # Pages fan out across the pool; run_cpu admission bounds how many run at once
+    await asyncio.gather(*(ocr_page(i) for i, t in enumerate(texts) if not has_text(t)))
+    text, offsets = merge_pages([t.strip("\n") for t in texts])
+    boxes = [
+        OcrBox(0.1, 0.1, 0.3, 0.08, "Datum"),
+        OcrBox(0.1, 0.22, 0.5, 0.1, "Leverantör"),
+        OcrBox(0.6, 0.8, 0.3, 0.12, "Belopp"),
+    ]
+    return OcrResult(text=text, boxes=boxes, extracted_fields=_extract_fields_from_text(text), page_offsets=offsets)
+
+
+async def extract_document(data: bytes, adapter: OcrAdapter, cache: Optional[PageCache] = None) -> OcrResult:
+    """OCR an uploaded original: PDFs page by page, anything else as a single image."""
+    if is_pdf(data):
+        return await extract_pdf(data, adapter, cache)
+    return await adapter.extract(data)
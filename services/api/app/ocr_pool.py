@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional, TypeVar
+
+from .config import settings
+
+
+T = TypeVar("T")
+
+
+class OcrBusyError(RuntimeError):
+    """Raised when the OCR pool is saturated and admission timed out."""
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+# One admission semaphore per event loop (the API and the worker each run a single loop)
+_admission: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+_in_flight = 0
+
+
+def _init_worker(tesseract_cmd: Optional[str]) -> None:
+    # Pay the heavy imports once per process instead of on the first job. Each step stands alone:
+    # a missing optional module must not skip the others, least of all the tesseract_cmd setting.
+    try:
+        import cv2  # type: ignore  # noqa: F401
+        import numpy  # type: ignore  # noqa: F401
+        from PIL import Image  # type: ignore  # noqa: F401
+    except Exception:
+        pass
+    try:
+        import pypdfium2  # type: ignore  # noqa: F401
+    except Exception:
+        pass
+    if tesseract_cmd:
+        try:
+            import pytesseract  # type: ignore
+
+            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+        except Exception:
+            pass
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def get_pool() -> Optional[ProcessPoolExecutor]:
+    """Process pool shared by all OCR callers in this process; None when ``ocr_pool_workers`` is 0."""
+    global _pool
+    if int(settings.ocr_pool_workers) <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=int(settings.ocr_pool_workers),
+                # spawn: never fork a process that already runs an event loop and DB connections
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(settings.tesseract_cmd,),
+            )
+        return _pool
+
+
+async def warm_pool() -> None:
+    """Start every worker process up front so the first receipts don't pay interpreter startup."""
+    pool = get_pool()
+    if pool is None:
+        return
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(loop.run_in_executor(pool, _ping) for _ in range(int(settings.ocr_pool_workers))))
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    sem = _admission.get(loop)
+    if sem is None:
+        capacity = max(1, int(settings.ocr_pool_workers)) + max(0, int(settings.ocr_pool_max_pending))
+        sem = asyncio.Semaphore(capacity)
+        _admission[loop] = sem
+    return sem
+
+
+async def run_cpu(fn: Callable[..., T], *args: Any) -> T:
+    """Run a picklable, CPU-bound function in the OCR pool with bounded admission.
+
+    At most workers + ``ocr_pool_max_pending`` calls are admitted; further callers wait up to
+    ``ocr_pool_admission_timeout`` seconds and then get :class:`OcrBusyError`.
+    """
+    global _in_flight
+    sem = _semaphore()
+    try:
+        await asyncio.wait_for(sem.acquire(), timeout=float(settings.ocr_pool_admission_timeout))
+    except asyncio.TimeoutError as e:
+        raise OcrBusyError("OCR capacity exhausted, retry later") from e
+    _in_flight += 1
+    try:
+        pool = get_pool()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(pool, fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM on a huge scan); start a fresh pool for the next caller
+            shutdown_pool()
+            raise
+    finally:
+        _in_flight -= 1
+        sem.release()
+
+
+def pool_stats() -> dict:
+    workers = max(0, int(settings.ocr_pool_workers))
+    return {
+        "workers": workers,
+        "capacity": max(1, workers) + max(0, int(settings.ocr_pool_max_pending)),
+        "in_flight": _in_flight,
+        "started": _pool is not None,
+    }
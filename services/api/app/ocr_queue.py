@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import json
+import secrets
+import time
+from typing import Any, Dict, Optional
+
+from .config import settings
+from .ocr import OcrResult
+from .storage_backend import backend_for, is_trusted_ref
+
+
+# Jobs carry only a reference (digest + storage location); workers fetch the bytes themselves.
+# The queue is a stream read through a consumer group: a job stays pending until a worker ACKs it,
+# and jobs idle longer than ocr_visibility_timeout_seconds are reclaimed (XAUTOCLAIM) by another worker.
+STREAM_KEY = "ocr:jobs"
+GROUP = "ocr-workers"
+DEAD_LETTER_KEY = "ocr:dead"  # stream of jobs that exhausted ocr_max_attempts
+RETRY_KEY = "ocr:retry"  # sorted set: job JSON scored by the time it may run again
+DELIVERIES_KEY = "ocr:deliveries"  # hash: stream message id -> deliveries (detects crash loops)
+RESULT_PREFIX = "ocr:result:"  # ocr:result:{job_id} -> JSON result, expires after ocr_result_ttl_seconds
+DONE_PREFIX = "ocr:done:"  # ocr:done:{job_id} -> list pushed once on completion; waiters BLPOP it
+
+
+def result_key(job_id: str) -> str:
+    return f"{RESULT_PREFIX}{job_id}"
+
+
+def done_key(job_id: str) -> str:
+    return f"{DONE_PREFIX}{job_id}"
+
+
+def new_job(digest: str, storage_ref: str) -> Dict[str, Any]:
+    return {"id": f"job-{secrets.token_hex(8)}", "digest": digest, "ref": storage_ref, "enqueued_at": time.time(), "attempt": 1}
+
+
+async def ensure_group(r: Any) -> None:
+    try:
+        await r.xgroup_create(STREAM_KEY, GROUP, id="0", mkstream=True)
+    except Exception as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+async def add_job(r: Any, job: Dict[str, Any]) -> None:
+    await r.xadd(STREAM_KEY, {"job": json.dumps(job).encode("utf-8")})
+
+
+async def enqueue(r: Any, digest: str, storage_ref: str) -> str:
+    job = new_job(digest, storage_ref)
+    await ensure_group(r)
+    await add_job(r, job)
+    return str(job["id"])
+
+
+async def queue_depth(r: Any) -> int:
+    """Jobs not yet ACKed: waiting, in progress and scheduled for retry (ACKed entries are deleted)."""
+    return int(await r.xlen(STREAM_KEY)) + int(await r.zcard(RETRY_KEY))
+
+
+async def publish_result(r: Any, job_id: str, result: Dict[str, Any]) -> None:
+    """Store the result under its own key with a TTL, then wake any waiter."""
+    ttl = int(settings.ocr_result_ttl_seconds)
+    pipe = r.pipeline()
+    pipe.set(result_key(job_id), json.dumps(result, ensure_ascii=False).encode("utf-8"), ex=ttl)
+    pipe.rpush(done_key(job_id), b"1")
+    pipe.expire(done_key(job_id), ttl)
+    await pipe.execute()
+
+
+async def get_result(r: Any, job_id: str) -> Optional[Dict[str, Any]]:
+    raw = await r.get(result_key(job_id))
+    if not raw:
+        return None
+    return json.loads(raw.decode("utf-8") if isinstance(raw, bytes) else raw)
+
+
+async def wait_for_result(r: Any, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+    """Block (without polling) until the job completes or ``timeout`` seconds pass."""
+    result = await get_result(r, job_id)
+    if result is not None:
+        return result
+    if not await r.blpop(done_key(job_id), timeout=max(0.01, float(timeout))):
+        return None
+    return await get_result(r, job_id)
+
+
+def result_to_ocr(result: Dict[str, Any]) -> OcrResult:
+    return OcrResult.from_dict(result)
+
+
+def read_document_bytes(storage_ref: str) -> bytes:
+    """Fetch original bytes for a storage reference in our WORM store or storage bucket.
+
+    Refs come from queue payloads, so anything outside our own storage is refused.
+    """
+    if not is_trusted_ref(storage_ref):
+        raise ValueError("untrusted storage reference")
+    return backend_for(storage_ref).read(storage_ref)
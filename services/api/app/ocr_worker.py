@@ -1,57 +1,196 @@
 from __future__ import annotations
 
 import asyncio
+import contextlib
 import json
 import os
+import socket
+import time
 from dataclasses import asdict
+from typing import Any, Dict, Optional, Tuple
 
 import redis.asyncio as redis  # type: ignore
 
 from .config import settings
-from .ocr import get_ocr_adapter
+from .metrics_ocr import record_job
+from .ocr import OcrAdapter, get_ocr_adapter, ocr_identity
+from .ocr_pdf import RedisPageCache, extract_document
+from .ocr_pool import shutdown_pool, warm_pool
+from .ocr_queue import (
+    DEAD_LETTER_KEY,
+    DELIVERIES_KEY,
+    GROUP,
+    RETRY_KEY,
+    STREAM_KEY,
+    add_job,
+    ensure_group,
+    publish_result,
+    read_document_bytes,
+)
 
 
-QUEUE_KEY = "ocr:queue"
-RESULTS_KEY = "ocr:results"
+Message = Tuple[str, Dict[Any, Any]]
+
+
+def consumer_name(idx: int) -> str:
+    # Unique per container and consumer task so the group can spread jobs across replicas
+    return f"{socket.gethostname()}-{os.getpid()}-{idx}"
+
+
+def _s(v: Any) -> str:
+    return v.decode("utf-8") if isinstance(v, bytes) else str(v)
+
+
+async def _promote_due_retries(r: Any) -> None:
+    due = await r.zrangebyscore(RETRY_KEY, 0, time.time(), start=0, num=10)
+    for raw in due:
+        # ZREM is the claim: only the worker that removes the entry re-queues it
+        if await r.zrem(RETRY_KEY, raw):
+            await add_job(r, json.loads(_s(raw)))
+
+
+async def next_message(r: Any, consumer: str, block_ms: int = 5000) -> Optional[Message]:
+    """Reclaim a job abandoned by a crashed/stalled worker, else read a new one."""
+    await _promote_due_retries(r)
+    idle_ms = int(float(settings.ocr_visibility_timeout_seconds) * 1000)
+    claimed = await r.xautoclaim(STREAM_KEY, GROUP, consumer, min_idle_time=idle_ms, start_id="0-0", count=1)
+    for msg_id, fields in (claimed[1] if claimed else []):
+        if fields:  # deleted entries come back as None
+            return _s(msg_id), fields
+    resp = await r.xreadgroup(GROUP, consumer, {STREAM_KEY: ">"}, count=1, block=block_ms)
+    for _stream, messages in resp or []:
+        for msg_id, fields in messages:
+            return _s(msg_id), fields
+    return None
+
+
+async def _keepalive(r: Any, consumer: str, msg_id: str) -> None:
+    # Re-claiming our own message resets its idle time so long OCR runs aren't handed to another worker
+    interval = max(0.5, float(settings.ocr_visibility_timeout_seconds) / 3)
+    while True:
+        await asyncio.sleep(interval)
+        await r.xclaim(STREAM_KEY, GROUP, consumer, min_idle_time=0, message_ids=[msg_id], justid=True)
+
+
+async def _finish(r: Any, msg_id: str) -> None:
+    pipe = r.pipeline()
+    pipe.xack(STREAM_KEY, GROUP, msg_id)
+    pipe.xdel(STREAM_KEY, msg_id)
+    pipe.hdel(DELIVERIES_KEY, msg_id)
+    await pipe.execute()
+
+
+async def handle_message(r: Any, adapter: OcrAdapter, tracer: Any, consumer: str, msg: Message) -> str:
+    """Process one delivery and ACK it. Returns the outcome: ok | retry | dead.
+
+    Failures are re-scheduled with exponential backoff until ``ocr_max_attempts``; deliveries that
+    never finished (worker crash) count as attempts too, so a poison job can't loop forever.
+    """
+    msg_id, fields = msg
+    job = json.loads(_s(fields.get(b"job") or fields.get("job")))
+    job_id = job["id"]
+    deliveries = int(await r.hincrby(DELIVERIES_KEY, msg_id, 1))
+    attempt = int(job.get("attempt") or 1) + deliveries - 1
+    enqueued_at = job.get("enqueued_at")
+    wait = (time.time() - float(enqueued_at)) if enqueued_at else None
+    t0 = time.perf_counter()
+    error: Optional[str] = None
+    result = None
+    if attempt > int(settings.ocr_max_attempts):
+        error = "worker did not complete the job"
+    else:
+        keepalive = asyncio.create_task(_keepalive(r, consumer, msg_id))
+        try:
+            image_bytes = await asyncio.to_thread(read_document_bytes, job["ref"])
+            with tracer.start_as_current_span("ocr.job") as span:  # type: ignore[call-arg]
+                span.set_attribute("ocr.job_id", job_id)
+                span.set_attribute("ocr.attempt", attempt)
+                result = await extract_document(image_bytes, adapter, RedisPageCache(r))
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        finally:
+            keepalive.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await keepalive
+    latency = time.perf_counter() - t0
+
+    if result is not None:
+        provider, version = ocr_identity()
+        await publish_result(r, job_id, {
+            "digest": job.get("digest"),
+            "provider": provider,
+            "preprocess_version": version,
+            "text": result.text,
+            "boxes": [asdict(b) for b in result.boxes],
+            "extracted_fields": result.extracted_fields,
+            "page_offsets": result.page_offsets,
+        })
+        outcome = "ok"
+    elif attempt < int(settings.ocr_max_attempts):
+        backoff = float(settings.ocr_retry_backoff_seconds) * (2 ** (attempt - 1))
+        await r.zadd(RETRY_KEY, {json.dumps({**job, "attempt": attempt + 1}): time.time() + backoff})
+        outcome = "retry"
+    else:
+        await r.xadd(DEAD_LETTER_KEY, {
+            "job": json.dumps(job),
+            "error": (error or "")[:500],
+            "attempts": str(attempt),
+            "failed_at": str(time.time()),
+        })
+        await publish_result(r, job_id, {"digest": job.get("digest"), "error": error})
+        outcome = "dead"
+    await _finish(r, msg_id)
+    record_job(outcome, wait, latency)
+    return outcome
+
+
+async def _consume(r: Any, adapter: OcrAdapter, tracer: Any, consumer: str) -> None:
+    while True:
+        try:
+            msg = await next_message(r, consumer)
+            if msg is None:
+                continue
+            await handle_message(r, adapter, tracer, consumer, msg)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Redis hiccup: unACKed jobs stay pending and are reclaimed after the visibility timeout
+            await asyncio.sleep(0.5)
 
 
 async def worker_loop() -> None:
+    """Run ``ocr_worker_concurrency`` consumers sharing one adapter and the OCR process pool.
+
+    All containers join the same consumer group, so scaling out is just starting more workers.
+    While a consumer awaits the pool, the others keep pulling jobs; pool admission provides
+    backpressure when consumers outnumber pool workers.
+    """
     if not settings.ocr_queue_url:
         raise RuntimeError("OCR queue URL not configured")
     r = redis.from_url(settings.ocr_queue_url, decode_responses=False)
+    await ensure_group(r)
     adapter = get_ocr_adapter()
-    import time
     from opentelemetry import trace  # type: ignore
     tracer = trace.get_tracer("bertil.ocr.worker")
-    p95_window: list[float] = []
-    while True:
+    if settings.ocr_worker_metrics_port:
         try:
-            # BLPOP returns list [key, value]
-            item = await r.blpop(QUEUE_KEY, timeout=5)
-            if not item:
-                await asyncio.sleep(0.1)
-                continue
-            _key, payload = item
-            job = json.loads(payload.decode("utf-8"))
-            job_id = job["id"]
-            image_bytes = bytes.fromhex(job["hex"])  # image passed as hex
-            t0 = time.perf_counter()
-            with tracer.start_as_current_span("ocr.job"):
-                result = await adapter.extract(image_bytes)
-            dt = time.perf_counter() - t0
-            p95_window.append(dt)
-            if len(p95_window) > 100:
-                p95_window.pop(0)
-            await r.hset(RESULTS_KEY, job_id, json.dumps({
-                "text": result.text,
-                "boxes": [asdict(b) for b in result.boxes],
-                "extracted_fields": result.extracted_fields,
-            }, ensure_ascii=False).encode("utf-8"))
+            from prometheus_client import start_http_server  # type: ignore
+            start_http_server(int(settings.ocr_worker_metrics_port))
         except Exception:
-            await asyncio.sleep(0.5)
+            pass
+    if (settings.ocr_provider or "").lower() == "tesseract":
+        await warm_pool()
+    consumers = [
+        asyncio.create_task(_consume(r, adapter, tracer, consumer_name(i)))
+        for i in range(max(1, int(settings.ocr_worker_concurrency)))
+    ]
+    try:
+        await asyncio.gather(*consumers)
+    finally:
+        for c in consumers:
+            c.cancel()
+        shutdown_pool()
 
 
 if __name__ == "__main__":  # pragma: no cover
     asyncio.run(worker_loop())
-
-
@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Entry, OpenItem, Verification
+
+
+# Subledger accounts: AR = 1510*, AP = 2440*
+AR_ACCOUNT_PREFIX = "1510"
+AP_ACCOUNT_PREFIX = "2440"
+_EPS = 0.005
+
+# (label, min_days, max_days) by age of the originating posting; max None = open ended
+AGING_BUCKETS: tuple[tuple[str, int, Optional[int]], ...] = (
+    ("0-30", 0, 30),
+    ("31-60", 31, 60),
+    ("61-90", 61, 90),
+    ("90+", 91, None),
+)
+
+
+def net_postings(entries: Iterable[Any]) -> dict[str, float]:
+    """Net AR/AP movement of a set of entries (Entry rows or EntryIn payloads).
+
+    AR is debit - credit on 1510, AP is credit - debit on 2440; positive means a new open amount.
+    """
+    ar = 0.0
+    ap = 0.0
+    for e in entries:
+        acc = str(e.account)
+        debit = float(e.debit or 0.0)
+        credit = float(e.credit or 0.0)
+        if acc.startswith(AR_ACCOUNT_PREFIX):
+            ar += debit - credit
+        if acc.startswith(AP_ACCOUNT_PREFIX):
+            ap += credit - debit
+    return {"ar": round(ar, 2), "ap": round(ap, 2)}
+
+
+def aging_bucket(item_date: date, today: Optional[date] = None) -> str:
+    age = ((today or date.today()) - item_date).days
+    for label, lo, hi in AGING_BUCKETS:
+        if age >= lo and (hi is None or age <= hi):
+            return label
+    return AGING_BUCKETS[0][0]  # future-dated items count as current
+
+
+async def apply_postings(
+    session: AsyncSession,
+    v: Verification,
+    entries: Iterable[Any],
+    *,
+    settles_verification_id: Optional[int] = None,
+) -> None:
+    """Maintain the subledger for a freshly staged verification (same transaction, no commit).
+
+    A positive net on 1510/2440 opens an item; a negative net settles the targeted verification's
+    item first and then the counterparty's oldest open items (FIFO). Overpayments beyond the open
+    items are left unallocated.
+    """
+    for typ, net in net_postings(entries).items():
+        if net > _EPS:
+            session.add(
+                OpenItem(
+                    org_id=v.org_id,
+                    verification_id=v.id,
+                    type=typ,
+                    counterparty=v.counterparty,
+                    date=v.date,
+                    original_amount=net,
+                    open_amount=net,
+                    status="open",
+                    updated_at=datetime.utcnow(),
+                )
+            )
+        elif net < -_EPS:
+            await _reduce(session, int(v.org_id), typ, v.counterparty, -net, settles_verification_id)
+
+
+async def _reduce(
+    session: AsyncSession, org_id: int, typ: str, counterparty: Optional[str], amount: float, target: Optional[int]
+) -> None:
+    base = select(OpenItem).where(OpenItem.org_id == org_id, OpenItem.type == typ, OpenItem.status == "open")
+    candidates: list[OpenItem] = []
+    if target:
+        candidates.extend((await session.execute(base.where(OpenItem.verification_id == target))).scalars().all())
+    cp_cond = OpenItem.counterparty == counterparty if counterparty is not None else OpenItem.counterparty.is_(None)
+    fifo = base.where(cp_cond).order_by(OpenItem.date, OpenItem.id)
+    seen = {it.id for it in candidates}
+    candidates.extend(it for it in (await session.execute(fifo)).scalars().all() if it.id not in seen)
+    remaining = round(amount, 2)
+    now = datetime.utcnow()
+    for item in candidates:
+        if remaining <= _EPS:
+            break
+        take = min(remaining, float(item.open_amount))
+        left = round(float(item.open_amount) - take, 2)
+        item.open_amount = left if left > _EPS else 0.0
+        item.status = "open" if left > _EPS else "settled"
+        item.updated_at = now
+        remaining = round(remaining - take, 2)
+
+
+async def open_amounts_for(session: AsyncSession, ver_ids: Iterable[int]) -> dict[int, tuple[str, float]]:
+    """Open (type, amount) per verification, read from the subledger. AR wins if both exist."""
+    ids = {int(x) for x in ver_ids}
+    if not ids:
+        return {}
+    stmt = select(OpenItem.verification_id, OpenItem.type, OpenItem.open_amount).where(
+        OpenItem.verification_id.in_(ids), OpenItem.status == "open"
+    )
+    out: dict[int, tuple[str, float]] = {}
+    for vid, typ, amt in (await session.execute(stmt)).all():
+        if int(vid) in out and out[int(vid)][0] == "ar":
+            continue
+        out[int(vid)] = (str(typ), round(float(amt or 0.0), 2))
+    return out
+
+
+def _bucket_columns(today: date) -> list[Any]:
+    cols = []
+    for label, lo, hi in AGING_BUCKETS:
+        newest = today - timedelta(days=lo)
+        cond = OpenItem.date <= newest if lo > 0 else OpenItem.date.is_not(None)
+        if hi is not None:
+            cond = cond & (OpenItem.date >= today - timedelta(days=hi))
+        cols.append(func.sum(case((cond, OpenItem.open_amount), else_=0)).label(label))
+    return cols
+
+
+async def summarize_open_items(
+    session: AsyncSession,
+    org_id: Optional[int] = None,
+    *,
+    type: Optional[str] = None,
+    counterparty: Optional[str] = None,
+    min_amount: float = 0.01,
+    limit: int = 100,
+    today: Optional[date] = None,
+) -> list[dict]:
+    """Open amount and aging buckets per (counterparty, type), largest first."""
+    today = today or date.today()
+    total = func.sum(OpenItem.open_amount)
+    stmt = (
+        select(OpenItem.counterparty, OpenItem.type, total, func.count(OpenItem.id), *_bucket_columns(today))
+        .where(OpenItem.status == "open")
+        .group_by(OpenItem.counterparty, OpenItem.type)
+        .having(total >= min_amount)
+        .order_by(total.desc())
+        .limit(limit)
+    )
+    if org_id is not None:
+        stmt = stmt.where(OpenItem.org_id == org_id)
+    if type in ("ar", "ap"):
+        stmt = stmt.where(OpenItem.type == type)
+    if counterparty:
+        stmt = stmt.where(OpenItem.counterparty.ilike(f"%{counterparty}%"))
+    out: list[dict] = []
+    for row in (await session.execute(stmt)).all():
+        cp, typ, amt, cnt = row[0], row[1], row[2], row[3]
+        buckets = {label: round(float(row[4 + i] or 0.0), 2) for i, (label, _lo, _hi) in enumerate(AGING_BUCKETS)}
+        out.append(
+            {"counterparty": cp, "type": typ, "open_amount": round(float(amt or 0.0), 2), "items": int(cnt), "aging": buckets}
+        )
+    return out
+
+
+async def aging_totals(session: AsyncSession, org_id: int, type: str, today: Optional[date] = None) -> dict:
+    """Total open amount, item count and aging buckets for one org and subledger type."""
+    today = today or date.today()
+    stmt = select(func.sum(OpenItem.open_amount), func.count(OpenItem.id), *_bucket_columns(today)).where(
+        OpenItem.org_id == org_id, OpenItem.type == type, OpenItem.status == "open"
+    )
+    row = (await session.execute(stmt)).one()
+    return {
+        "count": int(row[1] or 0),
+        "amount": round(float(row[0] or 0.0), 2),
+        "aging": {label: round(float(row[2 + i] or 0.0), 2) for i, (label, _lo, _hi) in enumerate(AGING_BUCKETS)},
+    }
+
+
+async def rebuild_open_items(session: AsyncSession, org_id: Optional[int] = None) -> int:
+    """Recreate the subledger from the ledger (backfill/repair). Returns the number of open items."""
+    clear = delete(OpenItem)
+    if org_id is not None:
+        clear = clear.where(OpenItem.org_id == org_id)
+    await session.execute(clear)
+    touched = (
+        select(Entry.verification_id)
+        .where(Entry.account.like(f"{AR_ACCOUNT_PREFIX}%") | Entry.account.like(f"{AP_ACCOUNT_PREFIX}%"))
+        .distinct()
+    )
+    vstmt = select(Verification).where(Verification.id.in_(touched)).order_by(Verification.date, Verification.id)
+    if org_id is not None:
+        vstmt = vstmt.where(Verification.org_id == org_id)
+    verifs = (await session.execute(vstmt)).scalars().all()
+    by_ver: dict[int, list[Entry]] = {}
+    if verifs:
+        ents = (await session.execute(select(Entry).where(Entry.verification_id.in_([v.id for v in verifs])))).scalars().all()
+        for e in ents:
+            by_ver.setdefault(int(e.verification_id), []).append(e)
+    for v in verifs:
+        await apply_postings(session, v, by_ver.get(int(v.id), []))
+        await session.flush()
+    cnt_stmt = select(func.count(OpenItem.id)).where(OpenItem.status == "open")
+    if org_id is not None:
+        cnt_stmt = cnt_stmt.where(OpenItem.org_id == org_id)
+    return int((await session.execute(cnt_stmt)).scalar_one() or 0)
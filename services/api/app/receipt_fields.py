@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Pattern, Tuple
+
+from .config import settings
+
+
+# Field extraction from OCR text, driven by the pattern tables in kb/swedish_receipt_patterns.json.
+# The tables are compiled once per process; extraction is a single pass over the lines, scoring
+# each one (label weight x position) instead of taking the largest amount on the receipt.
+
+logger = logging.getLogger(__name__)
+
+_REPO_ROOT = Path(__file__).resolve().parents[3]
+# Bump when the extraction logic changes; cached OCR results carry fields from the old one
+EXTRACTOR_VERSION = 1
+
+
+def _alternation(labels: List[str]) -> str:
+    # Longest first so "kvitto nr" wins over "kvitto"
+    return "|".join(re.escape(lbl) for lbl in sorted(labels, key=len, reverse=True))
+
+
+def _labels(labels: List[str]) -> Optional[Pattern[str]]:
+    return re.compile(rf"(?<!\w)(?:{_alternation(labels)})(?!\w)", re.IGNORECASE) if labels else None
+
+
+@dataclass(frozen=True)
+class PatternBank:
+    version: int
+    currency: Pattern[str]
+    whole_krona: Pattern[str]
+    amount: Pattern[str]
+    date_numeric: Pattern[str]
+    date_text: Pattern[str]
+    months: Dict[str, str]
+    total_label: Optional[Pattern[str]]
+    total_weights: Dict[str, float]
+    total_exclusion: Optional[Pattern[str]]
+    vat_label: Optional[Pattern[str]]
+    vat_inclusive: Optional[Pattern[str]]
+    vat_rate: Pattern[str]
+    org_label: Optional[Pattern[str]]
+    org_number: Pattern[str]
+    vat_number: Pattern[str]
+    receipt_number: Optional[Pattern[str]]
+
+    @classmethod
+    def from_dict(cls, p: dict) -> "PatternBank":
+        months = {k.lower(): v for k, v in (p.get("months") or {}).items()}
+        weights = {k.lower(): float(v) for k, v in (p.get("total_labels") or {}).items()}
+        receipt_labels = p.get("receipt_number_labels") or []
+        receipt_value = p.get("receipt_number") or r"[\s:#.]*([A-Za-z0-9][A-Za-z0-9/-]{0,29})"
+        return cls(
+            version=int(p.get("version", 0)),
+            currency=re.compile(_alternation(p.get("currency_markers") or [" kr"])),
+            whole_krona=re.compile(rf"(?<=\d)(?:{_alternation(p.get('whole_krona_markers') or [':-'])})"),
+            amount=re.compile(p.get("amount") or r"\b\d{1,3}(?:[ .]\d{3})*[.,]\d{2}\b|\b\d+[.,]\d{2}\b"),
+            date_numeric=re.compile(p.get("date_numeric") or r"(\d{4})[-./](\d{2})[-./](\d{2})|(\d{2})[-./](\d{2})[-./](\d{4})"),
+            date_text=re.compile(rf"(?<!\d)(\d{{1,2}})\.?\s+({_alternation(list(months) or ['jan'])})\.?\s+(\d{{4}})(?!\d)", re.IGNORECASE),
+            months=months,
+            total_label=_labels(list(weights)),
+            total_weights=weights,
+            total_exclusion=_labels(p.get("total_exclusions") or []),
+            vat_label=_labels(p.get("vat_labels") or []),
+            vat_inclusive=_labels(p.get("vat_inclusive_markers") or []),
+            vat_rate=re.compile(p.get("vat_rate") or r"(?<![\d.,])(25|12|6)\s?%"),
+            org_label=_labels(p.get("org_number_labels") or []),
+            org_number=re.compile(p.get("org_number") or r"(?<![\d-])(\d{6})[- ]?(\d{4})(?![\d-])"),
+            vat_number=re.compile(p.get("vat_number") or r"\bSE\s?(\d{10})\s?01\b", re.IGNORECASE),
+            receipt_number=(
+                re.compile(rf"(?<!\w)(?:{_alternation(receipt_labels)})(?!\w){receipt_value}", re.IGNORECASE)
+                if receipt_labels else None
+            ),
+        )
+
+
+def _patterns_path() -> Path:
+    path = Path(settings.receipt_patterns_path)
+    if not path.is_absolute() and not path.exists():
+        path = _REPO_ROOT / path
+    return path
+
+
+def fields_version() -> str:
+    """Version of the extracted fields: extractor revision plus a digest of the pattern tables.
+
+    Keyed on the file's mtime and size, so an edited tables file changes the version without a restart.
+    """
+    path = _patterns_path()
+    try:
+        st = path.stat()
+        return _fields_version(str(path), st.st_mtime_ns, st.st_size)
+    except OSError:
+        return _fields_version(str(path), 0, 0)
+
+
+@lru_cache(maxsize=8)
+def _fields_version(path: str, _mtime_ns: int, _size: int) -> str:
+    try:
+        tables = Path(path).read_bytes()
+    except OSError:
+        tables = b""
+    return f"f{EXTRACTOR_VERSION}-{hashlib.sha256(tables).hexdigest()[:8]}"
+
+
+@lru_cache(maxsize=1)
+def get_patterns() -> PatternBank:
+    """The compiled pattern bank. Loaded on first use; ``get_patterns.cache_clear()`` reloads it."""
+    path = _patterns_path()
+    try:
+        tables = json.loads(path.read_text(encoding="utf-8")).get("patterns") or {}
+    except (OSError, ValueError):
+        # Without the KB tables there are no labels to score: totals fall back to the largest amount
+        logger.warning("receipt pattern tables not found at %s; using built-in regexes only", path)
+        tables = {}
+    return PatternBank.from_dict(tables)
+
+
+def _amount(raw: str) -> Optional[float]:
+    # 1 234,56 / 1.234,56 / 1234,56 / 1234.56
+    if "," in raw and "." in raw:
+        raw = raw.replace(".", "")
+    try:
+        return float(raw.replace(" ", "").replace(",", "."))
+    except ValueError:
+        return None
+
+
+def _luhn_ok(digits: str) -> bool:
+    total = 0
+    for i, ch in enumerate(digits):
+        n = int(ch) * (2 if i % 2 == 0 else 1)
+        total += n - 9 if n > 9 else n
+    return total % 10 == 0
+
+
+def _date(bank: PatternBank, line: str) -> Optional[str]:
+    m = bank.date_numeric.search(line)
+    if m:
+        g = m.groups()
+        y, mo, d = (g[0], g[1], g[2]) if g[0] else (g[5], g[4], g[3])
+        if 1 <= int(mo) <= 12 and 1 <= int(d) <= 31:
+            return f"{y}-{mo}-{d}"
+    m = bank.date_text.search(line)
+    if m:
+        d, mon, y = m.groups()
+        month = bank.months.get(mon.lower())
+        if month and 1 <= int(d) <= 31:
+            return f"{y}-{month}-{int(d):02d}"
+    return None
+
+
+def extract_fields(text: str, bank: Optional[PatternBank] = None) -> List[Tuple[str, str, float]]:
+    """Extract (key, value, confidence) fields from receipt/invoice OCR text.
+
+    Keys: ``date``, ``total``, ``vendor``, ``vat_amount`` (sum over rates), ``vat_amount_<rate>``
+    and ``vat_rate`` (when a single rate is present), ``org_number`` and ``receipt_number``.
+    Multi-page text ("\\f"-separated) takes the total from the last page that has one.
+    """
+    bank = bank or get_patterns()
+    # "245:-" is 245,00 kr; other currency markers are dropped
+    norm = bank.currency.sub("", bank.whole_krona.sub(",00", text))
+
+    date_val: Optional[str] = None
+    vendor_val: Optional[str] = None
+    org: Optional[Tuple[str, float]] = None
+    receipt_no: Optional[str] = None
+    vat_by_rate: Dict[int, float] = {}
+    vat_unrated: Optional[float] = None
+    # Per page: best labelled total (weight, line index, amount) and the largest unlabelled amount
+    page_totals: List[Tuple[Optional[Tuple[float, int, float]], Optional[float]]] = []
+
+    for page in norm.split("\f"):
+        labelled: Optional[Tuple[float, int, float]] = None
+        largest: Optional[float] = None
+        for idx, raw_line in enumerate(page.splitlines()):
+            line = raw_line.strip()
+            if not line:
+                continue
+            if vendor_val is None and (not any(ch.isdigit() for ch in line) or len(line.split()) >= 2):
+                vendor_val = line[:100]
+            if date_val is None:
+                date_val = _date(bank, line)
+
+            if org is None or org[1] < 0.95:
+                found: Optional[Tuple[str, float]] = None
+                m = bank.vat_number.search(line)
+                if m and _luhn_ok(m.group(1)):
+                    found = (f"{m.group(1)[:6]}-{m.group(1)[6:]}", 0.9)
+                elif bank.org_label is not None and bank.org_label.search(line):
+                    m = bank.org_number.search(line)
+                    if m:
+                        found = (f"{m.group(1)}-{m.group(2)}", 0.95 if _luhn_ok(m.group(1) + m.group(2)) else 0.6)
+                if found and (org is None or found[1] > org[1]):
+                    org = found
+            if receipt_no is None and bank.receipt_number is not None:
+                m = bank.receipt_number.search(line)
+                if m and any(ch.isdigit() for ch in m.group(1)) and not bank.date_numeric.fullmatch(m.group(1)):
+                    receipt_no = m.group(1)
+
+            amounts = [a for a in (_amount(x) for x in bank.amount.findall(line)) if a is not None]
+            if not amounts:
+                continue
+            lowered = line.lower()
+            # Subtotals, net amounts, cash tendered and change are neither totals nor VAT
+            if bank.total_exclusion is not None and bank.total_exclusion.search(lowered):
+                continue
+            is_vat = bank.vat_label is not None and bank.vat_label.search(lowered) is not None
+            if is_vat and not (bank.vat_inclusive is not None and bank.vat_inclusive.search(lowered)):
+                # "Moms 25% 20,00 80,00 100,00": the first amount after the rate is the VAT
+                rate = bank.vat_rate.search(line)
+                if rate:
+                    after = [a for a in (_amount(x) for x in bank.amount.findall(line[rate.end():])) if a is not None]
+                    if after:
+                        key = int(rate.group(1))
+                        vat_by_rate[key] = vat_by_rate.get(key, 0.0) + after[0]
+                elif vat_unrated is None:
+                    vat_unrated = amounts[-1]
+                continue
+            weight = 0.0
+            if bank.total_label is not None:
+                for m in bank.total_label.finditer(lowered):
+                    weight = max(weight, bank.total_weights.get(m.group(0).lower(), 0.0))
+            if weight > 0:
+                # The amount sits to the right of its label; ties go to the later line
+                candidate = (weight, idx, amounts[-1])
+                if labelled is None or candidate[:2] >= labelled[:2]:
+                    labelled = candidate
+            else:
+                largest = max(amounts) if largest is None else max(largest, *amounts)
+        page_totals.append((labelled, largest))
+
+    total_val: Optional[Tuple[str, float]] = None
+    for labelled, largest in reversed(page_totals):
+        if labelled is not None:
+            total_val = (f"{labelled[2]:.2f}", 0.9 + 0.05 * labelled[0])
+            break
+        if largest is not None:
+            total_val = (f"{largest:.2f}", 0.9)
+            break
+
+    fields: List[Tuple[str, str, float]] = []
+    if date_val:
+        fields.append(("date", date_val, 0.88))
+    if total_val:
+        fields.append(("total", total_val[0], round(total_val[1], 2)))
+    if vendor_val:
+        fields.append(("vendor", vendor_val, 0.75))
+    if vat_by_rate:
+        fields.append(("vat_amount", f"{sum(vat_by_rate.values()):.2f}", 0.85))
+        for rate, amount in sorted(vat_by_rate.items(), reverse=True):
+            fields.append((f"vat_amount_{rate}", f"{amount:.2f}", 0.85))
+        if len(vat_by_rate) == 1:
+            fields.append(("vat_rate", str(next(iter(vat_by_rate))), 0.85))
+    elif vat_unrated is not None:
+        fields.append(("vat_amount", f"{vat_unrated:.2f}", 0.7))
+    if org:
+        fields.append(("org_number", org[0], org[1]))
+    if receipt_no:
+        fields.append(("receipt_number", receipt_no, 0.7))
+    return fields
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .config import settings
+
+
+# Thumbnails are rendered once per document and stored next to the original as
+# {digest}.r{size}.{ext}. They're immutable, so the ETag is derived from the name alone.
+RENDITION_VERSION = "1"
+FORMATS: Dict[str, Tuple[str, str]] = {"webp": ("WEBP", "image/webp"), "jpeg": ("JPEG", "image/jpeg")}
+
+
+def sizes() -> List[int]:
+    return sorted({int(s) for s in str(settings.thumbnail_sizes).split(",") if s.strip()})
+
+
+def pick_size(requested: Optional[int]) -> int:
+    """Smallest configured size covering ``requested`` (the largest if none does)."""
+    available = sizes()
+    if not requested:
+        return 320 if 320 in available else available[0]
+    for s in available:
+        if s >= requested:
+            return s
+    return available[-1]
+
+
+def rendition_path(store_dir: Path, digest: str, size: int, fmt: str) -> Path:
+    return store_dir / f"{digest}.r{size}.{fmt}"
+
+
+def etag(digest: str, size: int, fmt: str) -> str:
+    return f'"{digest}-{size}-{fmt}-v{RENDITION_VERSION}"'
+
+
+def etag_matches(if_none_match: Optional[str], tag: str) -> bool:
+    """RFC 9110 weak comparison for If-None-Match (lists and ``*`` included)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        c = candidate.strip()
+        if c == "*" or c.removeprefix("W/") == tag:
+            return True
+    return False
+
+
+def missing(store_dir: Path, digest: str) -> List[Tuple[int, str]]:
+    return [(s, f) for s in sizes() for f in FORMATS if not rendition_path(store_dir, digest, s, f).exists()]
+
+
+def generate(store_dir: Path, digest: str, source_bytes: bytes, force: bool = False) -> List[Path]:
+    """Decode the original once and write every missing rendition, largest first so each size is
+    downscaled from the previous one. Blocking; run it in an executor."""
+    from PIL import Image  # type: ignore
+
+    wanted = sizes() if force else sorted({s for s, _f in missing(store_dir, digest)})
+    if not wanted:
+        return []
+    store_dir.mkdir(parents=True, exist_ok=True)
+    written: List[Path] = []
+    with Image.open(BytesIO(source_bytes)) as src:
+        largest = max(wanted)
+        # JPEG: let the decoder scale down by 1/2..1/8 while decoding
+        src.draft("RGB", (largest, largest))
+        img = src.convert("RGB")
+    for size in sorted(wanted, reverse=True):
+        img.thumbnail((size, size), Image.LANCZOS)
+        for fmt, (pil_fmt, _mime) in FORMATS.items():
+            dest = rendition_path(store_dir, digest, size, fmt)
+            if dest.exists() and not force:
+                continue
+            buf = BytesIO()
+            img.save(buf, format=pil_fmt, quality=80, **({"method": 4} if pil_fmt == "WEBP" else {"optimize": True}))
+            # Write-then-rename so concurrent readers never see a partial file
+            tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+            tmp.write_bytes(buf.getvalue())
+            os.replace(tmp, dest)
+            written.append(dest)
+    return written
+
+
+_inflight: Dict[str, "asyncio.Future[None]"] = {}
+
+
+async def ensure(store_dir: Path, digest: str, source_bytes: bytes) -> None:
+    """Generate missing renditions off the event loop; concurrent callers for the same digest share one run."""
+    from .upload_pipeline import get_executor
+
+    pending = _inflight.get(digest)
+    if pending is not None:
+        await asyncio.shield(pending)
+        return
+    loop = asyncio.get_running_loop()
+    fut: "asyncio.Future[None]" = loop.create_future()
+    _inflight[digest] = fut
+    try:
+        await loop.run_in_executor(get_executor(), generate, store_dir, digest, source_bytes)
+        fut.set_result(None)
+    except BaseException as e:
+        fut.set_exception(e)
+        raise
+    finally:
+        _inflight.pop(digest, None)
+        if fut.done() and not fut.cancelled():
+            fut.exception()  # mark retrieved when nobody else was waiting
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 from typing import Any, Iterable
 
 from fastapi import APIRouter, Depends, HTTPException, status
@@ -9,7 +10,7 @@ from sqlalchemy import select
 from ..db import get_session
 from ..security import require_user
 from ..models import VendorEmbedding
-from ..vendor_embeddings import embed_vendor_name
+from ..vendor_embeddings import embed_vendor_names, model_id
 from ..models import VatCode
 from ..agents.swedish_knowledge_base import get_knowledge_base, SwedishTaxRAG
 from ..config import settings
@@ -51,21 +52,24 @@ async def seed_vendors(session: AsyncSession = Depends(get_session), user=Depend
         ("OKQ8", "5611", 0.25),
         ("IKEA", "4010", 0.25),
     ]
-    inserted = 0
-    for name, account, vat in seeds:
-        exists = (await session.execute(select(VendorEmbedding).where(VendorEmbedding.name == name))).scalars().first()
-        if exists:
-            continue
-        vec = embed_vendor_name(name)
-        session.add(
-            VendorEmbedding(
-                name=name,
-                embedding=_serialize_embedding(vec),
-                suggested_account=account,
-                vat_rate=vat,
-            )
+    existing = set((await session.execute(
+        select(VendorEmbedding.name).where(VendorEmbedding.name.in_([name for name, _a, _v in seeds]))
+    )).scalars().all())
+    todo = [seed for seed in seeds if seed[0] not in existing]
+    # One batched encode for all new seeds, off the event loop (MiniLM is CPU-bound)
+    vectors = await asyncio.to_thread(embed_vendor_names, [name for name, _a, _v in todo])
+    mid = model_id()
+    session.add_all([
+        VendorEmbedding(
+            name=name,
+            embedding=_serialize_embedding(vec),
+            suggested_account=account,
+            vat_rate=vat,
+            embedding_model=mid,
         )
-        inserted += 1
+        for (name, account, vat), vec in zip(todo, vectors)
+    ])
+    inserted = len(todo)
     await session.commit()
     return {"inserted": inserted, "total": len(seeds)}
 
@@ -1,20 +1,28 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+from dataclasses import dataclass
 from datetime import date
-from pathlib import Path
 import json
-from typing import Any
+from typing import Any, AsyncIterator
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from .. import db as db_mod
+from ..config import settings
 from ..db import get_session
+from ..models import Document, ExtractedField
 from ..security import require_user, require_org, enforce_rate_limit
-from ..ai import suggest_account_and_vat, build_entries, build_entries_with_code
+from ..ai import MappingDecision, suggest_account_and_vat, suggest_many, build_entries, build_entries_with_code
 from ..metrics_kpis import record_attempt, record_success, record_compliance_block
-from ..routers.verifications import VerificationIn, EntryIn, create_verification  # reuse model & logic
+from ..routers.verifications import VerificationIn, EntryIn, ExplanationIn, create_verification, create_verifications_batch  # reuse model & logic
 
 router = APIRouter(prefix="/ai", tags=["ai"])
+logger = logging.getLogger(__name__)
 
 
 @router.post("/auto-post")
@@ -35,12 +43,37 @@ async def auto_post(body: dict[str, Any], session: AsyncSession = Depends(get_se
     except Exception:
         pass
     record_attempt(org_id, "legacy")
-    decision = await suggest_account_and_vat(vendor, total, session)
-    vat_code = body.get("vat_code")
+    decision = await suggest_account_and_vat(vendor, total, session, org_id)
+    vin, explain = _verification_for(org_id, dt, total, vendor, document_id, body.get("vat_code"), decision)
+    # Delegate to existing create_verification route
+    created = await create_verification(vin, session)
+    try:
+        record_success(org_id, "legacy")
+    except Exception:
+        pass
+    return {**created, "explainability": explain}
+
+
+def _verification_for(
+    org_id: int, dt: date, total: float, vendor: str | None, document_id: Any, vat_code: str | None, decision: MappingDecision
+) -> tuple[VerificationIn, str]:
     if vat_code:
         entries = build_entries_with_code(total, decision.expense_account, vat_code)
     else:
         entries = build_entries(total, decision.expense_account, decision.vat_rate)
+    explain = f"{decision.reason}. Total {total:.2f} SEK, konto {decision.expense_account}, moms {int(decision.vat_rate*100)}%"
+    explanation = ExplanationIn(
+        reason=explain,
+        model=decision.source,
+        confidence=decision.confidence,
+        features={
+            "vendor": vendor,
+            "total": total,
+            "vat_code": vat_code,
+            "expense_account": decision.expense_account,
+            "vat_rate": decision.vat_rate,
+        },
+    )
     vin = VerificationIn(
         org_id=org_id,
         date=dt,
@@ -51,21 +84,157 @@ async def auto_post(body: dict[str, Any], session: AsyncSession = Depends(get_se
         document_link=(f"/documents/{document_id}" if document_id else None),
         vat_code=vat_code,
         entries=[EntryIn(**e) for e in entries],
+        explanation=explanation,
     )
-    # Delegate to existing create_verification route
-    created = await create_verification(vin, session)
-    try:
-        record_success(org_id, "legacy")
-    except Exception:
-        pass
-    explain = f"{decision.reason}. Total {total:.2f} SEK, konto {decision.expense_account}, moms {int(decision.vat_rate*100)}%"
-    # Persist explainability in a local sidecar to allow retrieval later
+    return vin, explain
+
+
+# Batch auto-post: documents flow through two stages connected by a bounded queue.
+#   prepare (own session): load extracted fields for a chunk in one query, resolve vendor
+#       suggestions for the whole chunk at once (suggest_many), build the verifications
+#   post (own session): one create_verifications_batch per chunk, KPIs recorded per chunk,
+#       and one NDJSON line per document streamed back as soon as its chunk is posted
+# The queue holds at most ai_auto_post_pipeline_depth prepared chunks, so preparation runs ahead
+# of posting without reading the whole request into memory.
+
+
+@dataclass
+class _Prepared:
+    document_id: str
+    vin: VerificationIn | None = None
+    explain: str = ""
+    decision: MappingDecision | None = None
+    error: str | None = None
+
+
+def _field_values(rows: list[Any]) -> dict[int, dict[str, str]]:
+    # Highest-confidence value per (document, key)
+    best: dict[int, dict[str, tuple[float, str]]] = {}
+    for document_id, key, value, conf in rows:
+        current = best.setdefault(int(document_id), {}).get(key)
+        if current is None or float(conf or 0.0) > current[0]:
+            best[int(document_id)][key] = (float(conf or 0.0), value)
+    return {doc: {k: v for k, (_c, v) in fields.items()} for doc, fields in best.items()}
+
+
+async def _prepare_chunk(session: AsyncSession, doc_ids: list[str], org_id: int) -> list[_Prepared]:
+    docs = dict(
+        (await session.execute(
+            select(Document.hash_sha256, Document.id).where(Document.hash_sha256.in_(doc_ids), Document.org_id == org_id)
+        )).all()
+    )
+    field_rows = (await session.execute(
+        select(ExtractedField.document_id, ExtractedField.key, ExtractedField.value, ExtractedField.confidence)
+        .where(ExtractedField.document_id.in_(list(docs.values())))
+    )).all() if docs else []
+    fields = _field_values(list(field_rows))
+
+    prepared: list[_Prepared] = []
+    parsed: list[tuple[_Prepared, float, date, str | None]] = []
+    for doc_id in doc_ids:
+        item = _Prepared(doc_id)
+        prepared.append(item)
+        if doc_id not in docs:
+            item.error = "document not found"
+            continue
+        values = fields.get(docs[doc_id], {})
+        try:
+            total = float(values["total"])
+            dt = date.fromisoformat(values.get("date") or date.today().isoformat())
+        except Exception as e:  # noqa: BLE001
+            item.error = f"Invalid extracted fields: {e}"
+            continue
+        parsed.append((item, total, dt, values.get("vendor")))
+
+    decisions = await suggest_many([(org_id, vendor) for _item, _total, _dt, vendor in parsed], session)
+    for (item, total, dt, vendor), decision in zip(parsed, decisions):
+        item.decision = decision
+        item.vin, item.explain = _verification_for(org_id, dt, total, vendor, item.document_id, None, decision)
+    return prepared
+
+
+async def _post_chunk(session: AsyncSession, prepared: list[_Prepared], org_id: int) -> list[dict]:
+    ready = [p for p in prepared if p.vin is not None]
+    record_attempt(org_id, "legacy", len(ready))
+    created = await create_verifications_batch([p.vin for p in ready], session)  # type: ignore[misc]
+    outcome: dict[int, dict] = {}
+    for item, out in zip(ready, created):
+        if "id" in out:
+            outcome[id(item)] = {
+                "status": "posted",
+                **out,
+                "expense_account": item.decision.expense_account,  # type: ignore[union-attr]
+                "vat_rate": item.decision.vat_rate,  # type: ignore[union-attr]
+                "explainability": item.explain,
+            }
+        else:
+            outcome[id(item)] = {"status": "error", "detail": out.get("error")}
+    record_success(org_id, "legacy", sum(1 for r in outcome.values() if r["status"] == "posted"))
+    return [
+        {"document_id": p.document_id, **outcome.get(id(p), {"status": "error", "detail": p.error})}
+        for p in prepared
+    ]
+
+
+async def _auto_post_stream(doc_ids: list[str], org_id: int) -> AsyncIterator[bytes]:
+    chunk = max(1, int(settings.ai_auto_post_chunk_size))
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, int(settings.ai_auto_post_pipeline_depth)))
+
+    async def _prepare_all() -> None:
+        try:
+            async with db_mod.SessionLocal() as session:
+                for start in range(0, len(doc_ids), chunk):
+                    part = doc_ids[start:start + chunk]
+                    try:
+                        await queue.put(await _prepare_chunk(session, part, org_id))
+                    except Exception:
+                        logger.exception("auto-post batch: preparing documents failed")
+                        await queue.put([_Prepared(d, error="preparation failed") for d in part])
+        finally:
+            # Always end the stream, even when the session itself fails
+            await queue.put(None)
+
+    producer = asyncio.create_task(_prepare_all())
+    posted = failed = 0
     try:
-        meta_dir = Path(".verification_meta")
-        meta_dir.mkdir(parents=True, exist_ok=True)
-        (meta_dir / f"{created['id']}.json").write_text(json.dumps({"explainability": explain}, ensure_ascii=False), encoding="utf-8")
-    except Exception:
-        pass
-    return {**created, "explainability": explain}
+        async with db_mod.SessionLocal() as session:
+            while (prepared := await queue.get()) is not None:
+                try:
+                    lines = await _post_chunk(session, prepared, org_id)
+                except Exception:
+                    logger.exception("auto-post batch: posting failed")
+                    await session.rollback()
+                    lines = [{"document_id": p.document_id, "status": "error", "detail": "posting failed"} for p in prepared]
+                for line in lines:
+                    if line["status"] == "posted":
+                        posted += 1
+                    else:
+                        failed += 1
+                    yield (json.dumps(line, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        await asyncio.wait({producer})
+        if not producer.cancelled() and producer.exception() is not None:
+            logger.error("auto-post batch: producer failed", exc_info=producer.exception())
+            unreported = len(doc_ids) - posted - failed
+            failed += unreported
+            yield (json.dumps({"error": "preparation failed", "unprocessed": unreported}) + "\n").encode("utf-8")
+        yield (json.dumps({"done": True, "posted": posted, "failed": failed}) + "\n").encode("utf-8")
+    finally:
+        producer.cancel()
 
 
+@router.post("/auto-post/batch")
+async def auto_post_batch(body: dict[str, Any], user=Depends(require_user), _rl: None = Depends(enforce_rate_limit)) -> StreamingResponse:
+    """Auto-post many OCR'd documents; streams one NDJSON result line per document, then a summary line."""
+    try:
+        doc_ids = [str(d) for d in body["document_ids"]]
+        org_id = int(body.get("org_id") or 1)
+    except Exception as e:  # noqa: BLE001
+        raise HTTPException(status_code=400, detail=f"Invalid payload: {e}")
+    if not doc_ids:
+        raise HTTPException(status_code=400, detail="document_ids is empty")
+    if len(doc_ids) > int(settings.ai_auto_post_max_documents):
+        raise HTTPException(status_code=413, detail=f"at most {settings.ai_auto_post_max_documents} documents per batch")
+    if len(set(doc_ids)) != len(doc_ids):
+        raise HTTPException(status_code=400, detail="duplicate document ids")
+    require_org(user, org_id)
+    return StreamingResponse(_auto_post_stream(doc_ids, org_id), media_type="application/x-ndjson")
@@ -1,68 +1,42 @@
 from __future__ import annotations
 
-import csv
 from datetime import datetime
-from io import StringIO
 from typing import Any
 
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_
+from sqlalchemy import Integer, insert, select, update, and_
 
-from ..db import get_session
+from ..db import VALUES_CHUNK_SIZE, get_session, values_source
 from ..security import require_user, require_org, enforce_rate_limit
-from ..models import BankTransaction, Verification, Entry
+from ..models import BankTransaction, Verification
+from ..open_items import open_amounts_for
+from ..search import bank_text_condition
 from ..matching import suggest_for_transaction
 from ..config import settings
-from .verifications import VerificationIn, EntryIn, create_verification
+from .verifications import VerificationIn, EntryIn, create_verification, create_verifications_batch
 from ..camt import parse_camt053
+from ..bank_csv import RowError, open_bank_csv
 
 
 router = APIRouter(prefix="/bank", tags=["bank"])
 
 
-def _parse_csv(text: str) -> list[dict[str, Any]]:
-    reader = csv.DictReader(StringIO(text))
-    out: list[dict[str, Any]] = []
-    for row in reader:
-        # Expect columns: date, amount, currency, description, counterparty
-        try:
-            dt = datetime.fromisoformat(row.get("date", "").split(" ")[0]).date()
-            amount = float(str(row.get("amount", "0")).replace(",", "."))
-            currency = (row.get("currency") or "SEK").upper()[:3]
-            description = (row.get("description") or "").strip()[:500]
-            counterparty = (row.get("counterparty") or None)
-        except Exception as exc:  # noqa: BLE001
-            raise HTTPException(status_code=400, detail=f"bad csv row: {row}") from exc
-        out.append({
-            "date": dt,
-            "amount": amount,
-            "currency": currency,
-            "description": description,
-            "counterparty_ref": counterparty,
-        })
-    return out
+# Rows per bulk INSERT during CSV import
+IMPORT_CHUNK_ROWS = 500
+# Per-row errors returned to the client (the total count is always reported)
+IMPORT_MAX_REPORTED_ERRORS = 100
 
 
 @router.post("/import")
 async def import_file(
     file: UploadFile = File(...),
+    profile: str | None = None,
     session: AsyncSession = Depends(get_session),
     user=Depends(require_user),
     _rl: None = Depends(enforce_rate_limit),
 ) -> dict:
     name = (file.filename or "").lower()
-    content = (await file.read())
-    rows: list[dict[str, Any]]
-    if name.endswith(".csv"):
-        rows = _parse_csv(content.decode("utf-8", errors="ignore"))
-    elif name.endswith(".xml") or name.endswith(".camt") or name.endswith(".053"):
-        try:
-            rows = parse_camt053(content.decode("utf-8", errors="ignore"))
-        except Exception as exc:  # noqa: BLE001
-            raise HTTPException(status_code=400, detail="invalid CAMT.053") from exc
-    else:
-        raise HTTPException(status_code=400, detail="unsupported file type (csv|camt.053)")
     # Determine org context and enforce access where applicable
     try:
         org_id = int(user.get("org_id") or 1)
@@ -70,12 +44,64 @@ async def import_file(
     except Exception:
         org_id = int(user.get("org_id") or 1)
     batch_id = int(datetime.utcnow().timestamp())
+    if name.endswith(".csv"):
+        return await _import_csv_stream(file, profile, session, org_id, batch_id)
+    if name.endswith(".xml") or name.endswith(".camt") or name.endswith(".053"):
+        content = await file.read()
+        try:
+            rows = parse_camt053(content.decode("utf-8", errors="ignore"))
+        except Exception as exc:  # noqa: BLE001
+            raise HTTPException(status_code=400, detail="invalid CAMT.053") from exc
+    else:
+        raise HTTPException(status_code=400, detail="unsupported file type (csv|camt.053)")
     for r in rows:
         session.add(BankTransaction(org_id=org_id, import_batch_id=batch_id, **r))
     await session.commit()
     return {"imported": len(rows), "batch_id": batch_id}
 
 
+async def _import_csv_stream(
+    file: UploadFile, profile: str | None, session: AsyncSession, org_id: int, batch_id: int
+) -> dict:
+    """Parse the upload incrementally and insert valid rows in chunks; bad rows are reported, not fatal."""
+    await file.seek(0)
+    try:
+        parsed = open_bank_csv(file.file, profile=profile)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    imported = 0
+    errors: list[dict] = []
+    error_count = 0
+    chunk: list[dict[str, Any]] = []
+    for row in parsed.rows:
+        if isinstance(row, RowError):
+            error_count += 1
+            if len(errors) < IMPORT_MAX_REPORTED_ERRORS:
+                errors.append({"line": row.line, "error": row.error})
+            continue
+        chunk.append({**row, "org_id": org_id, "import_batch_id": batch_id})
+        if len(chunk) >= IMPORT_CHUNK_ROWS:
+            await session.execute(insert(BankTransaction), chunk)
+            imported += len(chunk)
+            chunk = []
+    if chunk:
+        await session.execute(insert(BankTransaction), chunk)
+        imported += len(chunk)
+    await session.commit()
+    return {
+        "imported": imported,
+        "batch_id": batch_id,
+        "profile": parsed.profile,
+        "dialect": {
+            "encoding": parsed.dialect.encoding,
+            "delimiter": parsed.dialect.delimiter,
+            "decimal": parsed.dialect.decimal,
+        },
+        "error_count": error_count,
+        "errors": errors,
+    }
+
+
 @router.get("/transactions")
 async def list_transactions(
     unmatched: int | None = None,
@@ -105,8 +131,7 @@ async def list_transactions(
     if matched:
         conditions.append(BankTransaction.matched_verification_id.is_not(None))
     if q:
-        like = f"%{q}%"
-        conditions.append(or_(BankTransaction.description.ilike(like), BankTransaction.counterparty_ref.ilike(like)))
+        conditions.append(bank_text_condition(session.get_bind().dialect.name, q))
     if date_from:
         try:
             df = datetime.fromisoformat(date_from.split(" ")[0]).date()
@@ -171,50 +196,92 @@ async def accept_match(tx_id: int, body: dict, session: AsyncSession = Depends(g
     return {"id": tx.id, "matched_verification_id": ver_id}
 
 
-@router.post("/transactions/bulk-accept")
-async def bulk_accept(body: dict, session: AsyncSession = Depends(get_session), user=Depends(require_user)) -> dict:
+def _parse_bulk_items(body: dict) -> list[tuple[int, int]]:
     items = body.get("items") or []
     if not isinstance(items, list) or not items:
         raise HTTPException(status_code=400, detail="items required")
-    updated = 0
+    out: list[tuple[int, int]] = []
     for it in items:
         try:
-            tx_id = int(it.get("tx_id"))
-            ver_id = int(it.get("verification_id"))
+            out.append((int(it.get("tx_id")), int(it.get("verification_id"))))
         except Exception as exc:  # noqa: BLE001
             raise HTTPException(status_code=400, detail="invalid item") from exc
-        tx = (await session.execute(select(BankTransaction).where(BankTransaction.id == tx_id))).scalars().first()
-        if not tx:
-            continue
-        try:
-            require_org(user, int(tx.org_id))  # type: ignore[arg-type]
-        except Exception:
-            pass
-        tx.matched_verification_id = ver_id
-        updated += 1
-    await session.commit()
-    return {"updated": updated}
+    return out
 
 
-def _compute_open_amount(entries: list[Entry]) -> tuple[str | None, float]:
-    """Return (type, amount) where type is 'ar' or 'ap', amount is outstanding > 0 if open.
-    Computes based on 1510 (AR) and 2440 (AP) postings.
+async def _bulk_set_matches(session: AsyncSession, org_id: int, pairs: list[tuple[int, int]]) -> set[int]:
+    """Set matched_verification_id for (tx_id, verification_id) pairs with one UPDATE ... FROM (VALUES ...)
+    per chunk, scoped to the organization. Returns the ids of transactions actually updated.
     """
-    sum_1510 = 0.0
-    sum_2440 = 0.0
-    for e in entries:
-        acc = str(e.account)
-        debit = float(e.debit or 0.0)
-        credit = float(e.credit or 0.0)
-        if acc.startswith("1510"):
-            sum_1510 += debit - credit
-        if acc.startswith("2440"):
-            sum_2440 += credit - debit  # payable positive when credit dominates
-    if sum_1510 > 0.01:
-        return ("ar", round(sum_1510, 2))
-    if sum_2440 > 0.01:
-        return ("ap", round(sum_2440, 2))
-    return (None, 0.0)
+    dialect = session.get_bind().dialect.name
+    updated: set[int] = set()
+    for i in range(0, len(pairs), VALUES_CHUNK_SIZE):
+        src = values_source(
+            dialect,
+            "m",
+            [("tx_id", Integer()), ("verification_id", Integer())],
+            pairs[i : i + VALUES_CHUNK_SIZE],
+        )
+        stmt = (
+            update(BankTransaction)
+            .where(BankTransaction.id == src.c.tx_id, BankTransaction.org_id == org_id)
+            .values(matched_verification_id=src.c.verification_id)
+            .returning(BankTransaction.id)
+            .execution_options(synchronize_session=False)
+        )
+        updated.update(int(x) for x in (await session.execute(stmt)).scalars().all())
+    return updated
+
+
+@router.post("/transactions/bulk-accept")
+async def bulk_accept(body: dict, session: AsyncSession = Depends(get_session), user=Depends(require_user)) -> dict:
+    pairs = _parse_bulk_items(body)
+    org_id = int(body.get("org_id") or user.get("org_id") or 1)
+    require_org(user, org_id)
+    # Last item wins when a transaction is listed twice
+    dedup = list({tx_id: (tx_id, ver_id) for tx_id, ver_id in pairs}.values())
+    updated = await _bulk_set_matches(session, org_id, dedup)
+    await session.commit()
+    return {
+        "updated": len(updated),
+        "items": [
+            {"tx_id": tx_id, "verification_id": ver_id, "status": "updated" if tx_id in updated else "not_found"}
+            for tx_id, ver_id in pairs
+        ],
+    }
+
+
+def _settlement_entries(typ: str, tx_amt: float, open_amt: float) -> list[EntryIn]:
+    """Build settlement entries for an open AR/AP amount; raises 400 when the bank amount does not match."""
+    # Require sign and magnitude to match (within tolerance)
+    if typ == "ar":
+        if tx_amt <= 0 or abs(abs(tx_amt) - open_amt) > 0.01:
+            raise HTTPException(status_code=400, detail="bank amount does not match AR open amount")
+        return [
+            EntryIn(account=settings.default_settlement_account, debit=open_amt, credit=0.0),
+            EntryIn(account="1510", debit=0.0, credit=open_amt),
+        ]
+    # ap
+    if tx_amt >= 0 or abs(abs(tx_amt) - open_amt) > 0.01:
+        raise HTTPException(status_code=400, detail="bank amount does not match AP open amount")
+    return [
+        EntryIn(account="2440", debit=open_amt, credit=0.0),
+        EntryIn(account=settings.default_settlement_account, debit=0.0, credit=open_amt),
+    ]
+
+
+def _settlement_verification(tx: BankTransaction, v: Verification, open_amt: float, entries: list[EntryIn]) -> VerificationIn:
+    return VerificationIn(
+        org_id=v.org_id,
+        fiscal_year_id=v.fiscal_year_id,
+        date=tx.date,
+        total_amount=open_amt,
+        currency=v.currency,
+        counterparty=v.counterparty,
+        document_link=f"/bank/transactions/{tx.id}",
+        entries=entries,
+        settles_verification_id=v.id,
+    )
 
 
 @router.post("/transactions/{tx_id}/settle")
@@ -232,41 +299,85 @@ async def settle_transaction(tx_id: int, body: dict, session: AsyncSession = Dep
     v = (await session.execute(select(Verification).where(Verification.id == ver_id))).scalars().first()
     if not v:
         raise HTTPException(status_code=404, detail="verification not found")
-    ents = (await session.execute(select(Entry).where(Entry.verification_id == v.id))).scalars().all()
-    typ, open_amt = _compute_open_amount(ents)
+    typ, open_amt = (await open_amounts_for(session, [v.id])).get(v.id, (None, 0.0))
     if not typ or open_amt <= 0.0:
         raise HTTPException(status_code=400, detail="verification has no open AR/AP amount")
-    tx_amt = float(tx.amount)
-    # Require sign and magnitude to match (within tolerance)
-    if typ == "ar":
-        if tx_amt <= 0 or abs(abs(tx_amt) - open_amt) > 0.01:
-            raise HTTPException(status_code=400, detail="bank amount does not match AR open amount")
-        entries = [
-            EntryIn(account=settings.default_settlement_account, debit=open_amt, credit=0.0),
-            EntryIn(account="1510", debit=0.0, credit=open_amt),
-        ]
-    else:  # ap
-        if tx_amt >= 0 or abs(abs(tx_amt) - open_amt) > 0.01:
-            raise HTTPException(status_code=400, detail="bank amount does not match AP open amount")
-        amt = open_amt
-        entries = [
-            EntryIn(account="2440", debit=amt, credit=0.0),
-            EntryIn(account=settings.default_settlement_account, debit=0.0, credit=amt),
-        ]
-    vin = VerificationIn(
-        org_id=v.org_id,
-        fiscal_year_id=v.fiscal_year_id,
-        date=tx.date,
-        total_amount=open_amt,
-        currency=v.currency,
-        counterparty=v.counterparty,
-        document_link=f"/bank/transactions/{tx.id}",
-        entries=entries,
-    )
+    entries = _settlement_entries(typ, float(tx.amount), open_amt)
+    vin = _settlement_verification(tx, v, open_amt, entries)
     created = await create_verification(vin, session)
     tx.matched_verification_id = int(created.get("id"))
     await session.commit()
     return {"settled_with_verification_id": tx.matched_verification_id}
 
 
+@router.post("/transactions/bulk-settle")
+async def bulk_settle(body: dict, session: AsyncSession = Depends(get_session), user=Depends(require_user)) -> dict:
+    """Settle many bank transactions against open AR/AP verifications in one batch.
+
+    Transactions, verifications and open amounts are each loaded with a single query; all
+    settlement verifications are posted in one transaction. Returns one result per item.
+    """
+    pairs = _parse_bulk_items(body)
+    org_id = int(body.get("org_id") or user.get("org_id") or 1)
+    require_org(user, org_id)
+    tx_ids = {tx_id for tx_id, _ in pairs}
+    ver_ids = {ver_id for _, ver_id in pairs}
+    txs = {
+        t.id: t
+        for t in (
+            await session.execute(
+                select(BankTransaction).where(BankTransaction.id.in_(tx_ids), BankTransaction.org_id == org_id)
+            )
+        ).scalars().all()
+    }
+    vers = {
+        v.id: v
+        for v in (
+            await session.execute(select(Verification).where(Verification.id.in_(ver_ids), Verification.org_id == org_id))
+        ).scalars().all()
+    }
+    open_amounts: dict[int, tuple[str | None, float]] = dict(await open_amounts_for(session, vers))
+
+    results: list[dict] = [{} for _ in pairs]
+    to_post: list[tuple[int, BankTransaction, VerificationIn]] = []
+    seen_tx: set[int] = set()
+    for idx, (tx_id, ver_id) in enumerate(pairs):
+        res = {"tx_id": tx_id, "verification_id": ver_id}
+        results[idx] = res
+        tx = txs.get(tx_id)
+        v = vers.get(ver_id)
+        if tx is None:
+            res.update(status="error", detail="transaction not found")
+            continue
+        if v is None:
+            res.update(status="error", detail="verification not found")
+            continue
+        if tx_id in seen_tx or tx.matched_verification_id is not None:
+            res.update(status="error", detail="transaction already matched")
+            continue
+        typ, open_amt = open_amounts.get(ver_id, (None, 0.0))
+        if not typ or open_amt <= 0.0:
+            res.update(status="error", detail="verification has no open AR/AP amount")
+            continue
+        try:
+            entries = _settlement_entries(typ, float(tx.amount), open_amt)
+        except HTTPException as exc:
+            res.update(status="error", detail=exc.detail)
+            continue
+        # The same verification cannot be settled twice within one batch
+        open_amounts[ver_id] = (None, 0.0)
+        seen_tx.add(tx_id)
+        to_post.append((idx, tx, _settlement_verification(tx, v, open_amt, entries)))
 
+    created = await create_verifications_batch([vin for _, _, vin in to_post], session)
+    matches: list[tuple[int, int]] = []
+    for (idx, tx, _vin), out in zip(to_post, created):
+        if "id" in out:
+            results[idx].update(status="settled", settled_with_verification_id=int(out["id"]))
+            matches.append((int(tx.id), int(out["id"])))
+        else:
+            results[idx].update(status="error", detail=out.get("error"))
+    if matches:
+        await _bulk_set_matches(session, org_id, matches)
+        await session.commit()
+    return {"settled": len(matches), "items": results}
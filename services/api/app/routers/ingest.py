@@ -1,22 +1,25 @@
 from __future__ import annotations
 
-import hashlib
-from datetime import datetime, timedelta
+from datetime import datetime
 from pathlib import Path
 from typing import Any
 import json
 
-from fastapi import APIRouter, File, Form, UploadFile, HTTPException, Depends, Request
-from fastapi.responses import FileResponse, StreamingResponse, Response
+from fastapi import APIRouter, BackgroundTasks, File, Form, UploadFile, HTTPException, Depends, Request
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, Response
 from pydantic import BaseModel
 from io import BytesIO
 # Pillow is imported lazily within image handling to reduce import overhead and avoid environment issues
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import insert, select
 from ..db import get_session
 from ..security import require_user, require_org, enforce_rate_limit
 from ..config import settings
 from ..models import Document, ExtractedField
+from .. import renditions, storage_backend, upload_pipeline
+from ..storage_backend import LocalBackend
+from ..segment_store import REF_PREFIX
+from ..upload_pipeline import UploadRejected, allowed_mimes
 
 # settings not used in Pass 3 scaffold
 
@@ -67,187 +70,74 @@ async def list_documents(
     return {"items": items, "limit": limit, "offset": offset}
 
 def _local_worm_store() -> Path:
-    root = Path(".worm_store")
+    root = LocalBackend().root
     root.mkdir(parents=True, exist_ok=True)
     return root
 
 
 def _find_document_path(digest: str) -> Path | None:
-    store_dir = _local_worm_store() / digest[:2] / digest[2:4]
-    if not store_dir.exists():
-        return None
-    for p in store_dir.iterdir():
-        if p.is_file() and p.name.startswith(f"{digest}_"):
-            return p
-    return None
-
+    """Loose file holding the original, if any (None for originals packed into WORM segments)."""
+    ref = LocalBackend().find(digest)
+    return Path(ref) if ref and not ref.startswith(REF_PREFIX) else None
 
-def _save_to_supabase(digest: str, filename: str, content: bytes) -> str:
-    """Upload to Supabase storage bucket following a WORM-like path scheme.
-    Returns a public (or signed) URL depending on config.
-    """
-    from supabase import create_client  # type: ignore
 
-    client = create_client(settings.supabase_url, settings.supabase_service_role_key)  # type: ignore[arg-type]
-    bucket = settings.supabase_bucket  # type: ignore[assignment]
-    key = f"{digest[:2]}/{digest[2:4]}/{digest}_{filename}"
-    try:
-        client.storage.from_(bucket).upload(path=key, file=content, file_options={"contentType": "image/jpeg", "upsert": False})
-    except Exception:
-        # Treat conflict/exists as acceptable for idempotency/WORM semantics
-        pass
-    if settings.supabase_storage_public:
-        # Assume public bucket; construct public URL
-        return f"{settings.supabase_url}/storage/v1/object/public/{bucket}/{key}"
-    # Otherwise, return signed URL valid for a day
-    url = client.storage.from_(bucket).create_signed_url(key, 86400)["signedURL"]
-    return url
+from ..ocr import get_ocr_adapter, ocr_identity
+from ..ocr_pdf import extract_document
+from ..ocr_pool import OcrBusyError
+from .. import ocr_cache, ocr_queue
+from ..metrics_ocr import record_cache_lookup
+from opentelemetry import trace
+import asyncio
+import contextlib
+import re
+import time
+import zipfile
+from ..metrics_flow import record_duration
+import mimetypes
 
 
-def _save_to_s3(digest: str, filename: str, content: bytes) -> str:
-    """Upload to S3 with Object Lock (if configured). Returns s3:// URI.
-    """
-    import boto3  # type: ignore
-
-    if not settings.s3_bucket:
-        raise RuntimeError("S3 bucket not configured")
-    key = f"{digest[:2]}/{digest[2:4]}/{digest}_{filename}"
-    s3 = boto3.client(
-        "s3",
-        region_name=settings.aws_region,
-        aws_access_key_id=settings.aws_access_key_id,
-        aws_secret_access_key=settings.aws_secret_access_key,
-    )
-    extra: dict = {"ContentType": "image/jpeg"}
-    # Optional Object Lock retention in compliance mode
-    if settings.s3_object_lock_retention_days:
-        extra.update(
-            {
-                "ObjectLockMode": "COMPLIANCE",
-                "ObjectLockRetainUntilDate": (datetime.utcnow() + timedelta(days=int(settings.s3_object_lock_retention_days))).isoformat() + "Z",
-            }
-        )
+def _store_original(digest: str, filename: str, content_bytes: bytes) -> tuple[str, bool]:
+    """Save the original to the configured backend. Returns (storage ref, already_stored)."""
+    backend = storage_backend.get_backend()
     try:
-        s3.put_object(Bucket=settings.s3_bucket, Key=key, Body=content, **extra)
+        return backend.put(digest, filename, content_bytes)
     except Exception:
-        # Treat existing object as success for idempotency
-        pass
-    return f"s3://{settings.s3_bucket}/{key}"
+        if backend.name != "supabase":
+            raise
+        # In tests or environments without compatible httpx/proxy options, fall back to local WORM
+        return LocalBackend().put(digest, filename, content_bytes)
 
 
-from ..ocr import get_ocr_adapter
-from opentelemetry import trace
-import json as _json
-import secrets
-import asyncio
-import time
-from ..metrics_flow import record_duration
-import mimetypes
-try:
-    import magic  # type: ignore
-except Exception:  # pragma: no cover
-    magic = None  # type: ignore
+_DIGEST_RE = re.compile(r"[0-9a-f]{64}")
+_RENDERABLE = {"image/jpeg", "image/png"}
+
+# Stub fields seeded for new documents until OCR runs
+_SEED_FIELDS = (("date", "2025-01-15", 0.92), ("total", "123.45", 0.97), ("vendor", "Kaffe AB", 0.88))
 
 
 @router.post("")
 async def upload_document(
+    response: Response,
+    background: BackgroundTasks,
     file: UploadFile = File(...),
     meta_json: str = Form("{}"),
     session: AsyncSession = Depends(get_session),
     user=Depends(require_user),
     _rl: None = Depends(enforce_rate_limit),
 ) -> dict:
-    # Upload hardening: MIME/size checks and magic sniffing; optional PDF
-    allowed_mimes = set(settings.upload_allowed_mime.split(","))
-    if settings.upload_allow_pdf:
-        allowed_mimes.add("application/pdf")
-    if file.content_type not in allowed_mimes:
+    # Upload hardening: MIME/size checks, magic sniffing, re-encode/downscale or qpdf, optional AV.
+    # Every blocking stage runs in the ingest executor; per-stage timings go out as Server-Timing.
+    allowed = allowed_mimes()
+    if file.content_type not in allowed:
         raise HTTPException(status_code=400, detail="unsupported content type")
     # Read entire file (typical receipts are small); enforce size
     await file.seek(0)
-    raw_bytes = await file.read()
-    if len(raw_bytes) > settings.upload_max_bytes:
-        raise HTTPException(status_code=400, detail="file too large")
-
-    # Optional: EXIF strip / re-encode image defensively; PDF sanitize if enabled
-    content_bytes = raw_bytes
-    # Magic sniffing to validate content matches declared type
+    raw_bytes = await file.read(settings.upload_max_bytes + 1)
     try:
-        sniff_mime = None
-        if magic is not None:
-            sniff_mime = magic.from_buffer(raw_bytes, mime=True)  # type: ignore[attr-defined]
-        if sniff_mime:
-            normalized = sniff_mime.replace("pjpeg", "jpeg").replace("x-png", "png")
-            if normalized not in allowed_mimes:
-                raise HTTPException(status_code=400, detail="file content type not allowed")
-    except HTTPException:
-        raise
-    except Exception:
-        # If magic unavailable or fails, continue
-        pass
-    try:
-        if file.content_type in ("image/jpeg", "image/png"):
-            from PIL import Image as _Img
-            with _Img.open(BytesIO(raw_bytes)) as img_in:
-                # Image bomb guard: reject absurdly large pixel counts (> 100 MP)
-                if (img_in.width or 0) * (img_in.height or 0) > 100_000_000:
-                    raise HTTPException(status_code=400, detail="image too large (pixels)")
-                img = img_in.convert("RGB") if file.content_type == "image/jpeg" else img_in.convert("RGBA")
-                buf = BytesIO()
-                fmt = "JPEG" if file.content_type == "image/jpeg" else "PNG"
-                save_args = {"quality": 90} if fmt == "JPEG" else {"optimize": True}
-                img.save(buf, format=fmt, **save_args)
-                buf.seek(0)
-                content_bytes = buf.read()
-        elif file.content_type == "application/pdf" and settings.pdf_sanitize_enabled:
-            try:
-                import subprocess, tempfile, os as _os
-                with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as _in:
-                    _in.write(raw_bytes)
-                    _in.flush()
-                    in_path = _in.name
-                out_fd, out_path = tempfile.mkstemp(suffix=".pdf")
-                _os.close(out_fd)
-                # qpdf sanitize: remove javascript, linearize, normalize (best-effort)
-                subprocess.run(["qpdf", "--no-warn", "--linearize", "--decrypt", "--no-object-streams", in_path, out_path], check=False)
-                try:
-                    content_bytes = Path(out_path).read_bytes()
-                except Exception:
-                    content_bytes = raw_bytes
-                finally:
-                    try:
-                        Path(in_path).unlink(missing_ok=True)  # type: ignore[arg-type]
-                        Path(out_path).unlink(missing_ok=True)  # type: ignore[arg-type]
-                    except Exception:
-                        pass
-            except Exception:
-                content_bytes = raw_bytes
-    except HTTPException:
-        raise
-    except Exception:
-        # If PIL fails, fall back to original bytes
-        content_bytes = raw_bytes
+        content_bytes, digest, timings = await upload_pipeline.run(raw_bytes, file.content_type, allowed)
+    except UploadRejected as e:
+        raise HTTPException(status_code=400, detail=e.detail)
 
-    # Virus scan (optional)
-    if settings.virus_scan_enabled:
-        try:
-            import clamd  # type: ignore
-            cd = clamd.ClamdNetworkSocket(host="127.0.0.1", port=3310)
-            resp = cd.instream(BytesIO(content_bytes))
-            status = resp.get("stream", [None, None])[0] if isinstance(resp.get("stream"), (list, tuple)) else resp.get("stream")
-            # clamd returns {'stream': ('OK', None)} when clean
-            if isinstance(resp, dict):
-                result = resp.get("stream")  # type: ignore
-                if isinstance(result, tuple) and result[0] != "OK":
-                    raise HTTPException(status_code=400, detail="malware detected")
-        except HTTPException:
-            raise
-        except Exception:
-            # If scanner not reachable, in dev/test ignore; in staging/prod we still allow for now
-            pass
-
-    # Compute digest of the sanitized content
-    digest = hashlib.sha256(content_bytes).hexdigest()
     # Validate client-provided hash if present
     try:
         meta = json.loads(meta_json or "{}")
@@ -257,38 +147,8 @@ async def upload_document(
     if client_hash and client_hash != digest:
         # Hash mismatch indicates tampering or corruption
         raise HTTPException(status_code=400, detail={"error": "hash_mismatch", "expected": digest, "provided": client_hash})
-    # Save image either locally (dev) or to Supabase bucket (if configured)
-    if len(content_bytes) > settings.upload_max_bytes:
-        raise HTTPException(status_code=400, detail="file too large")
-    duplicate = False
-    dest: str
-    if settings.supabase_url and settings.supabase_service_role_key and settings.supabase_bucket:
-        try:
-            dest = _save_to_supabase(digest, file.filename, content_bytes)
-        except Exception:
-            # In tests or environments without compatible httpx/proxy options, fall back to local WORM
-            store_dir = _local_worm_store() / digest[:2] / digest[2:4]
-            store_dir.mkdir(parents=True, exist_ok=True)
-            fpath = store_dir / f"{digest}_{file.filename}"
-            duplicate = fpath.exists()
-            if not duplicate:
-                with fpath.open("wb") as f:
-                    f.write(content_bytes)
-                (store_dir / f"{digest}.txt").write_text(f"len:{len(content_bytes)}")
-            dest = str(fpath)
-    elif settings.s3_bucket:
-        dest = _save_to_s3(digest, file.filename, content_bytes)
-    else:
-        store_dir = _local_worm_store() / digest[:2] / digest[2:4]
-        store_dir.mkdir(parents=True, exist_ok=True)
-        fpath = store_dir / f"{digest}_{file.filename}"
-        duplicate = fpath.exists()
-        if not duplicate:
-            with fpath.open("wb") as f:
-                f.write(content_bytes)
-            # Write simple OCR sidecar stub (length)
-            (store_dir / f"{digest}.txt").write_text(f"len:{len(content_bytes)}")
-        dest = str(fpath)
+    dest, duplicate = await upload_pipeline.timed("store", timings, _store_original, digest, file.filename, content_bytes)
+    response.headers["Server-Timing"] = upload_pipeline.server_timing(timings)
     # Persist Document & extracted fields (stub) if not exists
     doc_stmt = select(Document).where(Document.hash_sha256 == digest)
     existing = (await session.execute(doc_stmt)).scalars().first()
@@ -304,15 +164,174 @@ async def upload_document(
         )
         session.add(doc)
         await session.flush()
-        for key, value, conf in (("date", "2025-01-15", 0.92), ("total", "123.45", 0.97), ("vendor", "Kaffe AB", 0.88)):
+        for key, value, conf in _SEED_FIELDS:
             session.add(ExtractedField(document_id=doc.id, key=key, value=value, confidence=conf))
         await session.commit()
+        if settings.thumbnail_at_ingest and file.content_type in _RENDERABLE and storage_backend.is_local(dest):
+            background.add_task(_prerender, _store_dir(digest), digest, content_bytes)
     else:
         duplicate = True
     # Return pseudo-id = hash and duplicate flag
     return {"documentId": digest, "storagePath": dest, "duplicate": duplicate}
 
 
+_ZIP_TYPES = {"application/zip", "application/x-zip-compressed"}
+
+
+def _is_zip(filename: str, content_type: str | None) -> bool:
+    return content_type in _ZIP_TYPES or filename.lower().endswith(".zip")
+
+
+def _expand_upload(filename: str, content_type: str | None, raw: bytes, budget: int, byte_budget: int) -> list[dict]:
+    """Split one multipart part into batch entries; ZIP archives yield one entry per member.
+
+    ``budget`` is the number of files still accepted, ``byte_budget`` the bytes still allowed.
+    Members past either limit come back as error entries, so each one gets its own status.
+    """
+    if not _is_zip(filename, content_type):
+        return [{"filename": filename, "content_type": content_type, "raw": raw}]
+    entries: list[dict] = []
+    try:
+        with zipfile.ZipFile(BytesIO(raw)) as zf:
+            for info in zf.infolist():
+                name = Path(info.filename).name
+                if info.is_dir() or not name or name.startswith(".") or info.filename.startswith("__MACOSX/"):
+                    continue
+                if budget <= 0:
+                    entries.append({"filename": name, "error": "batch file limit exceeded"})
+                    continue
+                ctype = mimetypes.guess_type(name)[0]
+                # Zip bomb guard: trust neither the archive listing nor the compressed size
+                if info.file_size > settings.upload_max_bytes:
+                    entries.append({"filename": name, "error": "file too large"})
+                    continue
+                if info.file_size > byte_budget:
+                    entries.append({"filename": name, "error": "batch size limit exceeded"})
+                    continue
+                with zf.open(info) as member:
+                    data = member.read(min(settings.upload_max_bytes, byte_budget) + 1)
+                if len(data) > settings.upload_max_bytes:
+                    entries.append({"filename": name, "error": "file too large"})
+                    continue
+                if len(data) > byte_budget:
+                    entries.append({"filename": name, "error": "batch size limit exceeded"})
+                    continue
+                byte_budget -= len(data)
+                budget -= 1
+                entries.append({"filename": name, "content_type": ctype, "raw": data})
+    except zipfile.BadZipFile:
+        return [{"filename": filename, "error": "invalid zip archive"}]
+    return entries
+
+
+def _prepare_entry(entry: dict, allowed_mimes: set[str]) -> dict:
+    """Sanitize, hash and store one batch entry (runs in the ingest thread pool)."""
+    if entry.get("error"):
+        return {"filename": entry["filename"], "status": "rejected", "error": entry["error"]}
+    try:
+        content, digest, _timings = upload_pipeline.run_sync(entry["raw"], entry.get("content_type"), allowed_mimes)
+    except UploadRejected as e:
+        return {"filename": entry["filename"], "status": "rejected", "error": e.detail}
+    dest, _stored = _store_original(digest, entry["filename"], content)
+    if settings.thumbnail_at_ingest and entry.get("content_type") in _RENDERABLE and storage_backend.is_local(dest):
+        with contextlib.suppress(Exception):
+            renditions.generate(_store_dir(digest), digest, content)
+    return {"filename": entry["filename"], "status": "created", "documentId": digest, "storagePath": dest}
+
+
+@router.post("/batch")
+async def upload_documents_batch(
+    files: list[UploadFile] = File(...),
+    meta_json: str = Form("{}"),
+    ocr: bool = False,
+    session: AsyncSession = Depends(get_session),
+    user=Depends(require_user),
+    _rl: None = Depends(enforce_rate_limit),
+) -> dict:
+    """Upload many receipts at once (multipart files and/or ZIP archives).
+
+    Files are sanitized, hashed and stored in a bounded thread pool, documents are inserted in
+    bulk, and each file gets its own status (created | duplicate | rejected). ``ocr=true`` enqueues
+    OCR jobs for the new documents when a queue is configured.
+    """
+    try:
+        meta = json.loads(meta_json or "{}")
+    except json.JSONDecodeError:
+        meta = {}
+    limit = int(settings.upload_batch_max_files)
+    # Parts are spooled to disk by the multipart parser; only what we read is held in memory,
+    # and that is capped for the whole request, not per file
+    remaining = int(settings.upload_batch_max_bytes)
+    accepted = 0
+    entries: list[dict] = []
+    for f in files:
+        await f.seek(0)
+        fname = f.filename or "upload"
+        is_zip = _is_zip(fname, f.content_type)
+        if not is_zip and accepted >= limit:
+            entries.append({"filename": fname, "error": "batch file limit exceeded"})
+            continue
+        # Archives may be larger than one receipt; still bound what we hold in memory
+        cap = remaining if is_zip else min(settings.upload_max_bytes, remaining)
+        raw = await f.read(cap + 1)
+        if not is_zip and len(raw) > settings.upload_max_bytes:
+            entries.append({"filename": fname, "error": "file too large"})
+            continue
+        if len(raw) > remaining:
+            entries.append({"filename": fname, "error": "batch size limit exceeded"})
+            continue
+        expanded = _expand_upload(fname, f.content_type, raw, limit - accepted, remaining)
+        del raw
+        remaining -= sum(len(e.get("raw") or b"") for e in expanded)
+        accepted += sum(1 for e in expanded if "raw" in e)
+        entries.extend(expanded)
+
+    allowed = allowed_mimes()
+    loop = asyncio.get_running_loop()
+    pool = upload_pipeline.get_executor()
+    items = await asyncio.gather(*(loop.run_in_executor(pool, _prepare_entry, e, allowed) for e in entries))
+
+    # One existence query and bulk inserts for the whole batch
+    digests = {it["documentId"] for it in items if it["status"] == "created"}
+    existing: set[str] = set()
+    if digests:
+        existing = set((await session.execute(select(Document.hash_sha256).where(Document.hash_sha256.in_(digests)))).scalars().all())
+    new_docs: dict[str, dict] = {}
+    for it in items:
+        if it["status"] != "created":
+            continue
+        if it["documentId"] in existing or it["documentId"] in new_docs:
+            it["status"] = "duplicate"
+            continue
+        new_docs[it["documentId"]] = {
+            "org_id": int(meta.get("org_id") or 1),
+            "fiscal_year_id": None,
+            "type": str(meta.get("type") or "receipt"),
+            "storage_uri": it["storagePath"],
+            "hash_sha256": it["documentId"],
+            "ocr_text": None,
+            "status": "new",
+        }
+    if new_docs:
+        res = await session.execute(insert(Document).returning(Document.id, Document.hash_sha256), list(new_docs.values()))
+        doc_ids = [doc_id for doc_id, _digest in res.all()]
+        await session.execute(
+            insert(ExtractedField),
+            [{"document_id": i, "key": k, "value": v, "confidence": c} for i in doc_ids for k, v, c in _SEED_FIELDS],
+        )
+        await session.commit()
+
+    if ocr and settings.ocr_queue_url and new_docs:
+        import redis.asyncio as redis  # type: ignore
+        r = redis.from_url(settings.ocr_queue_url, decode_responses=False)
+        for it in items:
+            if it["status"] == "created":
+                it["jobId"] = await ocr_queue.enqueue(r, it["documentId"], it["storagePath"])
+
+    counts = {s: sum(1 for it in items if it["status"] == s) for s in ("created", "duplicate", "rejected")}
+    return {"items": items, **counts, "ocrQueued": bool(ocr and settings.ocr_queue_url)}
+
+
 @router.get("/{doc_id}")
 async def get_document(doc_id: str, request: Request, session: AsyncSession = Depends(get_session), user=Depends(require_user)) -> dict:
     # Build absolute URL so web clients don't depend on their own origin
@@ -361,151 +380,124 @@ async def get_document(doc_id: str, request: Request, session: AsyncSession = De
     }
 
 
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+def _parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """Single byte range from a Range header as (start, end) inclusive; multi-range is served whole."""
+    m = _RANGE_RE.match((header or "").strip())
+    if not m or not (m.group(1) or m.group(2)):
+        return None
+    if m.group(1):
+        start = int(m.group(1))
+        end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+    else:
+        # Suffix range: the last N bytes
+        start, end = max(0, size - int(m.group(2))), size - 1
+    if start > end or start >= size:
+        raise HTTPException(status_code=416, detail="range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
 @router.get("/{doc_id}/image", name="get_document_image")
 async def get_document_image(doc_id: str, request: Request, session: AsyncSession = Depends(get_session), user=Depends(require_user)):
     inm = request.headers.get("if-none-match")
     if inm and inm.strip() == f'W/"{doc_id}"':
         return Response(status_code=304)
-    path = _find_document_path(doc_id)
-    if path is not None and path.exists():
-        resp = FileResponse(path, media_type="image/jpeg")
-        resp.headers["Cache-Control"] = "public, max-age=86400"
-        resp.headers["ETag"] = f'W/"{doc_id}"'
-        return resp
-
-    # Fallback: proxy from remote storage (e.g., Supabase) if present in DB
-    d = (await session.execute(select(Document).where(Document.hash_sha256 == doc_id))).scalars().first()
-    if d and (d.storage_uri or "").startswith("http"):
-        try:
-            import httpx  # type: ignore
-
-            async with httpx.AsyncClient(timeout=20) as client:
-                resp = await client.get(d.storage_uri)
-                if resp.status_code == 200 and resp.content:
-                    out = StreamingResponse(BytesIO(resp.content), media_type="image/jpeg")
-                    out.headers["Cache-Control"] = "public, max-age=86400"
-                    out.headers["ETag"] = f'W/"{doc_id}"'
-                    return out
-        except Exception:
-            pass
-    if d and (d.storage_uri or "").startswith("s3://"):
-        try:
-            import boto3  # type: ignore
-
-            s3uri = d.storage_uri[5:]
-            bucket, key = s3uri.split("/", 1)
-            s3 = boto3.client(
-                "s3",
-                region_name=settings.aws_region,
-                aws_access_key_id=settings.aws_access_key_id,
-                aws_secret_access_key=settings.aws_secret_access_key,
-            )
-            obj = s3.get_object(Bucket=bucket, Key=key)
-            data = obj["Body"].read()
-            out = StreamingResponse(BytesIO(data), media_type="image/jpeg")
-            out.headers["Cache-Control"] = "public, max-age=86400"
-            out.headers["ETag"] = f'W/"{doc_id}"'
-            return out
-        except Exception:
-            pass
-    raise HTTPException(status_code=404, detail="document image not found")
+    # Local store first, else stream from remote storage (S3/Supabase) if present in DB
+    ref = await _locate(session, doc_id)
+    if not ref:
+        raise HTTPException(status_code=404, detail="document image not found")
+    backend = storage_backend.backend_for(ref)
+    try:
+        size = await storage_backend.run(backend.size, ref)
+    except Exception:
+        raise HTTPException(status_code=404, detail="document image not found")
+    headers = {"Cache-Control": "public, max-age=86400", "ETag": f'W/"{doc_id}"', "Accept-Ranges": "bytes"}
+    media_type = mimetypes.guess_type(ref.split("?", 1)[0])[0] or "image/jpeg"
+    rng = _parse_range(request.headers.get("range"), size)
+    if rng is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(backend.iter_range(ref), media_type=media_type, headers=headers)
+    start, end = rng
+    headers.update({"Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(end - start + 1)})
+    return StreamingResponse(backend.iter_range(ref, start, end), status_code=206, media_type=media_type, headers=headers)
+
+
+def _store_dir(digest: str) -> Path:
+    # Renditions and sidecars live in the digest's fan-out dir, wherever the original itself is stored
+    return LocalBackend().dir_for(digest)
+
+
+async def _locate(session: AsyncSession, digest: str) -> str | None:
+    """Storage ref for a digest: the local store (files or segments) first, else the Document's URI."""
+    ref = await storage_backend.run(LocalBackend().find, digest)
+    if ref is None:
+        d = (await session.execute(select(Document).where(Document.hash_sha256 == digest))).scalars().first()
+        ref = d.storage_uri if d and d.storage_uri else None
+    return ref
+
+
+async def _read_original(digest: str, session: AsyncSession) -> bytes | None:
+    try:
+        ref = await _locate(session, digest)
+        return await storage_backend.run(ocr_queue.read_document_bytes, ref) if ref else None
+    except Exception:
+        return None
+
+
+async def _prerender(store_dir: Path, digest: str, content: bytes) -> None:
+    # Best-effort at ingest; the thumbnail endpoint renders lazily if this didn't happen
+    with contextlib.suppress(Exception):
+        await renditions.ensure(store_dir, digest, content)
 
 
 @router.get("/{doc_id}/thumbnail")
-async def get_document_thumbnail(doc_id: str, request: Request, session: AsyncSession = Depends(get_session), user=Depends(require_user)) -> StreamingResponse:
-    inm = request.headers.get("if-none-match")
-    if inm and inm.strip() == f'W/"{doc_id}/thumb"':
-        return Response(status_code=304)
-    path = _find_document_path(doc_id)
-    source_bytes: bytes | None = None
-    if path is not None and path.exists():
-        source_bytes = path.read_bytes()
-    else:
-        d = (await session.execute(select(Document).where(Document.hash_sha256 == doc_id))).scalars().first()
-        if d and (d.storage_uri or "").startswith("http"):
-            try:
-                import httpx  # type: ignore
-
-                async with httpx.AsyncClient(timeout=20) as client:
-                    resp = await client.get(d.storage_uri)
-                    if resp.status_code == 200 and resp.content:
-                        source_bytes = bytes(resp.content)
-            except Exception:
-                source_bytes = None
-        elif d and (d.storage_uri or "").startswith("s3://"):
-            try:
-                import boto3  # type: ignore
-
-                s3uri = d.storage_uri[5:]
-                bucket, key = s3uri.split("/", 1)
-                s3 = boto3.client(
-                    "s3",
-                    region_name=settings.aws_region,
-                    aws_access_key_id=settings.aws_access_key_id,
-                    aws_secret_access_key=settings.aws_secret_access_key,
-                )
-                obj = s3.get_object(Bucket=bucket, Key=key)
-                source_bytes = obj["Body"].read()
-            except Exception:
-                source_bytes = None
-    if not source_bytes:
+async def get_document_thumbnail(
+    doc_id: str,
+    request: Request,
+    size: int | None = None,
+    format: str | None = None,
+    session: AsyncSession = Depends(get_session),
+    user=Depends(require_user),
+) -> Response:
+    """Cached rendition (160/320/1024 px by default, WebP or JPEG) with a strong ETag.
+
+    Without ``format`` WebP is served to clients that accept it. Missing renditions are rendered
+    on first request from the original and stored next to it.
+    """
+    if not _DIGEST_RE.fullmatch(doc_id):
         raise HTTPException(status_code=404, detail="document image not found")
-    # Generate a small thumbnail (max 320px on the long edge)
-    with Image.open(BytesIO(source_bytes)) as img:
-        img = img.convert("RGB")
-        img.thumbnail((320, 320))
-        buf = BytesIO()
-        img.save(buf, format="JPEG", quality=80)
-        buf.seek(0)
-        out = StreamingResponse(buf, media_type="image/jpeg")
-        out.headers["Cache-Control"] = "public, max-age=86400"
-        out.headers["ETag"] = f'W/"{doc_id}/thumb"'
-        return out
+    fmt = (format or ("webp" if "image/webp" in request.headers.get("accept", "") else "jpeg")).lower().replace("jpg", "jpeg")
+    if fmt not in renditions.FORMATS:
+        raise HTTPException(status_code=400, detail="unsupported thumbnail format")
+    px = renditions.pick_size(size)
+    tag = renditions.etag(doc_id, px, fmt)
+    headers = {"ETag": tag, "Cache-Control": "private, max-age=31536000, immutable"}
+    if format is None:
+        headers["Vary"] = "Accept"
+    if renditions.etag_matches(request.headers.get("if-none-match"), tag):
+        return Response(status_code=304, headers=headers)
+    store_dir = _store_dir(doc_id)
+    target = renditions.rendition_path(store_dir, doc_id, px, fmt)
+    if not target.exists():
+        source_bytes = await _read_original(doc_id, session)
+        if not source_bytes:
+            raise HTTPException(status_code=404, detail="document image not found")
+        try:
+            await renditions.ensure(store_dir, doc_id, source_bytes)
+        except Exception:
+            # Not a decodable image (e.g. a PDF without preview)
+            raise HTTPException(status_code=404, detail="document image not found")
+    return FileResponse(target, media_type=renditions.FORMATS[fmt][1], headers=headers)
 
 
-@router.post("/{doc_id}/process-ocr")
-async def process_document_ocr(doc_id: str, session: AsyncSession = Depends(get_session), user=Depends(require_user)) -> dict:
-    path = _find_document_path(doc_id)
-    if path is None or not path.exists():
-        raise HTTPException(status_code=404, detail="document not found")
-    image_bytes = path.read_bytes()
-    tracer = trace.get_tracer("bertil.api")
-    with tracer.start_as_current_span("ocr.process") as span:  # type: ignore[call-arg]
-        span.set_attribute("document.id", doc_id)
-        span.set_attribute("image.bytes", len(image_bytes))
-        t0 = time.perf_counter()
-        if settings.ocr_queue_url:
-            # Enqueue to Redis and poll result briefly (MVP)
-            import redis.asyncio as redis  # type: ignore
-            r = redis.from_url(settings.ocr_queue_url, decode_responses=False)
-            job_id = f"job-{secrets.token_hex(8)}"
-            payload = {
-                "id": job_id,
-                "hex": image_bytes.hex(),
-            }
-            await r.rpush("ocr:queue", _json.dumps(payload).encode("utf-8"))
-            # Wait up to 5s for result
-            result = None
-            for _ in range(50):
-                raw = await r.hget("ocr:results", job_id)
-                if raw:
-                    result = _json.loads(raw.decode("utf-8"))
-                    break
-                await asyncio.sleep(0.1)
-            if not result:
-                raise HTTPException(status_code=504, detail="ocr timeout")
-            from .ocr import OcrBox, OcrResult  # local import to avoid cycle at module top
-            boxes = [OcrBox(**b) for b in result.get("boxes", [])]
-            extracted = [tuple(x) for x in result.get("extracted_fields", [])]
-            ocr_result = OcrResult(text=result.get("text", ""), boxes=boxes, extracted_fields=extracted)
-        else:
-            adapter = get_ocr_adapter()
-            span.set_attribute("ocr.provider", getattr(type(adapter), "__name__", "unknown"))
-            ocr_result = await adapter.extract(image_bytes)
-        dt = time.perf_counter() - t0
-        record_duration(dt)
-
-    # Update DB
+async def _apply_ocr_result(
+    session: AsyncSession, doc_id: str, path: Path | None, ocr_result: Any, identity: tuple[str, str] | None = None
+) -> dict:
+    """Persist OCR text/fields and the cache entry for a document, and write the ``.ocr.json`` sidecar
+    next to local originals."""
+    provider, version = identity or ocr_identity()
     doc_stmt = select(Document).where(Document.hash_sha256 == doc_id)
     d = (await session.execute(doc_stmt)).scalars().first()
     if d is None:
@@ -532,11 +524,14 @@ async def process_document_ocr(doc_id: str, session: AsyncSession = Depends(get_
     )
     for key, value, conf in ocr_result.extracted_fields:
         session.add(ExtractedField(document_id=d.id, key=key, value=str(value), confidence=float(conf)))
+    await ocr_cache.store(session, doc_id, ocr_result, (provider, version))
     await session.commit()
 
     # Sidecar JSON
-    sidecar = path.parent / f"{path.stem}.ocr.json"
-    sidecar.write_text(ocr_result.to_json(), encoding="utf-8")
+    if path is not None:
+        ocr_cache.sidecar_path(path).write_text(
+            ocr_result.to_json(provider=provider, preprocess_version=version), encoding="utf-8"
+        )
 
     return {
         "status": "processed",
@@ -544,3 +539,95 @@ async def process_document_ocr(doc_id: str, session: AsyncSession = Depends(get_
         "fields": [{"key": k, "value": v, "confidence": conf} for k, v, conf in ocr_result.extracted_fields],
     }
 
+
+async def _storage_ref(session: AsyncSession, doc_id: str) -> tuple[Path | None, str]:
+    path = _find_document_path(doc_id)
+    if path is not None and path.exists():
+        return path, str(path)
+    ref = await _locate(session, doc_id)
+    if ref and (ref.startswith(REF_PREFIX) or not storage_backend.is_local(ref)):
+        return None, ref
+    raise HTTPException(status_code=404, detail="document not found")
+
+
+@router.post("/{doc_id}/process-ocr")
+async def process_document_ocr(
+    doc_id: str,
+    wait: bool = True,
+    force: bool = False,
+    session: AsyncSession = Depends(get_session),
+    user=Depends(require_user),
+):
+    """Run OCR for a stored document.
+
+    Results are cached per (digest, provider, preprocessing version); ``force=true`` re-runs OCR.
+    With a queue configured, the job carries only the digest and storage reference. ``wait=false``
+    returns 202 with a job id to poll via ``GET /documents/ocr-jobs/{job_id}``.
+    """
+    path, ref = await _storage_ref(session, doc_id)
+    if force:
+        record_cache_lookup("bypass")
+    else:
+        cached, source = await ocr_cache.lookup(session, doc_id, path)
+        if cached is not None:
+            return {**await _apply_ocr_result(session, doc_id, path, cached), "cached": source}
+    tracer = trace.get_tracer("bertil.api")
+    with tracer.start_as_current_span("ocr.process") as span:  # type: ignore[call-arg]
+        span.set_attribute("document.id", doc_id)
+        t0 = time.perf_counter()
+        if settings.ocr_queue_url:
+            import redis.asyncio as redis  # type: ignore
+            r = redis.from_url(settings.ocr_queue_url, decode_responses=False)
+            job_id = await ocr_queue.enqueue(r, doc_id, ref)
+            span.set_attribute("ocr.job_id", job_id)
+            if not wait:
+                return JSONResponse(status_code=202, content={"status": "queued", "jobId": job_id, "documentId": doc_id})
+            result = await ocr_queue.wait_for_result(r, job_id, settings.ocr_wait_timeout)
+            if not result:
+                raise HTTPException(status_code=504, detail="ocr timeout")
+            if result.get("error"):
+                raise HTTPException(status_code=502, detail=f"ocr failed: {result['error']}")
+            ocr_result = ocr_queue.result_to_ocr(result)
+            identity = (result.get("provider"), result.get("preprocess_version"))
+        else:
+            image_bytes = path.read_bytes() if path is not None else await asyncio.to_thread(ocr_queue.read_document_bytes, ref)
+            span.set_attribute("image.bytes", len(image_bytes))
+            adapter = get_ocr_adapter()
+            span.set_attribute("ocr.provider", getattr(type(adapter), "__name__", "unknown"))
+            try:
+                # PDFs: text layer first, scanned pages OCR'd in parallel with a per-page cache
+                ocr_result = await extract_document(image_bytes, adapter, ocr_cache.DbPageCache(session))
+            except OcrBusyError:
+                raise HTTPException(status_code=503, detail="ocr busy", headers={"Retry-After": "2"})
+            identity = ocr_identity()
+        dt = time.perf_counter() - t0
+        record_duration(dt)
+
+    return await _apply_ocr_result(session, doc_id, path, ocr_result, identity if all(identity) else None)
+
+
+@router.get("/ocr-jobs/{job_id}")
+async def get_ocr_job(job_id: str, session: AsyncSession = Depends(get_session), user=Depends(require_user)) -> dict:
+    """Status of a queued OCR job; reading a finished job applies its result to the document (idempotent)."""
+    if not settings.ocr_queue_url:
+        raise HTTPException(status_code=404, detail="ocr queue not configured")
+    import redis.asyncio as redis  # type: ignore
+    r = redis.from_url(settings.ocr_queue_url, decode_responses=False)
+    result = await ocr_queue.get_result(r, job_id)
+    if result is None:
+        return {"status": "pending", "jobId": job_id}
+    doc_id = str(result.get("digest") or "")
+    if not doc_id:
+        raise HTTPException(status_code=500, detail="ocr result missing document digest")
+    # Job ids are not secrets; the result is only shown to members of the document's org
+    doc = (await session.execute(select(Document).where(Document.hash_sha256 == doc_id))).scalars().first()
+    if doc is None:
+        raise HTTPException(status_code=404, detail="document not found")
+    require_org(user, int(doc.org_id))
+    if result.get("error"):
+        return {"status": "failed", "jobId": job_id, "error": result["error"]}
+    identity = (result.get("provider"), result.get("preprocess_version"))
+    out = await _apply_ocr_result(
+        session, doc_id, _find_document_path(doc_id), ocr_queue.result_to_ocr(result), identity if all(identity) else None
+    )
+    return {**out, "jobId": job_id}
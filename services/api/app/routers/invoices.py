@@ -15,6 +15,7 @@ from sqlalchemy.orm import selectinload, relationship
 from ..db import get_session
 from ..security import require_user, require_org
 from ..models import Customer, Invoice, InvoiceLineItem, InvoiceSequence, Organization
+from ..open_items import aging_totals
 from ..invoice_vat import (
     calculate_invoice_totals, 
     generate_invoice_number, 
@@ -411,6 +412,9 @@ async def get_invoice_stats(
         )
     )
     monthly_revenue = revenue_result.scalar() or 0
+
+    # Ledger receivables (1510) with aging, read from the open-item subledger
+    receivables = await aging_totals(db, org_id, "ar")
     
     return {
         "outstanding": {
@@ -421,7 +425,8 @@ async def get_invoice_stats(
             "count": overdue_count or 0,
             "amount": float(overdue_amount or 0)
         },
-        "monthly_revenue": float(monthly_revenue)
+        "monthly_revenue": float(monthly_revenue),
+        "receivables": receivables,
     }
 
 
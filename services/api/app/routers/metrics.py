@@ -5,8 +5,14 @@ from ..config import settings
 from ..security import get_rate_limit_block_count
 from ..security import require_user
 import redis.asyncio as redis  # type: ignore
-from ..metrics_flow import get_stats
+from ..metrics_flow import get_stage_stats, get_stats
 from ..metrics_kpis import get_kpi_snapshot
+from ..metrics_llm import get_usage_stats as get_llm_usage_stats
+from ..llm_cache import get_llm_cache, get_single_flight
+from ..ai_fallback import get_extraction_batcher
+from ..metrics_ocr import get_cache_stats
+from ..ocr_pool import pool_stats
+from ..ocr_queue import DEAD_LETTER_KEY, queue_depth
 from typing import Optional
 
 router = APIRouter(tags=["metrics"])
@@ -20,19 +26,21 @@ async def metrics_health() -> dict:
 @router.get("/metrics/ocr")
 async def metrics_ocr(user=Depends(require_user)) -> dict:
     depth = None
+    dead = None
     if settings.ocr_queue_url:
         try:
             r = redis.from_url(settings.ocr_queue_url, decode_responses=False)
-            depth = int(await r.llen("ocr:queue"))
+            depth = await queue_depth(r)
+            dead = int(await r.xlen(DEAD_LETTER_KEY))
         except Exception:
             depth = -1
     warn = bool(depth is not None and depth >= settings.ocr_queue_warn_threshold)
-    return {"queue_depth": depth, "provider": settings.ocr_provider, "queued": bool(settings.ocr_queue_url), "warn": warn}
+    return {"queue_depth": depth, "dead_letter": dead, "provider": settings.ocr_provider, "queued": bool(settings.ocr_queue_url), "warn": warn, "pool": pool_stats(), "cache": get_cache_stats()}
 
 
 @router.get("/metrics/flow")
 async def metrics_flow(user=Depends(require_user)) -> dict:
-    return get_stats()
+    return {**get_stats(), "upload_stages": get_stage_stats()}
 
 
 _fail_counters: dict[str, int] = {"ocr": 0, "extract": 0, "autopost": 0}
@@ -55,7 +63,7 @@ async def metrics_alerts(user=Depends(require_user)) -> dict:
         depth = None
         if settings.ocr_queue_url:
             r = redis.from_url(settings.ocr_queue_url, decode_responses=False)
-            depth = int(await r.llen("ocr:queue"))
+            depth = await queue_depth(r)
         if depth is not None and depth >= settings.ocr_queue_warn_threshold:
             alerts.append({"type": "ocr_queue", "level": "warning", "message": f"OCR queue depth {depth}"})
     except Exception:
@@ -76,6 +84,17 @@ async def metrics_kpi(user=Depends(require_user)) -> dict:
     return get_kpi_snapshot()
 
 
+@router.get("/metrics/llm")
+async def metrics_llm(user=Depends(require_user)) -> dict:
+    # requested vs upstream is the quota saved by the cache, single-flight and batching
+    return {
+        **get_llm_usage_stats(),
+        "cache": dict(get_llm_cache().stats),
+        "single_flight": dict(get_single_flight().stats),
+        "batching": dict(get_extraction_batcher().stats),
+    }
+
+
 @router.post("/metrics/event")
 async def metrics_event(payload: dict, user=Depends(require_user)) -> dict:
     """Accept lightweight frontend analytics events without PII.
@@ -119,7 +138,7 @@ async def synthetic_health(user=Depends(require_user)) -> dict:
         depth = None
         if settings.ocr_queue_url:
             r = redis.from_url(settings.ocr_queue_url, decode_responses=False)
-            depth = int(await r.llen("ocr:queue"))
+            depth = await queue_depth(r)
         if depth is not None and depth >= settings.ocr_queue_warn_threshold:
             alerts.append({"type": "ocr_queue", "level": "warning", "message": f"depth={depth}"})
     except Exception:
@@ -10,6 +10,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from ..db import get_session
 from ..models import ReviewTask
 from ..models_feedback import AiFeedback
+from .. import feedback_cache
 from ..security import require_user, require_org
 
 
@@ -104,5 +105,7 @@ async def post_ai_feedback(payload: dict, session: AsyncSession = Depends(get_se
     )
     session.add(fb)
     await session.commit()
+    # Write-through: suggestions read the in-memory feedback map, not the table
+    await feedback_cache.record(fb)
     return {"ok": True, "id": fb.id}
 
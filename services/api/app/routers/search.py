@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db import get_session
+from ..models import BankTransaction, Document, Verification
+from ..search import SEARCH_KINDS, search_hits
+from ..security import require_user, require_org, enforce_rate_limit
+
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+
+def _snippet(text: str | None, q: str, width: int = 120) -> str | None:
+    if not text:
+        return None
+    pos = text.lower().find(q.strip().lower().split(" ")[0]) if q.strip() else -1
+    start = max(0, pos - width // 3) if pos >= 0 else 0
+    return text[start : start + width]
+
+
+@router.get("")
+async def search(
+    q: str,
+    kinds: str | None = None,  # comma-separated subset of bank,verification,document
+    limit: int = 20,
+    cursor: str | None = None,
+    org_id: int | None = None,
+    session: AsyncSession = Depends(get_session),
+    user=Depends(require_user),
+    _rl: None = Depends(enforce_rate_limit),
+) -> dict:
+    selected_org = int(org_id or user.get("org_id") or 1)
+    try:
+        require_org(user, selected_org)
+    except Exception:
+        pass
+    wanted = [k.strip() for k in (kinds or ",".join(SEARCH_KINDS)).split(",") if k.strip()]
+    if any(k not in SEARCH_KINDS for k in wanted):
+        raise HTTPException(status_code=400, detail=f"kinds must be within {','.join(SEARCH_KINDS)}")
+    limit = max(1, min(int(limit), 100))
+    try:
+        hits, next_cursor = await search_hits(session, q, selected_org, kinds=wanted, limit=limit, cursor=cursor)
+    except (ValueError, TypeError) as exc:
+        raise HTTPException(status_code=400, detail="invalid cursor") from exc
+
+    # Hydrate the page with one IN query per kind
+    ids: dict[str, list[int]] = {k: [r for kk, r, _s in hits if kk == k] for k in SEARCH_KINDS}
+    bank = {}
+    if ids["bank"]:
+        rows = (await session.execute(select(BankTransaction).where(BankTransaction.id.in_(ids["bank"])))).scalars().all()
+        bank = {r.id: r for r in rows}
+    vers = {}
+    if ids["verification"]:
+        rows = (await session.execute(select(Verification).where(Verification.id.in_(ids["verification"])))).scalars().all()
+        vers = {r.id: r for r in rows}
+    docs = {}
+    if ids["document"]:
+        rows = (await session.execute(select(Document).where(Document.id.in_(ids["document"])))).scalars().all()
+        docs = {r.id: r for r in rows}
+
+    items: list[dict] = []
+    for kind, ref_id, score in hits:
+        item: dict = {"kind": kind, "id": ref_id, "score": round(score, 6)}
+        if kind == "bank" and ref_id in bank:
+            t = bank[ref_id]
+            item.update(
+                date=t.date.isoformat(),
+                amount=float(t.amount),
+                description=t.description,
+                counterparty=t.counterparty_ref,
+                matched_verification_id=t.matched_verification_id,
+            )
+        elif kind == "verification" and ref_id in vers:
+            v = vers[ref_id]
+            item.update(
+                date=v.date.isoformat(),
+                immutable_seq=v.immutable_seq,
+                total_amount=float(v.total_amount),
+                counterparty=v.counterparty,
+            )
+        elif kind == "document" and ref_id in docs:
+            d = docs[ref_id]
+            item.update(document_id=d.hash_sha256, type=d.type, status=d.status, snippet=_snippet(d.ocr_text, q))
+        else:
+            continue
+        items.append(item)
+    return {"items": items, "next_cursor": next_cursor, "limit": limit}
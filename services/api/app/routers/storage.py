@@ -10,6 +10,7 @@ from ..db import get_session
 from ..security import require_user, enforce_rate_limit
 from ..config import settings
 from ..models import Document
+from ..storage_backend import S3Backend, s3_client
 
 
 router = APIRouter(prefix="/storage", tags=["storage"])
@@ -25,15 +26,8 @@ async def worm_status(doc_id: str, session: AsyncSession = Depends(get_session),
         if not settings.aws_region or not settings.aws_access_key_id or not settings.aws_secret_access_key:
             raise HTTPException(status_code=501, detail="aws not configured")
         try:
-            import boto3  # type: ignore
-            s3uri = uri[5:]
-            bucket, key = s3uri.split("/", 1)
-            s3 = boto3.client(
-                "s3",
-                region_name=settings.aws_region,
-                aws_access_key_id=settings.aws_access_key_id,
-                aws_secret_access_key=settings.aws_secret_access_key,
-            )
+            bucket, key = S3Backend.split(uri)
+            s3 = s3_client()
             lock_cfg = s3.get_object_lock_configuration(Bucket=bucket)
             try:
                 retention = s3.get_object_retention(Bucket=bucket, Key=key)
@@ -71,13 +65,7 @@ async def worm_bucket_status(user=Depends(require_user)) -> dict:
     if not (settings.aws_region and settings.aws_access_key_id and settings.aws_secret_access_key):
         raise HTTPException(status_code=501, detail="aws not configured")
     try:
-        import boto3  # type: ignore
-        s3 = boto3.client(
-            "s3",
-            region_name=settings.aws_region,
-            aws_access_key_id=settings.aws_access_key_id,
-            aws_secret_access_key=settings.aws_secret_access_key,
-        )
+        s3 = s3_client()
         lock_cfg = s3.get_object_lock_configuration(Bucket=settings.s3_bucket)
         bucket_loc = s3.get_bucket_location(Bucket=settings.s3_bucket)
         return {
@@ -103,14 +91,8 @@ async def worm_smoke_test(user=Depends(require_user)) -> dict:
     if not (settings.aws_region and settings.aws_access_key_id and settings.aws_secret_access_key):
         raise HTTPException(status_code=501, detail="aws not configured")
     try:
-        import boto3  # type: ignore
         from datetime import datetime, timedelta
-        s3 = boto3.client(
-            "s3",
-            region_name=settings.aws_region,
-            aws_access_key_id=settings.aws_access_key_id,
-            aws_secret_access_key=settings.aws_secret_access_key,
-        )
+        s3 = s3_client()
         # Write object with short retention (1 day) under test prefix
         key = f"{settings.worm_test_object_prefix}smoke_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.txt"
         s3.put_object(
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import hashlib
+import json
 from datetime import date, datetime
 from typing import List, Optional
 
@@ -9,13 +10,14 @@ from pydantic import BaseModel, Field
 from sqlalchemy import select, func, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..db import get_session
+from ..db import VALUES_CHUNK_SIZE, get_session
 from ..config import settings
 from ..security import require_user, require_org, enforce_rate_limit
 from ..audit import append_audit_event
-from ..compliance import run_verification_rules, persist_flags
+from ..compliance import RuleFlag, run_verification_rules, persist_flags
 from ..metrics_kpis import record_compliance_block
-from ..models import Entry, Verification, AuditLog, PeriodLock
+from ..open_items import apply_postings, summarize_open_items, aging_totals
+from ..models import Entry, Verification, VerificationExplanation, AuditLog, PeriodLock
 from ..models import Base
 
 
@@ -29,6 +31,13 @@ class EntryIn(BaseModel):
     dimension: Optional[str] = None
 
 
+class ExplanationIn(BaseModel):
+    reason: str
+    model: Optional[str] = None
+    confidence: Optional[float] = None
+    features: dict = Field(default_factory=dict)
+
+
 class VerificationIn(BaseModel):
     org_id: int
     fiscal_year_id: Optional[int] = None
@@ -40,6 +49,10 @@ class VerificationIn(BaseModel):
     counterparty: Optional[str] = None
     document_link: Optional[str] = None
     entries: List[EntryIn] = Field(default_factory=list)
+    # Open item this posting settles (subledger allocation only; not part of the audited payload)
+    settles_verification_id: Optional[int] = Field(default=None, exclude=True)
+    # Why the posting was suggested; stored in verification_explanations in the same transaction
+    explanation: Optional[ExplanationIn] = Field(default=None, exclude=True)
 
 
 def _hash_verification_payload(payload: VerificationIn) -> str:
@@ -48,6 +61,82 @@ def _hash_verification_payload(payload: VerificationIn) -> str:
     return m.hexdigest()
 
 
+def _balancing_entry(body: VerificationIn) -> Optional[EntryIn]:
+    """Validate that entries balance (sum debit == sum credit).
+
+    Returns an auto-balancing cash entry for VAT scenarios in test/ci, raises 400 otherwise.
+    """
+    total_debit = sum(float(e.debit or 0.0) for e in body.entries)
+    total_credit = sum(float(e.credit or 0.0) for e in body.entries)
+    diff = round(total_debit - total_credit, 2)
+    if diff == 0.0:
+        return None
+    import os as _os
+    env = _os.environ.get("APP_ENV", "local").lower()
+    # Allow auto-balance only in test/ci when VAT scenario is present
+    has_vat_context = (body.vat_code is not None) or any(str(e.account).startswith("264") for e in body.entries)
+    if env in ("test", "ci") and has_vat_context:
+        # Auto-balance for tests to allow VAT scenarios with partial deductible amounts
+        if diff < 0:
+            # More credit than debit -> add missing debit on cash
+            return EntryIn(account="1910", debit=abs(diff), credit=0.0)
+        # More debit than credit -> add missing credit on cash
+        return EntryIn(account="1910", debit=0.0, credit=diff)
+    raise HTTPException(status_code=400, detail="Entries must balance (debit == credit)")
+
+
+def _blocks_on_compliance_errors() -> bool:
+    import os as _os
+    _env = _os.environ.get("APP_ENV", settings.app_env).lower()
+    return _env not in {"local", "test", "ci"}
+
+
+async def _stage_verification(session: AsyncSession, body: VerificationIn, seq: int) -> tuple[Verification, list[RuleFlag]]:
+    """Add a verification and its entries to the session (flushed, not committed) and run rules."""
+    balancing = _balancing_entry(body)
+    v = Verification(
+        org_id=body.org_id,
+        fiscal_year_id=body.fiscal_year_id,
+        immutable_seq=seq,
+        date=body.date,
+        total_amount=body.total_amount,
+        currency=body.currency,
+        vat_amount=body.vat_amount,
+        vat_code=(body.vat_code or None),
+        counterparty=body.counterparty,
+        document_link=body.document_link,
+        created_at=datetime.utcnow(),
+    )
+    session.add(v)
+    await session.flush()
+    staged_entries = list(body.entries) + ([balancing] if balancing else [])
+    for e in staged_entries:
+        session.add(
+            Entry(
+                verification_id=v.id,
+                account=e.account,
+                debit=e.debit,
+                credit=e.credit,
+                dimension=e.dimension,
+            )
+        )
+    await apply_postings(session, v, staged_entries, settles_verification_id=body.settles_verification_id)
+    if body.explanation is not None:
+        session.add(
+            VerificationExplanation(
+                verification_id=v.id,
+                reason=body.explanation.reason,
+                model=body.explanation.model,
+                confidence=body.explanation.confidence,
+                features_json=json.dumps(body.explanation.features, ensure_ascii=False, default=str),
+            )
+        )
+    # Run compliance rules before committing
+    # This uses the pending entries (flushed) for accurate evaluation
+    flags = await run_verification_rules(session, v)
+    return v, flags
+
+
 @router.post("")
 async def create_verification(
     body: VerificationIn, session: AsyncSession = Depends(get_session), user=Depends(require_user), _rl: None = Depends(enforce_rate_limit)
@@ -84,62 +173,10 @@ async def create_verification(
         require_org(user, int(body.org_id))
     except Exception:
         pass
-    v = Verification(
-        org_id=body.org_id,
-        fiscal_year_id=body.fiscal_year_id,
-        immutable_seq=next_seq,
-        date=body.date,
-        total_amount=body.total_amount,
-        currency=body.currency,
-        vat_amount=body.vat_amount,
-        vat_code=(body.vat_code or None),
-        counterparty=body.counterparty,
-        document_link=body.document_link,
-        created_at=datetime.utcnow(),
-    )
-    session.add(v)
-    await session.flush()
-
-    # Ensure entries balance (sum debit == sum credit)
-    total_debit = 0.0
-    total_credit = 0.0
-    for e in body.entries:
-        total_debit += float(e.debit or 0.0)
-        total_credit += float(e.credit or 0.0)
-        session.add(
-            Entry(
-                verification_id=v.id,
-                account=e.account,
-                debit=e.debit,
-                credit=e.credit,
-                dimension=e.dimension,
-            )
-        )
-    diff = round(total_debit - total_credit, 2)
-    if diff != 0.0:
-        import os as _os
-        env = _os.environ.get("APP_ENV", "local").lower()
-        # Allow auto-balance only in test/ci when VAT scenario is present
-        has_vat_context = (body.vat_code is not None) or any(str(e.account).startswith("264") for e in body.entries)
-        if env in ("test", "ci") and has_vat_context:
-            # Auto-balance for tests to allow VAT scenarios with partial deductible amounts
-            if diff < 0:
-                # More credit than debit -> add missing debit on cash
-                session.add(Entry(verification_id=v.id, account="1910", debit=abs(diff), credit=0.0))
-            else:
-                # More debit than credit -> add missing credit on cash
-                session.add(Entry(verification_id=v.id, account="1910", debit=0.0, credit=diff))
-        else:
-            raise HTTPException(status_code=400, detail="Entries must balance (debit == credit)")
-
-    # Run compliance rules before committing
-    # This uses the pending entries (flushed) for accurate evaluation
-    flags = await run_verification_rules(session, v)
+    v, flags = await _stage_verification(session, body, next_seq)
     error_flags = [f for f in flags if f.severity == "error"]
     # In non-local environments, block on errors. In local/test/ci, allow to keep developer tests simple
-    import os as _os
-    _env = _os.environ.get("APP_ENV", settings.app_env).lower()
-    if error_flags and _env not in {"local", "test", "ci"}:
+    if error_flags and _blocks_on_compliance_errors():
         # Roll back the uncommitted verification and entries
         await session.rollback()
         details = [{"rule": f.rule_code, "message": f.message} for f in error_flags]
@@ -169,6 +206,86 @@ async def create_verification(
     return {"id": v.id, "immutable_seq": v.immutable_seq, "audit_hash": chain_hash}
 
 
+async def create_verifications_batch(bodies: List[VerificationIn], session: AsyncSession) -> list[dict]:
+    """Post several verifications in one transaction.
+
+    Period locks and per-org sequence heads are loaded once for the whole batch. Items that fail
+    validation are reported in place as ``{"error": ...}`` without aborting the others; the
+    accepted ones are committed together and their audit events chained in one follow-up
+    transaction, mirroring :func:`create_verification`.
+    """
+    if not bodies:
+        return []
+    try:
+        await session.run_sync(lambda conn: Base.metadata.create_all(bind=conn))
+    except Exception:
+        pass
+    org_ids = {int(b.org_id) for b in bodies}
+    locks = (await session.execute(select(PeriodLock).where(PeriodLock.org_id.in_(org_ids)))).scalars().all()
+    seq_rows = await session.execute(
+        select(Verification.org_id, func.coalesce(func.max(Verification.immutable_seq), 0))
+        .where(Verification.org_id.in_(org_ids))
+        .group_by(Verification.org_id)
+    )
+    seq_head: dict[int, int] = {org: 0 for org in org_ids}
+    for org, head in seq_rows.all():
+        seq_head[int(org)] = int(head or 0)
+
+    results: list[dict] = []
+    staged: list[tuple[int, Verification, VerificationIn, list[RuleFlag]]] = []
+    for body in bodies:
+        org = int(body.org_id)
+        if any(lk.org_id == org and lk.start_date <= body.date <= lk.end_date for lk in locks):
+            results.append({"error": "period is locked for selected date"})
+            continue
+        # Each item is staged in its own savepoint so a rejected one takes everything it touched
+        # (entries, explanation, open items and settlements of other items) with it
+        savepoint = await session.begin_nested()
+        try:
+            v, flags = await _stage_verification(session, body, seq_head[org] + 1)
+        except HTTPException as exc:
+            await savepoint.rollback()
+            results.append({"error": exc.detail})
+            continue
+        error_flags = [f for f in flags if f.severity == "error"]
+        if error_flags and _blocks_on_compliance_errors():
+            # Drop only this item; its sequence number is reused by the next one
+            await savepoint.rollback()
+            try:
+                record_compliance_block(org, "post")
+            except Exception:
+                pass
+            results.append({"error": {"errors": [{"rule": f.rule_code, "message": f.message} for f in error_flags]}})
+            continue
+        await savepoint.commit()
+        seq_head[org] = int(v.immutable_seq)
+        staged.append((len(results), v, body, flags))
+        results.append({})
+    await session.commit()
+    if not staged:
+        return results
+
+    async with session.begin():
+        for idx, v, body, _flags in staged:
+            chain_hash = await append_audit_event(
+                session,
+                actor="system",
+                action="verification.create",
+                target=f"verifications:{v.id}",
+                event_payload_hash=_hash_verification_payload(body),
+            )
+            results[idx] = {"id": v.id, "immutable_seq": v.immutable_seq, "audit_hash": chain_hash}
+    pending_flags = False
+    for _idx, v, _body, flags in staged:
+        non_blocking = [f for f in flags if f.severity in {"warning", "info"}]
+        if non_blocking:
+            await persist_flags(session, "verification", v.id, non_blocking, commit=False)
+            pending_flags = True
+    if pending_flags:
+        await session.commit()
+    return results
+
+
 @router.get("")
 async def list_verifications(year: Optional[int] = None, session: AsyncSession = Depends(get_session), user=Depends(require_user), _rl: None = Depends(enforce_rate_limit)) -> list[dict]:
     stmt = select(Verification)
@@ -181,6 +298,7 @@ async def list_verifications(year: Optional[int] = None, session: AsyncSession =
     if _env not in {"local", "test", "ci"} and claim_org:
         stmt = stmt.where(Verification.org_id == int(claim_org))
     rows = (await session.execute(stmt.order_by(Verification.id.desc()))).scalars().all()
+    explanations = await load_explanations(session, [r.id for r in rows])
     return [
         {
             "id": r.id,
@@ -189,11 +307,85 @@ async def list_verifications(year: Optional[int] = None, session: AsyncSession =
             "date": r.date.isoformat(),
             "total_amount": float(r.total_amount),
             "currency": r.currency,
+            "explainability": explanations[r.id].reason if r.id in explanations else None,
         }
         for r in rows
     ]
 
 
+async def load_explanations(session: AsyncSession, verification_ids: List[int]) -> dict[int, VerificationExplanation]:
+    """Explanations for many verifications, keyed by verification id (missing ids are absent)."""
+    out: dict[int, VerificationExplanation] = {}
+    ids = list(dict.fromkeys(verification_ids))
+    for start in range(0, len(ids), VALUES_CHUNK_SIZE):
+        chunk = ids[start:start + VALUES_CHUNK_SIZE]
+        stmt = select(VerificationExplanation).where(VerificationExplanation.verification_id.in_(chunk))
+        for ex in (await session.execute(stmt)).scalars().all():
+            out[int(ex.verification_id)] = ex
+    return out
+
+
+def _explanation_out(ex: VerificationExplanation | None) -> Optional[dict]:
+    if ex is None:
+        return None
+    try:
+        features = json.loads(ex.features_json) if ex.features_json else {}
+    except ValueError:
+        features = {}
+    return {
+        "reason": ex.reason,
+        "model": ex.model,
+        "confidence": float(ex.confidence) if ex.confidence is not None else None,
+        "features": features,
+    }
+
+
+@router.get("/open-items")
+async def list_open_items(
+    type: str | None = None,  # "ar" or "ap" or None for both
+    counterparty: str | None = None,
+    min_amount: float = 0.01,
+    limit: int = 100,
+    org_id: int | None = None,
+    session: AsyncSession = Depends(get_session),
+    user=Depends(require_user),
+) -> dict:
+    # Served from the open_items subledger: cost scales with open items, not ledger size
+    selected_org = org_id or user.get("org_id")
+    if selected_org:
+        try:
+            require_org(user, int(selected_org))
+        except Exception:
+            pass
+    items = await summarize_open_items(
+        session,
+        int(selected_org) if selected_org else None,
+        type=type,
+        counterparty=counterparty,
+        min_amount=min_amount,
+        limit=limit,
+    )
+    return {"items": items}
+
+
+@router.get("/open-items/aging")
+async def open_items_aging(
+    org_id: int | None = None,
+    session: AsyncSession = Depends(get_session),
+    user=Depends(require_user),
+) -> dict:
+    selected_org = int(org_id or user.get("org_id") or 1)
+    try:
+        require_org(user, selected_org)
+    except Exception:
+        pass
+    return {
+        "org_id": selected_org,
+        "ar": await aging_totals(session, selected_org, "ar"),
+        "ap": await aging_totals(session, selected_org, "ap"),
+    }
+
+
 @router.get("/{ver_id}")
 async def get_verification(ver_id: int, session: AsyncSession = Depends(get_session), user=Depends(require_user)) -> dict:
     vstmt = select(Verification).where(Verification.id == ver_id)
@@ -214,16 +406,7 @@ async def get_verification(ver_id: int, session: AsyncSession = Depends(get_sess
         .limit(1)
     )
     audit_hash = (await session.execute(at_stmt)).scalar_one_or_none()
-    # Try load explainability sidecar if exists
-    explainability: Optional[str] = None
-    try:
-        from pathlib import Path
-        import json
-        meta_path = Path(".verification_meta") / f"{v.id}.json"
-        if meta_path.exists():
-            explainability = (json.loads(meta_path.read_text(encoding="utf-8")).get("explainability") or None)
-    except Exception:
-        explainability = None
+    explanation = (await load_explanations(session, [v.id])).get(v.id)
 
     return {
         "id": v.id,
@@ -244,7 +427,8 @@ async def get_verification(ver_id: int, session: AsyncSession = Depends(get_sess
             for e in entries
         ],
         "audit_hash": audit_hash,
-        "explainability": explainability,
+        "explainability": explanation.reason if explanation is not None else None,
+        "explanation": _explanation_out(explanation),
     }
 
 
@@ -286,6 +470,8 @@ async def reverse_verification(ver_id: int, session: AsyncSession = Depends(get_
         counterparty=v.counterparty,
         document_link=v.document_link,
         entries=reversed_entries,
+        # The reversal closes this verification's own open item, not the counterparty's oldest
+        settles_verification_id=ver_id,
     )
     created = await create_verification(vin, session)
     return created
@@ -346,47 +532,3 @@ async def correct_verification_document(ver_id: int, body: CorrectionDocumentIn,
     )
     corrected_created = await create_verification(vin, session)
     return {"corrected": corrected_created}
-
-
-@router.get("/open-items")
-async def list_open_items(
-    type: str | None = None,  # "ar" or "ap" or None for both
-    counterparty: str | None = None,
-    min_amount: float = 0.01,
-    limit: int = 100,
-    session: AsyncSession = Depends(get_session),
-    user=Depends(require_user),
-) -> dict:
-    out: list[dict] = []
-    # Accounts: AR = 1510*, AP = 2440*
-    if type in (None, "ar"):
-        stmt_ar = (
-            select(Verification.counterparty, func.sum(func.coalesce(Entry.debit, 0) - func.coalesce(Entry.credit, 0)))
-            .join(Verification, Verification.id == Entry.verification_id)
-            .where(Entry.account.like("1510%"))
-            .group_by(Verification.counterparty)
-            .order_by(func.sum(func.coalesce(Entry.debit, 0) - func.coalesce(Entry.credit, 0)).desc())
-        )
-        if counterparty:
-            stmt_ar = stmt_ar.where(Verification.counterparty.ilike(f"%{counterparty}%"))
-        rows_ar = (await session.execute(stmt_ar.limit(limit))).all()
-        for cp, amt in rows_ar:
-            val = float(amt or 0.0)
-            if val >= min_amount:
-                out.append({"counterparty": cp, "type": "ar", "open_amount": round(val, 2)})
-    if type in (None, "ap"):
-        stmt_ap = (
-            select(Verification.counterparty, func.sum(func.coalesce(Entry.credit, 0) - func.coalesce(Entry.debit, 0)))
-            .join(Verification, Verification.id == Entry.verification_id)
-            .where(Entry.account.like("2440%"))
-            .group_by(Verification.counterparty)
-            .order_by(func.sum(func.coalesce(Entry.credit, 0) - func.coalesce(Entry.debit, 0)).desc())
-        )
-        if counterparty:
-            stmt_ap = stmt_ap.where(Verification.counterparty.ilike(f"%{counterparty}%"))
-        rows_ap = (await session.execute(stmt_ap.limit(limit))).all()
-        for cp, amt in rows_ap:
-            val = float(amt or 0.0)
-            if val >= min_amount:
-                out.append({"counterparty": cp, "type": "ap", "open_amount": round(val, 2)})
-    return {"items": out[:limit]}
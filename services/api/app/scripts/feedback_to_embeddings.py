@@ -7,7 +7,7 @@ from sqlalchemy import select
 from ..config import settings
 from ..models import VendorEmbedding
 from ..models_feedback import AiFeedback
-from ..vendor_embeddings import embed_vendor_name
+from ..vendor_embeddings import embed_vendor_name, model_id
 
 
 async def main() -> None:
@@ -22,7 +22,12 @@ async def main() -> None:
                 continue
             row = (await session.execute(select(VendorEmbedding).where(VendorEmbedding.name == fb.vendor))).scalars().first()
             if row is None:
-                row = VendorEmbedding(name=fb.vendor, suggested_account=fb.correct_account or None, vat_rate=fb.correct_vat_rate)
+                row = VendorEmbedding(
+                    name=fb.vendor,
+                    suggested_account=fb.correct_account or None,
+                    vat_rate=fb.correct_vat_rate,
+                    embedding_model=model_id(),
+                )
                 try:
                     row.embedding = embed_vendor_name(fb.vendor)  # type: ignore[assignment]
                 except Exception:
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from io import BytesIO
+
+from ..config import settings
+from ..ocr import _tesseract_text
+from ..ocr_pool import run_cpu, shutdown_pool, warm_pool
+
+
+def _receipt_image(i: int) -> bytes:
+    from PIL import Image, ImageDraw  # type: ignore
+
+    img = Image.new("L", (1200, 1800), color=255)
+    draw = ImageDraw.Draw(img)
+    lines = [f"Kaffe AB {i}", "Org.nr 556677-8899", "2025-01-15", "Bulle 25,00", "Kaffe 39,00", "Moms 12% 6,86", f"Totalt {64 + i},00 kr"]
+    for n, ln in enumerate(lines):
+        draw.text((80, 100 + n * 90), ln, fill=0)
+    buf = BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _synthetic_work(image_bytes: bytes) -> str:
+    """Pillow-only stand-in for the OpenCV+Tesseract job when those aren't installed."""
+    from PIL import Image, ImageFilter, ImageOps  # type: ignore
+
+    img = ImageOps.grayscale(Image.open(BytesIO(image_bytes)))
+    for _ in range(3):
+        img = img.filter(ImageFilter.MedianFilter(5))
+    img = img.rotate(1.5, expand=False)
+    return str(sum(img.histogram()))
+
+
+async def main(jobs: int, concurrency: int, synthetic: bool) -> None:
+    fn = _synthetic_work if synthetic else _tesseract_text
+    images = [_receipt_image(i) for i in range(jobs)]
+
+    # Baseline: what the API did before, one job at a time in the calling thread
+    t0 = time.perf_counter()
+    for img in images:
+        fn(img)
+    serial = time.perf_counter() - t0
+
+    await warm_pool()
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(img: bytes) -> None:
+        async with sem:
+            await run_cpu(fn, img)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(img) for img in images))
+    pooled = time.perf_counter() - t0
+    shutdown_pool()
+    print({
+        "jobs": jobs,
+        "workload": "synthetic" if synthetic else "tesseract",
+        "pool_workers": settings.ocr_pool_workers,
+        "concurrency": concurrency,
+        "serial_s": round(serial, 3),
+        "pool_s": round(pooled, 3),
+        "serial_jobs_per_s": round(jobs / serial, 2),
+        "pool_jobs_per_s": round(jobs / pooled, 2),
+        "speedup": round(serial / pooled, 2),
+    })
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Compare serial OCR against the OCR process pool")
+    ap.add_argument("--jobs", type=int, default=24)
+    ap.add_argument("--concurrency", type=int, default=settings.ocr_worker_concurrency)
+    ap.add_argument("--synthetic", action="store_true", help="Pillow-only workload (no Tesseract/OpenCV needed)")
+    args = ap.parse_args()
+    asyncio.run(main(args.jobs, args.concurrency, args.synthetic))
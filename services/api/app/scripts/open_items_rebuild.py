@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from ..config import settings
+from ..open_items import rebuild_open_items
+
+
+async def main(org_id: int | None = None) -> None:
+    engine = create_async_engine(settings.database_url, future=True, echo=False)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    async with Session() as session:
+        # Replay 1510/2440 postings in date order to (re)build the open-item subledger
+        open_count = await rebuild_open_items(session, org_id)
+        await session.commit()
+        print({"org_id": org_id, "open_items": open_count})
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else None))
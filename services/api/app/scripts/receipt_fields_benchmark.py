@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from ..receipt_fields import extract_fields, get_patterns
+
+
+# Accuracy and throughput of the receipt field extractor over the anonymised corpus in
+# tests/data/receipt_corpus.jsonl, optionally topped up with generated receipts:
+#   python -m services.api.app.scripts.receipt_fields_benchmark --synthetic 2000 --repeat 5
+
+CORPUS = Path(__file__).resolve().parents[2] / "tests" / "data" / "receipt_corpus.jsonl"
+
+_VENDORS = ["Livs Norra AB", "Kafé Centrum HB", "Bygg & Järn i Väst AB", "Taxi Syd AB", "Bensinstation E4 AB", "Restaurang Hamnen AB"]
+_ITEMS = [("Kaffe", 12), ("Bulle", 12), ("Lunch dagens", 12), ("Skruv 4x40", 25), ("Diesel", 25), ("Resa", 6), ("Tidning", 6)]
+_TOTAL_LABELS = ["Att betala", "Summa att betala", "Totalt", "TOTAL", "Summa"]
+
+
+def _kr(amount: float) -> str:
+    whole, frac = f"{amount:.2f}".split(".")
+    grouped = f"{int(whole):,}".replace(",", " ")
+    return f"{grouped},{frac}"
+
+
+def _org_number(rng: random.Random) -> str:
+    digits = [5, 5, 6] + [rng.randint(0, 9) for _ in range(6)]
+    total = 0
+    for i, d in enumerate(digits):
+        n = d * (2 if i % 2 == 0 else 1)
+        total += n - 9 if n > 9 else n
+    digits.append((10 - total % 10) % 10)
+    s = "".join(map(str, digits))
+    return f"{s[:6]}-{s[6:]}"
+
+
+def synthetic_receipt(rng: random.Random) -> Tuple[str, Dict[str, str]]:
+    """One generated receipt and the fields the extractor should return for it."""
+    vendor = rng.choice(_VENDORS)
+    y, m, d = 2025, rng.randint(1, 12), rng.randint(1, 28)
+    org = _org_number(rng)
+    receipt_no = str(rng.randint(1000, 999999))
+    lines = [vendor, f"Org.nr {org}"]
+    lines.append(rng.choice([f"{y}-{m:02d}-{d:02d} 12:{rng.randint(10, 59)}", f"{d:02d}.{m:02d}.{y}", f"Datum: {y}/{m:02d}/{d:02d}"]))
+    lines.append(f"Kvitto nr {receipt_no}")
+    vat: Dict[int, float] = {}
+    gross = 0.0
+    for _ in range(rng.randint(1, 8)):
+        name, rate = rng.choice(_ITEMS)
+        price = round(rng.uniform(5, 900), 2)
+        gross += price
+        vat[rate] = vat.get(rate, 0.0) + price * rate / (100 + rate)
+        lines.append(f"{name} {_kr(price)}")
+    gross = round(gross, 2)
+    if rng.random() < 0.3:
+        lines.append(f"Delsumma {_kr(gross)}")
+    lines.append(f"{rng.choice(_TOTAL_LABELS)} {_kr(gross)}{rng.choice(['', ' kr', ' SEK'])}")
+    for rate, amount in sorted(vat.items(), reverse=True):
+        lines.append(f"Moms {rate}% {_kr(amount)} {_kr(gross)}")
+    if rng.random() < 0.3:
+        paid = float(int(gross // 100 + 1) * 100)
+        lines += [f"Kontant {_kr(paid)}", f"Växel {_kr(paid - gross)}"]
+    expected = {
+        "date": f"{y}-{m:02d}-{d:02d}",
+        "total": f"{gross:.2f}",
+        "vendor": vendor,
+        "vat_amount": f"{sum(round(v, 2) for v in vat.values()):.2f}",
+        "org_number": org,
+        "receipt_number": receipt_no,
+    }
+    for rate, amount in vat.items():
+        expected[f"vat_amount_{rate}"] = f"{amount:.2f}"
+    return "\n".join(lines), expected
+
+
+def load_corpus(path: Path = CORPUS) -> List[Tuple[str, Dict[str, str]]]:
+    rows = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if line.strip():
+            obj = json.loads(line)
+            rows.append((obj["text"], obj["expected"]))
+    return rows
+
+
+def score(corpus: List[Tuple[str, Dict[str, str]]]) -> Dict[str, dict]:
+    """Per-field accuracy: exact matches over receipts where the field is expected."""
+    hits: Dict[str, int] = {}
+    seen: Dict[str, int] = {}
+    misses: List[dict] = []
+    for text, expected in corpus:
+        got = {k: v for k, v, _c in extract_fields(text)}
+        for key, want in expected.items():
+            seen[key] = seen.get(key, 0) + 1
+            if got.get(key) == want:
+                hits[key] = hits.get(key, 0) + 1
+            elif len(misses) < 20:
+                misses.append({"field": key, "expected": want, "got": got.get(key), "text": text[:80]})
+    fields = {k: round(hits.get(k, 0) / n, 4) for k, n in sorted(seen.items())}
+    return {"fields": fields, "misses": misses}
+
+
+def throughput(texts: List[str], repeat: int) -> float:
+    get_patterns()  # compile outside the timed loop
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            extract_fields(text)
+    return len(texts) * repeat / (time.perf_counter() - t0)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Accuracy/throughput benchmark for receipt field extraction")
+    ap.add_argument("--corpus", default=str(CORPUS))
+    ap.add_argument("--synthetic", type=int, default=0, help="add N generated receipts")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--show-misses", action="store_true")
+    args = ap.parse_args()
+    corpus = load_corpus(Path(args.corpus))
+    rng = random.Random(args.seed)
+    corpus += [synthetic_receipt(rng) for _ in range(args.synthetic)]
+    report = score(corpus)
+    out = {
+        "receipts": len(corpus),
+        "patterns_version": get_patterns().version,
+        "accuracy": report["fields"],
+        "receipts_per_s": round(throughput([t for t, _ in corpus], args.repeat), 1),
+    }
+    if args.show_misses:
+        out["misses"] = report["misses"]
+    print(json.dumps(out, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
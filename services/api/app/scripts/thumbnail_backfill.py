@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from ..config import settings
+from ..models import Document
+from ..ocr_queue import read_document_bytes
+from ..renditions import generate, missing
+from ..routers.ingest import _store_dir
+from ..storage_backend import LocalBackend
+
+
+def _backfill_one(digest: str, storage_uri: str, force: bool) -> str:
+    store_dir = _store_dir(digest)
+    if not force and not missing(store_dir, digest):
+        return "present"
+    try:
+        data = read_document_bytes(LocalBackend().find(digest) or storage_uri)
+        generate(store_dir, digest, data, force=force)
+    except Exception:
+        return "failed"
+    return "rendered"
+
+
+async def main(batch: int, workers: int, force: bool) -> None:
+    engine = create_async_engine(settings.database_url, future=True, echo=False)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    counts = {"rendered": 0, "present": 0, "failed": 0}
+    sem = asyncio.Semaphore(max(1, workers))
+
+    async def one(digest: str, uri: str) -> None:
+        async with sem:
+            counts[await asyncio.to_thread(_backfill_one, digest, uri, force)] += 1
+
+    last_id = 0
+    async with Session() as session:
+        while True:
+            # Keyset pagination so long backfills don't re-scan from the start
+            rows = (await session.execute(
+                select(Document.id, Document.hash_sha256, Document.storage_uri)
+                .where(Document.id > last_id)
+                .order_by(Document.id)
+                .limit(batch)
+            )).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            await asyncio.gather(*(one(digest, uri or "") for _id, digest, uri in rows))
+    await engine.dispose()
+    print(counts)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Render missing thumbnail renditions for existing documents")
+    ap.add_argument("--batch", type=int, default=200)
+    ap.add_argument("--workers", type=int, default=settings.ingest_workers)
+    ap.add_argument("--force", action="store_true", help="re-render renditions that already exist")
+    args = ap.parse_args()
+    asyncio.run(main(args.batch, args.workers, args.force))
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from io import BytesIO
+
+from ..config import settings
+from ..metrics_flow import get_stage_stats
+from ..upload_pipeline import allowed_mimes, run, run_sync
+
+
+def _phone_photo(i: int, width: int, height: int) -> bytes:
+    from PIL import Image, ImageDraw  # type: ignore
+
+    img = Image.new("RGB", (width, height), color=(235, 232, 225))
+    draw = ImageDraw.Draw(img)
+    for n in range(40):
+        draw.text((200, 200 + n * 80), f"Kaffe AB {i} rad {n}  39,00", fill=(20, 20, 20))
+    buf = BytesIO()
+    img.save(buf, format="JPEG", quality=92)
+    return buf.getvalue()
+
+
+async def _heartbeat(stop: asyncio.Event, lags: list[float], interval: float = 0.01) -> None:
+    # Stand-in for every other request on the worker: how late does a 10 ms timer fire?
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - t0 - interval)
+
+
+async def _measure(uploads: list[bytes], concurrency: int, inline: bool) -> dict:
+    allowed = allowed_mimes()
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(data: bytes) -> None:
+        async with sem:
+            if inline:
+                # What upload_document did before: every stage directly on the event loop
+                run_sync(data, "image/jpeg", allowed)
+                await asyncio.sleep(0)
+            else:
+                await run(data, "image/jpeg", allowed)
+
+    stop = asyncio.Event()
+    lags: list[float] = []
+    hb = asyncio.create_task(_heartbeat(stop, lags))
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(d) for d in uploads))
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    await hb
+    lags.sort()
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "uploads_per_s": round(len(uploads) / elapsed, 2),
+        "loop_lag_p95_ms": round(lags[int(0.95 * (len(lags) - 1))] * 1000, 1) if lags else None,
+        "loop_lag_max_ms": round(lags[-1] * 1000, 1) if lags else None,
+    }
+
+
+async def main(uploads: int, concurrency: int, width: int, height: int) -> None:
+    photos = [_phone_photo(i, width, height) for i in range(uploads)]
+    inline = await _measure(photos, concurrency, inline=True)
+    pipeline = await _measure(photos, concurrency, inline=False)
+    print({
+        "uploads": uploads,
+        "photo": f"{width}x{height}",
+        "max_edge": settings.upload_image_max_edge,
+        "ingest_workers": settings.ingest_workers,
+        "inline": inline,
+        "pipeline": pipeline,
+        "stages": get_stage_stats(),
+    })
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Upload sanitization throughput and event-loop lag, inline vs executor pipeline")
+    ap.add_argument("--uploads", type=int, default=16)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--width", type=int, default=3024)
+    ap.add_argument("--height", type=int, default=4032)
+    args = ap.parse_args()
+    asyncio.run(main(args.uploads, args.concurrency, args.width, args.height))
@@ -1,36 +1,47 @@
 from __future__ import annotations
 
+import argparse
 import asyncio
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
-from sqlalchemy import select, update
+from sqlalchemy import or_, select, update
 
 from ..config import settings
 from ..models import VendorEmbedding
-from ..vendor_embeddings import embed_vendor_name
+from ..vendor_embeddings import embed_vendor_names, model_id
 
 
-async def main() -> None:
+# Re-embed the vendor table in batches, e.g. after changing embeddings_provider/embedding_dim.
+# By default only rows produced by another model (or never tagged) are re-embedded; --all redoes everything.
+
+async def main(batch: int, all_rows: bool) -> None:
     engine = create_async_engine(settings.database_url, future=True, echo=False)
     Session = async_sessionmaker(engine, expire_on_commit=False)
+    mid = model_id()
+    updated = 0
+    last_id = 0
     async with Session() as session:
-        rows = (await session.execute(select(VendorEmbedding))).scalars().all()
-        updated = 0
-        for r in rows:
-            try:
-                vec = embed_vendor_name(r.name)
-            except Exception:
-                continue
-            # Store as comma-separated if pgvector not available
-            try:
-                r.embedding = vec  # type: ignore[assignment]
-            except Exception:
-                r.embedding = ",".join(f"{v:.6f}" for v in vec)  # type: ignore[assignment]
-            updated += 1
-        await session.commit()
-        print({"updated": updated})
+        while True:
+            stmt = select(VendorEmbedding.id, VendorEmbedding.name).where(VendorEmbedding.id > last_id)
+            if not all_rows:
+                stmt = stmt.where(or_(VendorEmbedding.embedding_model.is_(None), VendorEmbedding.embedding_model != mid))
+            rows = (await session.execute(stmt.order_by(VendorEmbedding.id).limit(batch))).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            vectors = await asyncio.to_thread(embed_vendor_names, [name for _id, name in rows])
+            await session.execute(
+                update(VendorEmbedding),
+                [{"id": row_id, "embedding": vec, "embedding_model": mid} for (row_id, _name), vec in zip(rows, vectors)],
+            )
+            await session.commit()
+            updated += len(rows)
+    await engine.dispose()
+    print({"updated": updated, "model": mid})
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
-
-
+    ap = argparse.ArgumentParser(description="Bulk re-embed vendor names into vendor_embeddings")
+    ap.add_argument("--batch", type=int, default=settings.embeddings_batch_max)
+    ap.add_argument("--all", action="store_true", help="re-embed rows already tagged with the current model")
+    args = ap.parse_args()
+    asyncio.run(main(args.batch, args.all))
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import re
+from pathlib import Path
+
+from ..config import settings
+from ..segment_store import get_store
+
+
+# Maintenance for the packed local WORM store:
+#   pack    move loose originals (one file per receipt) into segments, verifying each by digest
+#   verify  re-check every record's crc32 + sha256 and the offset index; --rebuild-index repairs it
+#   seal    mark the active segment read-only (e.g. before a backup snapshot)
+
+_ORIGINAL_RE = re.compile(r"^([0-9a-f]{64})_(.+)$")
+
+
+def pack(root: Path, delete: bool, max_object_bytes: int) -> dict:
+    store = get_store(root)
+    counts = {"packed": 0, "already": 0, "skipped_large": 0, "digest_mismatch": 0, "deleted": 0}
+    for path in sorted(root.glob("[0-9a-f][0-9a-f]/[0-9a-f][0-9a-f]/*")):
+        m = _ORIGINAL_RE.match(path.name)
+        if not m or not path.is_file() or path.name.endswith(".ocr.json"):
+            continue
+        digest, filename = m.group(1), m.group(2)
+        if path.stat().st_size > max_object_bytes:
+            counts["skipped_large"] += 1
+            continue
+        data = path.read_bytes()
+        if hashlib.sha256(data).hexdigest() != digest:
+            # Content no longer matches its address; leave it for manual inspection
+            counts["digest_mismatch"] += 1
+            continue
+        entry, already = store.put(digest, filename, data)
+        counts["already" if already else "packed"] += 1
+        if delete and store.read_entry(entry, verify=True) == data:
+            path.unlink()
+            path.with_name(f"{digest}.txt").unlink(missing_ok=True)
+            counts["deleted"] += 1
+    return counts
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Pack, verify and seal the segmented local WORM store")
+    ap.add_argument("command", choices=["pack", "verify", "seal"])
+    ap.add_argument("--root", default=".worm_store")
+    ap.add_argument("--delete", action="store_true", help="pack: remove loose files once their packed copy verifies")
+    ap.add_argument("--rebuild-index", action="store_true", help="verify: index records missing from the offset index")
+    args = ap.parse_args()
+    root = Path(args.root)
+    store = get_store(root)
+    if args.command == "pack":
+        print(pack(root, args.delete, int(settings.worm_segment_max_object_bytes)))
+    elif args.command == "verify":
+        report = store.verify(rebuild_index=args.rebuild_index)
+        print(report)
+        if not report["ok"]:
+            raise SystemExit(1)
+    else:
+        numbers = store.segments()
+        if numbers:
+            store.seal(numbers[-1])
+        print({"sealed": numbers[-1] if numbers else None})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""Indexed text search over bank transactions, verifications and document OCR text.
+
+Postgres: pg_trgm GIN indexes (migration 20261019_000005) ranked by ``word_similarity``.
+SQLite: an FTS5 trigram shadow table (``search_fts``) kept in sync by triggers on the source
+tables, ranked by bm25. Both backends expose the same ``(kind, ref_id, score)`` hit relation so
+ranking and keyset pagination are shared.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+import re
+from typing import Any, Optional, Sequence
+
+from sqlalchemy import Float, Integer, String, and_, event, func, literal, literal_column, or_, select, text, union_all
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql.expression import ColumnElement, Subquery
+
+from .models import BankTransaction, Document, Verification
+
+
+SEARCH_KINDS: tuple[str, ...] = ("bank", "verification", "document")
+FTS_TABLE = "search_fts"
+# FTS rowid encodes (source id, kind) as id * 4 + {bank: 1, verification: 2, document: 3} so
+# triggers can delete by rowid instead of scanning the UNINDEXED columns
+_MIN_TRIGRAM_QUERY = 3
+
+_BANK_BODY = "coalesce(new.description, '') || ' ' || coalesce(new.counterparty_ref, '')"
+
+_SQLITE_FTS_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+    "USING fts5(kind UNINDEXED, org_id UNINDEXED, body, tokenize='trigram')"
+)
+
+_SQLITE_TRIGGERS: dict[str, tuple[str, ...]] = {
+    "bank_transactions": (
+        f"""CREATE TRIGGER IF NOT EXISTS bank_transactions_search_ai AFTER INSERT ON bank_transactions BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, kind, org_id, body) VALUES (new.id * 4 + 1, 'bank', new.org_id, {_BANK_BODY});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS bank_transactions_search_au
+            AFTER UPDATE OF description, counterparty_ref, org_id ON bank_transactions BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id * 4 + 1;
+            INSERT INTO {FTS_TABLE}(rowid, kind, org_id, body) VALUES (new.id * 4 + 1, 'bank', new.org_id, {_BANK_BODY});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS bank_transactions_search_ad AFTER DELETE ON bank_transactions BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id * 4 + 1;
+        END""",
+    ),
+    "verifications": (
+        f"""CREATE TRIGGER IF NOT EXISTS verifications_search_ai AFTER INSERT ON verifications BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, kind, org_id, body)
+            VALUES (new.id * 4 + 2, 'verification', new.org_id, coalesce(new.counterparty, ''));
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS verifications_search_au AFTER UPDATE OF counterparty ON verifications BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id * 4 + 2;
+            INSERT INTO {FTS_TABLE}(rowid, kind, org_id, body)
+            VALUES (new.id * 4 + 2, 'verification', new.org_id, coalesce(new.counterparty, ''));
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS verifications_search_ad AFTER DELETE ON verifications BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id * 4 + 2;
+        END""",
+    ),
+    "documents": (
+        f"""CREATE TRIGGER IF NOT EXISTS documents_search_ai AFTER INSERT ON documents BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, kind, org_id, body)
+            VALUES (new.id * 4 + 3, 'document', new.org_id, coalesce(new.ocr_text, ''));
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS documents_search_au AFTER UPDATE OF ocr_text ON documents BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id * 4 + 3;
+            INSERT INTO {FTS_TABLE}(rowid, kind, org_id, body)
+            VALUES (new.id * 4 + 3, 'document', new.org_id, coalesce(new.ocr_text, ''));
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS documents_search_ad AFTER DELETE ON documents BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id * 4 + 3;
+        END""",
+    ),
+}
+
+_SQLITE_BACKFILL: dict[str, str] = {
+    "bank_transactions": (
+        f"INSERT INTO {FTS_TABLE}(rowid, kind, org_id, body) SELECT id * 4 + 1, 'bank', org_id, "
+        "coalesce(description, '') || ' ' || coalesce(counterparty_ref, '') FROM bank_transactions"
+    ),
+    "verifications": (
+        f"INSERT INTO {FTS_TABLE}(rowid, kind, org_id, body) SELECT id * 4 + 2, 'verification', org_id, "
+        "coalesce(counterparty, '') FROM verifications"
+    ),
+    "documents": (
+        f"INSERT INTO {FTS_TABLE}(rowid, kind, org_id, body) SELECT id * 4 + 3, 'document', org_id, "
+        "coalesce(ocr_text, '') FROM documents"
+    ),
+}
+
+
+def _install_sqlite_triggers(connection: Connection, table: str) -> None:
+    connection.exec_driver_sql(_SQLITE_FTS_DDL)
+    for stmt in _SQLITE_TRIGGERS[table]:
+        connection.exec_driver_sql(stmt)
+
+
+def install_sqlite_search(connection: Connection) -> None:
+    """Idempotently create the FTS shadow table and triggers on an existing SQLite database.
+
+    The shadow table is backfilled from the source tables only when it did not exist before.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    existed = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+    ).first() is not None
+    tables = {
+        r[0] for r in connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+    }
+    for table in _SQLITE_TRIGGERS:
+        if table in tables:
+            _install_sqlite_triggers(connection, table)
+            if not existed:
+                connection.exec_driver_sql(_SQLITE_BACKFILL[table])
+
+
+def _on_table_created(target: Any, connection: Connection, **_kw: Any) -> None:
+    if connection.dialect.name == "sqlite":
+        _install_sqlite_triggers(connection, target.name)
+
+
+for _model in (BankTransaction, Verification, Document):
+    event.listen(_model.__table__, "after_create", _on_table_created)
+
+
+def _query_tokens(q: str) -> list[str]:
+    return [t for t in re.split(r"\s+", q.strip()) if t]
+
+
+def _fts_match_expression(q: str) -> Optional[str]:
+    """Fuzzy FTS5 query: each token as a phrase OR'ed with its trigrams, so near-misses still rank."""
+    terms: list[str] = []
+    for tok in _query_tokens(q):
+        if len(tok) < _MIN_TRIGRAM_QUERY:
+            continue
+        low = tok.lower()
+        terms.append(low)
+        terms.extend(low[i : i + 3] for i in range(len(low) - 2))
+    if not terms:
+        return None
+    uniq = list(dict.fromkeys(terms))
+    return " OR ".join('"' + t.replace('"', '""') + '"' for t in uniq)
+
+
+def bank_text_condition(dialect_name: str, q: str) -> ColumnElement[bool]:
+    """Substring filter on bank description/counterparty that is served by the search index.
+
+    Postgres ILIKE is accelerated by the trigram GIN indexes; on SQLite the FTS trigram table is
+    used for queries of three or more characters.
+    """
+    like = f"%{q}%"
+    ilike = or_(BankTransaction.description.ilike(like), BankTransaction.counterparty_ref.ilike(like))
+    if dialect_name != "sqlite" or len(q.strip()) < _MIN_TRIGRAM_QUERY:
+        return ilike
+    phrase = '"' + q.strip().replace('"', '""') + '"'
+    hits = text(f"SELECT rowid / 4 FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :bank_q AND kind = 'bank'").bindparams(
+        bank_q=phrase
+    )
+    return BankTransaction.id.in_(hits)
+
+
+def _sqlite_hits(q: str, org_id: int, kinds: Sequence[str]) -> Optional[Subquery]:
+    match = _fts_match_expression(q)
+    if match is None:
+        return None
+    kind_params = {f"k{i}": k for i, k in enumerate(kinds)}
+    kind_in = ", ".join(f":{p}" for p in kind_params)
+    stmt = text(
+        f"SELECT kind, rowid / 4 AS ref_id, -bm25({FTS_TABLE}) AS score FROM {FTS_TABLE} "
+        f"WHERE {FTS_TABLE} MATCH :match AND org_id = :org AND kind IN ({kind_in})"
+    ).bindparams(match=match, org=org_id, **kind_params)
+    return stmt.columns(kind=String, ref_id=Integer, score=Float).subquery("hits")
+
+
+def _pg_hits(q: str, org_id: int, kinds: Sequence[str]) -> Optional[Subquery]:
+    query = q.strip()
+    if not query:
+        return None
+    ql = literal(query)
+
+    def _score(col: Any) -> Any:
+        return func.word_similarity(ql, func.coalesce(col, ""))
+
+    parts = []
+    if "bank" in kinds:
+        parts.append(
+            select(
+                literal_column("'bank'", String).label("kind"),
+                BankTransaction.id.label("ref_id"),
+                func.greatest(_score(BankTransaction.description), _score(BankTransaction.counterparty_ref)).label("score"),
+            ).where(
+                BankTransaction.org_id == org_id,
+                or_(ql.op("<%")(BankTransaction.description), ql.op("<%")(BankTransaction.counterparty_ref)),
+            )
+        )
+    if "verification" in kinds:
+        parts.append(
+            select(
+                literal_column("'verification'", String).label("kind"),
+                Verification.id.label("ref_id"),
+                _score(Verification.counterparty).label("score"),
+            ).where(Verification.org_id == org_id, ql.op("<%")(Verification.counterparty))
+        )
+    if "document" in kinds:
+        parts.append(
+            select(
+                literal_column("'document'", String).label("kind"),
+                Document.id.label("ref_id"),
+                _score(Document.ocr_text).label("score"),
+            ).where(Document.org_id == org_id, ql.op("<%")(Document.ocr_text))
+        )
+    if not parts:
+        return None
+    return (union_all(*parts) if len(parts) > 1 else parts[0]).subquery("hits")
+
+
+def encode_cursor(score: float, kind: str, ref_id: int) -> str:
+    raw = json.dumps([float(score), kind, int(ref_id)]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[float, str, int]:
+    score, kind, ref_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    return float(score), str(kind), int(ref_id)
+
+
+async def search_hits(
+    session: Any,
+    q: str,
+    org_id: int,
+    *,
+    kinds: Sequence[str] = SEARCH_KINDS,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+) -> tuple[list[tuple[str, int, float]], Optional[str]]:
+    """Ranked ``(kind, ref_id, score)`` hits, best first, with an opaque keyset cursor for the next page."""
+    kinds = [k for k in kinds if k in SEARCH_KINDS]
+    if not kinds:
+        return [], None
+    dialect = session.get_bind().dialect.name
+    hits = _pg_hits(q, org_id, kinds) if dialect == "postgresql" else _sqlite_hits(q, org_id, kinds)
+    if hits is None:
+        return [], None
+    stmt = select(hits.c.kind, hits.c.ref_id, hits.c.score)
+    if cursor:
+        c_score, c_kind, c_ref = decode_cursor(cursor)
+        stmt = stmt.where(
+            or_(
+                hits.c.score < c_score,
+                and_(
+                    hits.c.score == c_score,
+                    or_(hits.c.kind > c_kind, and_(hits.c.kind == c_kind, hits.c.ref_id > c_ref)),
+                ),
+            )
+        )
+    stmt = stmt.order_by(hits.c.score.desc(), hits.c.kind, hits.c.ref_id).limit(limit + 1)
+    rows = [(str(k), int(r), float(s or 0.0)) for k, r, s in (await session.execute(stmt)).all()]
+    next_cursor = encode_cursor(rows[limit - 1][2], rows[limit - 1][0], rows[limit - 1][1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import mmap
+import os
+import re
+import sqlite3
+import struct
+import threading
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+from .config import settings
+
+try:
+    import fcntl  # type: ignore
+except Exception:  # pragma: no cover - non-POSIX
+    fcntl = None  # type: ignore
+
+try:
+    import zstandard  # type: ignore
+except Exception:  # pragma: no cover
+    zstandard = None  # type: ignore
+
+
+# Append-only packed store for small originals. Records are appended to numbered segment files
+# (segments/00000001.seg, ...); a segment is sealed read-only once it reaches worm_segment_max_bytes
+# and is never modified again. Each record is self-describing and checksummed, so the SQLite offset
+# index (segments/index.db) is only an accelerator and can be rebuilt from the segments alone.
+#
+# Record: header | filename (utf-8) | payload
+#   header = magic, flags, sha256 digest (raw), filename length, stored length, raw length, crc32
+# crc32 covers filename + stored payload; the digest covers the raw (decompressed) content.
+
+MAGIC = b"BWS1"
+HEADER = struct.Struct("<4sB32sHQQI")
+FLAG_ZSTD = 1
+REF_PREFIX = "worm://"
+_SEGMENT_RE = re.compile(r"^(\d{8})\.seg$")
+
+
+class SegmentCorrupt(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Entry:
+    digest: str
+    filename: str
+    segment: int
+    offset: int  # start of the record header
+    stored_length: int
+    raw_length: int
+    flags: int
+
+    @property
+    def payload_offset(self) -> int:
+        return self.offset + HEADER.size + len(self.filename.encode("utf-8"))
+
+
+def make_ref(digest: str, filename: str) -> str:
+    return f"{REF_PREFIX}{digest}/{filename}"
+
+
+def parse_ref(ref: str) -> Tuple[str, str]:
+    digest, _, filename = ref[len(REF_PREFIX):].partition("/")
+    return digest, filename
+
+
+class SegmentStore:
+    def __init__(self, root: Path) -> None:
+        self.dir = Path(root) / "segments"
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._maps: Dict[int, Tuple[mmap.mmap, int]] = {}
+        self._maps_lock = threading.Lock()
+
+    # --- index -------------------------------------------------------------------------------
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.dir / "index.db", timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries (digest TEXT PRIMARY KEY, filename TEXT NOT NULL, segment INTEGER NOT NULL,"
+                " offset INTEGER NOT NULL, stored_length INTEGER NOT NULL, raw_length INTEGER NOT NULL, flags INTEGER NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def lookup(self, digest: str) -> Optional[Entry]:
+        if not self.dir.exists():
+            return None
+        row = self._db().execute(
+            "SELECT digest, filename, segment, offset, stored_length, raw_length, flags FROM entries WHERE digest = ?", (digest,)
+        ).fetchone()
+        return Entry(*row) if row else None
+
+    def _index(self, entry: Entry) -> None:
+        with self._db() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (entry.digest, entry.filename, entry.segment, entry.offset, entry.stored_length, entry.raw_length, entry.flags),
+            )
+
+    # --- writes ------------------------------------------------------------------------------
+    def segment_path(self, number: int) -> Path:
+        return self.dir / f"{number:08d}.seg"
+
+    def segments(self) -> list[int]:
+        if not self.dir.exists():
+            return []
+        return sorted(int(m.group(1)) for p in self.dir.iterdir() if (m := _SEGMENT_RE.match(p.name)))
+
+    @contextlib.contextmanager
+    def _writer(self) -> Iterator[None]:
+        # Thread lock for this process, flock for other API/worker processes sharing the store
+        with self._lock:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            with open(self.dir / ".lock", "a+") as lf:
+                if fcntl is not None:
+                    fcntl.flock(lf, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lf, fcntl.LOCK_UN)
+
+    def _encode(self, data: bytes) -> Tuple[bytes, int]:
+        if (settings.worm_segment_compression or "none").lower() == "zstd" and zstandard is not None:
+            packed = zstandard.ZstdCompressor(level=int(settings.worm_segment_zstd_level)).compress(data)
+            # JPEG/PNG rarely shrink; keep them raw so reads skip decompression
+            if len(packed) < len(data) * 0.9:
+                return packed, FLAG_ZSTD
+        return data, 0
+
+    def put(self, digest: str, filename: str, data: bytes) -> Tuple[Entry, bool]:
+        """Append ``data`` unless the digest is already stored. Returns (entry, already_stored)."""
+        existing = self.lookup(digest)
+        if existing is not None:
+            return existing, True
+        stored, flags = self._encode(data)
+        name = filename.encode("utf-8")[:1024].decode("utf-8", "ignore").encode("utf-8")
+        header = HEADER.pack(MAGIC, flags, bytes.fromhex(digest), len(name), len(stored), len(data), zlib.crc32(name + stored))
+        record_len = len(header) + len(name) + len(stored)
+        with self._writer():
+            existing = self.lookup(digest)
+            if existing is not None:
+                return existing, True
+            numbers = self.segments()
+            number = numbers[-1] if numbers else 1
+            path = self.segment_path(number)
+            size = path.stat().st_size if path.exists() else 0
+            sealed = path.exists() and not (path.stat().st_mode & 0o200)
+            if sealed or (size and size + record_len > int(settings.worm_segment_max_bytes)):
+                self.seal(number)
+                number += 1
+                path = self.segment_path(number)
+                size = 0
+            with open(path, "ab") as f:
+                f.write(header + name + stored)
+                f.flush()
+                if settings.worm_segment_fsync:
+                    os.fsync(f.fileno())
+            # A crash between append and index insert leaves an unindexed record; verify --rebuild-index finds it
+            entry = Entry(digest, name.decode("utf-8"), number, size, len(stored), len(data), flags)
+            self._index(entry)
+        return entry, False
+
+    def seal(self, number: int) -> None:
+        path = self.segment_path(number)
+        if path.exists():
+            os.chmod(path, 0o444)
+
+    # --- reads -------------------------------------------------------------------------------
+    def _map(self, number: int, needed: int) -> mmap.mmap:
+        with self._maps_lock:
+            cached = self._maps.get(number)
+            if cached is not None and cached[1] >= needed:
+                return cached[0]
+            # The active segment grows; remap when a record lies past the current mapping
+            with open(self.segment_path(number), "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # The previous mapping isn't closed here: a reader may still be slicing it (GC unmaps it)
+            self._maps[number] = (mm, size)
+            return mm
+
+    def read_entry(self, entry: Entry, verify: bool = False) -> bytes:
+        start = entry.payload_offset
+        mm = self._map(entry.segment, start + entry.stored_length)
+        stored = mm[start:start + entry.stored_length]
+        if verify:
+            name = mm[entry.offset + HEADER.size:start]
+            crc = HEADER.unpack(mm[entry.offset:entry.offset + HEADER.size])[6]
+            if zlib.crc32(name + stored) != crc:
+                raise SegmentCorrupt(f"crc mismatch for {entry.digest} in segment {entry.segment}")
+        data = zstandard.ZstdDecompressor().decompress(stored, max_output_size=entry.raw_length) if entry.flags & FLAG_ZSTD else stored
+        if verify and hashlib.sha256(data).hexdigest() != entry.digest:
+            raise SegmentCorrupt(f"digest mismatch for {entry.digest} in segment {entry.segment}")
+        return data
+
+    def get(self, digest: str) -> Optional[bytes]:
+        entry = self.lookup(digest)
+        return self.read_entry(entry) if entry is not None else None
+
+    def close(self) -> None:
+        with self._maps_lock:
+            for mm, _size in self._maps.values():
+                mm.close()
+            self._maps.clear()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # --- maintenance -------------------------------------------------------------------------
+    def scan(self, number: int) -> Iterator[Entry]:
+        """Walk a segment's records from its own headers (no index). Raises SegmentCorrupt on a bad record."""
+        path = self.segment_path(number)
+        size = path.stat().st_size
+        if size == 0:
+            return
+        mm = self._map(number, size)
+        pos = 0
+        while pos < size:
+            if pos + HEADER.size > size:
+                raise SegmentCorrupt(f"truncated header at {number}:{pos}")
+            magic, flags, digest, name_len, stored_len, raw_len, _crc = HEADER.unpack(mm[pos:pos + HEADER.size])
+            if magic != MAGIC:
+                raise SegmentCorrupt(f"bad magic at {number}:{pos}")
+            end = pos + HEADER.size + name_len + stored_len
+            if end > size:
+                raise SegmentCorrupt(f"truncated record at {number}:{pos}")
+            name = mm[pos + HEADER.size:pos + HEADER.size + name_len].decode("utf-8", "replace")
+            yield Entry(digest.hex(), name, number, pos, stored_len, raw_len, flags)
+            pos = end
+
+    def verify(self, rebuild_index: bool = False) -> dict:
+        """Check every record's checksum and digest against its content, and the index against the segments."""
+        report: dict = {"segments": 0, "records": 0, "bytes": 0, "corrupt": [], "unindexed": 0, "index_mismatch": 0, "dangling_index": 0}
+        seen: set[str] = set()
+        for number in self.segments():
+            report["segments"] += 1
+            try:
+                for entry in self.scan(number):
+                    report["records"] += 1
+                    report["bytes"] += entry.stored_length
+                    try:
+                        self.read_entry(entry, verify=True)
+                    except SegmentCorrupt as e:
+                        report["corrupt"].append(str(e))
+                        continue
+                    seen.add(entry.digest)
+                    indexed = self.lookup(entry.digest)
+                    if indexed is None:
+                        report["unindexed"] += 1
+                        if rebuild_index:
+                            self._index(entry)
+                    elif (indexed.segment, indexed.offset) != (entry.segment, entry.offset):
+                        report["index_mismatch"] += 1
+            except SegmentCorrupt as e:
+                report["corrupt"].append(str(e))
+        if self.dir.exists():
+            indexed = {row[0] for row in self._db().execute("SELECT digest FROM entries")}
+            report["dangling_index"] = len(indexed - seen)
+        report["ok"] = not (report["corrupt"] or report["dangling_index"] or (report["unindexed"] and not rebuild_index))
+        return report
+
+
+_stores: Dict[str, SegmentStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(root: Path) -> SegmentStore:
+    key = str(Path(root).resolve())
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = SegmentStore(Path(root))
+        return store
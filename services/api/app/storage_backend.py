@@ -0,0 +1,401 @@
+from __future__ import annotations
+
+import asyncio
+import mimetypes
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator, Optional, Tuple
+
+from .config import settings
+from .segment_store import REF_PREFIX, Entry, SegmentStore, get_store as get_segment_store, make_ref, parse_ref
+
+
+# Originals are content-addressed: every backend stores them under {d[:2]}/{d[2:4]}/{digest}_{filename}
+# and hands back a reference string (local path, s3:// URI or Supabase URL) that is kept in
+# Document.storage_uri. Backend methods are blocking; call them via ``run`` (or from a worker thread).
+
+CHUNK_SIZE = 256 * 1024
+
+
+def object_key(digest: str, filename: str) -> str:
+    return f"{digest[:2]}/{digest[2:4]}/{digest}_{filename}"
+
+
+def _content_type(filename: str) -> str:
+    return mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+
+class StorageBackend:
+    name = "base"
+
+    def put(self, digest: str, filename: str, data: bytes | BinaryIO, content_type: Optional[str] = None) -> Tuple[str, bool]:
+        """Store an original. Returns (ref, already_stored); existing objects are never overwritten."""
+        raise NotImplementedError
+
+    def find(self, digest: str) -> Optional[str]:
+        """Reference of the stored original for ``digest``, if any."""
+        raise NotImplementedError
+
+    def exists(self, ref: str) -> bool:
+        raise NotImplementedError
+
+    def size(self, ref: str) -> int:
+        raise NotImplementedError
+
+    def iter_range(self, ref: str, start: int = 0, end: Optional[int] = None, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """Yield bytes ``start``..``end`` (inclusive; ``None`` = to EOF) in chunks."""
+        raise NotImplementedError
+
+    def read(self, ref: str) -> bytes:
+        return b"".join(self.iter_range(ref))
+
+    def ping(self) -> bool:
+        raise NotImplementedError
+
+
+class LocalBackend(StorageBackend):
+    """Local WORM store under ``.worm_store`` (relative to the working directory).
+
+    With ``worm_store_layout = "segments"`` originals up to ``worm_segment_max_object_bytes`` are packed
+    into append-only segment files (refs ``worm://{digest}/{filename}``); larger ones, and everything
+    in the default ``files`` layout, are stored one file per original in a two-level hex fan-out.
+    """
+
+    name = "local"
+
+    def __init__(self, root: str | Path = ".worm_store") -> None:
+        self.root = Path(root)
+
+    def dir_for(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest[2:4]
+
+    def segments(self) -> SegmentStore:
+        return get_segment_store(self.root)
+
+    def _packs(self, size: int) -> bool:
+        return (settings.worm_store_layout or "files") == "segments" and size <= int(settings.worm_segment_max_object_bytes)
+
+    def put(self, digest: str, filename: str, data: bytes | BinaryIO, content_type: Optional[str] = None) -> Tuple[str, bool]:
+        payload = data if isinstance(data, bytes) else data.read()
+        existing = self.find(digest)
+        if existing is not None:
+            return existing, True
+        if self._packs(len(payload)):
+            entry, stored = self.segments().put(digest, filename, payload)
+            return make_ref(digest, entry.filename), stored
+        store_dir = self.dir_for(digest)
+        store_dir.mkdir(parents=True, exist_ok=True)
+        fpath = store_dir / f"{digest}_{filename}"
+        with fpath.open("wb") as f:
+            f.write(payload)
+        # Write simple OCR sidecar stub (length)
+        (store_dir / f"{digest}.txt").write_text(f"len:{len(payload)}")
+        return str(fpath), False
+
+    def find(self, digest: str) -> Optional[str]:
+        entry = self.segments().lookup(digest)
+        if entry is not None:
+            return make_ref(digest, entry.filename)
+        store_dir = self.dir_for(digest)
+        if not store_dir.exists():
+            return None
+        for p in store_dir.iterdir():
+            # Skip the .ocr.json sidecar stored next to the original
+            if p.is_file() and p.name.startswith(f"{digest}_") and not p.name.endswith(".ocr.json"):
+                return str(p)
+        return None
+
+    def _entry(self, ref: str) -> Optional[Entry]:
+        """Segment entry for a ref: a worm:// ref, or a file path whose original was packed since."""
+        if ref.startswith(REF_PREFIX):
+            return self.segments().lookup(parse_ref(ref)[0])
+        if Path(ref).is_file():
+            return None
+        digest = Path(ref).name.split("_", 1)[0]
+        return self.segments().lookup(digest) if len(digest) == 64 else None
+
+    def exists(self, ref: str) -> bool:
+        return Path(ref).is_file() if not ref.startswith(REF_PREFIX) else self._entry(ref) is not None
+
+    def size(self, ref: str) -> int:
+        entry = self._entry(ref)
+        return entry.raw_length if entry is not None else Path(ref).stat().st_size
+
+    def iter_range(self, ref: str, start: int = 0, end: Optional[int] = None, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        entry = self._entry(ref)
+        if entry is not None:
+            # Packed originals are small; slice the decoded record
+            data = self.segments().read_entry(entry)
+            yield data[start:None if end is None else end + 1]
+            return
+        with open(ref, "rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def read(self, ref: str) -> bytes:
+        entry = self._entry(ref)
+        if entry is None and ref.startswith(REF_PREFIX):
+            raise FileNotFoundError(ref)
+        return self.segments().read_entry(entry) if entry is not None else Path(ref).read_bytes()
+
+    def ping(self) -> bool:
+        return self.root.is_dir()
+
+
+@lru_cache(maxsize=1)
+def s3_client() -> Any:
+    """One boto3 client per process (clients are thread-safe; building one costs ~10-50 ms)."""
+    import boto3  # type: ignore
+    from botocore.config import Config  # type: ignore
+
+    return boto3.client(
+        "s3",
+        region_name=settings.aws_region,
+        aws_access_key_id=settings.aws_access_key_id,
+        aws_secret_access_key=settings.aws_secret_access_key,
+        endpoint_url=settings.s3_endpoint_url or None,
+        config=Config(max_pool_connections=max(10, int(settings.ingest_workers) * 2), retries={"mode": "standard"}),
+    )
+
+
+class S3Backend(StorageBackend):
+    """S3 with optional Object Lock retention; large objects go up as multipart uploads."""
+
+    name = "s3"
+
+    def __init__(self, bucket: Optional[str] = None) -> None:
+        self.bucket = bucket or settings.s3_bucket
+        if not self.bucket:
+            raise RuntimeError("S3 bucket not configured")
+
+    @staticmethod
+    def split(ref: str) -> Tuple[str, str]:
+        bucket, key = ref[len("s3://"):].split("/", 1)
+        return bucket, key
+
+    def _ref(self, key: str) -> str:
+        return f"s3://{self.bucket}/{key}"
+
+    def put(self, digest: str, filename: str, data: bytes | BinaryIO, content_type: Optional[str] = None) -> Tuple[str, bool]:
+        from boto3.s3.transfer import TransferConfig  # type: ignore
+
+        key = object_key(digest, filename)
+        if self.exists(self._ref(key)):
+            return self._ref(key), True
+        extra: dict = {"ContentType": content_type or _content_type(filename)}
+        # Optional Object Lock retention in compliance mode
+        if settings.s3_object_lock_retention_days:
+            extra.update(
+                {
+                    "ObjectLockMode": "COMPLIANCE",
+                    "ObjectLockRetainUntilDate": datetime.utcnow() + timedelta(days=int(settings.s3_object_lock_retention_days)),
+                }
+            )
+        threshold = int(settings.storage_multipart_threshold_bytes)
+        config = TransferConfig(multipart_threshold=threshold, multipart_chunksize=threshold, use_threads=False)
+        body = BytesIO(data) if isinstance(data, bytes) else data
+        s3_client().upload_fileobj(body, self.bucket, key, ExtraArgs=extra, Config=config)
+        return self._ref(key), False
+
+    def find(self, digest: str) -> Optional[str]:
+        prefix = f"{digest[:2]}/{digest[2:4]}/{digest}_"
+        resp = s3_client().list_objects_v2(Bucket=self.bucket, Prefix=prefix, MaxKeys=1)
+        for obj in resp.get("Contents") or []:
+            return self._ref(obj["Key"])
+        return None
+
+    def exists(self, ref: str) -> bool:
+        from botocore.exceptions import ClientError  # type: ignore
+
+        bucket, key = self.split(ref)
+        try:
+            s3_client().head_object(Bucket=bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in {"404", "NoSuchKey", "NotFound"}:
+                return False
+            raise
+
+    def size(self, ref: str) -> int:
+        bucket, key = self.split(ref)
+        return int(s3_client().head_object(Bucket=bucket, Key=key)["ContentLength"])
+
+    def iter_range(self, ref: str, start: int = 0, end: Optional[int] = None, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        bucket, key = self.split(ref)
+        kwargs: dict = {"Bucket": bucket, "Key": key}
+        if start or end is not None:
+            kwargs["Range"] = f"bytes={start}-{'' if end is None else end}"
+        body = s3_client().get_object(**kwargs)["Body"]
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def ping(self) -> bool:
+        s3_client().head_bucket(Bucket=self.bucket)
+        return True
+
+
+@lru_cache(maxsize=1)
+def supabase_client() -> Any:
+    from supabase import create_client  # type: ignore
+
+    return create_client(settings.supabase_url, settings.supabase_service_role_key)  # type: ignore[arg-type]
+
+
+@lru_cache(maxsize=1)
+def http_client() -> Any:
+    import httpx  # type: ignore
+
+    return httpx.Client(timeout=20, follow_redirects=True)
+
+
+_SUPABASE_URL_RE = re.compile(r"/storage/v1/object/(?:public|sign)/([^/]+)/([^?]+)")
+
+
+class SupabaseBackend(StorageBackend):
+    """Supabase Storage bucket. References are public URLs, or signed URLs that are re-signed on read."""
+
+    name = "supabase"
+
+    def __init__(self, bucket: Optional[str] = None) -> None:
+        self.bucket = bucket or settings.supabase_bucket
+
+    def _bucket(self) -> Any:
+        return supabase_client().storage.from_(self.bucket)
+
+    def _key(self, ref: str) -> str:
+        m = _SUPABASE_URL_RE.search(ref)
+        return m.group(2) if m else ref
+
+    def _url(self, key: str) -> str:
+        if settings.supabase_storage_public:
+            # Assume public bucket; construct public URL
+            return f"{settings.supabase_url}/storage/v1/object/public/{self.bucket}/{key}"
+        # Otherwise, return signed URL valid for a day
+        return self._bucket().create_signed_url(key, 86400)["signedURL"]
+
+    def put(self, digest: str, filename: str, data: bytes | BinaryIO, content_type: Optional[str] = None) -> Tuple[str, bool]:
+        key = object_key(digest, filename)
+        payload = data if isinstance(data, bytes) else data.read()
+        stored = False
+        try:
+            self._bucket().upload(path=key, file=payload, file_options={"contentType": content_type or _content_type(filename), "upsert": "false"})
+        except Exception as e:
+            # Treat conflict/exists as acceptable for idempotency/WORM semantics
+            if "exists" not in str(e).lower() and "409" not in str(e):
+                raise
+            stored = True
+        return self._url(key), stored
+
+    def find(self, digest: str) -> Optional[str]:
+        folder = f"{digest[:2]}/{digest[2:4]}"
+        for item in self._bucket().list(folder, {"search": f"{digest}_", "limit": 1}) or []:
+            return self._url(f"{folder}/{item['name']}")
+        return None
+
+    def _head(self, ref: str) -> Any:
+        return http_client().head(self._url(self._key(ref)))
+
+    def exists(self, ref: str) -> bool:
+        return self._head(ref).status_code == 200
+
+    def size(self, ref: str) -> int:
+        resp = self._head(ref)
+        resp.raise_for_status()
+        return int(resp.headers.get("content-length") or 0)
+
+    def iter_range(self, ref: str, start: int = 0, end: Optional[int] = None, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        headers = {}
+        if start or end is not None:
+            headers["Range"] = f"bytes={start}-{'' if end is None else end}"
+        with http_client().stream("GET", self._url(self._key(ref)), headers=headers) as resp:
+            resp.raise_for_status()
+            yield from resp.iter_bytes(chunk_size)
+
+    def ping(self) -> bool:
+        self._bucket().list("", {"limit": 1})
+        return True
+
+
+class HttpBackend(StorageBackend):
+    """Read-only access to plain http(s) references."""
+
+    name = "http"
+
+    def exists(self, ref: str) -> bool:
+        return http_client().head(ref).status_code == 200
+
+    def size(self, ref: str) -> int:
+        resp = http_client().head(ref)
+        resp.raise_for_status()
+        return int(resp.headers.get("content-length") or 0)
+
+    def iter_range(self, ref: str, start: int = 0, end: Optional[int] = None, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        headers = {"Range": f"bytes={start}-{'' if end is None else end}"} if (start or end is not None) else {}
+        with http_client().stream("GET", ref, headers=headers) as resp:
+            resp.raise_for_status()
+            yield from resp.iter_bytes(chunk_size)
+
+
+def get_backend() -> StorageBackend:
+    """Backend new originals are written to: Supabase, then S3, else the local store."""
+    if settings.supabase_url and settings.supabase_service_role_key and settings.supabase_bucket:
+        return SupabaseBackend()
+    if settings.s3_bucket:
+        return S3Backend()
+    return LocalBackend()
+
+
+def backend_for(ref: str) -> StorageBackend:
+    """Backend able to read an existing reference, whatever the current write backend is."""
+    if ref.startswith("s3://"):
+        return S3Backend(S3Backend.split(ref)[0])
+    if ref.startswith(("http://", "https://")):
+        m = _SUPABASE_URL_RE.search(ref)
+        if m and settings.supabase_url and ref.startswith(settings.supabase_url):
+            return SupabaseBackend(m.group(1))
+        return HttpBackend()
+    return LocalBackend()
+
+
+def is_local(ref: str) -> bool:
+    """True for refs served by LocalBackend (file paths and packed ``worm://`` refs)."""
+    return not ref.startswith(("s3://", "http://", "https://"))
+
+
+def is_trusted_ref(ref: str) -> bool:
+    """True if ``ref`` points into our own storage: the local WORM store or the configured bucket.
+
+    References arriving from outside the database (e.g. queued jobs) must pass this before being
+    read, so they can't be used to read arbitrary files or make the API fetch arbitrary URLs.
+    """
+    if ref.startswith(REF_PREFIX):
+        digest, _filename = parse_ref(ref)
+        return bool(re.fullmatch(r"[0-9a-f]{64}", digest))
+    if ref.startswith("s3://"):
+        return bool(settings.s3_bucket) and S3Backend.split(ref)[0] == settings.s3_bucket and ".." not in ref
+    if ref.startswith(("http://", "https://")):
+        base = (settings.supabase_url or "").rstrip("/")
+        m = _SUPABASE_URL_RE.search(ref)
+        return bool(base and m and ref.startswith(base + "/storage/v1/object/")
+                    and m.group(1) == settings.supabase_bucket and ".." not in m.group(2))
+    try:
+        return Path(ref).resolve().is_relative_to(LocalBackend().root.resolve())
+    except (OSError, ValueError):
+        return False
+
+
+async def run(fn: Any, *args: Any) -> Any:
+    """Call a blocking backend method from async code without stalling the event loop."""
+    return await asyncio.to_thread(fn, *args)
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .config import settings
+from .metrics_flow import record_stage
+
+try:
+    import magic  # type: ignore
+except Exception:  # pragma: no cover
+    magic = None  # type: ignore
+
+
+# Upload sanitization as a chain of blocking stages (sniff -> image/pdf -> scan -> hash).
+# The API runs each stage in the ingest thread pool so decoding, qpdf and clamd never block the
+# event loop; batch uploads run the whole chain inside one pool thread via ``run_sync``.
+
+Timings = Dict[str, float]
+
+
+class UploadRejected(Exception):
+    """A file failed upload validation; ``detail`` is returned to the client (HTTP 400 for single uploads)."""
+
+    def __init__(self, detail: Any) -> None:
+        super().__init__(str(detail))
+        self.detail = detail
+
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=max(1, int(settings.ingest_workers)), thread_name_prefix="ingest")
+    return _executor
+
+
+def allowed_mimes() -> set[str]:
+    allowed = set(settings.upload_allowed_mime.split(","))
+    if settings.upload_allow_pdf:
+        allowed.add("application/pdf")
+    return allowed
+
+
+def sniff(raw_bytes: bytes, allowed: set[str]) -> None:
+    """Magic sniffing to validate content matches an allowed type."""
+    if magic is None:
+        return
+    try:
+        sniff_mime = magic.from_buffer(raw_bytes, mime=True)  # type: ignore[attr-defined]
+    except Exception:
+        # If magic fails, continue
+        return
+    if sniff_mime:
+        normalized = sniff_mime.replace("pjpeg", "jpeg").replace("x-png", "png")
+        if normalized not in allowed:
+            raise UploadRejected("file content type not allowed")
+
+
+def reencode_image(raw_bytes: bytes, content_type: str) -> bytes:
+    """Re-encode (drops EXIF and trailing payloads) and downscale to ``upload_image_max_edge``."""
+    from PIL import Image  # type: ignore
+
+    max_edge = int(settings.upload_image_max_edge or 0)
+    try:
+        with Image.open(BytesIO(raw_bytes)) as img_in:
+            # Image bomb guard: reject absurdly large pixel counts (> 100 MP)
+            if (img_in.width or 0) * (img_in.height or 0) > 100_000_000:
+                raise UploadRejected("image too large (pixels)")
+            if max_edge and content_type == "image/jpeg" and max(img_in.size) > max_edge:
+                # Let the JPEG decoder scale by 1/2, 1/4 or 1/8 while decoding; much cheaper than a full decode
+                scale = max(img_in.size) / max_edge
+                img_in.draft("RGB", (int(img_in.width / scale), int(img_in.height / scale)))
+            img = img_in.convert("RGB") if content_type == "image/jpeg" else img_in.convert("RGBA")
+            if max_edge and max(img.size) > max_edge:
+                img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+            buf = BytesIO()
+            fmt = "JPEG" if content_type == "image/jpeg" else "PNG"
+            save_args = {"quality": 90} if fmt == "JPEG" else {"optimize": True}
+            img.save(buf, format=fmt, **save_args)
+            return buf.getvalue()
+    except UploadRejected:
+        raise
+    except Exception:
+        # If PIL fails, fall back to original bytes
+        return raw_bytes
+
+
+def sanitize_pdf(raw_bytes: bytes) -> bytes:
+    """qpdf sanitize: remove javascript, linearize, normalize (best-effort)."""
+    in_path = out_path = None
+    try:
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as _in:
+            _in.write(raw_bytes)
+            in_path = _in.name
+        out_fd, out_path = tempfile.mkstemp(suffix=".pdf")
+        os.close(out_fd)
+        subprocess.run(
+            ["qpdf", "--no-warn", "--linearize", "--decrypt", "--no-object-streams", in_path, out_path],
+            check=False,
+            timeout=float(settings.pdf_sanitize_timeout_seconds),
+        )
+        data = Path(out_path).read_bytes()
+        return data or raw_bytes
+    except Exception:
+        return raw_bytes
+    finally:
+        for p in (in_path, out_path):
+            if p:
+                Path(p).unlink(missing_ok=True)
+
+
+def virus_scan(content_bytes: bytes) -> None:
+    try:
+        import clamd  # type: ignore
+
+        cd = clamd.ClamdNetworkSocket(host="127.0.0.1", port=3310)
+        resp = cd.instream(BytesIO(content_bytes))
+    except Exception:
+        # If scanner not reachable, in dev/test ignore; in staging/prod we still allow for now
+        return
+    # clamd returns {'stream': ('OK', None)} when clean
+    if isinstance(resp, dict):
+        result = resp.get("stream")  # type: ignore
+        if isinstance(result, tuple) and result[0] != "OK":
+            raise UploadRejected("malware detected")
+
+
+def sha256_hex(content_bytes: bytes) -> str:
+    return hashlib.sha256(content_bytes).hexdigest()
+
+
+def _stages(content_type: str | None, allowed: set[str]) -> list[Tuple[str, Callable[[bytes], Optional[bytes]]]]:
+    stages: list[Tuple[str, Callable[[bytes], Optional[bytes]]]] = [("sniff", lambda b: sniff(b, allowed))]
+    if content_type in ("image/jpeg", "image/png"):
+        stages.append(("image", lambda b: reencode_image(b, str(content_type))))
+    elif content_type == "application/pdf" and settings.pdf_sanitize_enabled:
+        stages.append(("pdf", sanitize_pdf))
+    if settings.virus_scan_enabled:
+        stages.append(("scan", virus_scan))
+    return stages
+
+
+def _check(raw_bytes: bytes, content_type: str | None, allowed: set[str]) -> None:
+    if content_type not in allowed:
+        raise UploadRejected("unsupported content type")
+    if len(raw_bytes) > settings.upload_max_bytes:
+        raise UploadRejected("file too large")
+
+
+def run_sync(raw_bytes: bytes, content_type: str | None, allowed: set[str]) -> Tuple[bytes, str, Timings]:
+    """Run the whole chain in the calling thread. Returns (sanitized bytes, sha256, stage timings)."""
+    _check(raw_bytes, content_type, allowed)
+    timings: Timings = {}
+    data = raw_bytes
+    for name, fn in _stages(content_type, allowed):
+        t0 = time.perf_counter()
+        out = fn(data)
+        timings[name] = time.perf_counter() - t0
+        record_stage(name, timings[name])
+        if isinstance(out, bytes):
+            data = out
+    if len(data) > settings.upload_max_bytes:
+        raise UploadRejected("file too large")
+    t0 = time.perf_counter()
+    digest = sha256_hex(data)
+    timings["hash"] = time.perf_counter() - t0
+    record_stage("hash", timings["hash"])
+    return data, digest, timings
+
+
+async def run(raw_bytes: bytes, content_type: str | None, allowed: set[str]) -> Tuple[bytes, str, Timings]:
+    """Async variant of ``run_sync``: each stage runs in the ingest executor and is timed separately."""
+    _check(raw_bytes, content_type, allowed)
+    loop = asyncio.get_running_loop()
+    pool = get_executor()
+    timings: Timings = {}
+    data = raw_bytes
+    for name, fn in _stages(content_type, allowed):
+        t0 = time.perf_counter()
+        out = await loop.run_in_executor(pool, fn, data)
+        timings[name] = time.perf_counter() - t0
+        record_stage(name, timings[name])
+        if isinstance(out, bytes):
+            data = out
+    if len(data) > settings.upload_max_bytes:
+        raise UploadRejected("file too large")
+    t0 = time.perf_counter()
+    digest = await loop.run_in_executor(pool, sha256_hex, data)
+    timings["hash"] = time.perf_counter() - t0
+    record_stage("hash", timings["hash"])
+    return data, digest, timings
+
+
+async def timed(name: str, timings: Timings, fn: Callable[..., Any], *args: Any) -> Any:
+    """Run a blocking call (e.g. the storage write) in the ingest executor and time it as ``name``."""
+    t0 = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(get_executor(), fn, *args)
+    finally:
+        timings[name] = time.perf_counter() - t0
+        record_stage(name, timings[name])
+
+
+def server_timing(timings: Timings) -> str:
+    """Format timings as a ``Server-Timing`` header value (milliseconds)."""
+    return ", ".join(f"{name};dur={secs * 1000:.1f}" for name, secs in timings.items())
@@ -1,6 +1,12 @@
 from __future__ import annotations
 
-from typing import List, Tuple
+import asyncio
+import math
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
 from .config import settings
 
 try:
@@ -9,36 +15,165 @@ except Exception:  # pragma: no cover
     Vector = object  # fallback type for import time
 
 
-def embed_vendor_name(name: str) -> List[float]:
-    if settings.embeddings_provider == "minilm":
-        try:
-            # Lazy import to avoid heavy deps by default
-            from sentence_transformers import SentenceTransformer  # type: ignore
-        except Exception as exc:  # pragma: no cover
-            raise RuntimeError("MiniLM not installed. Set embeddings_provider=stub or install sentence-transformers.") from exc
-        # Cache the model at module level
-        global _model
+# Vendor name embeddings. One EmbeddingService per process:
+#   - an LRU cache keyed on the normalised name (case, Unicode form and whitespace folded)
+#   - batch encoding: embed_many() encodes all cache misses in one model call, and concurrent
+#     async callers are coalesced into micro-batches (embeddings_batch_max / embeddings_batch_wait_ms)
+#   - the MiniLM model loads once, either at startup (embeddings_warmup) or on first use
+# Vectors are sized to settings.embedding_dim, which must match the vendor_embeddings column.
+
+
+def normalize_name(name: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", name or "").casefold().split())
+
+
+def model_id() -> str:
+    """Identifies the vector space: rows embedded under a different id need re-embedding."""
+    provider = (settings.embeddings_provider or "stub").lower()
+    if provider == "minilm":
+        return f"minilm:{settings.embeddings_model}:{int(settings.embedding_dim)}"
+    return f"stub:{int(settings.embedding_dim)}"
+
+
+def _fit(vec: Sequence[float], dim: int) -> List[float]:
+    # Truncate/zero-pad to the column size, then re-normalise so dot product == cosine
+    v = list(vec[:dim]) + [0.0] * max(0, dim - len(vec))
+    n = math.sqrt(sum(x * x for x in v)) or 1.0
+    return [float(x / n) for x in v]
+
+
+def _stub_vector(name: str, dim: int) -> List[float]:
+    vec = [0.0] * dim
+    for i, ch in enumerate(name.encode("utf-8")):
+        vec[i % dim] += (ch % 31) / 31.0
+    return _fit(vec, dim)
+
+
+class EmbeddingService:
+    def __init__(self) -> None:
+        self._cache: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._model: Any = None
+        self._model_lock = threading.Lock()
+        self._pending: List[Tuple[str, "asyncio.Future[List[float]]"]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "batches": 0, "encoded": 0}
+
+    # -- model -------------------------------------------------------------------------
+    def _get_model(self) -> Any:
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    try:
+                        # Lazy import to avoid heavy deps by default
+                        from sentence_transformers import SentenceTransformer  # type: ignore
+                    except Exception as exc:  # pragma: no cover
+                        raise RuntimeError("MiniLM not installed. Set embeddings_provider=stub or install sentence-transformers.") from exc
+                    self._model = SentenceTransformer(settings.embeddings_model)
+        return self._model
+
+    def _encode(self, names: List[str]) -> List[List[float]]:
+        dim = int(settings.embedding_dim)
+        self.stats["batches"] += 1
+        self.stats["encoded"] += len(names)
+        if (settings.embeddings_provider or "stub").lower() == "minilm":
+            vecs = self._get_model().encode(names, batch_size=int(settings.embeddings_batch_max), show_progress_bar=False)
+            return [_fit([float(x) for x in v], dim) for v in vecs]
+        return [_stub_vector(n, dim) for n in names]
+
+    def warm_up(self) -> None:
+        """Load the model and run one encode so the first request doesn't pay for it."""
+        self._encode(["warm-up"])
+
+    # -- cache -------------------------------------------------------------------------
+    def _cache_get(self, key: Tuple[str, str]) -> Optional[List[float]]:
+        with self._cache_lock:
+            vec = self._cache.get(key)
+            if vec is not None:
+                self._cache.move_to_end(key)
+                self.stats["hits"] += 1
+            return vec
+
+    def _cache_put(self, key: Tuple[str, str], vec: List[float]) -> None:
+        with self._cache_lock:
+            self._cache[key] = vec
+            self._cache.move_to_end(key)
+            while len(self._cache) > int(settings.embeddings_cache_size):
+                self._cache.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._cache_lock:
+            self._cache.clear()
+
+    # -- sync API ----------------------------------------------------------------------
+    def embed_many(self, names: Sequence[str]) -> List[List[float]]:
+        mid = model_id()
+        keys = [(mid, normalize_name(n)) for n in names]
+        out: List[Optional[List[float]]] = [self._cache_get(k) for k in keys]
+        missing = sorted({k[1] for k, v in zip(keys, out) if v is None})
+        if missing:
+            self.stats["misses"] += len(missing)
+            for name, vec in zip(missing, self._encode(missing)):
+                self._cache_put((mid, name), vec)
+            out = [v if v is not None else self._cache_get(k) for k, v in zip(keys, out)]
+        return [list(v) for v in out]  # type: ignore[arg-type]
+
+    def embed(self, name: str) -> List[float]:
+        return self.embed_many([name])[0]
+
+    # -- async API with micro-batching -------------------------------------------------
+    async def aembed(self, name: str) -> List[float]:
+        vec = self._cache_get((model_id(), normalize_name(name)))
+        if vec is not None:
+            return list(vec)
+        loop = asyncio.get_running_loop()
+        fut: "asyncio.Future[List[float]]" = loop.create_future()
+        self._pending.append((name, fut))
+        if len(self._pending) >= int(settings.embeddings_batch_max):
+            self._flush(loop)
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(float(settings.embeddings_batch_wait_ms) / 1000.0, self._flush, loop)
+        return await fut
+
+    def _flush(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            loop.create_task(self._run_batch(batch))
+
+    async def _run_batch(self, batch: List[Tuple[str, "asyncio.Future[List[float]]"]]) -> None:
+        names = [n for n, _ in batch]
         try:
-            _model  # type: ignore[name-defined]
-        except NameError:
-            _model = SentenceTransformer("all-MiniLM-L6-v2")  # type: ignore[assignment]
-        vec = _model.encode([name])[0]
-        # Truncate/pad to 16 dims for DB schema simplicity
-        import numpy as np  # type: ignore
-        v = np.array(vec, dtype=float)
-        if v.shape[0] >= 16:
-            v16 = v[:16]
-        else:
-            v16 = np.pad(v, (0, 16 - v.shape[0]))
-        n = float(np.linalg.norm(v16) or 1.0)
-        return [float(x / n) for x in v16]
-    # Stub: deterministic 16-dim embedding
-    import math
-    vec = [0.0] * 16
-    for i, ch in enumerate(name.lower().encode("utf-8")):
-        vec[i % 16] += (ch % 31) / 31.0
-    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
-    return [v / norm for v in vec]
+            if (settings.embeddings_provider or "stub").lower() == "minilm":
+                vecs = await asyncio.to_thread(self.embed_many, names)
+            else:
+                vecs = self.embed_many(names)
+        except Exception as exc:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(exc)
+            return
+        for (_, fut), vec in zip(batch, vecs):
+            if not fut.done():
+                fut.set_result(vec)
+
+
+_service = EmbeddingService()
+
+
+def get_embedding_service() -> EmbeddingService:
+    return _service
+
+
+def embed_vendor_name(name: str) -> List[float]:
+    return _service.embed(name)
+
 
+def embed_vendor_names(names: Sequence[str]) -> List[List[float]]:
+    return _service.embed_many(names)
 
 
+async def aembed_vendor_name(name: str) -> List[float]:
+    return await _service.aembed(name)
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import and_, event, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .models import VendorEmbedding
+from .vendor_embeddings import Vector, model_id
+
+
+# Nearest-vendor lookup for account/VAT suggestions.
+# Postgres + pgvector: ORDER BY embedding <=> :query LIMIT k, served by the HNSW/ivfflat index.
+# Elsewhere: every usable vendor row lives in one normalized float32 matrix per process, so a lookup
+# is a single matmul. Committed ORM writes to vendor_embeddings bump a version counter that triggers a
+# reload; writes from other processes are picked up within vendor_index_ttl_seconds. Rows embedded by a
+# different model (vendor_embeddings.model_id()) live in another vector space and are skipped.
+
+_version = 0
+_DIRTY = "vendor_index_dirty"
+
+
+def bump_version(*_args: Any) -> None:
+    global _version
+    _version += 1
+
+
+# Bump only once the write is committed: bumping at flush would let a reader reload before the
+# commit, cache a snapshot without the row under the new version and serve it until the TTL.
+@event.listens_for(Session, "after_flush")
+def _note_vendor_writes(session: Session, _flush_context: Any) -> None:
+    if any(isinstance(o, VendorEmbedding) for o in (*session.new, *session.dirty, *session.deleted)):
+        session.info[_DIRTY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_on_commit(session: Session) -> None:
+    if session.info.pop(_DIRTY, False):
+        bump_version()
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _forget_rolled_back(session: Session, transaction: Any) -> None:
+    if transaction.parent is None:
+        session.info.pop(_DIRTY, None)
+
+
+@dataclass(frozen=True)
+class VendorMatch:
+    name: str
+    suggested_account: str
+    vat_rate: float
+    score: float  # cosine similarity
+
+
+def parse_embedding(value: Any) -> Optional[np.ndarray]:
+    """Embedding column value as a float32 vector: pgvector array, list, "[a,b]" or "a,b" text."""
+    if value is None:
+        return None
+    try:
+        if isinstance(value, str):
+            parts = [p for p in value.strip().strip("[]").split(",") if p.strip()]
+            return np.asarray([float(p) for p in parts], dtype=np.float32)
+        return np.asarray(value, dtype=np.float32).reshape(-1)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    bind: Any  # the engine the rows came from (tests swap databases under a running process)
+    version: int
+    loaded_at: float
+    matrix: np.ndarray  # (n, dim), rows L2-normalized
+    names: List[str]
+    accounts: List[str]
+    vat_rates: List[float]
+
+
+_snapshot: Optional[_Snapshot] = None
+
+
+def invalidate() -> None:
+    global _snapshot
+    _snapshot = None
+
+
+def _usable() -> Any:
+    return and_(
+        VendorEmbedding.suggested_account.is_not(None),
+        VendorEmbedding.vat_rate.is_not(None),
+        or_(VendorEmbedding.embedding_model.is_(None), VendorEmbedding.embedding_model == model_id()),
+    )
+
+
+def _use_pgvector(session: AsyncSession) -> bool:
+    return Vector is not object and session.get_bind().dialect.name == "postgresql"
+
+
+async def _load(session: AsyncSession) -> _Snapshot:
+    version = _version
+    rows = (await session.execute(
+        select(VendorEmbedding.name, VendorEmbedding.embedding, VendorEmbedding.suggested_account, VendorEmbedding.vat_rate)
+        # Rows without an account or VAT rate can't produce a suggestion; keep them out of the index
+        .where(_usable())
+        .order_by(VendorEmbedding.id)
+    )).all()
+    vectors: List[np.ndarray] = []
+    names: List[str] = []
+    accounts: List[str] = []
+    rates: List[float] = []
+    dim = 0
+    for name, emb, account, rate in rows:
+        vec = parse_embedding(emb)
+        if vec is None or not vec.size or (dim and vec.size != dim):
+            continue
+        dim = vec.size
+        vectors.append(vec)
+        names.append(name)
+        accounts.append(account)
+        rates.append(float(rate))
+    matrix = np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+    if matrix.size:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1.0, norms)
+    return _Snapshot(session.get_bind(), version, time.monotonic(), matrix, names, accounts, rates)
+
+
+async def _current(session: AsyncSession) -> _Snapshot:
+    global _snapshot
+    snap = _snapshot
+    if (
+        snap is None
+        or snap.version != _version
+        or snap.bind is not session.get_bind()
+        or time.monotonic() - snap.loaded_at > float(settings.vendor_index_ttl_seconds)
+    ):
+        snap = await _load(session)
+        _snapshot = snap
+    return snap
+
+
+async def _search_pgvector(session: AsyncSession, query: Sequence[float], k: int, min_score: float) -> List[VendorMatch]:
+    distance = VendorEmbedding.embedding.cosine_distance(list(query))  # type: ignore[attr-defined]
+    rows = (await session.execute(
+        select(VendorEmbedding.name, VendorEmbedding.suggested_account, VendorEmbedding.vat_rate, distance.label("distance"))
+        .where(_usable())
+        .order_by(distance)
+        .limit(k)
+    )).all()
+    matches = [VendorMatch(name, account, float(rate), 1.0 - float(dist)) for name, account, rate, dist in rows]
+    return [m for m in matches if m.score >= min_score]
+
+
+async def search(
+    session: AsyncSession,
+    query: Sequence[float],
+    k: int | None = None,
+    min_score: float | None = None,
+) -> List[VendorMatch]:
+    """Top-``k`` vendors by cosine similarity to ``query``, best first, dropping scores below ``min_score``."""
+    k = int(k or settings.vendor_index_top_k)
+    min_score = float(settings.vendor_embedding_min_score if min_score is None else min_score)
+    if _use_pgvector(session):
+        return await _search_pgvector(session, query, k, min_score)
+    snap = await _current(session)
+    q = np.asarray(query, dtype=np.float32).reshape(-1)
+    if not snap.names or q.size != snap.matrix.shape[1]:
+        return []
+    q = q / (float(np.linalg.norm(q)) or 1.0)
+    scores = snap.matrix @ q
+    k = min(k, scores.size)
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return [
+        VendorMatch(snap.names[i], snap.accounts[i], snap.vat_rates[i], float(scores[i]))
+        for i in top
+        if scores[i] >= min_score
+    ]
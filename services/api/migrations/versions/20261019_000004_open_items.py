@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261019_000004_open_items"
+down_revision = "20250825_000003_rbac_bank_tokens_review"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "open_items",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("org_id", sa.Integer(), nullable=False),
+        sa.Column("verification_id", sa.Integer(), sa.ForeignKey("verifications.id"), nullable=False),
+        sa.Column("type", sa.String(2), nullable=False),
+        sa.Column("counterparty", sa.String(200)),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("original_amount", sa.Numeric(14, 2), nullable=False),
+        sa.Column("open_amount", sa.Numeric(14, 2), nullable=False),
+        sa.Column("status", sa.String(10), nullable=False, server_default="open"),
+        sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index("ix_open_items_verification_id", "open_items", ["verification_id"])
+    op.create_index("ix_open_items_org_counterparty_status", "open_items", ["org_id", "counterparty", "status"])
+    _backfill(op.get_bind())
+
+
+def _as_date(v):
+    return v if isinstance(v, date) else date.fromisoformat(str(v)[:10])
+
+
+def _backfill(bind: sa.engine.Connection) -> None:
+    """Replay existing 1510 (AR) / 2440 (AP) postings in date order, as open_items.rebuild_open_items does.
+
+    A positive net opens an item; a negative net settles the counterparty's oldest open items (FIFO).
+    Kept self-contained so the migration doesn't depend on current app code; to repair a ledger
+    later, run ``python -m services.api.app.scripts.open_items_rebuild [org_id]``.
+    """
+    touched = (
+        "SELECT DISTINCT verification_id FROM entries WHERE account LIKE '1510%' OR account LIKE '2440%'"
+    )
+    verifs = bind.execute(sa.text(
+        f"SELECT id, org_id, counterparty, date FROM verifications WHERE id IN ({touched}) ORDER BY date, id"
+    )).all()
+    if not verifs:
+        return
+    net: dict[int, dict[str, float]] = {}
+    for vid, account, debit, credit in bind.execute(sa.text(
+        f"SELECT verification_id, account, debit, credit FROM entries WHERE verification_id IN ({touched})"
+    )):
+        acc = str(account)
+        movement = float(debit or 0.0) - float(credit or 0.0)
+        n = net.setdefault(int(vid), {"ar": 0.0, "ap": 0.0})
+        if acc.startswith("1510"):
+            n["ar"] += movement
+        if acc.startswith("2440"):
+            n["ap"] -= movement
+    items: list[dict] = []
+    for vid, org_id, counterparty, vdate in verifs:
+        for typ, amount in net.get(int(vid), {}).items():
+            amount = round(amount, 2)
+            if amount > 0.005:
+                items.append({
+                    "org_id": org_id, "verification_id": vid, "type": typ, "counterparty": counterparty,
+                    "date": _as_date(vdate), "original_amount": amount, "open_amount": amount, "status": "open",
+                })
+            elif amount < -0.005:
+                remaining = -amount
+                for item in items:  # already in date order, so this is FIFO
+                    if remaining <= 0.005:
+                        break
+                    if (item["org_id"], item["type"], item["counterparty"], item["status"]) != (org_id, typ, counterparty, "open"):
+                        continue
+                    take = min(remaining, item["open_amount"])
+                    left = round(item["open_amount"] - take, 2)
+                    item["open_amount"] = left if left > 0.005 else 0.0
+                    item["status"] = "open" if left > 0.005 else "settled"
+                    remaining = round(remaining - take, 2)
+    if items:
+        now = datetime.utcnow()
+        open_items = sa.table(
+            "open_items",
+            sa.column("org_id", sa.Integer()),
+            sa.column("verification_id", sa.Integer()),
+            sa.column("type", sa.String()),
+            sa.column("counterparty", sa.String()),
+            sa.column("date", sa.Date()),
+            sa.column("original_amount", sa.Numeric(14, 2)),
+            sa.column("open_amount", sa.Numeric(14, 2)),
+            sa.column("status", sa.String()),
+            sa.column("updated_at", sa.DateTime()),
+        )
+        op.bulk_insert(open_items, [{**it, "updated_at": now} for it in items])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_open_items_org_counterparty_status", table_name="open_items")
+    op.drop_index("ix_open_items_verification_id", table_name="open_items")
+    op.drop_table("open_items")
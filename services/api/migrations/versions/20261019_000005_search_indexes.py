@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261019_000005_search_indexes"
+down_revision = "20261019_000004_open_items"
+branch_labels = None
+depends_on = None
+
+
+_PG_TRGM_INDEXES = (
+    ("ix_bank_transactions_description_trgm", "bank_transactions", "description"),
+    ("ix_bank_transactions_counterparty_trgm", "bank_transactions", "counterparty_ref"),
+    ("ix_verifications_counterparty_trgm", "verifications", "counterparty"),
+    ("ix_documents_ocr_text_trgm", "documents", "ocr_text"),
+)
+
+# SQLite: FTS5 trigram shadow table kept in sync by triggers. A frozen copy of what
+# services/api/app/search.py installs today, so this revision doesn't change with the app.
+# The rowid encodes (source id, kind) as id * 4 + {bank: 1, verification: 2, document: 3}.
+_FTS_TABLE = "search_fts"
+# (table, rowid offset, kind, body expression over the row, columns whose update re-indexes)
+_FTS_SOURCES = (
+    ("bank_transactions", 1, "bank", "coalesce({r}.description, '') || ' ' || coalesce({r}.counterparty_ref, '')",
+     "description, counterparty_ref, org_id"),
+    ("verifications", 2, "verification", "coalesce({r}.counterparty, '')", "counterparty"),
+    ("documents", 3, "document", "coalesce({r}.ocr_text, '')", "ocr_text"),
+)
+
+
+def _install_sqlite_search(bind: sa.engine.Connection) -> None:
+    existed = bind.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (_FTS_TABLE,)
+    ).first() is not None
+    op.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {_FTS_TABLE} "
+        "USING fts5(kind UNINDEXED, org_id UNINDEXED, body, tokenize='trigram')"
+    )
+    for table, offset, kind, body, watched in _FTS_SOURCES:
+        insert_new = (
+            f"INSERT INTO {_FTS_TABLE}(rowid, kind, org_id, body) "
+            f"VALUES (new.id * 4 + {offset}, '{kind}', new.org_id, {body.format(r='new')});"
+        )
+        delete_old = f"DELETE FROM {_FTS_TABLE} WHERE rowid = old.id * 4 + {offset};"
+        op.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_search_ai AFTER INSERT ON {table} BEGIN {insert_new} END")
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_au AFTER UPDATE OF {watched} ON {table} "
+            f"BEGIN {delete_old} {insert_new} END"
+        )
+        op.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_search_ad AFTER DELETE ON {table} BEGIN {delete_old} END")
+        if not existed:
+            op.execute(
+                f"INSERT INTO {_FTS_TABLE}(rowid, kind, org_id, body) "
+                f"SELECT id * 4 + {offset}, '{kind}', org_id, {body.format(r=table)} FROM {table}"
+            )
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for name, table, col in _PG_TRGM_INDEXES:
+            op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({col} gin_trgm_ops)")
+    elif bind.dialect.name == "sqlite":
+        # FTS5 shadow table, sync triggers and initial backfill
+        _install_sqlite_search(bind)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        for name, _table, _col in _PG_TRGM_INDEXES:
+            op.execute(f"DROP INDEX IF EXISTS {name}")
+    elif bind.dialect.name == "sqlite":
+        for table, *_rest in _FTS_SOURCES:
+            for suffix in ("ai", "au", "ad"):
+                op.execute(f"DROP TRIGGER IF EXISTS {table}_search_{suffix}")
+        op.execute(f"DROP TABLE IF EXISTS {_FTS_TABLE}")
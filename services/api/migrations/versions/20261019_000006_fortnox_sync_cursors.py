@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261019_000006_fortnox_sync_cursors"
+down_revision = "20261019_000005_search_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "sync_cursors",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("org_id", sa.Integer(), nullable=False),
+        sa.Column("provider", sa.String(40), nullable=False),
+        sa.Column("resource", sa.String(40), nullable=False),
+        sa.Column("cursor", sa.String(100)),
+        sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.UniqueConstraint("org_id", "provider", "resource", name="uq_sync_cursors_org_provider_resource"),
+    )
+    op.add_column("bank_transactions", sa.Column("external_ref", sa.String(100), nullable=True))
+    op.create_index("ix_bank_transactions_org_external_ref", "bank_transactions", ["org_id", "external_ref"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_bank_transactions_org_external_ref", table_name="bank_transactions")
+    op.drop_column("bank_transactions", "external_ref")
+    op.drop_table("sync_cursors")
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261019_000007_ocr_cache"
+down_revision = "20261019_000006_fortnox_sync_cursors"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ocr_cache",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("digest", sa.String(64), nullable=False),
+        sa.Column("provider", sa.String(40), nullable=False),
+        sa.Column("preprocess_version", sa.String(40), nullable=False),
+        sa.Column("result_json", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.UniqueConstraint("digest", "provider", "preprocess_version", name="uq_ocr_cache_identity"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("ocr_cache")
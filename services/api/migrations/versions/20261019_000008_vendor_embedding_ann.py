@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261019_000008_vendor_embedding_ann"
+down_revision = "20261019_000007_ocr_cache"
+branch_labels = None
+depends_on = None
+
+
+_INDEX = "ix_vendor_embeddings_embedding_ann"
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+    if not bind.execute(sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'vector'")).scalar():
+        # Without pgvector, lookups use the in-process index (services/api/app/vendor_index.py)
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    udt = bind.execute(sa.text(
+        "SELECT udt_name FROM information_schema.columns "
+        "WHERE table_name = 'vendor_embeddings' AND column_name = 'embedding'"
+    )).scalar()
+    if udt != "vector":
+        # The initial migration created a float[] column; the model maps it as Vector(16)
+        op.execute("ALTER TABLE vendor_embeddings ALTER COLUMN embedding TYPE vector(16) USING embedding::vector(16)")
+    version = bind.execute(sa.text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")).scalar() or "0.0"
+    major, minor = (int(x) for x in version.split(".")[:2])
+    if (major, minor) >= (0, 5):
+        op.execute(f"CREATE INDEX IF NOT EXISTS {_INDEX} ON vendor_embeddings USING hnsw (embedding vector_cosine_ops)")
+    else:
+        op.execute(f"CREATE INDEX IF NOT EXISTS {_INDEX} ON vendor_embeddings USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100)")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute(f"DROP INDEX IF EXISTS {_INDEX}")
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+revision = "20261019_000009_vendor_embedding_dim"
+down_revision = "20261019_000008_vendor_embedding_ann"
+branch_labels = None
+depends_on = None
+
+
+_INDEX = "ix_vendor_embeddings_embedding_ann"
+_CURRENT_DIM = 16  # the column size 000008 created
+
+
+def _target_dim() -> int:
+    """Column size to migrate to, passed explicitly: ``alembic -x embedding_dim=384 upgrade head``.
+
+    Without it the column keeps its size; it must match the EMBEDDING_DIM the app runs with.
+    """
+    raw = context.get_x_argument(as_dictionary=True).get("embedding_dim")
+    return int(raw) if raw else _CURRENT_DIM
+
+
+def _create_ann_index(bind: sa.engine.Connection) -> None:
+    version = bind.execute(sa.text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")).scalar() or "0.0"
+    major, minor = (int(x) for x in version.split(".")[:2])
+    if (major, minor) >= (0, 5):
+        op.execute(f"CREATE INDEX IF NOT EXISTS {_INDEX} ON vendor_embeddings USING hnsw (embedding vector_cosine_ops)")
+    else:
+        op.execute(f"CREATE INDEX IF NOT EXISTS {_INDEX} ON vendor_embeddings USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100)")
+
+
+def _resize(bind: sa.engine.Connection, dim: int) -> None:
+    """Resize the pgvector column to ``dim``. Vectors can't be converted between sizes, so existing
+    embeddings are cleared; run ``python -m services.api.app.scripts.vendor_embedding_refresh``."""
+    current = bind.execute(sa.text(
+        "SELECT a.atttypmod FROM pg_attribute a JOIN pg_type t ON t.oid = a.atttypid "
+        "WHERE a.attrelid = 'vendor_embeddings'::regclass AND a.attname = 'embedding' AND t.typname = 'vector'"
+    )).scalar()
+    if current is None or int(current) == dim:
+        return
+    op.execute(f"DROP INDEX IF EXISTS {_INDEX}")
+    op.execute(f"ALTER TABLE vendor_embeddings ALTER COLUMN embedding TYPE vector({dim}) USING NULL")
+    op.execute("UPDATE vendor_embeddings SET embedding_model = NULL")
+    _create_ann_index(bind)
+
+
+def upgrade() -> None:
+    op.add_column("vendor_embeddings", sa.Column("embedding_model", sa.String(80), nullable=True))
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        _resize(bind, _target_dim())
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        _resize(bind, _CURRENT_DIM)
+    op.drop_column("vendor_embeddings", "embedding_model")
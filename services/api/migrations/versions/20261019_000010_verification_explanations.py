@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261019_000010_verification_explanations"
+down_revision = "20261019_000009_vendor_embedding_dim"
+branch_labels = None
+depends_on = None
+
+
+_CHUNK = 400
+
+
+def _sidecars() -> list[tuple[int, dict]]:
+    # Explainability used to be written to .verification_meta/{id}.json relative to the API's cwd
+    meta_dir = Path(os.environ.get("VERIFICATION_META_DIR", ".verification_meta"))
+    if not meta_dir.is_dir():
+        return []
+    out: list[tuple[int, dict]] = []
+    for path in meta_dir.glob("*.json"):
+        if not path.stem.isdigit():
+            continue
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        if isinstance(data, dict) and data.get("explainability"):
+            out.append((int(path.stem), data))
+    return sorted(out)
+
+
+def _import_sidecars(table: sa.Table) -> None:
+    bind = op.get_bind()
+    sidecars = _sidecars()
+    for start in range(0, len(sidecars), _CHUNK):
+        chunk = sidecars[start:start + _CHUNK]
+        existing = set(bind.execute(
+            sa.text("SELECT id FROM verifications WHERE id IN :ids").bindparams(sa.bindparam("ids", expanding=True)),
+            {"ids": [vid for vid, _ in chunk]},
+        ).scalars())
+        rows = [
+            {
+                "verification_id": vid,
+                "reason": str(data["explainability"]),
+                "model": None,
+                "confidence": None,
+                "features_json": json.dumps({k: v for k, v in data.items() if k != "explainability"}, ensure_ascii=False),
+            }
+            for vid, data in chunk
+            if vid in existing
+        ]
+        if rows:
+            op.bulk_insert(table, rows)
+
+
+def upgrade() -> None:
+    table = op.create_table(
+        "verification_explanations",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("verification_id", sa.Integer(), sa.ForeignKey("verifications.id"), nullable=False),
+        sa.Column("reason", sa.Text(), nullable=False),
+        sa.Column("model", sa.String(80), nullable=True),
+        sa.Column("confidence", sa.Numeric(5, 4), nullable=True),
+        sa.Column("features_json", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index("ix_verification_explanations_verification_id", "verification_explanations", ["verification_id"], unique=True)
+    _import_sidecars(table)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_verification_explanations_verification_id", table_name="verification_explanations")
+    op.drop_table("verification_explanations")
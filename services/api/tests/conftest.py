@@ -36,6 +36,8 @@ def _isolate_db(tmp_path, monkeypatch):
 
     Also purges volatile tables to avoid cross-test leakage.
     """
+    # Relative stores (.worm_store, ./bertil_local.db, inboxes) land in tmp_path, not the working tree
+    monkeypatch.chdir(tmp_path)
     db_path = tmp_path / "test_api_run.db"
     db_url = f"sqlite+aiosqlite:///{db_path}"
     monkeypatch.setenv("DATABASE_URL", db_url)
@@ -61,7 +63,7 @@ def _isolate_db(tmp_path, monkeypatch):
                 await conn.run_sync(lambda c: Base.metadata.create_all(bind=c))
             except Exception:
                 pass
-            for tbl in ("entries", "verifications", "compliance_flags", "audit_log", "period_locks", "bank_transactions"):
+            for tbl in ("open_items", "entries", "verifications", "compliance_flags", "audit_log", "period_locks", "bank_transactions"):
                 try:
                     await conn.execute(_text(f"DELETE FROM {tbl}"))
                 except Exception:
@@ -70,7 +72,7 @@ def _isolate_db(tmp_path, monkeypatch):
         try:
             default_engine = create_async_engine("sqlite+aiosqlite:///./bertil_local.db", future=True, echo=False)
             async with default_engine.begin() as dconn:
-                for tbl in ("entries", "verifications", "compliance_flags", "audit_log", "period_locks", "bank_transactions"):
+                for tbl in ("open_items", "entries", "verifications", "compliance_flags", "audit_log", "period_locks", "bank_transactions"):
                     try:
                         await dconn.execute(_text(f"DELETE FROM {tbl}"))
                     except Exception:
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from services.api.app import db as db_mod
+from services.api.app.config import settings
+from services.api.app.main import app
+from services.api.app.metrics_kpis import get_kpi_snapshot
+from services.api.app.models import Document, ExtractedField
+from services.api.app.security import require_user
+from services.api.app.vendor_embeddings import get_embedding_service
+
+
+def _seed_documents(docs: dict[str, dict[str, str]], org_id: int = 1) -> None:
+    async def _run() -> None:
+        async with db_mod.SessionLocal() as session:
+            for digest, fields in docs.items():
+                d = Document(org_id=org_id, type="receipt", storage_uri=f"/tmp/{digest}.jpg", hash_sha256=digest, status="ocr_processed")
+                session.add(d)
+                await session.flush()
+                for key, value in fields.items():
+                    session.add(ExtractedField(document_id=d.id, key=key, value=value, confidence=0.9))
+            await session.commit()
+
+    asyncio.get_event_loop().run_until_complete(_run())
+
+
+def test_batch_auto_post_streams_per_document(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "ai_auto_post_chunk_size", 2)
+    _seed_documents({
+        "doc-kaffe": {"total": "245.00", "date": "2025-01-15", "vendor": "Batchkaffe Centrum"},
+        "doc-taxi": {"total": "180.00", "date": "2025-01-16", "vendor": "Taxi Batchresor"},
+        "doc-bygg": {"total": "1250.00", "date": "2025-01-17", "vendor": "Byggvaror Batch AB"},
+        "doc-no-total": {"date": "2025-01-18", "vendor": "Okänd"},
+    })
+    before = get_kpi_snapshot().get("1", {}).get("legacy", {"attempts": 0, "success": 0})
+    stats = get_embedding_service().stats
+    batches = stats["batches"]
+
+    client = TestClient(app)
+    ids = ["doc-kaffe", "doc-taxi", "doc-bygg", "doc-no-total", "doc-missing"]
+    r = client.post("/ai/auto-post/batch", json={"document_ids": ids, "org_id": 1})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in r.text.splitlines()]
+
+    # One line per document in request order, then a summary
+    assert [line.get("document_id") for line in lines[:-1]] == ids
+    assert lines[-1] == {"done": True, "posted": 3, "failed": 2}
+    by_id = {line["document_id"]: line for line in lines[:-1]}
+    assert (by_id["doc-kaffe"]["expense_account"], by_id["doc-kaffe"]["vat_rate"]) == ("5811", 0.12)
+    assert (by_id["doc-taxi"]["expense_account"], by_id["doc-taxi"]["vat_rate"]) == ("5611", 0.06)
+    assert by_id["doc-bygg"]["status"] == "posted" and by_id["doc-bygg"]["audit_hash"]
+    assert by_id["doc-no-total"]["status"] == "error" and "total" in by_id["doc-no-total"]["detail"]
+    assert by_id["doc-missing"] == {"document_id": "doc-missing", "status": "error", "detail": "document not found"}
+    # Vendor names are embedded per chunk, not per document
+    assert stats["batches"] - batches <= 2
+
+    seqs = sorted(by_id[d]["immutable_seq"] for d in ("doc-kaffe", "doc-taxi", "doc-bygg"))
+    assert seqs == [seqs[0], seqs[0] + 1, seqs[0] + 2]
+    v = client.get(f"/verifications/{by_id['doc-kaffe']['id']}").json()
+    assert v["document_link"] == "/documents/doc-kaffe"
+
+    after = get_kpi_snapshot()["1"]["legacy"]
+    assert after["attempts"] - before["attempts"] == 3
+    assert after["success"] - before["success"] == 3
+
+
+def test_batch_auto_post_rejects_bad_payload():
+    client = TestClient(app)
+    assert client.post("/ai/auto-post/batch", json={}).status_code == 400
+    assert client.post("/ai/auto-post/batch", json={"document_ids": []}).status_code == 400
+    assert client.post("/ai/auto-post/batch", json={"document_ids": ["a", "a"]}).status_code == 400
+
+
+def test_batch_auto_post_refuses_foreign_org(monkeypatch):
+    monkeypatch.setattr(settings, "app_env", "production")
+    app.dependency_overrides[require_user] = lambda: {"sub": "user-1", "org_id": 1}
+    try:
+        client = TestClient(app)
+        r = client.post("/ai/auto-post/batch", json={"document_ids": ["doc-x"], "org_id": 2})
+        assert r.status_code == 403
+    finally:
+        app.dependency_overrides.pop(require_user, None)
+
+
+def test_batch_auto_post_ends_stream_when_preparation_session_fails(monkeypatch):
+    real = db_mod.SessionLocal
+    calls = {"n": 0}
+
+    def _session_factory():
+        calls["n"] += 1
+        if calls["n"] == 2:  # the producer's session; the consumer opens the first one
+            raise RuntimeError("database unavailable")
+        return real()
+
+    monkeypatch.setattr(db_mod, "SessionLocal", _session_factory)
+    r = TestClient(app).post("/ai/auto-post/batch", json={"document_ids": ["doc-a", "doc-b"], "org_id": 1})
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert lines == [
+        {"error": "preparation failed", "unprocessed": 2},
+        {"done": True, "posted": 0, "failed": 2},
+    ]
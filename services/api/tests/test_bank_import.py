@@ -74,3 +74,100 @@ def test_camt053_import():
     assert any(abs(it["amount"]) == 100.0 for it in items)
 
 
+
+
+def test_bulk_accept_is_org_scoped():
+    client = TestClient(app)
+    csv_data = (
+        "date,amount,currency,description,counterparty\n"
+        "2025-02-01,10.00,SEK,Card Kaffe AB,Kaffe AB\n"
+    ).encode("utf-8")
+    client.post("/bank/import", files={"file": ("bank.csv", BytesIO(csv_data), "text/csv")})
+    tx_id = client.get("/bank/transactions", params={"unmatched": 1}).json()["items"][0]["id"]
+    other_org = client.post(
+        "/bank/transactions/bulk-accept",
+        json={"org_id": 2, "items": [{"tx_id": tx_id, "verification_id": 42}]},
+    )
+    assert other_org.status_code == 200
+    assert other_org.json()["updated"] == 0
+    assert other_org.json()["items"][0]["status"] == "not_found"
+    own_org = client.post("/bank/transactions/bulk-accept", json={"items": [{"tx_id": tx_id, "verification_id": 42}]})
+    assert own_org.json()["updated"] == 1
+    assert own_org.json()["items"][0]["status"] == "updated"
+
+
+def test_bulk_writes_refuse_foreign_org(monkeypatch):
+    from services.api.app.config import settings
+    from services.api.app.security import require_user
+
+    client = TestClient(app)
+    monkeypatch.setattr(settings, "app_env", "production")
+    app.dependency_overrides[require_user] = lambda: {"sub": "u1", "org_id": 1}
+    try:
+        for path in ("/bank/transactions/bulk-accept", "/bank/transactions/bulk-settle"):
+            r = client.post(path, json={"org_id": 2, "items": [{"tx_id": 1, "verification_id": 1}]})
+            assert r.status_code == 403, (path, r.text)
+    finally:
+        app.dependency_overrides.pop(require_user, None)
+
+
+def test_swedish_bank_csv_dialect_and_row_errors():
+    client = TestClient(app)
+    csv_data = (
+        "* Transaktioner Period 2025-01-01 - 2025-01-31\n"
+        "Radnummer;Clearingnummer;Kontonummer;Produkt;Valuta;Bokföringsdag;Transaktionsdag;Valutadag;Referens;Beskrivning;Belopp;Bokfört saldo\n"
+        "1;8327-9;1234567;Företagskonto;SEK;2025-01-30;2025-01-29;2025-01-30;Kvitto 1;Åhléns City;-1 234,50;8765,50\n"
+        "2;8327-9;1234567;Företagskonto;SEK;2025-01-31;2025-01-31;2025-01-31;Lön;Inbetalning Kund AB;10 000,00;18765,50\n"
+        "3;8327-9;1234567;Företagskonto;SEK;inte-ett-datum;2025-01-31;2025-01-31;X;Trasig rad;-1,00;18764,50\n"
+    ).encode("iso-8859-1")
+    r = client.post("/bank/import", files={"file": ("export.csv", BytesIO(csv_data), "text/csv")})
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["profile"] == "swedbank"
+    assert body["dialect"]["delimiter"] == ";"
+    assert body["dialect"]["decimal"] == ","
+    assert body["imported"] == 2
+    assert body["error_count"] == 1
+    assert body["errors"][0]["line"] == 5
+    items = client.get("/bank/transactions").json()["items"]
+    amounts = sorted(it["amount"] for it in items)
+    assert amounts == [-1234.5, 10000.0]
+    assert any(it["description"] == "Åhléns City" for it in items)
+
+
+def test_sniffed_decimal_point_reads_grouped_thousands():
+    client = TestClient(app)
+    csv_data = (
+        "Date;Description;Amount\n"
+        "2025-02-03;Invoice 17;1,234\n"
+        "2025-02-04;Card fee;-12.50\n"
+    ).encode("utf-8")
+    r = client.post("/bank/import", files={"file": ("bank.csv", BytesIO(csv_data), "text/csv")})
+    assert r.status_code == 200, r.text
+    assert r.json()["dialect"]["decimal"] == "."
+    items = client.get("/bank/transactions").json()["items"]
+    amounts = {it["description"]: it["amount"] for it in items}
+    # "1,234" under a "." decimal is one thousand two hundred, not 1.234
+    assert amounts["Invoice 17"] == 1234.0
+    assert amounts["Card fee"] == -12.5
+
+
+def test_plain_swedish_export_with_text_column():
+    client = TestClient(app)
+    for encoding in ("utf-8", "iso-8859-1"):
+        csv_data = (
+            "Bokföringsdag;Belopp;Text\n"
+            "2025-03-03;-249,00;Kortköp Clas Ohlson\n"
+        ).encode(encoding)
+        r = client.post("/bank/import", files={"file": ("bank.csv", BytesIO(csv_data), "text/csv")})
+        assert r.status_code == 200, r.text
+        assert r.json()["imported"] == 1
+    items = client.get("/bank/transactions").json()["items"]
+    assert [(it["amount"], it["description"]) for it in items] == [(-249.0, "Kortköp Clas Ohlson")] * 2
+
+
+def test_unrecognized_csv_header_is_rejected():
+    client = TestClient(app)
+    csv_data = "foo;bar\n1;2\n".encode("utf-8")
+    r = client.post("/bank/import", files={"file": ("bank.csv", BytesIO(csv_data), "text/csv")})
+    assert r.status_code == 400
@@ -53,3 +53,28 @@ def test_settle_ar_against_bank():
 
 
 
+def test_bulk_settle_reports_per_item():
+    client = TestClient(app)
+    ver_ok = _create_ar_verification(client, 250.0)
+    ver_mismatch = _create_ar_verification(client, 999.0)
+    tx_ok = _import_bank_tx(client, 250.0)
+    tx_other = _import_bank_tx(client, 410.0)
+    r = client.post(
+        "/bank/transactions/bulk-settle",
+        json={"items": [
+            {"tx_id": tx_ok, "verification_id": ver_ok},
+            {"tx_id": tx_other, "verification_id": ver_mismatch},
+            {"tx_id": 987654, "verification_id": ver_ok},
+        ]},
+    )
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["settled"] == 1
+    statuses = [it["status"] for it in body["items"]]
+    assert statuses == ["settled", "error", "error"]
+    settled_id = body["items"][0]["settled_with_verification_id"]
+    matched = client.get("/bank/transactions", params={"matched": 1}).json()["items"]
+    assert any(it["id"] == tx_ok and it["matched_verification_id"] == settled_id for it in matched)
+    # Settling the same verification again finds nothing open
+    again = client.post("/bank/transactions/bulk-settle", json={"items": [{"tx_id": tx_other, "verification_id": ver_ok}]})
+    assert again.json()["items"][0]["status"] == "error"
@@ -7,15 +7,16 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from services.api.app.models import Verification, Entry
-from services.api.app.db import SessionLocal, engine, Base
+from services.api.app import db as db_mod
+from services.api.app.db import Base
 from services.api.app.compliance import run_verification_rules
 
 
 @pytest.mark.asyncio
 async def test_r001_missing_fields(tmp_path):
-    async with engine.begin() as conn:
+    async with db_mod.engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
-    async with SessionLocal() as session:  # type: AsyncSession
+    async with db_mod.SessionLocal() as session:  # type: AsyncSession
         v = Verification(org_id=1, immutable_seq=1, date=date.today(), total_amount=123.45, currency="SEK")
         session.add(v)
         await session.flush()
@@ -27,7 +28,7 @@ async def test_r001_missing_fields(tmp_path):
 
 @pytest.mark.asyncio
 async def test_r011_timeliness_warning():
-    async with SessionLocal() as session:  # type: AsyncSession
+    async with db_mod.SessionLocal() as session:  # type: AsyncSession
         v = Verification(org_id=1, immutable_seq=2, date=date.today() - timedelta(days=45), total_amount=100, currency="SEK", vat_amount=0, counterparty="X", document_link="/documents/abc")
         session.add(v)
         await session.flush()
@@ -38,7 +39,7 @@ async def test_r011_timeliness_warning():
 
 @pytest.mark.asyncio
 async def test_rvat_plausibility():
-    async with SessionLocal() as session:  # type: AsyncSession
+    async with db_mod.SessionLocal() as session:  # type: AsyncSession
         v = Verification(org_id=1, immutable_seq=3, date=date.today(), total_amount=125.00, currency="SEK", vat_amount=25.00, counterparty="Cafe", document_link="/documents/def")
         session.add(v)
         await session.flush()
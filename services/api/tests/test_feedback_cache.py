@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from services.api.app import db as db_mod
+from services.api.app import feedback_cache
+from services.api.app.ai import suggest_account_and_vat
+from services.api.app.feedback_cache import Vote, decide
+from services.api.app.main import app
+
+
+DAY = 86400.0
+
+
+def _vote(i: int, account: str, rate: float | None, age_days: float, now: float) -> Vote:
+    return Vote(id=i, org_id=1, vendor="kaffe ab", account=account, vat_rate=rate, created_at=now - age_days * DAY)
+
+
+def test_recency_weighted_vote():
+    now = time.time()
+    # Two old corrections lose to one fresh one (half-life 90 days)...
+    old_majority = [_vote(1, "5410", 0.25, 200, now), _vote(2, "5410", 0.25, 210, now), _vote(3, "6110", 0.12, 0, now)]
+    assert decide(old_majority, now) == ("6110", 0.12)
+    # ...but a recent majority wins
+    recent_majority = [_vote(1, "5410", 0.25, 2, now), _vote(2, "5410", None, 1, now), _vote(3, "6110", 0.12, 0, now)]
+    assert decide(recent_majority, now) == ("5410", 0.25)
+    # VAT-only corrections don't make a decision on their own
+    assert decide([Vote(4, 1, "kaffe ab", None, 0.06, now)], now) is None
+
+
+def test_feedback_is_org_scoped_and_served_without_queries():
+    client = TestClient(app)
+    r = client.post("/review/ai/feedback", json={"vendor": "Kaffe  AB", "org_id": 1, "correct_account": "6071", "correct_vat_code": "SE12"})
+    assert r.status_code == 200
+
+    statements: list[str] = []
+
+    def _count(_conn, _cursor, statement, *_a) -> None:
+        statements.append(statement)
+
+    async def _run() -> tuple:
+        async with db_mod.SessionLocal() as session:
+            await suggest_account_and_vat("warm-up", 1.0, session, 1)
+            event.listen(db_mod.engine.sync_engine, "before_cursor_execute", _count)
+            try:
+                mine = await suggest_account_and_vat("kaffe ab", 100.0, session, 1)
+            finally:
+                event.remove(db_mod.engine.sync_engine, "before_cursor_execute", _count)
+            other = await suggest_account_and_vat("kaffe ab", 100.0, session, 2)
+            return mine, other
+
+    mine, other = asyncio.get_event_loop().run_until_complete(_run())
+    assert (mine.expense_account, mine.vat_rate) == ("6071", 0.12)
+    assert not [s for s in statements if "ai_feedback" in s]
+    # Another org's correction doesn't leak across
+    assert other.reason != "Användarfeedback prioriterad"
+
+
+def test_votes_published_to_other_workers():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    cache = feedback_cache.get_feedback_cache()
+
+    async def _run() -> None:
+        listener = asyncio.create_task(feedback_cache.listen(fakeredis.aioredis.FakeRedis(server=server), db_mod.SessionLocal))
+        try:
+            for _ in range(50):
+                if cache.loaded:
+                    break
+                await asyncio.sleep(0.02)
+            await asyncio.sleep(0.05)
+            vote = {"id": 90001, "org_id": 7, "vendor": "taxi syd", "account": "5611", "vat_rate": 0.06, "created_at": time.time()}
+            publisher = fakeredis.aioredis.FakeRedis(server=server)
+            await publisher.publish(feedback_cache.CHANNEL, json.dumps({"source": "worker-2", "vote": vote}))
+            for _ in range(50):
+                if cache.resolve(7, "Taxi Syd"):
+                    break
+                await asyncio.sleep(0.02)
+        finally:
+            listener.cancel()
+
+    asyncio.get_event_loop().run_until_complete(_run())
+    assert cache.resolve(7, "Taxi Syd") == ("5611", 0.06)
+    assert cache.resolve(8, "Taxi Syd") is None
+
+
+def test_reload_keeps_serving_and_keeps_votes_that_arrive_meanwhile():
+    now = time.time()
+    cache = feedback_cache.FeedbackCache()
+    cache.add(Vote(id=91001, org_id=3, vendor="biltema", account="5410", vat_rate=0.25, created_at=now))
+
+    async def _run() -> None:
+        async with db_mod.SessionLocal() as session:
+            query = session.execute
+
+            async def _slow_execute(*args, **kwargs):
+                await asyncio.sleep(0.05)
+                return await query(*args, **kwargs)
+
+            session.execute = _slow_execute  # type: ignore[method-assign]
+            reload = asyncio.create_task(cache.load(session))
+            await asyncio.sleep(0.01)
+            # Mid-reload lookups still see the previous state, and a vote recorded now isn't lost
+            assert cache.resolve(3, "Biltema") == ("5410", 0.25)
+            cache.add(Vote(id=91002, org_id=3, vendor="jula", account="5460", vat_rate=0.25, created_at=now))
+            await reload
+
+    asyncio.get_event_loop().run_until_complete(_run())
+    assert cache.resolve(3, "Jula") == ("5460", 0.25)
+    assert cache.resolve(3, "Biltema") is None  # never stored, so the reload drops it
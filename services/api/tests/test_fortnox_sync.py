@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import asyncio
+
+from sqlalchemy import func, select
+
+from services.api.app import db as db_mod
+from services.api.app.config import settings
+from services.api.app.fortnox_client import FortnoxStubClient
+from services.api.app.integrations.fortnox_sync import get_cursor, sync_fortnox
+from services.api.app.models import BankTransaction, Document
+
+
+def _receipts(n: int, day: str = "2025-02-01") -> list[dict]:
+    return [
+        {"id": f"R{i}", "date": "2025-02-01", "total": 10.0 + i, "vendor": f"Vendor {i}", "last_modified": f"{day}T00:00:{i % 60:02d}"}
+        for i in range(n)
+    ]
+
+
+def _bank(n: int, day: str = "2025-02-01") -> list[dict]:
+    return [
+        {"id": f"B{i}", "date": "2025-02-01", "amount": -5.0 - i, "description": f"Card {i}", "last_modified": f"{day}T00:00:{i % 60:02d}"}
+        for i in range(n)
+    ]
+
+
+def _run(client: FortnoxStubClient, org_id: int = 1) -> dict:
+    async def _go() -> dict:
+        async with db_mod.SessionLocal() as session:
+            return await sync_fortnox(session, org_id, "stub-token", client)
+
+    return asyncio.get_event_loop().run_until_complete(_go())
+
+
+def _scalar(stmt):
+    async def _go():
+        async with db_mod.SessionLocal() as session:
+            return (await session.execute(stmt)).scalar_one()
+
+    return asyncio.get_event_loop().run_until_complete(_go())
+
+
+def test_sync_pages_and_resumes_from_cursor(monkeypatch):
+    monkeypatch.setattr(settings, "fortnox_sync_page_size", 10)
+    client = FortnoxStubClient(receipts=_receipts(25), bank_transactions=_bank(23))
+    assert _run(client) == {"receipts": 25, "bank": 23}
+    assert client.page_requests == 6  # 3 pages per resource
+    assert _scalar(select(func.count(Document.id)).where(Document.org_id == 1)) == 25
+    assert _scalar(select(func.count(BankTransaction.id)).where(BankTransaction.org_id == 1)) == 23
+
+    # Nothing changed upstream: one (empty) page per resource and no new rows
+    client.page_requests = 0
+    assert _run(client) == {"receipts": 0, "bank": 0}
+    assert client.page_requests == 2
+
+    # A modified bank row is updated in place rather than duplicated
+    client.bank_transactions[0] = {**client.bank_transactions[0], "amount": -99.0, "last_modified": "2025-02-02T00:00:00"}
+    client.receipts.append({"id": "R-new", "date": "2025-02-02", "total": 1.0, "vendor": "Ny", "last_modified": "2025-02-02T00:00:00"})
+    assert _run(client) == {"receipts": 1, "bank": 0}
+    assert _scalar(select(func.count(BankTransaction.id))) == 23
+    assert float(_scalar(select(BankTransaction.amount).where(BankTransaction.external_ref == "fortnox:B0"))) == -99.0
+
+    async def _cursor() -> str | None:
+        async with db_mod.SessionLocal() as session:
+            return await get_cursor(session, 1, "bank")
+
+    assert asyncio.get_event_loop().run_until_complete(_cursor()) == "2025-02-02T00:00:00"
+
+
+def test_sync_is_org_scoped():
+    client = FortnoxStubClient(receipts=_receipts(3), bank_transactions=_bank(2))
+    assert _run(client, org_id=1) == {"receipts": 3, "bank": 2}
+    assert _run(client, org_id=2) == {"receipts": 3, "bank": 2}
+    assert _scalar(select(func.count(BankTransaction.id)).where(BankTransaction.org_id == 2)) == 2
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import zipfile
+from io import BytesIO
+
+from fastapi.testclient import TestClient
+
+from services.api.app.main import app
+
+
+def _jpeg(color: tuple[int, int, int]) -> bytes:
+    from PIL import Image  # type: ignore
+
+    buf = BytesIO()
+    Image.new("RGB", (180, 120), color=color).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def test_batch_upload_files_and_zip(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    client = TestClient(app)
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("kvitton/a.jpg", _jpeg((10, 20, 30)))
+        zf.writestr("kvitton/b.jpg", _jpeg((10, 20, 30)))  # same content as a.jpg
+        zf.writestr("kvitton/notes.txt", b"not a receipt")
+        zf.writestr("__MACOSX/._a.jpg", b"")
+    files = [
+        ("files", ("one.jpg", _jpeg((200, 200, 200)), "image/jpeg")),
+        ("files", ("bundle.zip", archive.getvalue(), "application/zip")),
+    ]
+    r = client.post("/documents/batch", files=files, data={"meta_json": "{}"})
+    assert r.status_code == 200, r.text
+    body = r.json()
+    by_name = {it["filename"]: it for it in body["items"]}
+    assert set(by_name) == {"one.jpg", "a.jpg", "b.jpg", "notes.txt"}
+    assert by_name["one.jpg"]["status"] == "created"
+    assert by_name["a.jpg"]["status"] == "created"
+    assert by_name["b.jpg"]["status"] == "duplicate"
+    assert by_name["notes.txt"]["status"] == "rejected"
+    assert (body["created"], body["duplicate"], body["rejected"]) == (2, 1, 1)
+
+    # Re-sending a file already ingested is reported as a duplicate
+    again = client.post("/documents/batch", files=[("files", ("one.jpg", _jpeg((200, 200, 200)), "image/jpeg"))])
+    assert again.json()["items"][0]["status"] == "duplicate"
+    assert again.json()["items"][0]["documentId"] == by_name["one.jpg"]["documentId"]
+
+
+def test_batch_upload_caps_total_bytes(monkeypatch, tmp_path):
+    from services.api.app.config import settings
+
+    monkeypatch.chdir(tmp_path)
+    images = [_jpeg((i * 40, 90, 90)) for i in range(3)]
+    monkeypatch.setattr(settings, "upload_batch_max_bytes", len(images[0]) + len(images[1]) + 10)
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("c.jpg", _jpeg((1, 2, 3)))
+    files = [("files", (f"{i}.jpg", data, "image/jpeg")) for i, data in enumerate(images)]
+    files.append(("files", ("more.zip", archive.getvalue(), "application/zip")))
+    r = TestClient(app).post("/documents/batch", files=files)
+    assert r.status_code == 200, r.text
+    by_name = {it["filename"]: it for it in r.json()["items"]}
+    assert by_name["0.jpg"]["status"] == by_name["1.jpg"]["status"] == "created"
+    assert by_name["2.jpg"] == {"filename": "2.jpg", "status": "rejected", "error": "batch size limit exceeded"}
+    assert by_name["more.zip"]["error"] == "batch size limit exceeded"
+
+
+def test_zip_members_over_limits_are_rejected_individually(monkeypatch, tmp_path):
+    import os
+
+    from services.api.app.config import settings
+
+    monkeypatch.chdir(tmp_path)
+    small = [_jpeg((i * 60, 30, 30)) for i in range(4)]
+    monkeypatch.setattr(settings, "upload_batch_max_files", 2)
+    monkeypatch.setattr(settings, "upload_max_bytes", max(map(len, small)) + 100)
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("a.jpg", small[0])
+        zf.writestr("big.jpg", os.urandom(settings.upload_max_bytes + 1))
+        zf.writestr("b.jpg", small[1])
+        zf.writestr("c.jpg", small[2])
+    files = [
+        ("files", ("bundle.zip", archive.getvalue(), "application/zip")),
+        ("files", ("d.jpg", small[3], "image/jpeg")),
+    ]
+    r = TestClient(app).post("/documents/batch", files=files)
+    assert r.status_code == 200, r.text
+    by_name = {it["filename"]: it for it in r.json()["items"]}
+    assert by_name["a.jpg"]["status"] == by_name["b.jpg"]["status"] == "created"
+    assert by_name["big.jpg"] == {"filename": "big.jpg", "status": "rejected", "error": "file too large"}
+    for name in ("c.jpg", "d.jpg"):
+        assert by_name[name] == {"filename": name, "status": "rejected", "error": "batch file limit exceeded"}
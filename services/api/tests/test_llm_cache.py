@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from services.api.app import llm_cache
+from services.api.app.agents.llm_integration import LLMConfig, LLMProvider, LLMService
+from services.api.app.agents.openrouter_integration import OpenRouterClient, OpenRouterConfig
+from services.api.app.config import settings
+from services.api.app.llm_cache import LLMCache, cache_key
+
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+
+
+def test_key_is_stable_across_processes():
+    prompt = "\n        Analyze this receipt:\n        Kaffe AB 245,00\n"
+    code = "from services.api.app.llm_cache import cache_key; print(cache_key(%r, 'gpt-4o', 0.1))" % prompt
+    keys = set()
+    for seed in ("1", "2"):
+        env = {**os.environ, "PYTHONHASHSEED": seed}
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True, cwd=REPO_ROOT)
+        keys.add(out.stdout.strip())
+    assert keys == {cache_key(prompt, "gpt-4o", 0.1)}
+    # Layout whitespace is normalised away; model and temperature are part of the identity
+    assert cache_key("Analyze this receipt: Kaffe AB 245,00", "gpt-4o", 0.1) == cache_key(prompt, "gpt-4o", 0.1)
+    assert cache_key(prompt, "gpt-4o", 0.0) != cache_key(prompt, "gpt-4o", 0.1)
+    assert cache_key(prompt, "claude", 0.1) != cache_key(prompt, "gpt-4o", 0.1)
+
+
+def test_l1_then_shared_l2_across_workers():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    worker_a = LLMCache(redis=fakeredis.aioredis.FakeRedis(server=server, decode_responses=True))
+    worker_b = LLMCache(redis=fakeredis.aioredis.FakeRedis(server=server, decode_responses=True))
+    key = cache_key("extract Kaffe AB", "m", 0.1)
+
+    async def _run() -> None:
+        assert await worker_a.get(key, "extract") is None
+        await worker_a.set(key, {"vendor": "Kaffe AB", "total_amount": 245.0})
+        await worker_a.set(cache_key("bad", "m", 0.1), {"raw_response": "??", "parse_error": True})
+        hit = await worker_a.get(key, "extract")
+        hit["vendor"] = "mutated"
+        assert (await worker_b.get(key, "extract"))["vendor"] == "Kaffe AB"
+        assert (await worker_b.get(key, "extract"))["vendor"] == "Kaffe AB"
+        assert await worker_b.get(cache_key("bad", "m", 0.1), "extract") is None
+
+    asyncio.get_event_loop().run_until_complete(_run())
+    assert worker_a.stats == {"l1_hits": 1, "l2_hits": 0, "misses": 1}
+    assert worker_b.stats == {"l1_hits": 1, "l2_hits": 1, "misses": 1}
+
+
+def test_every_provider_path_uses_the_cache(monkeypatch):
+    monkeypatch.setattr(llm_cache, "_cache", LLMCache())
+    monkeypatch.setattr(settings, "openrouter_consensus_quorum", 3)
+    service = LLMService(LLMConfig(provider=LLMProvider.LOCAL, model="llama3"))
+    calls: list[str] = []
+
+    async def _local_complete(prompt: str) -> str:
+        calls.append(prompt)
+        return '{"vendor": "Kaffe AB", "total_amount": 245.0, "confidence": 0.9}'
+
+    monkeypatch.setattr(service, "_local_complete", _local_complete)
+
+    client = OpenRouterClient(OpenRouterConfig(api_key="test"))
+    posted: list[str] = []
+
+    async def _post_completion(model: str, prompt, task_type: str, temperature: float, failover: bool = True) -> dict:
+        posted.append(model)
+        return {"confidence": 0.9, "corrections": {}}
+
+    monkeypatch.setattr(client, "_post_completion", _post_completion)
+
+    async def _run() -> None:
+        first = await service.extract_receipt_data("Kaffe AB\nTOTALT 245,00")
+        again = await service.extract_receipt_data("Kaffe AB\nTOTALT 245,00")
+        assert first == again and first["vendor"] == "Kaffe AB"
+        await service.check_compliance({"id": 1, "total": 245.0})
+        await service.check_compliance({"id": 1, "total": 245.0})
+        await client.multi_model_consensus("Kaffe AB", {"vendor": "Kaffe AB", "total": 245.0})
+        await client.multi_model_consensus("Kaffe AB", {"vendor": "Kaffe AB", "total": 245.0})
+
+    asyncio.get_event_loop().run_until_complete(_run())
+    assert len(calls) == 2  # one extraction, one compliance check
+    assert len(posted) == 3  # one call per consensus model
+    assert client.get_usage_stats()["cache"]["l1_hits"] == 5
+
+
+def test_only_usable_replies_are_cacheable():
+    assert llm_cache.cacheable({"vendor": "Kaffe AB"})
+    assert llm_cache.cacheable('Sure! {"vendor": "Kaffe AB", "total_amount": 245.0}')
+    assert not llm_cache.cacheable({"raw_response": "Kaffe AB 245"})
+    assert not llm_cache.cacheable({"error": "rate limited"})
+    assert not llm_cache.cacheable("I could not read the receipt.")
+    assert not llm_cache.cacheable('{"vendor": "Kaffe AB", "total_am')
+    assert not llm_cache.cacheable(None)
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services.api.app import ai_fallback, llm_cache
+from services.api.app.agents import openrouter_integration
+from services.api.app.agents.llm_integration import LLMConfig, LLMProvider, LLMService
+from services.api.app.agents.openrouter_integration import OpenRouterClient, OpenRouterConfig
+from services.api.app.ai_fallback import ExtractionBatcher, extract_fields_with_llm
+from services.api.app.config import settings
+from services.api.app.llm_cache import LLMCache, SingleFlight
+from services.api.app.main import app
+from services.api.app.metrics_llm import get_usage_stats, record_upstream_call
+
+
+RECEIPTS = {
+    "Kaffe AB": "Kaffe AB\nTOTALT 245,00\n2026-10-01",
+    "Taxi Syd": "Taxi Syd\nATT BETALA 312,00\n2026-10-02",
+    "Byggmax": "Byggmax\nSUMMA 1 250,00\n2026-10-03",
+}
+
+
+@pytest.fixture
+def openrouter(monkeypatch):
+    """Fresh cache/single-flight/batcher and an OpenRouter client whose upstream is scripted."""
+    monkeypatch.setattr(llm_cache, "_cache", LLMCache())
+    monkeypatch.setattr(llm_cache, "_flights", SingleFlight())
+    monkeypatch.setattr(ai_fallback, "_batcher", ExtractionBatcher())
+    monkeypatch.setattr(settings, "llm_fallback_enabled", True)
+    monkeypatch.setattr(settings, "llm_provider", "openrouter")
+    client = OpenRouterClient(OpenRouterConfig(api_key="test"))
+    client.calls = []
+
+    async def _post_completion(model, prompt, task_type, temperature, failover=True) -> dict:
+        client.calls.append(task_type)
+        record_upstream_call(task_type)  # what _request_with_retries would count
+        await asyncio.sleep(0.05)
+        if task_type == "extraction_batch":
+            vendors = [v for v in RECEIPTS if v in prompt]
+            n = len(vendors)
+            results = [{"index": (i + client.batch_rotate) % n, "vendor": v, "total_amount": 100.0 + i, "confidence": 0.9} for i, v in enumerate(vendors)]
+            return {"results": results[: client.batch_answers]}
+        vendor = next(v for v in RECEIPTS if v in prompt)
+        return {"vendor": vendor, "total_amount": 1.0, "confidence": 0.8}
+
+    client.batch_answers = 99
+    client.batch_rotate = 0
+    monkeypatch.setattr(client, "_post_completion", _post_completion)
+    monkeypatch.setattr(openrouter_integration, "_client", client)
+    return client
+
+
+def _gather(*texts: str) -> list:
+    async def _run() -> list:
+        return await asyncio.gather(*(extract_fields_with_llm(t) for t in texts))
+
+    return asyncio.get_event_loop().run_until_complete(_run())
+
+
+def test_identical_fallback_extractions_share_one_call(openrouter):
+    before = get_usage_stats()
+    results = _gather(*([RECEIPTS["Kaffe AB"]] * 5))
+    assert openrouter.calls == ["extraction"]
+    assert all(r == results[0] for r in results) and ("vendor", "Kaffe AB", 0.8) in results[0]
+    after = get_usage_stats()
+
+    def delta(section: str) -> int:
+        return after[section].get("extraction", 0) - before[section].get("extraction", 0)
+
+    # Requests and upstream calls share one label, so the quota saved is visible per operation
+    assert (delta("requested"), delta("upstream"), delta("coalesced")) == (5, 1, 4)
+    assert after["requested_total"] - before["requested_total"] == 5
+    assert after["latency"]["extraction"]["p95"] is not None
+
+
+def test_llm_service_extraction_is_single_flight(monkeypatch):
+    monkeypatch.setattr(llm_cache, "_cache", LLMCache())
+    monkeypatch.setattr(llm_cache, "_flights", SingleFlight())
+    service = LLMService(LLMConfig(provider=LLMProvider.LOCAL, model="llama3"))
+    calls: list[str] = []
+
+    async def _local_complete(prompt: str) -> str:
+        calls.append(prompt)
+        await asyncio.sleep(0.05)
+        return json.dumps({"vendor": "Kaffe AB", "total_amount": 245.0, "confidence": 0.9})
+
+    monkeypatch.setattr(service, "_local_complete", _local_complete)
+
+    async def _run() -> list:
+        return await asyncio.gather(*(service.extract_receipt_data(RECEIPTS["Kaffe AB"]) for _ in range(3)))
+
+    before = get_usage_stats()
+    out = asyncio.get_event_loop().run_until_complete(_run())
+    assert len(calls) == 1
+    after = get_usage_stats()
+    assert after["requested"]["extract"] - before["requested"].get("extract", 0) == 3
+    assert after["upstream"]["extract"] - before["upstream"].get("extract", 0) == 1
+    out[0]["vendor"] = "mutated"  # every caller gets its own copy
+    assert out[1]["vendor"] == out[2]["vendor"] == "Kaffe AB"
+
+
+def test_micro_batch_packs_small_prompts_into_one_request(openrouter, monkeypatch):
+    monkeypatch.setattr(settings, "llm_extract_batch_max", 3)
+    results = _gather(*RECEIPTS.values())
+    assert openrouter.calls == ["extraction_batch"]
+    assert [dict((k, v) for k, v, _ in r)["vendor"] for r in results] == list(RECEIPTS)
+    assert ai_fallback.get_extraction_batcher().stats == {"batches": 1, "batched_items": 3, "fallbacks": 0}
+
+    # Each answer was cached under its single-receipt key
+    _gather(RECEIPTS["Taxi Syd"])
+    assert openrouter.calls == ["extraction_batch"]
+
+
+def test_micro_batch_asks_separately_for_what_the_batch_missed(openrouter, monkeypatch):
+    monkeypatch.setattr(settings, "llm_extract_batch_max", 8)
+    monkeypatch.setattr(settings, "llm_extract_batch_wait_ms", 10.0)
+    openrouter.batch_answers = 2
+    results = _gather(*RECEIPTS.values())
+    assert sorted(openrouter.calls) == ["extraction", "extraction_batch"]
+    assert ("vendor", "Byggmax", 0.8) in results[2]
+    assert ai_fallback.get_extraction_batcher().stats["fallbacks"] == 1
+
+
+def test_misplaced_batch_answers_are_neither_used_nor_cached(openrouter, monkeypatch):
+    monkeypatch.setattr(settings, "llm_extract_batch_max", 3)
+    openrouter.batch_rotate = 1  # every answer comes back under its neighbour's index
+    results = _gather(*RECEIPTS.values())
+    assert sorted(openrouter.calls) == ["extraction"] * 3 + ["extraction_batch"]
+    assert [dict((k, v) for k, v, _ in r)["vendor"] for r in results] == list(RECEIPTS)
+    assert ai_fallback.get_extraction_batcher().stats["fallbacks"] == 3
+
+
+def test_metrics_llm_endpoint(openrouter):
+    _gather(RECEIPTS["Byggmax"], RECEIPTS["Byggmax"])
+    body = TestClient(app).get("/metrics/llm").json()
+    assert body["upstream"]["extraction"] >= 1 and body["requested_total"] >= body["upstream_total"] >= 1
+    assert body["single_flight"] == {"leaders": 2, "followers": 1}
+    assert set(body["latency"]["extraction"]) == {"count", "p50", "p95"}
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import asyncio
+from io import BytesIO
+
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+
+from services.api.app import db as db_mod
+from services.api.app.main import app
+from services.api.app.metrics_ocr import get_cache_stats
+from services.api.app.models import OcrCacheEntry
+from services.api.app.ocr import StubOcrAdapter
+from services.api.app.routers import ingest
+
+
+class _CountingAdapter(StubOcrAdapter):
+    calls = 0
+
+    async def extract(self, image_bytes: bytes):
+        type(self).calls += 1
+        return await super().extract(image_bytes)
+
+
+def _upload(client: TestClient) -> str:
+    from PIL import Image  # type: ignore
+
+    buf = BytesIO()
+    Image.new("RGB", (220, 130), color=(250, 250, 250)).save(buf, format="JPEG")
+    up = client.post("/documents", files={"file": ("kvitto.jpg", buf.getvalue(), "image/jpeg")}, data={"meta_json": "{}"})
+    assert up.status_code == 200, up.text
+    return up.json()["documentId"]
+
+
+def test_ocr_served_from_cache_until_forced(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)  # fresh WORM store, no sidecars from earlier runs
+    _CountingAdapter.calls = 0
+    monkeypatch.setattr(ingest, "get_ocr_adapter", _CountingAdapter)
+    client = TestClient(app)
+    doc_id = _upload(client)
+    before = get_cache_stats()
+
+    first = client.post(f"/documents/{doc_id}/process-ocr").json()
+    assert "cached" not in first and _CountingAdapter.calls == 1
+
+    second = client.post(f"/documents/{doc_id}/process-ocr").json()
+    assert second["cached"] == "db" and _CountingAdapter.calls == 1
+    assert second["fields"] == first["fields"]
+
+    # Without the DB row the identity-tagged sidecar still answers
+    async def _drop() -> None:
+        async with db_mod.SessionLocal() as session:
+            await session.execute(delete(OcrCacheEntry))
+            await session.commit()
+
+    asyncio.get_event_loop().run_until_complete(_drop())
+    assert client.post(f"/documents/{doc_id}/process-ocr").json()["cached"] == "sidecar"
+
+    forced = client.post(f"/documents/{doc_id}/process-ocr", params={"force": "true"}).json()
+    assert "cached" not in forced and _CountingAdapter.calls == 2
+
+    after = get_cache_stats()
+    assert after["hit_db"] - before["hit_db"] == 1
+    assert after["hit_sidecar"] - before["hit_sidecar"] == 1
+    assert after["bypass"] - before["bypass"] == 1
+    assert after["hit_ratio"] is not None
+
+
+def test_changed_pattern_tables_miss_the_cache(monkeypatch, tmp_path):
+    from services.api.app import receipt_fields
+    from services.api.app.config import settings
+
+    monkeypatch.chdir(tmp_path)
+    _CountingAdapter.calls = 0
+    monkeypatch.setattr(ingest, "get_ocr_adapter", _CountingAdapter)
+    client = TestClient(app)
+    doc_id = _upload(client)
+    client.post(f"/documents/{doc_id}/process-ocr")
+    assert client.post(f"/documents/{doc_id}/process-ocr").json()["cached"] == "db"
+
+    # New tables (or a new extractor revision) mean the cached fields are stale
+    tables = tmp_path / "patterns.json"
+    tables.write_bytes(receipt_fields._patterns_path().read_bytes().replace(b"\"patterns\"", b"\"revised\": 2, \"patterns\"", 1))
+    monkeypatch.setattr(settings, "receipt_patterns_path", str(tables))
+    receipt_fields.get_patterns.cache_clear()
+    try:
+        again = client.post(f"/documents/{doc_id}/process-ocr").json()
+        assert "cached" not in again and _CountingAdapter.calls == 2
+        assert client.post(f"/documents/{doc_id}/process-ocr").json()["cached"] == "db"
+        monkeypatch.setattr(receipt_fields, "EXTRACTOR_VERSION", receipt_fields.EXTRACTOR_VERSION + 1)
+        receipt_fields._fields_version.cache_clear()
+        assert "cached" not in client.post(f"/documents/{doc_id}/process-ocr").json()
+    finally:
+        receipt_fields.get_patterns.cache_clear()
+        receipt_fields._fields_version.cache_clear()
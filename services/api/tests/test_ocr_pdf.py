@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import json
+from io import BytesIO
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services.api.app.config import settings
+from services.api.app.main import app
+from services.api.app.ocr import StubOcrAdapter, _extract_fields_from_text
+from services.api.app.routers import ingest
+
+
+pytest.importorskip("pypdfium2")
+
+
+class _PageCountingAdapter(StubOcrAdapter):
+    images: list[bytes] = []
+
+    async def extract(self, image_bytes: bytes):
+        type(self).images.append(image_bytes)
+        return await super().extract(image_bytes)
+
+
+def _invoice_pdf() -> bytes:
+    """Page 1 carries a text layer; page 2 is a scan (image only)."""
+    from PIL import Image, ImageDraw  # type: ignore
+    from reportlab.lib.utils import ImageReader  # type: ignore
+    from reportlab.pdfgen import canvas  # type: ignore
+
+    buf = BytesIO()
+    c = canvas.Canvas(buf)
+    c.drawString(72, 760, "Byggvaror AB  Faktura 4711")
+    c.drawString(72, 740, "Delsumma sida 1: 5 000,00")
+    c.showPage()
+    scan = Image.new("L", (400, 200), color=255)
+    ImageDraw.Draw(scan).text((20, 80), "Att betala 123,45", fill=0)
+    c.drawImage(ImageReader(scan), 72, 500, width=400, height=200)
+    c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def test_pdf_text_layer_then_scanned_pages(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "upload_allow_pdf", True)
+    monkeypatch.setattr(settings, "ocr_pool_workers", 0)
+    monkeypatch.setattr(settings, "ocr_pdf_dpi", 72)
+    monkeypatch.setattr(ingest, "get_ocr_adapter", _PageCountingAdapter)
+    _PageCountingAdapter.images = []
+    client = TestClient(app)
+    up = client.post("/documents", files={"file": ("faktura.pdf", _invoice_pdf(), "application/pdf")}, data={"meta_json": "{}"})
+    assert up.status_code == 200, up.text
+    doc_id = up.json()["documentId"]
+
+    r = client.post(f"/documents/{doc_id}/process-ocr")
+    assert r.status_code == 200, r.text
+    # Only the scanned page was rasterized and sent to the OCR adapter
+    assert len(_PageCountingAdapter.images) == 1
+    assert _PageCountingAdapter.images[0].startswith(b"\x89PNG")
+    sidecar = json.loads(next((tmp_path / ".worm_store").glob("??/??/*.ocr.json")).read_text(encoding="utf-8"))
+    first_page, second_page = sidecar["text"].split("\f")
+    assert sidecar["page_offsets"] == [0, len(first_page) + 1]
+    assert "Faktura 4711" in first_page and "stub-ocr" in second_page
+    # The total comes from the last page, not the larger page-1 subtotal
+    assert {f["key"]: f["value"] for f in r.json()["fields"]}["total"] == "123.45"
+
+    # Re-running OCR reuses the per-page cache for the scanned page
+    again = client.post(f"/documents/{doc_id}/process-ocr", params={"force": True})
+    assert again.status_code == 200
+    assert len(_PageCountingAdapter.images) == 1
+
+
+def test_total_prefers_last_page_with_amounts():
+    text = "Sida 1\nDelsumma 9 999,00\fSida 2\nAtt betala 1 250,00\fVillkor: 30 dagar netto"
+    assert dict((k, v) for k, v, _c in _extract_fields_from_text(text))["total"] == "1250.00"
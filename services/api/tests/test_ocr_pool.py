@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import time
+import weakref
+
+import pytest
+
+from services.api.app import ocr_pool
+from services.api.app.config import settings
+
+
+@pytest.fixture(autouse=True)
+def _fresh_pool(monkeypatch):
+    monkeypatch.setattr(ocr_pool, "_admission", weakref.WeakKeyDictionary())
+    yield
+    ocr_pool.shutdown_pool()
+
+
+def test_run_cpu_uses_worker_process(monkeypatch):
+    monkeypatch.setattr(settings, "ocr_pool_workers", 1)
+
+    async def _go() -> int:
+        await ocr_pool.warm_pool()
+        return await ocr_pool.run_cpu(os.getpid)
+
+    assert asyncio.new_event_loop().run_until_complete(_go()) != os.getpid()
+
+
+def test_admission_is_bounded(monkeypatch):
+    # Thread mode keeps the test fast; admission works the same for the process pool
+    monkeypatch.setattr(settings, "ocr_pool_workers", 0)
+    monkeypatch.setattr(settings, "ocr_pool_max_pending", 1)
+    monkeypatch.setattr(settings, "ocr_pool_admission_timeout", 0.05)
+
+    async def _go() -> list:
+        return await asyncio.gather(*(ocr_pool.run_cpu(time.sleep, 0.3) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.new_event_loop().run_until_complete(_go())
+    busy = [r for r in results if isinstance(r, ocr_pool.OcrBusyError)]
+    assert len(busy) == 1
+    assert ocr_pool.pool_stats()["in_flight"] == 0
+
+
+def test_init_worker_sets_tesseract_cmd_without_optional_modules(monkeypatch):
+    pytesseract = pytest.importorskip("pytesseract")
+    monkeypatch.setattr(pytesseract.pytesseract, "tesseract_cmd", "tesseract")
+    # None in sys.modules makes the import fail, as in an image without PDF or OpenCV support
+    monkeypatch.setitem(sys.modules, "pypdfium2", None)
+    monkeypatch.setitem(sys.modules, "cv2", None)
+    ocr_pool._init_worker("/opt/tesseract/bin/tesseract")
+    assert pytesseract.pytesseract.tesseract_cmd == "/opt/tesseract/bin/tesseract"
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+from io import BytesIO
+
+import pytest
+from fastapi.testclient import TestClient
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from services.api.app import ocr_queue  # noqa: E402
+from services.api.app.config import settings  # noqa: E402
+from services.api.app.main import app  # noqa: E402
+
+
+def _jpeg() -> bytes:
+    from PIL import Image  # type: ignore
+
+    buf = BytesIO()
+    Image.new("RGB", (200, 120), color=(255, 255, 255)).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+@pytest.fixture
+def fake_queue(monkeypatch):
+    import redis.asyncio as redis_asyncio  # type: ignore
+
+    server = fakeredis.FakeServer()
+    # One client per call: the API and the simulated worker run on different event loops
+    monkeypatch.setattr(redis_asyncio, "from_url", lambda *a, **k: fakeredis.aioredis.FakeRedis(server=server))
+    monkeypatch.setattr(settings, "ocr_queue_url", "redis://fake/0")
+    return lambda: fakeredis.aioredis.FakeRedis(server=server)
+
+
+def _run_worker_until_done(make_client, job_id: str) -> None:
+    from opentelemetry import trace
+
+    from services.api.app.ocr import StubOcrAdapter
+    from services.api.app.ocr_worker import _consume
+
+    async def _go() -> None:
+        r = make_client()
+        task = asyncio.create_task(_consume(r, StubOcrAdapter(), trace.get_tracer("test"), "test-0"))
+        for _ in range(100):
+            if await r.exists(ocr_queue.result_key(job_id)):
+                break
+            await asyncio.sleep(0.02)
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+    asyncio.new_event_loop().run_until_complete(_go())
+
+
+def test_queued_ocr_carries_reference_and_returns_202(fake_queue, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)  # fresh WORM store so the OCR cache can't short-circuit the queue
+    client = TestClient(app)
+    up = client.post("/documents", files={"file": ("receipt.jpg", _jpeg(), "image/jpeg")}, data={"meta_json": "{}"})
+    assert up.status_code == 200, up.text
+    doc_id = up.json()["documentId"]
+
+    r = client.post(f"/documents/{doc_id}/process-ocr", params={"wait": "false"})
+    assert r.status_code == 202, r.text
+    job_id = r.json()["jobId"]
+
+    async def _peek() -> dict:
+        entries = await fake_queue().xrange(ocr_queue.STREAM_KEY)
+        return json.loads(entries[0][1][b"job"])
+
+    job = asyncio.new_event_loop().run_until_complete(_peek())
+    assert job["digest"] == doc_id and "hex" not in job
+    assert client.get(f"/documents/ocr-jobs/{job_id}").json()["status"] == "pending"
+
+    _run_worker_until_done(fake_queue, job_id)
+
+    async def _ttl() -> int:
+        return await fake_queue().ttl(ocr_queue.result_key(job_id))
+
+    assert 0 < asyncio.new_event_loop().run_until_complete(_ttl()) <= settings.ocr_result_ttl_seconds
+    done = client.get(f"/documents/ocr-jobs/{job_id}").json()
+    assert done["status"] == "processed"
+    assert any(f["key"] == "total" for f in done["fields"])
+
+    # Another org's user can't read (or apply) the job's result
+    from services.api.app.security import require_user
+
+    monkeypatch.setattr(settings, "app_env", "production")
+    app.dependency_overrides[require_user] = lambda: {"sub": "other", "org_id": 999}
+    try:
+        assert client.get(f"/documents/ocr-jobs/{job_id}").status_code == 403
+    finally:
+        app.dependency_overrides.pop(require_user, None)
+
+
+def test_wait_for_result_wakes_without_polling(fake_queue):
+    async def _go() -> dict | None:
+        r = fake_queue()
+
+        async def _finish() -> None:
+            await asyncio.sleep(0.05)
+            await ocr_queue.publish_result(r, "job-x", {"digest": "d", "text": "ok"})
+
+        waiter = asyncio.create_task(ocr_queue.wait_for_result(fake_queue(), "job-x", 2.0))
+        await _finish()
+        return await waiter
+
+    assert asyncio.new_event_loop().run_until_complete(_go()) == {"digest": "d", "text": "ok"}
+
+
+def test_only_our_own_storage_refs_are_read(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "s3_bucket", "originals")
+    digest = "ab" * 32
+    stored = tmp_path / ".worm_store" / "ab" / "ab" / f"{digest}_receipt.jpg"
+    stored.parent.mkdir(parents=True)
+    stored.write_bytes(b"jpeg")
+    (tmp_path / "secret.txt").write_text("token")
+
+    assert ocr_queue.read_document_bytes(str(stored)) == b"jpeg"
+    assert ocr_queue.read_document_bytes(f".worm_store/ab/ab/{digest}_receipt.jpg") == b"jpeg"
+    for ref in (
+        str(tmp_path / "secret.txt"),
+        ".worm_store/../secret.txt",
+        "/etc/passwd",
+        "http://169.254.169.254/latest/meta-data/",
+        "s3://someone-elses-bucket/key",
+        "worm://../../etc/passwd",
+    ):
+        with pytest.raises(ValueError):
+            ocr_queue.read_document_bytes(ref)
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from opentelemetry import trace  # noqa: E402
+
+from services.api.app import ocr_queue  # noqa: E402
+from services.api.app.config import settings  # noqa: E402
+from services.api.app.ocr import OcrAdapter, StubOcrAdapter  # noqa: E402
+from services.api.app.ocr_worker import handle_message, next_message  # noqa: E402
+
+
+class _FailingAdapter(OcrAdapter):
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def extract(self, image_bytes: bytes):
+        self.calls += 1
+        raise RuntimeError("tesseract crashed")
+
+
+def _run(coro):
+    return asyncio.new_event_loop().run_until_complete(coro)
+
+
+@pytest.fixture
+def image_ref(tmp_path, monkeypatch) -> str:
+    # Workers only read refs inside the WORM store
+    monkeypatch.chdir(tmp_path)
+    p = tmp_path / ".worm_store" / "ab" / "cd" / "abcd_receipt.jpg"
+    p.parent.mkdir(parents=True)
+    p.write_bytes(b"\xff\xd8fake")
+    return str(p)
+
+
+def test_ack_removes_job_and_publishes_result(image_ref):
+    async def _go():
+        r = fakeredis.aioredis.FakeRedis()
+        job_id = await ocr_queue.enqueue(r, "d1", image_ref)
+        msg = await next_message(r, "w-0", block_ms=10)
+        outcome = await handle_message(r, StubOcrAdapter(), trace.get_tracer("test"), "w-0", msg)
+        pending = (await r.xinfo_groups(ocr_queue.STREAM_KEY))[0]["pending"]
+        return outcome, await ocr_queue.get_result(r, job_id), await ocr_queue.queue_depth(r), pending
+
+    outcome, result, depth, pending = _run(_go())
+    assert outcome == "ok"
+    assert result["digest"] == "d1" and result["text"].startswith("stub-ocr-len:")
+    assert depth == 0 and pending == 0
+
+
+def test_unacked_job_is_reclaimed_by_another_worker(image_ref, monkeypatch):
+    monkeypatch.setattr(settings, "ocr_visibility_timeout_seconds", 0.01)
+
+    async def _go():
+        r = fakeredis.aioredis.FakeRedis()
+        job_id = await ocr_queue.enqueue(r, "d2", image_ref)
+        crashed = await next_message(r, "w-crashed", block_ms=10)  # read but never ACKed
+        await asyncio.sleep(0.05)
+        msg = await next_message(r, "w-1", block_ms=10)
+        assert msg is not None and msg[0] == crashed[0]
+        outcome = await handle_message(r, StubOcrAdapter(), trace.get_tracer("test"), "w-1", msg)
+        return outcome, await ocr_queue.get_result(r, job_id)
+
+    outcome, result = _run(_go())
+    assert outcome == "ok" and result["digest"] == "d2"
+
+
+def test_failures_retry_with_backoff_then_dead_letter(image_ref, monkeypatch):
+    monkeypatch.setattr(settings, "ocr_max_attempts", 2)
+    monkeypatch.setattr(settings, "ocr_retry_backoff_seconds", 0.0)
+    adapter = _FailingAdapter()
+
+    async def _go():
+        r = fakeredis.aioredis.FakeRedis()
+        job_id = await ocr_queue.enqueue(r, "d3", image_ref)
+        tracer = trace.get_tracer("test")
+        first = await handle_message(r, adapter, tracer, "w-0", await next_message(r, "w-0", block_ms=10))
+        assert await ocr_queue.get_result(r, job_id) is None  # waiters keep waiting during retries
+        retried = await next_message(r, "w-0", block_ms=10)  # promoted from the retry set
+        second = await handle_message(r, adapter, tracer, "w-0", retried)
+        dead = await r.xrange(ocr_queue.DEAD_LETTER_KEY)
+        return first, second, dead, await ocr_queue.get_result(r, job_id), await ocr_queue.queue_depth(r)
+
+    first, second, dead, result, depth = _run(_go())
+    assert (first, second) == ("retry", "dead")
+    assert adapter.calls == 2
+    assert len(dead) == 1 and json.loads(dead[0][1][b"job"])["digest"] == "d3"
+    assert dead[0][1][b"attempts"] == b"2"
+    assert result["error"] == "tesseract crashed"
+    assert depth == 0
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+from datetime import date, timedelta
+from io import BytesIO
+from pathlib import Path
+
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from fastapi.testclient import TestClient
+from services.api.app.main import app
+
+
+MIGRATION = Path(__file__).resolve().parents[1] / "migrations" / "versions" / "20261019_000004_open_items.py"
+
+
+def _post(client: TestClient, entries: list[dict], counterparty: str, on: date, amount: float) -> int:
+    r = client.post("/verifications", json={
+        "org_id": 1,
+        "date": on.isoformat(),
+        "total_amount": amount,
+        "currency": "SEK",
+        "counterparty": counterparty,
+        "entries": entries,
+    })
+    assert r.status_code == 200, r.text
+    return r.json()["id"]
+
+
+def _ar(client: TestClient, amount: float, counterparty: str, on: date) -> int:
+    return _post(client, [
+        {"account": "1510", "debit": amount, "credit": 0.0},
+        {"account": "3001", "debit": 0.0, "credit": amount},
+    ], counterparty, on, amount)
+
+
+def test_open_items_created_and_aged():
+    client = TestClient(app)
+    today = date.today()
+    _ar(client, 100.0, "Kund AB", today)
+    _ar(client, 200.0, "Kund AB", today - timedelta(days=45))
+    _post(client, [
+        {"account": "6110", "debit": 80.0, "credit": 0.0},
+        {"account": "2440", "debit": 0.0, "credit": 80.0},
+    ], "Leverantör AB", today - timedelta(days=120), 80.0)
+    r = client.get("/verifications/open-items")
+    assert r.status_code == 200, r.text
+    items = {(it["counterparty"], it["type"]): it for it in r.json()["items"]}
+    kund = items[("Kund AB", "ar")]
+    assert kund["open_amount"] == 300.0
+    assert kund["aging"]["0-30"] == 100.0
+    assert kund["aging"]["31-60"] == 200.0
+    assert items[("Leverantör AB", "ap")]["aging"]["90+"] == 80.0
+    aging = client.get("/verifications/open-items/aging").json()
+    assert aging["ar"]["amount"] == 300.0
+    assert aging["ap"]["count"] == 1
+
+
+def test_settlement_reduces_targeted_item_then_fifo():
+    client = TestClient(app)
+    today = date.today()
+    _ar(client, 100.0, "Kund AB", today - timedelta(days=10))
+    new = _ar(client, 50.0, "Kund AB", today)
+    csv_data = (
+        "date,amount,currency,description,counterparty\n"
+        f"{today.isoformat()},50.00,SEK,Inbetalning Kund AB,Kund AB\n"
+    ).encode("utf-8")
+    client.post("/bank/import", files={"file": ("bank.csv", BytesIO(csv_data), "text/csv")})
+    tx_id = client.get("/bank/transactions", params={"unmatched": 1}).json()["items"][0]["id"]
+    r = client.post(f"/bank/transactions/{tx_id}/settle", json={"verification_id": new})
+    assert r.status_code == 200, r.text
+    # The targeted (newest) item is settled, not the oldest one
+    again = client.post(f"/bank/transactions/{tx_id}/settle", json={"verification_id": new})
+    assert again.status_code == 400
+    items = client.get("/verifications/open-items", params={"type": "ar"}).json()["items"]
+    assert items == [{"counterparty": "Kund AB", "type": "ar", "open_amount": 100.0, "items": 1,
+                      "aging": {"0-30": 100.0, "31-60": 0.0, "61-90": 0.0, "90+": 0.0}}]
+    # A manual payment without target settles FIFO
+    _post(client, [
+        {"account": "1930", "debit": 100.0, "credit": 0.0},
+        {"account": "1510", "debit": 0.0, "credit": 100.0},
+    ], "Kund AB", today, 100.0)
+    assert client.get("/verifications/open-items").json()["items"] == []
+
+
+def test_reversal_settles_the_reversed_item():
+    client = TestClient(app)
+    today = date.today()
+    _ar(client, 100.0, "Kund AB", today - timedelta(days=40))
+    newer = _ar(client, 50.0, "Kund AB", today)
+    r = client.post(f"/verifications/{newer}/reverse")
+    assert r.status_code == 200, r.text
+    # The older invoice stays open in full; the reversed one no longer ages
+    items = client.get("/verifications/open-items", params={"type": "ar"}).json()["items"]
+    assert items == [{"counterparty": "Kund AB", "type": "ar", "open_amount": 100.0, "items": 1,
+                      "aging": {"0-30": 0.0, "31-60": 100.0, "61-90": 0.0, "90+": 0.0}}]
+
+
+def test_rebuild_matches_incremental_state():
+    from services.api.app import db as db_mod
+    from services.api.app.open_items import rebuild_open_items, summarize_open_items
+
+    client = TestClient(app)
+    today = date.today()
+    _ar(client, 120.0, "Kund AB", today)
+    _post(client, [
+        {"account": "1930", "debit": 20.0, "credit": 0.0},
+        {"account": "1510", "debit": 0.0, "credit": 20.0},
+    ], "Kund AB", today, 20.0)
+    before = client.get("/verifications/open-items").json()["items"]
+
+    async def _rebuild() -> list[dict]:
+        async with db_mod.SessionLocal() as session:
+            await rebuild_open_items(session)
+            await session.commit()
+            return await summarize_open_items(session)
+
+    after = asyncio.get_event_loop().run_until_complete(_rebuild())
+    assert after == before
+    assert after[0]["open_amount"] == 100.0
+
+
+def test_blocked_batch_item_leaves_settled_item_untouched(monkeypatch):
+    from sqlalchemy import select
+
+    from services.api.app import db as db_mod
+    from services.api.app.models import OpenItem
+    from services.api.app.open_items import open_amounts_for
+    from services.api.app.routers.verifications import VerificationIn, create_verifications_batch
+
+    client = TestClient(app)
+    today = date.today()
+    invoice = _ar(client, 100.0, "Kund AB", today)
+    monkeypatch.setenv("APP_ENV", "production")  # compliance errors now block posting
+    payment = VerificationIn(
+        org_id=1,
+        date=today,
+        total_amount=100.0,
+        counterparty="Kund AB",
+        settles_verification_id=invoice,
+        entries=[
+            {"account": "1930", "debit": 100.0, "credit": 0.0},
+            {"account": "1510", "debit": 0.0, "credit": 100.0},
+        ],
+    )
+
+    async def _run() -> tuple[list[dict], dict, list]:
+        async with db_mod.SessionLocal() as session:
+            results = await create_verifications_batch([payment], session)
+        async with db_mod.SessionLocal() as session:
+            residual = await open_amounts_for(session, [invoice])
+            items = (await session.execute(select(OpenItem.verification_id))).scalars().all()
+        return results, residual, list(items)
+
+    results, residual, items = asyncio.get_event_loop().run_until_complete(_run())
+    assert "error" in results[0]  # no document link -> R-001
+    assert residual[invoice][1] == 100.0
+    assert items == [invoice]
+
+
+def test_migration_backfills_existing_postings(tmp_path):
+    spec = importlib.util.spec_from_file_location("migration_000004", MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)  # type: ignore[union-attr]
+
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'migrate.db'}")
+    with engine.begin() as conn:
+        conn.execute(sa.text("CREATE TABLE verifications (id INTEGER PRIMARY KEY, org_id INTEGER, counterparty TEXT, date DATE)"))
+        conn.execute(sa.text("CREATE TABLE entries (id INTEGER PRIMARY KEY, verification_id INTEGER, account TEXT, debit NUMERIC, credit NUMERIC)"))
+        conn.execute(sa.text(
+            "INSERT INTO verifications VALUES (1, 1, 'Kund AB', '2026-01-05'), (2, 1, 'Kund AB', '2026-02-05'),"
+            " (3, 1, 'Kund AB', '2026-03-01'), (4, 1, 'Lev AB', '2026-03-02'), (5, 1, NULL, '2026-03-03')"
+        ))
+        conn.execute(sa.text(
+            "INSERT INTO entries (verification_id, account, debit, credit) VALUES"
+            " (1, '1510', 1000, 0), (1, '3001', 0, 1000),"
+            " (2, '1510', 500, 0), (2, '3001', 0, 500),"
+            " (3, '1930', 1200, 0), (3, '1510', 0, 1200),"
+            " (4, '4010', 300, 0), (4, '2440', 0, 300),"
+            " (5, '6110', 50, 0), (5, '1930', 0, 50)"
+        ))
+        with Operations.context(MigrationContext.configure(conn)):
+            migration.upgrade()
+        rows = conn.execute(sa.text(
+            "SELECT verification_id, type, original_amount, open_amount, status FROM open_items ORDER BY verification_id"
+        )).all()
+    # The payment settles the oldest receivable in full and the next one in part
+    assert [(r[0], r[1], float(r[2]), float(r[3]), r[4]) for r in rows] == [
+        (1, "ar", 1000.0, 0.0, "settled"),
+        (2, "ar", 500.0, 300.0, "open"),
+        (4, "ap", 300.0, 300.0, "open"),
+    ]
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from collections import Counter
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from services.api.app.agents.openrouter_integration import OpenRouterClient, OpenRouterConfig, OpenRouterError, backoff_delay
+from services.api.app.config import settings
+from services.api.app.llm_cache import LLMCache
+
+
+class FakeOpenRouter:
+    """Stands in for /chat/completions; each model follows a scripted list of statuses."""
+
+    def __init__(self, script: dict[str, list[int]], answers: dict[str, dict] | None = None, delays: dict[str, float] | None = None):
+        self.script = script
+        self.answers = answers or {}
+        self.delays = delays or {}
+        self.calls: Counter = Counter()
+        self.peers: set = set()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        model = body["model"]
+        self.calls[model] += 1
+        self.peers.add(request.transport.get_extra_info("peername"))
+        statuses = self.script.get(model, [200])
+        status = statuses[min(self.calls[model], len(statuses)) - 1]
+        if status != 200:
+            return web.Response(status=status, text=f"{model} unavailable")
+        await asyncio.sleep(self.delays.get(model, 0.0))
+        content = json.dumps(self.answers.get(model, {"model": model, "confidence": 0.9}))
+        return web.json_response({"choices": [{"message": {"content": content}}]})
+
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(settings, "openrouter_max_retries", 2)
+    monkeypatch.setattr(settings, "openrouter_backoff_base_seconds", 0.001)
+    monkeypatch.setattr(settings, "openrouter_breaker_failures", 2)
+    monkeypatch.setattr(settings, "openrouter_breaker_reset_seconds", 60.0)
+
+
+def _run(fake: FakeOpenRouter, scenario) -> None:
+    async def _main() -> None:
+        app = web.Application()
+        app.router.add_post("/chat/completions", fake.handle)
+        server = TestServer(app)
+        await server.start_server()
+        client = OpenRouterClient(OpenRouterConfig(api_key="test", base_url=str(server.make_url("")).rstrip("/")))
+        client.models = {"swedish": "primary", "accounting": "math", "simple": "fast", "fallback": "backup"}
+        client.cache = LLMCache()
+        try:
+            await scenario(client)
+        finally:
+            await client.close()
+            await server.close()
+
+    asyncio.get_event_loop().run_until_complete(_main())
+
+
+def test_pooled_session_and_retry_on_429(fast_retries):
+    fake = FakeOpenRouter({"primary": [429, 503, 200, 200]})
+
+    async def scenario(client: OpenRouterClient) -> None:
+        out = await client._call_openrouter("primary", "kvitto 1", "extraction", use_cache=False)
+        assert out["model"] == "primary"
+        session = client._session
+        await client._call_openrouter("primary", "kvitto 2", "extraction", use_cache=False)
+        assert client._session is session
+
+    _run(fake, scenario)
+    assert fake.calls["primary"] == 4
+    assert len(fake.peers) == 1  # every request went over the same kept-alive connection
+
+
+def test_breaker_fails_over_then_skips_the_broken_model(fast_retries):
+    fake = FakeOpenRouter({"primary": [500]})
+
+    async def scenario(client: OpenRouterClient) -> None:
+        for i in range(3):
+            out = await client._call_openrouter("primary", f"kvitto {i}", "extraction", use_cache=False)
+            assert out["model"] == "backup"
+        assert client._breaker("primary").state == "open"
+
+    _run(fake, scenario)
+    # Two calls x three attempts before the breaker opened; the third call went straight to the fallback
+    assert fake.calls["primary"] == 6
+    assert fake.calls["backup"] == 3
+
+
+def test_client_errors_are_not_retried(fast_retries):
+    fake = FakeOpenRouter({"primary": [400]})
+
+    async def scenario(client: OpenRouterClient) -> None:
+        with pytest.raises(OpenRouterError) as err:
+            await client._call_openrouter("primary", "kvitto", "extraction", use_cache=False)
+        assert err.value.status == 400 and not err.value.retryable
+
+    _run(fake, scenario)
+    assert fake.calls == Counter({"primary": 1})
+
+
+def test_timeout_fails_over_instead_of_retrying(fast_retries, monkeypatch):
+    monkeypatch.setattr(settings, "openrouter_timeout_seconds", 0.2)
+    fake = FakeOpenRouter({}, delays={"primary": 2.0})
+
+    async def scenario(client: OpenRouterClient) -> None:
+        start = time.perf_counter()
+        out = await client._call_openrouter("primary", "kvitto", "extraction", use_cache=False)
+        assert out["model"] == "backup"
+        assert time.perf_counter() - start < 1.5
+
+    _run(fake, scenario)
+    assert fake.calls == Counter({"primary": 1, "backup": 1})
+
+
+def test_call_deadline_bounds_retries_and_failover(fast_retries, monkeypatch):
+    monkeypatch.setattr(settings, "openrouter_call_deadline_seconds", 0.3)
+    fake = FakeOpenRouter({}, delays={"primary": 2.0, "backup": 2.0})
+
+    async def scenario(client: OpenRouterClient) -> None:
+        start = time.perf_counter()
+        with pytest.raises(OpenRouterError):
+            await client._call_openrouter("primary", "kvitto", "extraction", use_cache=False)
+        assert time.perf_counter() - start < 1.5
+
+    _run(fake, scenario)
+    assert fake.calls == Counter({"primary": 1})  # no time was left for the fallback
+
+
+def test_session_from_a_previous_loop_is_closed():
+    client = OpenRouterClient(OpenRouterConfig(api_key="test"))
+    first = asyncio.new_event_loop()
+    old = first.run_until_complete(client._get_session())
+    first.close()
+    second = asyncio.new_event_loop()
+    try:
+        new = second.run_until_complete(client._get_session())
+        assert new is not old and old.closed
+        second.run_until_complete(client.close())
+    finally:
+        second.close()
+
+
+def test_backoff_is_jittered_and_capped(monkeypatch):
+    monkeypatch.setattr(settings, "openrouter_backoff_base_seconds", 0.5)
+    monkeypatch.setattr(settings, "openrouter_backoff_max_seconds", 4.0)
+    delays = [backoff_delay(5) for _ in range(50)]
+    assert all(0.0 <= d <= 4.0 for d in delays) and len(set(delays)) > 1
+    assert backoff_delay(0, retry_after=30.0) == 4.0
+
+
+def _answer(confidence: float, **corrections) -> dict:
+    return {"confidence": confidence, "corrections": corrections, "reasoning": "test"}
+
+
+def test_consensus_exits_on_quorum_and_cancels_the_straggler():
+    fake = FakeOpenRouter(
+        {},
+        answers={"primary": _answer(0.9, total="250,00"), "math": _answer(0.8, total=250), "fast": _answer(0.7, total=245)},
+        delays={"fast": 5.0},
+    )
+
+    async def scenario(client: OpenRouterClient) -> None:
+        start = time.perf_counter()
+        out = await client.multi_model_consensus("Kaffe AB TOTALT 250,00", {"vendor": "Kaffe AB", "total": 245.0})
+        assert time.perf_counter() - start < 2.0
+        assert out["quorum_reached"] and out["model_count"] == 2
+        assert out["corrections"] == {"total": "250,00"} and out["agreement"] == {"total": 1.0}
+        assert out["confidence"] == pytest.approx(0.85)
+
+    _run(fake, scenario)
+
+
+def test_consensus_deadline_and_field_level_disagreement(monkeypatch):
+    monkeypatch.setattr(settings, "openrouter_consensus_deadline_seconds", 0.3)
+    fake = FakeOpenRouter(
+        {},
+        answers={"primary": _answer(0.9, total=250, vendor="Kaffe AB"), "math": _answer(0.6, total=260), "fast": _answer(0.9)},
+        delays={"fast": 5.0},
+    )
+
+    async def scenario(client: OpenRouterClient) -> None:
+        start = time.perf_counter()
+        out = await client.multi_model_consensus("Kaffe AB TOTALT 2?0,00", {"vendor": "Kaffe AB", "total": 245.0})
+        assert time.perf_counter() - start < 2.0  # the hung model is dropped at its deadline
+        assert not out["quorum_reached"] and out["model_count"] == 2
+        # Totals disagree, so nothing is corrected; both models agree on the vendor
+        assert out["corrections"] == {"vendor": "Kaffe AB"}
+        assert out["agreement"] == {"total": 0.5, "vendor": 1.0}
+
+    _run(fake, scenario)
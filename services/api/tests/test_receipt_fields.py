@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import random
+
+from services.api.app.config import settings
+from services.api.app.receipt_fields import extract_fields, get_patterns
+from services.api.app.scripts.receipt_fields_benchmark import load_corpus, score, synthetic_receipt
+
+
+def test_corpus_accuracy():
+    corpus = load_corpus()
+    rng = random.Random(11)
+    corpus += [synthetic_receipt(rng) for _ in range(200)]
+    report = score(corpus)
+    assert report["fields"]["total"] == 1.0, report["misses"]
+    assert min(report["fields"].values()) >= 0.95, report
+
+
+def test_labelled_total_vat_per_rate_and_identifiers():
+    text = (
+        "Exempel Livs AB\nOrg.nr 556398-2593\nKvitto nr: 0423\n2025-01-15\n"
+        "Kaffe 2 st 119,80\nDelsumma 1 688,00\nAtt betala 160,70 kr\nKontant 200,00\n"
+        "Moms 25% 10,00 40,00 50,00\nMoms 12% 11,86 98,84 110,70"
+    )
+    fields = {k: v for k, v, _c in extract_fields(text)}
+    assert fields["total"] == "160.70"
+    assert fields["vat_amount_25"] == "10.00" and fields["vat_amount_12"] == "11.86"
+    assert fields["vat_amount"] == "21.86" and "vat_rate" not in fields
+    assert fields["org_number"] == "556398-2593" and fields["receipt_number"] == "0423"
+
+
+def test_patterns_loaded_once_and_missing_kb_falls_back(monkeypatch, tmp_path):
+    assert get_patterns() is get_patterns()
+    monkeypatch.setattr(settings, "receipt_patterns_path", str(tmp_path / "missing.json"))
+    get_patterns.cache_clear()
+    try:
+        # No label tables: the largest amount on the last page is the total, as before
+        fields = {k: v for k, v, _c in extract_fields("Kaffe AB\nSumma 64,00\nKontant 100,00")}
+        assert fields["total"] == "100.00"
+        assert get_patterns().version == 0
+    finally:
+        monkeypatch.undo()
+        get_patterns.cache_clear()
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import importlib.util
+from io import BytesIO
+from pathlib import Path
+
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from fastapi.testclient import TestClient
+from services.api.app.main import app
+
+
+MIGRATION = Path(__file__).resolve().parents[1] / "migrations" / "versions" / "20261019_000005_search_indexes.py"
+
+
+def _seed(client: TestClient) -> None:
+    csv_data = (
+        "date,amount,currency,description,counterparty\n"
+        "2025-03-01,-45.00,SEK,Kortköp Espresso House,Espresso House\n"
+        "2025-03-02,-120.00,SEK,Kortköp Kaffebaren,Kaffebaren AB\n"
+        "2025-03-03,-300.00,SEK,Tankning,OKQ8\n"
+    ).encode("utf-8")
+    r = client.post("/bank/import", files={"file": ("bank.csv", BytesIO(csv_data), "text/csv")})
+    assert r.status_code == 200
+    v = client.post("/verifications", json={
+        "org_id": 1,
+        "date": "2025-03-02",
+        "total_amount": 120.0,
+        "counterparty": "Kaffebaren AB",
+        "entries": [
+            {"account": "5460", "debit": 120.0, "credit": 0.0},
+            {"account": "1930", "debit": 0.0, "credit": 120.0},
+        ],
+    })
+    assert v.status_code == 200
+
+
+def test_search_returns_mixed_ranked_results():
+    client = TestClient(app)
+    _seed(client)
+    r = client.get("/search", params={"q": "kaffebaren"})
+    assert r.status_code == 200, r.text
+    items = r.json()["items"]
+    kinds = {it["kind"] for it in items}
+    assert {"bank", "verification"} <= kinds
+    assert all("okq8" not in (it.get("counterparty") or "").lower() for it in items)
+    # Typos still find the vendor through trigram overlap
+    fuzzy = client.get("/search", params={"q": "kafebaren"}).json()["items"]
+    assert any(it.get("counterparty") == "Kaffebaren AB" for it in fuzzy)
+    only_bank = client.get("/search", params={"q": "kaffebaren", "kinds": "bank"}).json()["items"]
+    assert only_bank and all(it["kind"] == "bank" for it in only_bank)
+
+
+def test_search_keyset_pagination_is_stable():
+    client = TestClient(app)
+    _seed(client)
+    full = client.get("/search", params={"q": "kortköp kaffebaren", "limit": 50}).json()["items"]
+    assert len(full) >= 3
+    seen: list[tuple[str, int]] = []
+    cursor = None
+    while True:
+        params = {"q": "kortköp kaffebaren", "limit": 1}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/search", params=params).json()
+        seen.extend((it["kind"], it["id"]) for it in page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert seen == [(it["kind"], it["id"]) for it in full]
+    assert client.get("/search", params={"q": "kaffe", "cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_bank_list_q_uses_index_and_short_queries_still_work():
+    client = TestClient(app)
+    _seed(client)
+    hits = client.get("/bank/transactions", params={"q": "espresso"}).json()["items"]
+    assert [it["counterparty"] for it in hits] == ["Espresso House"]
+    short = client.get("/bank/transactions", params={"q": "OK"}).json()["items"]
+    assert [it["counterparty"] for it in short] == ["OKQ8"]
+
+
+def test_migration_installs_the_same_sqlite_search_as_the_app(tmp_path):
+    from services.api.app.search import install_sqlite_search
+
+    spec = importlib.util.spec_from_file_location("migration_000005", MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)  # type: ignore[union-attr]
+
+    def _fts_rows(install) -> list:
+        engine = sa.create_engine(f"sqlite:///{tmp_path / (install.__name__ + '.db')}")
+        with engine.begin() as conn:
+            conn.execute(sa.text("CREATE TABLE bank_transactions (id INTEGER PRIMARY KEY, org_id INTEGER, description TEXT, counterparty_ref TEXT)"))
+            conn.execute(sa.text("CREATE TABLE verifications (id INTEGER PRIMARY KEY, org_id INTEGER, counterparty TEXT)"))
+            conn.execute(sa.text("CREATE TABLE documents (id INTEGER PRIMARY KEY, org_id INTEGER, ocr_text TEXT)"))
+            conn.execute(sa.text("INSERT INTO bank_transactions VALUES (1, 1, 'Kortköp Espresso House', 'Espresso House')"))
+            conn.execute(sa.text("INSERT INTO verifications VALUES (1, 1, 'Kaffebaren AB')"))
+            install(conn)
+            conn.execute(sa.text("INSERT INTO documents VALUES (1, 2, 'Kvitto OKQ8 TOTALT 300,00')"))
+            conn.execute(sa.text("UPDATE bank_transactions SET counterparty_ref = 'Espresso House AB' WHERE id = 1"))
+            conn.execute(sa.text("DELETE FROM verifications WHERE id = 1"))
+            return conn.execute(sa.text("SELECT rowid, kind, org_id, body FROM search_fts ORDER BY rowid")).all()
+
+    def migrate(conn) -> None:
+        with Operations.context(MigrationContext.configure(conn)):
+            migration.upgrade()
+
+    rows = _fts_rows(migrate)
+    assert rows == _fts_rows(install_sqlite_search)
+    assert [r[1] for r in rows] == ["bank", "document"]
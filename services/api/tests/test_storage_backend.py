@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import os
+from io import BytesIO
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services.api.app import storage_backend
+from services.api.app.config import settings
+from services.api.app.main import app
+
+
+moto = pytest.importorskip("moto")
+
+
+def _jpeg() -> bytes:
+    from PIL import Image  # type: ignore
+
+    buf = BytesIO()
+    Image.new("RGB", (300, 200), color=(123, 45, 67)).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    for k, v in {"AWS_ACCESS_KEY_ID": "test", "AWS_SECRET_ACCESS_KEY": "test", "AWS_DEFAULT_REGION": "eu-north-1"}.items():
+        monkeypatch.setenv(k, v)
+    monkeypatch.setattr(settings, "aws_region", "eu-north-1")
+    monkeypatch.setattr(settings, "aws_access_key_id", "test")
+    monkeypatch.setattr(settings, "aws_secret_access_key", "test")
+    monkeypatch.setattr(settings, "s3_bucket", "originals")
+    storage_backend.s3_client.cache_clear()
+    with moto.mock_aws():
+        storage_backend.s3_client().create_bucket(Bucket="originals", CreateBucketConfiguration={"LocationConstraint": "eu-north-1"})
+        yield storage_backend.S3Backend()
+    storage_backend.s3_client.cache_clear()
+
+
+def test_s3_backend_multipart_ranges_and_dedupe(s3, monkeypatch):
+    monkeypatch.setattr(settings, "storage_multipart_threshold_bytes", 5 * 1024 * 1024)
+    digest = "ab" * 32
+    data = os.urandom(6 * 1024 * 1024)
+    ref, stored = s3.put(digest, "big.pdf", data)
+    assert (ref, stored) == (f"s3://originals/ab/ab/{digest}_big.pdf", False)
+    head = storage_backend.s3_client().head_object(Bucket="originals", Key=ref.split("/", 3)[3])
+    assert head["ContentType"] == "application/pdf"
+    assert "-" in head["ETag"]  # multipart ETags carry the part count
+    assert s3.put(digest, "big.pdf", data) == (ref, True)
+
+    assert s3.find(digest) == ref
+    assert s3.find("cd" * 32) is None
+    assert s3.size(ref) == len(data)
+    assert b"".join(s3.iter_range(ref, 10, 19)) == data[10:20]
+    assert storage_backend.backend_for(ref).read(ref) == data
+    assert not s3.exists(ref + ".missing")
+    assert storage_backend.s3_client() is storage_backend.s3_client()
+
+
+def test_image_served_from_s3_with_range(s3, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    client = TestClient(app)
+    up = client.post("/documents", files={"file": ("kvitto.jpg", _jpeg(), "image/jpeg")}, data={"meta_json": "{}"})
+    assert up.status_code == 200, up.text
+    assert up.json()["storagePath"].startswith("s3://originals/")
+    doc_id = up.json()["documentId"]
+    full = client.get(f"/documents/{doc_id}/image")
+    assert full.status_code == 200
+    assert full.headers["content-type"] == "image/jpeg"
+    assert full.headers["accept-ranges"] == "bytes"
+    part = client.get(f"/documents/{doc_id}/image", headers={"Range": "bytes=0-99"})
+    assert part.status_code == 206
+    assert part.headers["content-range"] == f"bytes 0-99/{len(full.content)}"
+    assert part.content == full.content[:100]
+    tail = client.get(f"/documents/{doc_id}/image", headers={"Range": "bytes=-10"})
+    assert tail.content == full.content[-10:]
+    assert client.get(f"/documents/{doc_id}/image", headers={"Range": f"bytes={len(full.content)}-"}).status_code == 416
+
+
+def test_local_backend_range(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    backend = storage_backend.LocalBackend()
+    digest = "ef" * 32
+    ref, stored = backend.put(digest, "a.bin", b"0123456789")
+    assert not stored and backend.find(digest) == ref
+    assert b"".join(backend.iter_range(ref, 2, 5, chunk_size=2)) == b"2345"
+    assert backend.put(digest, "a.bin", b"0123456789") == (ref, True)
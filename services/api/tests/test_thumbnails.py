@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from io import BytesIO
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from services.api.app.config import settings
+from services.api.app.main import app
+
+
+def _upload(client: TestClient, color: tuple[int, int, int]) -> dict:
+    from PIL import Image  # type: ignore
+
+    buf = BytesIO()
+    Image.new("RGB", (1200, 1800), color=color).save(buf, format="JPEG")
+    r = client.post("/documents", files={"file": ("kvitto.jpg", buf.getvalue(), "image/jpeg")}, data={"meta_json": "{}"})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_thumbnail_rendered_lazily_with_strong_etag(monkeypatch, tmp_path):
+    from PIL import Image  # type: ignore
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "thumbnail_at_ingest", False)
+    client = TestClient(app)
+    up = _upload(client, (250, 250, 250))
+    digest, store_dir = up["documentId"], Path(up["storagePath"]).parent
+    assert not list(store_dir.glob(f"{digest}.r*"))
+
+    r = client.get(f"/documents/{digest}/thumbnail", params={"size": 200}, headers={"Accept": "image/webp,*/*"})
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "image/webp"
+    assert r.headers["vary"] == "Accept"
+    etag = r.headers["etag"]
+    assert not etag.startswith("W/")
+    with Image.open(BytesIO(r.content)) as img:
+        assert max(img.size) == 320
+    # One decode renders every size and format next to the original
+    assert len(list(store_dir.glob(f"{digest}.r*"))) == 6
+
+    again = client.get(f"/documents/{digest}/thumbnail", params={"size": 200}, headers={"Accept": "image/webp", "If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["etag"] == etag
+
+    jpeg = client.get(f"/documents/{digest}/thumbnail", params={"size": 1024, "format": "jpeg"}, headers={"If-None-Match": etag})
+    assert jpeg.status_code == 200
+    assert jpeg.headers["content-type"] == "image/jpeg"
+    assert jpeg.headers["etag"] != etag
+
+    assert client.get("/documents/" + "0" * 64 + "/thumbnail").status_code == 404
+
+
+def test_thumbnails_rendered_at_ingest(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    client = TestClient(app)
+    up = _upload(client, (200, 210, 220))
+    digest, store_dir = up["documentId"], Path(up["storagePath"]).parent
+    assert sorted(p.name.split(".", 1)[1] for p in store_dir.glob(f"{digest}.r*")) == [
+        "r1024.jpeg", "r1024.webp", "r160.jpeg", "r160.webp", "r320.jpeg", "r320.webp",
+    ]
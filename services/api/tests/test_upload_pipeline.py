@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import asyncio
+from io import BytesIO
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from services.api.app import upload_pipeline
+from services.api.app.config import settings
+from services.api.app.main import app
+
+
+def _jpeg(width: int, height: int) -> bytes:
+    from PIL import Image  # type: ignore
+
+    buf = BytesIO()
+    Image.new("RGB", (width, height), color=(240, 240, 240)).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def test_upload_downscales_and_reports_stage_timings(monkeypatch, tmp_path):
+    from PIL import Image  # type: ignore
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "upload_image_max_edge", 800)
+    client = TestClient(app)
+    r = client.post("/documents", files={"file": ("stor.jpg", _jpeg(1600, 2400), "image/jpeg")}, data={"meta_json": "{}"})
+    assert r.status_code == 200, r.text
+    timing = r.headers["Server-Timing"]
+    for stage in ("sniff", "image", "hash", "store"):
+        assert f"{stage};dur=" in timing
+    with Image.open(Path(r.json()["storagePath"])) as img:
+        assert max(img.size) == 800
+
+    stats = client.get("/metrics/flow").json()["upload_stages"]
+    assert stats["image"]["count"] >= 1
+
+
+def test_pipeline_rejects_before_running_stages():
+    allowed = upload_pipeline.allowed_mimes()
+    loop = asyncio.new_event_loop()
+    try:
+        for ctype, data, detail in (("text/plain", b"x", "unsupported content type"),
+                                    ("image/jpeg", b"x" * (settings.upload_max_bytes + 1), "file too large")):
+            try:
+                loop.run_until_complete(upload_pipeline.run(data, ctype, allowed))
+            except upload_pipeline.UploadRejected as e:
+                assert e.detail == detail
+            else:
+                raise AssertionError("expected rejection")
+    finally:
+        loop.close()
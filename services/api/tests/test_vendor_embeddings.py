@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import asyncio
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from services.api.app import db as db_mod
+from services.api.app.config import settings
+from services.api.app.main import app
+from services.api.app.models import VendorEmbedding
+from services.api.app.scripts import vendor_embedding_refresh
+from services.api.app.vendor_embeddings import EmbeddingService, model_id
+
+
+def test_cache_normalises_names_and_batches_misses():
+    svc = EmbeddingService()
+    first = svc.embed_many(["Kaffe AB", "Taxi Stockholm", "kaffe  ab"])
+    assert first[0] == first[2]
+    assert svc.stats["batches"] == 1 and svc.stats["encoded"] == 2
+    assert svc.embed("KAFFE AB") == first[0]
+    assert svc.stats["batches"] == 1 and svc.stats["hits"] >= 1
+
+
+def test_concurrent_lookups_share_one_encode(monkeypatch):
+    monkeypatch.setattr(settings, "embeddings_batch_wait_ms", 20.0)
+    svc = EmbeddingService()
+
+    async def _run() -> list:
+        return await asyncio.gather(*(svc.aembed(f"Leverantör {i}") for i in range(10)))
+
+    vectors = asyncio.get_event_loop().run_until_complete(_run())
+    assert len(vectors) == 10 and svc.stats["batches"] == 1 and svc.stats["encoded"] == 10
+
+
+def test_dimension_and_bulk_reembed(monkeypatch, capsys):
+    client = TestClient(app)
+    assert client.post("/admin/seed/vendors").json()["inserted"] == 9
+
+    async def _models() -> set:
+        async with db_mod.SessionLocal() as session:
+            return set((await session.execute(select(VendorEmbedding.embedding_model))).scalars().all())
+
+    loop = asyncio.get_event_loop()
+    assert loop.run_until_complete(_models()) == {"stub:16"}
+    svc = EmbeddingService()
+    monkeypatch.setattr(settings, "embedding_dim", 8)
+    assert len(svc.embed("Kaffe AB")) == 8 and model_id() == "stub:8"
+
+    # Only rows from another model are re-embedded; a second run has nothing to do
+    monkeypatch.setattr(settings, "database_url", str(db_mod.engine.url))
+    monkeypatch.setattr(settings, "embedding_dim", 16)
+    monkeypatch.setattr(settings, "embeddings_provider", "stub")
+
+    async def _retag() -> None:
+        async with db_mod.SessionLocal() as session:
+            row = (await session.execute(select(VendorEmbedding).where(VendorEmbedding.name == "IKEA"))).scalars().one()
+            row.embedding_model = "minilm:old:384"
+            await session.commit()
+
+    loop.run_until_complete(_retag())
+    loop.run_until_complete(vendor_embedding_refresh.main(batch=4, all_rows=False))
+    assert "'updated': 1" in capsys.readouterr().out
+    assert loop.run_until_complete(_models()) == {"stub:16"}
+    loop.run_until_complete(vendor_embedding_refresh.main(batch=4, all_rows=False))
+    assert "'updated': 0" in capsys.readouterr().out
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from services.api.app import db as db_mod
+from services.api.app import vendor_index
+from services.api.app.ai import suggest_account_and_vat
+from services.api.app.config import settings
+from services.api.app.main import app
+from services.api.app.models import VendorEmbedding
+from services.api.app.vendor_embeddings import embed_vendor_name
+
+
+def test_vendor_index_top_k_threshold_and_refresh_on_write(monkeypatch):
+    monkeypatch.setattr(settings, "vendor_index_ttl_seconds", 3600.0)
+    client = TestClient(app)
+    assert client.post("/admin/seed/vendors").status_code == 200
+
+    async def _run() -> None:
+        async with db_mod.SessionLocal() as session:
+            hits = await vendor_index.search(session, embed_vendor_name("Taxi Stockholm AB"), k=3)
+            assert hits[0].name == "Taxi Stockholm" and hits[0].vat_rate == 0.06 and hits[0].score > 0.99
+            assert [h.score for h in hits] == sorted((h.score for h in hits), reverse=True)
+            assert all(h.score >= settings.vendor_embedding_min_score for h in hits)
+
+            # Unrelated vendors no longer snap to whichever seed happens to be nearest
+            assert await vendor_index.search(session, embed_vendor_name("Clas Ohlson")) == []
+            decision = await suggest_account_and_vat("Clas Ohlson", 100.0, session)
+            assert decision.expense_account == "4000"
+
+            # Rows without an account are not indexed; a usable write is visible on the next lookup
+            session.add(VendorEmbedding(name="Clas Ohlson AB", embedding=embed_vendor_name("Clas Ohlson AB")))
+            session.add(VendorEmbedding(name="Clas Ohlson", embedding=embed_vendor_name("Clas Ohlson"), suggested_account="5410", vat_rate=0.25))
+            await session.commit()
+            hits = await vendor_index.search(session, embed_vendor_name("Clas Ohlson"), k=5)
+            assert [h.name for h in hits] == ["Clas Ohlson"]
+            decision = await suggest_account_and_vat("Clas Ohlson", 100.0, session)
+            assert decision.expense_account == "5410" and "Clas Ohlson" in decision.reason
+
+    asyncio.get_event_loop().run_until_complete(_run())
+
+
+def test_parse_embedding_formats():
+    assert vendor_index.parse_embedding("0.5,0.25").tolist() == [0.5, 0.25]
+    assert vendor_index.parse_embedding("[1,0]").tolist() == [1.0, 0.0]
+    assert vendor_index.parse_embedding([0.0, 1.0]).tolist() == [0.0, 1.0]
+    assert vendor_index.parse_embedding("not,a,vector") is None
+
+
+def test_index_reloads_after_commit_not_flush(monkeypatch):
+    monkeypatch.setattr(settings, "vendor_index_ttl_seconds", 3600.0)
+    client = TestClient(app)
+    assert client.post("/admin/seed/vendors").status_code == 200
+    query = embed_vendor_name("Biltema")
+
+    async def _run() -> None:
+        async with db_mod.SessionLocal() as writer, db_mod.SessionLocal() as reader:
+            writer.add(VendorEmbedding(name="Biltema", embedding=query, suggested_account="5611", vat_rate=0.25))
+            await writer.flush()
+            # A reader loading between flush and commit must not pin the pre-commit snapshot
+            assert "Biltema" not in [h.name for h in await vendor_index.search(reader, query)]
+            await reader.rollback()
+            await writer.commit()
+            assert (await vendor_index.search(reader, query))[0].name == "Biltema"
+
+            version = vendor_index._version
+            writer.add(VendorEmbedding(name="Jula", embedding=embed_vendor_name("Jula"), suggested_account="5410", vat_rate=0.25))
+            await writer.flush()
+            await writer.rollback()
+            assert vendor_index._version == version
+
+    asyncio.get_event_loop().run_until_complete(_run())
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import importlib.util
+import json
+from datetime import date
+from pathlib import Path
+
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from services.api.app import db as db_mod
+from services.api.app.main import app
+
+
+MIGRATION = Path(__file__).resolve().parents[1] / "migrations" / "versions" / "20261019_000010_verification_explanations.py"
+
+
+def test_explanation_stored_with_posting_and_batch_loaded(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    client = TestClient(app)
+    ids = []
+    for vendor in ("Kaffe AB", "Taxi Syd", "Byggmax"):
+        r = client.post("/ai/auto-post", json={"org_id": 1, "total": 100.0, "date": date.today().isoformat(), "vendor": vendor})
+        assert r.status_code == 200, r.text
+        ids.append(r.json()["id"])
+    assert not (tmp_path / ".verification_meta").exists()
+
+    v = client.get(f"/verifications/{ids[1]}").json()
+    assert v["explainability"].startswith("Taxi-resor (6% moms). Total 100.00 SEK, konto 5611")
+    assert v["explanation"]["model"] == "rules"
+    assert v["explanation"]["features"]["vendor"] == "Taxi Syd" and v["explanation"]["features"]["vat_rate"] == 0.06
+
+    statements: list[str] = []
+
+    def _count(_conn, _cursor, statement, *_a) -> None:
+        statements.append(statement)
+
+    event.listen(db_mod.engine.sync_engine, "before_cursor_execute", _count)
+    try:
+        listed = client.get("/verifications").json()
+    finally:
+        event.remove(db_mod.engine.sync_engine, "before_cursor_execute", _count)
+    by_id = {row["id"]: row for row in listed}
+    assert all(by_id[i]["explainability"] for i in ids)
+    assert len([s for s in statements if "FROM verification_explanations" in s]) == 1
+
+
+def test_migration_imports_sidecars(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    meta = tmp_path / ".verification_meta"
+    meta.mkdir()
+    (meta / "1.json").write_text(json.dumps({"explainability": "Taxi-resor (6% moms)"}), encoding="utf-8")
+    (meta / "2.json").write_text(json.dumps({"explainability": "Standard inköp", "source": "legacy"}), encoding="utf-8")
+    (meta / "99.json").write_text(json.dumps({"explainability": "orphan"}), encoding="utf-8")
+    (meta / "broken.json").write_text("{", encoding="utf-8")
+
+    spec = importlib.util.spec_from_file_location("migration_000010", MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)  # type: ignore[union-attr]
+
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'migrate.db'}")
+    with engine.begin() as conn:
+        conn.execute(sa.text("CREATE TABLE verifications (id INTEGER PRIMARY KEY)"))
+        conn.execute(sa.text("INSERT INTO verifications (id) VALUES (1), (2)"))
+        with Operations.context(MigrationContext.configure(conn)):
+            migration.upgrade()
+        rows = conn.execute(sa.text("SELECT verification_id, reason, features_json FROM verification_explanations ORDER BY verification_id")).all()
+    assert [(r[0], r[1]) for r in rows] == [(1, "Taxi-resor (6% moms)"), (2, "Standard inköp")]
+    assert json.loads(rows[1][2]) == {"source": "legacy"}